@@ -62,6 +62,7 @@ Synthesis Functions
     Antenna.Fsynth2b
     Antenna.Fsynth2
     Antenna.Fsynth3
+    Antenna.vsh3basis
     Antenna.Fpatt
 
 Visualization functions
@@ -213,6 +214,9 @@ class Antenna(PyLayers):
                     number of phi (default 90)
         source    : string
                 source of data { 'satimo' | 'cst' | 'hfss' }
+        tol       : float
+                tolerance of the vsh synthesis (default 0 : exact)
+                see Fsynth3
         Notes
         -----
 
@@ -245,7 +249,8 @@ class Antenna(PyLayers):
                     'hpbwv':6.2,
                     'hpbwh':65,
                     'fbrh':30,
-                    'thtilt':0}
+                    'thtilt':0,
+                    'tol':0}
 
         for k in defaults:
             if k not in kwargs:
@@ -258,6 +263,7 @@ class Antenna(PyLayers):
         self.pol = kwargs['pol']
         self.fmin = kwargs['fmin']
         self.fmax = kwargs['fmax']
+        self.tol = kwargs['tol']
 
         # if typ has an extension it is a file
         if isinstance(typ,str):
@@ -1973,7 +1979,6 @@ class Antenna(PyLayers):
         return (Ft,Fp)    
 
 
-    #def Fsynth1(self, theta, phi, k=0):
     def Fsynth1(self, theta, phi,pattern=False):
         """ calculate complex antenna pattern  from VSH Coefficients (shape 1)
 
@@ -1982,8 +1987,41 @@ class Antenna(PyLayers):
 
         theta  : ndarray (1xNdir)
         phi    : ndarray (1xNdir)
-        k      : int
-            frequency index
+        pattern : boolean
+            if True theta and phi are reorganized for building the pattern
+
+        Returns
+        -------
+
+        if pattern:
+            Fth   : ndarray (Nf x Ntheta x Nphi)
+            Fph   : ndarray (Nf x Ntheta x Nphi)
+        else:
+            Fth   : ndarray (Nf x Ndir)
+            Fph   : ndarray (Nf x Ndir)
+
+        Notes
+        -----
+
+        The synthesis is a single contraction over the frequency,
+        the direction and the (l,m) axis
+
+        .. math::
+
+            F_{c,f,r} = \\sum_{s,k} C_{c,s,f,k} X_{r,s,k}
+
+        where c is the component (theta,phi), s the term of the basis
+        X = [Re(V),Im(V),Re(W),Im(W)] and C the corresponding
+        coefficients [Br,-Bi,Ci,Cr] for theta and [-Cr,Ci,Bi,Br] for phi.
+
+        The theta part of the basis, obtained from AFLegendre3, is cached
+        and reused as long as theta and the coefficients order are unchanged.
+
+        See Also
+        --------
+
+        _vsh1theta
+        Fsynth3
 
         """
 
@@ -1991,63 +2029,44 @@ class Antenna(PyLayers):
         Np = len(phi)
 
         if pattern:
-            theta = np.kron(theta, np.ones(Np))
+            Vt, Wt = self._vsh1theta(theta)
+            Vt = np.repeat(Vt,Np,axis=0)
+            Wt = np.repeat(Wt,Np,axis=0)
             phi = np.kron(np.ones(Nt),phi)
+        else:
+            Vt, Wt = self._vsh1theta(theta)
 
-        nray = len(theta)
-
-        #Br = self.C.Br.s1[k, :, :]
-        #Bi = self.C.Bi.s1[k, :, :]
-        #Cr = self.C.Cr.s1[k, :, :]
-        #Ci = self.C.Ci.s1[k, :, :]
+        ind = index_vsh(self.C.Br.L1, self.C.Br.M1)
+        l = ind[:, 0]
+        m = ind[:, 1]
 
-        Br = self.C.Br.s1[:, :, :]
-        Bi = self.C.Bi.s1[:, :, :]
-        Cr = self.C.Cr.s1[:, :, :]
-        Ci = self.C.Ci.s1[:, :, :]
+        Ephi = np.exp(1j*np.outer(phi,m))
+        V = Vt*Ephi
+        W = Wt*Ephi
+        # X : nray x 4 x K
+        X = np.concatenate((np.real(V)[:,None,:],
+                            np.imag(V)[:,None,:],
+                            np.real(W)[:,None,:],
+                            np.imag(W)[:,None,:]),axis=1)
+
+        Br = self.C.Br.s1[:, l, m]
+        Bi = self.C.Bi.s1[:, l, m]
+        Cr = self.C.Cr.s1[:, l, m]
+        Ci = self.C.Ci.s1[:, l, m]
+        # C : 2 x 4 x Nf x K
+        C = np.array([[Br,-Bi,Ci,Cr],
+                      [-Cr,Ci,Bi,Br]])
 
-        N = self.C.Br.N1
-        M = self.C.Br.M1
-        #print "N,M",N,M
         #
-        # The - sign is necessary to get the good reconstruction
-        #     deduced from observation
-        #     May be it comes from a different definition of theta in SPHEREPACK
-        x = -np.cos(theta)
-        Pmm1n, Pmp1n = AFLegendre3(N, M, x)
-        ind = index_vsh(N, M)
-        n = ind[:, 0]
-        m = ind[:, 1]
-        #~ V, W = VW(n, m, x, phi, Pmm1n, Pmp1n)
-        V, W = VW(n, m, x, phi)
-        #
-        # broadcasting along frequency axis
-        #
-        V = np.expand_dims(V,0)
-        W = np.expand_dims(V,0)
+        #   c : component (theta,phi)
+        #   s : basis term
+        #   f : frequency axis
+        #   k : coeff (l,m)
+        #   r : direction
         #
-        #   k : frequency axis
-        #   l : coeff l
-        #   m
-        Fth = np.eisum('klm,kilm->ki',Br,np.real(V.T)) - \
-              np.eisum('klm,kilm->ki',Bi,np.imag(V.T)) + \
-              np.eisum('klm,kilm->ki',Ci,np.real(W.T)) + \
-              np.eisum('klm,kilm->ki',Cr,np.imag(W.T))
-
-        Fph = -np.eisum('klm,kilm->ki',Cr,np.real(V.T)) + \
-              np.eisum('klm,kilm->ki',Ci,np.imag(V.T)) + \
-              np.eisum('klm,kilm->ki',Bi,np.real(W.T)) + \
-              np.eisum('klm,kilm->ki',Br,np.imag(W.T))
-
-        #Fth = np.dot(Br, np.real(V.T)) - \
-        #    np.dot(Bi, np.imag(V.T)) + \
-        #    np.dot(Ci, np.real(W.T)) + \
-        #    np.dot(Cr, np.imag(W.T))
-
-        #Fph = -np.dot(Cr, np.real(V.T)) + \
-        #    np.dot(Ci, np.imag(V.T)) + \
-        #    np.dot(Bi, np.real(W.T)) + \
-        #    np.dot(Br, np.imag(W.T))
+        F = np.einsum('csfk,rsk->cfr',C,X,optimize=True)
+        Fth = F[0]
+        Fph = F[1]
 
         if pattern:
             Nf = len(self.fa)
@@ -2056,7 +2075,52 @@ class Antenna(PyLayers):
 
         return Fth, Fph
 
+    def _vsh1theta(self,theta):
+        """ theta part of the vsh basis of shape 1 coefficients
+
+        Parameters
+        ----------
+
+        theta : np.array (Nray)
+
+        Returns
+        -------
+
+        Vt : np.array (Nray x K)
+        Wt : np.array (Nray x K)
+
+        Notes
+        -----
+
+        The Legendre terms are obtained from AFLegendre3. The result
+        is cached for the last theta array.
+
+        """
+        L = self.C.Br.L1
+        M = self.C.Br.M1
+        theta = np.array(theta,dtype=float)
+        key = (L,M,theta.tostring())
+        if getattr(self,'_vsh1key',None) == key:
+            return self._vsh1
 
+        ind = index_vsh(L, M)
+        #
+        # The - sign is necessary to get the good reconstruction
+        #     deduced from observation
+        #     May be it comes from a different definition of theta in SPHEREPACK
+        #
+        th = theta.copy()
+        index = np.where(abs(th-np.pi/2)<1e-5)[0]
+        if len(index)>0:
+            th[index]=np.pi/2-0.01
+        x = -np.cos(th)
+        # as in VW, M=L provides the m=0 term of Pmm1l
+        Pmm1l, Pmp1l = AFLegendre3(L, L, x)
+        Vt, Wt = VWtheta(ind[:, 0], ind[:, 1], th, Pmm1l, Pmp1l)
+
+        self._vsh1 = (Vt,Wt)
+        self._vsh1key = key
+        return self._vsh1
 
     def Fsynth2s(self,dsf=1):
         """  pattern synthesis from shape 2 vsh coefficients
@@ -2307,7 +2371,7 @@ class Antenna(PyLayers):
         return Fth, Fph
 
 
-    def Fsynth3(self, theta = [], phi=[], pattern=True):
+    def Fsynth3(self, theta = [], phi=[], pattern=True, tol=None):
         r""" synthesis of a complex antenna pattern from SH coefficients
         (vsh or ssh  in shape 3)
 
@@ -2322,6 +2386,11 @@ class Antenna(PyLayers):
 
         pattern : boolean
             if True theta and phi are reorganized for building the pattern
+        tol : float
+            tolerance of the vsh synthesis (default None : self.tol)
+            0 : the basis functions are evaluated for each direction
+            >0 : the basis functions are interpolated from a theta grid
+            (see vsh3basis)
         typ  : 'vsh' | 'ssh' | 'hfss'
 
         Returns
@@ -2356,6 +2425,10 @@ class Antenna(PyLayers):
         All Br,Cr,Bi,Ci have the same (l,m) index in order to evaluate only
         once the V,W function
 
+        The V,W functions are separable : the theta part is either
+        evaluated for each direction or interpolated from the basis cached
+        by vsh3basis, the phi part is :math:`e^{jm\phi}`.
+
         If the data comes from a cst file like the antenna used in WHERE1 D4.1
         the pattern is multiplied by $\frac{4\pi}{120\pi}=\frac{1}{\sqrt{30}$
 
@@ -2394,31 +2467,34 @@ class Antenna(PyLayers):
 
         if typ =='vsh':
 
-            nray = len(theta)
-
-            Br  = self.C.Br.s3
-            lBr = self.C.Br.ind3[:, 0]
-            mBr = self.C.Br.ind3[:, 1]
+            if tol is None:
+                tol = getattr(self,'tol',0)
 
-            Bi  = self.C.Bi.s3
-            Cr  = self.C.Cr.s3
-            Ci  = self.C.Ci.s3
-
-            L = lBr.max()
-            M = mBr.max()
+            # theta part of the basis functions
+            if pattern:
+                Vt, Wt = self._vsh3theta(self.theta,tol)
+                Vt = np.repeat(Vt,Np,axis=0)
+                Wt = np.repeat(Wt,Np,axis=0)
+            else:
+                Vt, Wt = self._vsh3theta(theta,tol)
 
-            # vector spherical harmonics basis functions
-            V, W = VW(lBr, mBr, theta, phi)
+            # phi part of the basis functions
+            mBr = self.C.Br.ind3[:, 1]
+            Ephi = np.exp(1j*np.outer(phi,mBr))
+            V = Vt*Ephi
+            W = Wt*Ephi
 
-            Fth = np.dot(Br, np.real(V.T)) - \
-                  np.dot(Bi, np.imag(V.T)) + \
-                  np.dot(Ci, np.real(W.T)) + \
-                  np.dot(Cr, np.imag(W.T))
+            #
+            # Fth = Br.Vr - Bi.Vi + Ci.Wr + Cr.Wi
+            # Fph = -Cr.Vr + Ci.Vi + Bi.Wr + Br.Wi
+            #
+            # evaluated as a single product (see _vsh3coeff)
+            #
+            X = np.hstack((np.real(V),np.imag(V),np.real(W),np.imag(W)))
+            F = np.dot(self._vsh3coeff(),X.T)
 
-            Fph = -np.dot(Cr, np.real(V.T)) + \
-                   np.dot(Ci, np.imag(V.T)) + \
-                   np.dot(Bi, np.real(W.T)) + \
-                   np.dot(Br, np.imag(W.T))
+            Fth = F[0:Nf,:]
+            Fph = F[Nf:,:]
 
             if pattern:
 
@@ -2479,6 +2555,126 @@ class Antenna(PyLayers):
         else:
             return None,None
 
+
+    def vsh3basis(self,tol=1e-4):
+        """ theta part of the vsh basis on a regular theta grid
+
+        Parameters
+        ----------
+
+        tol : float
+            maximum interpolation error relatively to the maximum
+            of the basis functions
+
+        Returns
+        -------
+
+        th : np.array (Ng)
+            theta grid
+        Vt : np.array (Ng x K)
+        Wt : np.array (Ng x K)
+
+        Notes
+        -----
+
+        The grid is refined until the linear interpolation error evaluated
+        between the grid points is lower than tol. The number of
+        intervals is kept odd in order to avoid the singular point
+        theta = pi/2.
+
+        The basis is cached and reevaluated only if tol or the
+        coefficients change.
+
+        See Also
+        --------
+
+        pylayers.antprop.spharm.VWtheta
+
+        """
+        lBr = self.C.Br.ind3[:, 0]
+        mBr = self.C.Br.ind3[:, 1]
+        key = (tol,id(self.C.Br.ind3),self.C.Br.ind3.shape)
+        if getattr(self,'_vsh3bkey',None) == key:
+            return self._vsh3b
+
+        L = lBr.max()
+        ng = int(np.ceil(np.pi*(L+1)/np.sqrt(8*tol)))
+        ng = ng + 1 - ng % 2
+        while True:
+            th = np.linspace(0,np.pi,ng+1)
+            Vt, Wt = VWtheta(lBr, mBr, th)
+            # error at 1/3 of the intervals
+            Vm, Wm = VWtheta(lBr, mBr, th[0:-1]+np.pi/(3.*ng))
+            ev = abs((2*Vt[0:-1,:]+Vt[1:,:])/3.-Vm).max()
+            ew = abs((2*Wt[0:-1,:]+Wt[1:,:])/3.-Wm).max()
+            ref = max(abs(Vt).max(),abs(Wt).max())
+            if (max(ev,ew) <= tol*ref) or (ng > 65536):
+                break
+            ng = 2*ng + 1
+
+        self._vsh3b = (th,Vt,Wt)
+        self._vsh3bkey = key
+        return self._vsh3b
+
+    def _vsh3theta(self,theta,tol=0):
+        """ theta part of the vsh basis for given directions
+
+        Parameters
+        ----------
+
+        theta : np.array (Nray)
+        tol : float
+            0 : direct evaluation , >0 : interpolation from vsh3basis
+
+        Returns
+        -------
+
+        Vt : np.array (Nray x K)
+        Wt : np.array (Nray x K)
+
+        """
+        if tol > 0:
+            th, Gv, Gw = self.vsh3basis(tol)
+            ng = len(th) - 1
+            u = np.clip(np.asarray(theta,dtype=float)*ng/np.pi,0,ng)
+            i = np.minimum(u.astype(int),ng-1)
+            w = (u - i)[:,np.newaxis]
+            Vt = (1-w)*Gv[i,:] + w*Gv[i+1,:]
+            Wt = (1-w)*Gw[i,:] + w*Gw[i+1,:]
+        else:
+            lBr = self.C.Br.ind3[:, 0]
+            mBr = self.C.Br.ind3[:, 1]
+            Vt, Wt = VWtheta(lBr, mBr, theta)
+        return Vt, Wt
+
+    def _vsh3coeff(self):
+        """ stacked shape 3 coefficients
+
+        Returns
+        -------
+
+        C : np.array (2Nf x 4K)
+            [[ Br , -Bi , Ci , Cr ],
+             [ -Cr , Ci , Bi , Br ]]
+
+        Notes
+        -----
+
+        Fth and Fph are obtained with a single product of C with the
+        stacked basis [Vr,Vi,Wr,Wi]
+
+        """
+        key = (id(self.C.Br.s3),id(self.C.Bi.s3),id(self.C.Cr.s3),id(self.C.Ci.s3))
+        if getattr(self,'_vsh3ckey',None) != key:
+            Br = self.C.Br.s3
+            Bi = self.C.Bi.s3
+            Cr = self.C.Cr.s3
+            Ci = self.C.Ci.s3
+            self._vsh3c = np.vstack((np.hstack((Br,-Bi,Ci,Cr)),
+                                     np.hstack((-Cr,Ci,Bi,Br))))
+            self._vsh3ckey = key
+        return self._vsh3c
+
     def gain(self,th,ph,dB=True):
         """
         Parameters
@@ -28,6 +28,7 @@ Ctilde class
     Ctilde.energy
     Ctilde.sort
     Ctilde.prop2tran
+    Ctilde.compact
     Ctilde.PLoss
 
 Tchannel Class
@@ -53,6 +54,22 @@ Tchannel Class
     Tchannel.saveh5
     Tchannel.loadh5
 
+Schannel Class
+==============
+
+.. autosummary::
+    :toctree: generated/
+
+    Schannel.__init__
+    Schannel.fit
+    Schannel.eval
+    Schannel.totilde
+    Schannel.prop2tran
+    Schannel.energy
+    Schannel.rssi
+    Schannel.tap
+    Schannel.cut
+
 """
 import doctest
 import pdb
@@ -762,6 +779,58 @@ class Ctilde(PyLayers):
         return fig,[ax1,ax2]
 
 
+    def _locbas(self, Tt, Tr):
+        """ rotate the channel for a stack of antenna orientations
+
+        Parameters
+        ----------
+
+        Tt  : Tx rotation matrix 3x3 or No x 3 x 3
+        Tr  : Rx rotation matrix 3x3 or No x 3 x 3
+
+        Returns
+        -------
+
+        Cl : np.array (No x 2 x 2 x r x f)
+            rotated components [[tt,tp],[pt,pp]]
+        tangl : np.array (No x r x 2)
+        rangl : np.array (No x r x 2)
+
+        Notes
+        -----
+
+        The channel is not modified. The rotation matrices of all the rays
+        and all the orientations are stacked, so that
+
+        .. math::
+
+            C_l = R_r C R_t
+
+        is evaluated for all of them at once.
+
+        """
+        Tt = np.asarray(Tt)
+        Tr = np.asarray(Tr)
+        if Tt.ndim == 2:
+            Tt = Tt[np.newaxis, :, :]
+        if Tr.ndim == 2:
+            Tr = Tr[np.newaxis, :, :]
+        No = max(len(Tt), len(Tr))
+        Tt = Tt*np.ones((No, 1, 1))
+        Tr = Tr*np.ones((No, 1, 1))
+
+        # Rt : No x 2 x 2 x r
+        # Rr : No x 2 x 2 x r
+        Rt, tangl = geu.BTB_tx(self.tang, Tt)
+        Rr, rangl = geu.BTB_rx(self.rang, Tr)
+
+        # C : 2 x 2 x r x f
+        C = np.array([[self.Ctt.y, self.Ctp.y], [self.Cpt.y, self.Cpp.y]])
+        RC = np.einsum('oabr,bcrf->oacrf', Rr, C)
+        Cl = np.einsum('oacrf,ocdr->oadrf', RC, Rt)
+
+        return Cl, tangl, rangl
+
     def locbas(self, Tt=[], Tr=[],b2g=False):
         """ global reference frame to local reference frame
 
@@ -833,57 +902,18 @@ class Ctilde(PyLayers):
         #
 
 
-        Rt, tangl = geu.BTB_tx(self.tang, self.Tt)
-        Rr, rangl = geu.BTB_rx(self.rang, self.Tr)
+        Cl, tangl, rangl = self._locbas(self.Tt, self.Tr)
         #
         # update direction of departure and arrival
         #
 
-        self.tangl = tangl
-        self.rangl = rangl
+        self.tangl = tangl[0]
+        self.rangl = rangl[0]
 
-        #uf = np.ones(self.nfreq)
-
-        #
-        # r0 : r x 1(f)
-        #
-
-        #r0 = np.outer(Rr[0, 0,:], uf)
-        r0 = Rr[0,0,:][:, np.newaxis]
-        #r1 = np.outer(Rr[0, 1,:], uf)
-        r1 = Rr[0,1,:][:, np.newaxis]
-
-        t00 = r0 * self.Ctt.y + r1 * self.Cpt.y
-        t01 = r0 * self.Ctp.y + r1 * self.Cpp.y
-
-        #r0 = np.outer(Rr[1, 0,:], uf)
-        r0 = Rr[1, 0,:][:, np.newaxis]
-        #r1 = np.outer(Rr[1, 1,:], uf)
-        r1 = Rr[1, 1,:][:, np.newaxis]
-
-        t10 = r0 * self.Ctt.y + r1 * self.Cpt.y
-        t11 = r0 * self.Ctp.y + r1 * self.Cpp.y
-
-        #r0 = np.outer(Rt[0, 0,:], uf)
-        r0 = Rt[0, 0, :][:, np.newaxis]
-        #r1 = np.outer(Rt[1, 0,:], uf)
-        r1 = Rt[1, 0, :][:, np.newaxis]
-
-        Cttl = t00 * r0 + t01 * r1
-        Cptl = t10 * r0 + t11 * r1
-
-        #r0 = np.outer(Rt[0, 1,:], uf)
-        r0 = Rt[0, 1, :][:, np.newaxis]
-        #r1 = np.outer(Rt[1, 1,:], uf)
-        r1 = Rt[1, 1, :][:, np.newaxis]
-
-        Ctpl = t00 * r0 + t01 * r1
-        Cppl = t10 * r0 + t11 * r1
-
-        self.Ctt = bs.FUsignal(fGHz, Cttl)
-        self.Ctp = bs.FUsignal(fGHz, Ctpl)
-        self.Cpt = bs.FUsignal(fGHz, Cptl)
-        self.Cpp = bs.FUsignal(fGHz, Cppl)
+        self.Ctt = bs.FUsignal(fGHz, Cl[0, 0, 0])
+        self.Ctp = bs.FUsignal(fGHz, Cl[0, 0, 1])
+        self.Cpt = bs.FUsignal(fGHz, Cl[0, 1, 0])
+        self.Cpp = bs.FUsignal(fGHz, Cl[0, 1, 1])
 
         return self
 
@@ -937,61 +967,19 @@ class Ctilde(PyLayers):
         # rangl : r x 2
         #
 
-        Rt, tangl = geu.BTB_tx(self.tang, self.Tt)
-        Rr, rangl = geu.BTB_rx(self.rang, self.Tr)
+        Cl, tangl, rangl = self._locbas(self.Tt, self.Tr)
 
         #
         # update direction of departure and arrival
         #
 
-        self.tang = tangl
-        self.rang = rangl
-
-        #uf = np.ones(self.nfreq)
-
-        #
-        # r0 : r x 1(f)
-        #
-
-        #r0 = np.outer(Rr[0, 0,:], uf)
-        r0 = Rr[0,0,:][:,np.newaxis]
-        #r1 = np.outer(Rr[0, 1,:], uf)
-        r1 = Rr[0,1,:][:,np.newaxis]
-
-        t00 = r0 * self.Ctt.y + r1 * self.Cpt.y
-        t01 = r0 * self.Ctp.y + r1 * self.Cpp.y
-
-        #r0 = np.outer(Rr[1, 0,:], uf)
-        r0 = Rr[1, 0,:][:,np.newaxis]
-        #r1 = np.outer(Rr[1, 1,:], uf)
-        r1 = Rr[1, 1,:][:,np.newaxis]
-
-        t10 = r0 * self.Ctt.y + r1 * self.Cpt.y
-        t11 = r0 * self.Ctp.y + r1 * self.Cpp.y
-
-        #r0 = np.outer(Rt[0, 0,:], uf)
-        r0 = Rt[0,0,:][:,np.newaxis]
-        #r1 = np.outer(Rt[1, 0,:], uf)
-        r1 = Rt[1,0,:][:,np.newaxis]
-
-        Cttl = t00 * r0 + t01 * r1
-        Cptl = t10 * r0 + t11 * r1
-
-        #r0 = np.outer(Rt[0, 1,:], uf)
-        r0 = Rt[0,1,:][:,np.newaxis]
-        #r1 = np.outer(Rt[1, 1,:], uf)
-        r1 = Rt[1,1,:][:,np.newaxis]
-
-        Ctpl = t00 * r0 + t01 * r1
-        Cppl = t10 * r0 + t11 * r1
-
-
-        self.Ctt = bs.FUsignal(fGHz, Cttl)
-        self.Ctp = bs.FUsignal(fGHz, Ctpl)
-        self.Cpt = bs.FUsignal(fGHz, Cptl)
-        self.Cpp = bs.FUsignal(fGHz, Cppl)
-
+        self.tang = tangl[0]
+        self.rang = rangl[0]
 
+        self.Ctt = bs.FUsignal(fGHz, Cl[0, 0, 0])
+        self.Ctp = bs.FUsignal(fGHz, Cl[0, 0, 1])
+        self.Cpt = bs.FUsignal(fGHz, Cl[0, 1, 0])
+        self.Cpp = bs.FUsignal(fGHz, Cl[0, 1, 1])
 
         return self
 
@@ -1188,6 +1176,45 @@ class Ctilde(PyLayers):
         self.Ctp.y = self.Ctp.y[u,:]
         self.Cpt.y = self.Cpt.y[u,:]
 
+    def _Fpattern(self, A, angl):
+        """ antenna pattern along a set of directions
+
+        Parameters
+        ----------
+
+        A : string or antenna
+            'theta' | 'phi' | antenna
+        angl : np.array (n x 2)
+            directions in the antenna local basis
+
+        Returns
+        -------
+
+        Ft : bs.FUsignal (n x f)
+        Fp : bs.FUsignal (n x f)
+
+        """
+        n = np.shape(angl)[0]
+        if type(A) == str:
+            Ft = np.zeros((n, self.nfreq))
+            Fp = np.zeros((n, self.nfreq))
+            if A == 'theta':
+                Ft[:] = 1
+            if A == 'phi':
+                Fp[:] = 1
+            Ft = bs.FUsignal(self.fGHz, Ft)
+            Fp = bs.FUsignal(self.fGHz, Fp)
+        else:
+            if A.fromfile :
+                Ft, Fp = A.Fsynth3(angl[:, 0], angl[:, 1], pattern=False)
+                Ft = bs.FUsignal(A.fa, Ft.transpose())
+                Fp = bs.FUsignal(A.fa, Fp.transpose())
+            else:
+                Ft, Fp = A.Fpatt(angl[:, 0], angl[:, 1], pattern=False)
+                Ft = bs.FUsignal(A.fa, Ft)
+                Fp = bs.FUsignal(A.fa, Fp)
+        return Ft, Fp
+
     def prop2tran(self,a='theta',b='theta',Ta=[],Tb=[],Friis=True):
         r""" transform propagation channel into transmission channel
 
@@ -1204,9 +1231,9 @@ class Ctilde(PyLayers):
             0 : theta
             1 : phi
 
-        Ta : np.array(3x3)
+        Ta : np.array(3x3) or np.array(No x 3 x 3)
            unitary matrice for antenna orientation
-        Tb : np.array(3x3)
+        Tb : np.array(3x3) or np.array(No x 3 x 3)
            unitary matrice for antenna orientation
         Friis : boolean
             if True scale with :math:`-j\frac{\lambda}{f}`
@@ -1215,63 +1242,66 @@ class Ctilde(PyLayers):
         -------
 
         H : Tchannel(bs.FUDAsignal)
+            or list of No Tchannel if Ta or Tb is a stack of orientations
 
+        Notes
+        -----
 
-        """
-        freq = self.fGHz
-        nfreq = self.nfreq
-        nray  = self.nray
-        sh = np.shape(self.Ctt.y)
+        If neither Ta nor Tb are given, the channel is used in its current
+        basis (see locbas). Otherwise the global channel is rotated
+        for all the orientations at once, without being modified, and the
+        antenna patterns of all the orientations are synthesized in a
+        single call per antenna.
 
-        if type(a) == str:
+        Examples
+        --------
 
-            if a == 'theta':
-                Fat = np.ones((nray, nfreq))
-                Fap = np.zeros(nray*nfreq).reshape((nray, nfreq))
+        Sweep of 36 orientations of antenna b around z
 
-            if a == 'phi':
-                Fat = np.zeros(nray*nfreq).reshape((nray, nfreq))
-                Fap = np.ones((nray, nfreq))
+        >>> lTb = np.array([geu.MRot3(k*np.pi/18,2) for k in range(36)]) # doctest: +SKIP
+        >>> lH = C.prop2tran(a=A,b=B,Ta=np.eye(3),Tb=lTb) # doctest: +SKIP
 
-            Fat = bs.FUsignal(self.fGHz, Fat)
-            Fap = bs.FUsignal(self.fGHz, Fap)
+        """
+        nray  = self.nray
 
-        else:
-            if a.fromfile :
-                Fat, Fap = a.Fsynth3(self.tangl[:, 0], self.tangl[:, 1], pattern=False)
-                Fat = Fat.transpose()
-                Fap = Fap.transpose()
-                Fat = bs.FUsignal(a.fa, Fat)
-                Fap = bs.FUsignal(a.fa, Fap)
+        if (len(Ta) == 0) & (len(Tb) == 0):
+            No = 1
+            stacked = False
+            Ctt = self.Ctt
+            Ctp = self.Ctp
+            Cpt = self.Cpt
+            Cpp = self.Cpp
+            if type(a) == str:
+                tangl = self.tang
             else:
-                Fat, Fap = a.Fpatt(self.tangl[:, 0], self.tangl[:, 1], pattern=False)
-                Fat = bs.FUsignal(a.fa, Fat)
-                Fap = bs.FUsignal(a.fa, Fap)
-
-
-        if type(b) == str:
-
-            if b == 'theta':
-                Fbt = np.ones((nray, nfreq))
-                Fbp = np.zeros(nray*nfreq).reshape((nray, nfreq))
-            if b == 'phi':
-                Fbp = np.ones((nray, nfreq))
-                Fbt = np.zeros(nray*nfreq).reshape((nray, nfreq))
-
-            Fbt = bs.FUsignal(self.fGHz, Fbt)
-            Fbp = bs.FUsignal(self.fGHz, Fbp)
+                tangl = self.tangl
+            if type(b) == str:
+                rangl = self.rang
+            else:
+                rangl = self.rangl
         else:
+            if len(Ta) == 0:
+                Ta = np.eye(3)
+            if len(Tb) == 0:
+                Tb = np.eye(3)
+            stacked = (np.ndim(Ta) == 3) | (np.ndim(Tb) == 3)
+            if self.islocal:
+                self.locbas(b2g=True)
+            # Cl : No x 2 x 2 x r x f
+            Cl, tangl, rangl = self._locbas(Ta, Tb)
+            No = Cl.shape[0]
+            # orientations are stacked along the ray axis : (No x r) x f
+            Cl = Cl.transpose((1, 2, 0, 3, 4)).reshape(2, 2, No*nray, self.nfreq)
+            Ctt = bs.FUsignal(self.fGHz, Cl[0, 0])
+            Ctp = bs.FUsignal(self.fGHz, Cl[0, 1])
+            Cpt = bs.FUsignal(self.fGHz, Cl[1, 0])
+            Cpp = bs.FUsignal(self.fGHz, Cl[1, 1])
+            tangl = tangl.reshape(No*nray, 2)
+            rangl = rangl.reshape(No*nray, 2)
+
+        Fat, Fap = self._Fpattern(a, tangl)
+        Fbt, Fbp = self._Fpattern(b, rangl)
 
-            if b.fromfile :
-                Fbt, Fbp = b.Fsynth3(self.rangl[:, 0], self.rangl[:, 1], pattern=False)
-                Fbt = Fbt.transpose()
-                Fbp = Fbp.transpose()
-                Fbt = bs.FUsignal(b.fa, Fbt)
-                Fbp = bs.FUsignal(b.fa, Fbp)
-            else:
-                Fbt, Fbp = b.Fpatt(self.rangl[:, 0], self.rangl[:, 1], pattern=False)
-                Fbt = bs.FUsignal(b.fa, Fbt)
-                Fbp = bs.FUsignal(b.fa, Fbp)
         # Ctt : r x f
         # Cg2cl should be applied here
         #
@@ -1283,18 +1313,64 @@ class Ctilde(PyLayers):
         #t1 = self.Ctt * Fat + self.Cpt * Fap
         #t2 = self.Ctp * Fat + self.Cpp * Fap
 
-        t1 = self.Ctt * Fat + self.Ctp * Fap
-        t2 = self.Cpt * Fat + self.Cpp * Fap
-        alpha = t1 * Fbt + t2 * Fbp
+        lF = [Fat, Fap, Fbt, Fbp]
+        same = [ (len(F.x) == self.nfreq) and np.allclose(F.x, self.fGHz) for F in lF ]
+        if np.all(same):
+            # common frequency base : no alignment needed
+            t1 = Ctt.y * Fat.y + Ctp.y * Fap.y
+            t2 = Cpt.y * Fat.y + Cpp.y * Fap.y
+            alpha = bs.FUsignal(self.fGHz, t1 * Fbt.y + t2 * Fbp.y)
+        else:
+            t1 = Ctt * Fat + Ctp * Fap
+            t2 = Cpt * Fat + Cpp * Fap
+            alpha = t1 * Fbt + t2 * Fbp
 
-        H = Tchannel(alpha.x, alpha.y, self.tauk, self.tang, self.rang)
-        if Friis:
-            H.applyFriis()
+        lH = []
+        for k in range(No):
+            H = Tchannel(alpha.x, alpha.y[k*nray:(k+1)*nray], self.tauk, self.tang, self.rang)
+            if Friis:
+                H.applyFriis()
 
-        # average w.r.t frequency
-        H.ak = np.real(np.sqrt(np.sum(H.y * np.conj(H.y)/self.nfreq, axis=1)))
-        H.tk = H.taud
-        return(H)
+            # average w.r.t frequency
+            H.ak = np.real(np.sqrt(np.sum(H.y * np.conj(H.y)/self.nfreq, axis=1)))
+            H.tk = H.taud
+            lH.append(H)
+
+        if stacked:
+            return(lH)
+        return(lH[0])
+
+    def compact(self,order=1):
+        """ compact delay domain representation of the channel
+
+        Parameters
+        ----------
+
+        order : int
+            order of the frequency model of each ray (default 1)
+
+        Returns
+        -------
+
+        S : Schannel
+
+        Notes
+        -----
+
+        The compact channel stores (order+1) x 2 x 2 complex values per ray
+        instead of nfreq x 2 x 2. It is fitted in the global basis.
+
+        See Also
+        --------
+
+        pylayers.antprop.channel.Schannel
+
+        """
+        if self.islocal:
+            self.locbas(b2g=True)
+        S = Schannel()
+        S.fit(self,order=order)
+        return(S)
 
     def _vec2scal(self):
         """ calculate scalChannel from VectChannel and antenna
@@ -1707,13 +1783,21 @@ class Tchannel(bs.FUDAsignal):
         htap = h.chantap(**kwargs)
         return htap
 
-    def applywavB(self, Wgam):
+    def applywavB(self, Wgam, nb=0, **kwargs):
         """ apply waveform method B (time domain )
 
         Parameters
         ----------
 
         Wgam : waveform including gamma factor
+        nb : int
+            number of rays per batch (default 0 : all rays at once)
+            if nb > 0 the CIR is built ray batch by ray batch
+            (see FUDsignal.ftstream)
+        kwargs :
+            ftstream keyword arguments (method, frac, fast, tstart, tstop)
+            frac is False by default : the rays are placed at their
+            nearest time sample, as with ft1(nearest=True)
 
         Returns
         -------
@@ -1733,6 +1817,7 @@ class Tchannel(bs.FUDAsignal):
         --------
 
         pylayers.signal.bsignal.TUDsignal.ft1
+        pylayers.signal.bsignal.FUDsignal.ftstream
 
         """
         #
@@ -1741,7 +1826,11 @@ class Tchannel(bs.FUDAsignal):
         #import ipdb
         #ipdb.set_trace()
         Y = self.apply(Wgam)
-        ri = Y.ft1(Nz=500,ffts=1)
+        if nb > 0:
+            kwargs.setdefault('frac',False)
+            ri = Y.ftstream(Nz=500,ffts=1,nb=nb,**kwargs)
+        else:
+            ri = Y.ft1(Nz=500,ffts=1)
 
         return(ri)
 
@@ -2389,6 +2478,573 @@ class Tchannel(bs.FUDAsignal):
         return PrdB
 
 
+class Schannel(PyLayers):
+    """ compact (sparse delay domain) polarimetric ray channel
+
+    For each ray the channel is stored as a delay and a 2x2 polarimetric
+    amplitude expressed as a low order polynomial of the normalized
+    frequency
+
+    .. math::
+
+        C_k(f) = \sum_{n=0}^{N} c_{nk} u^n  \quad  u=\frac{f-f_c}{B/2}
+
+    where :math:`f_c` and :math:`B` are the centre and the width of the band.
+    :math:`c_{0k}` is the polarimetric amplitude at the band centre and the
+    higher order terms model the frequency slope of the ray. The delay term
+    :math:`e^{-2j\pi f\tau_k}` is kept apart, as in Ctilde.
+
+    Attributes
+    ----------
+
+    fGHz : np.array
+        frequency array of the band
+    fcGHz : float
+        band centre
+    BGHz : float
+        band width
+    tauk : ndarray delays  (nray)
+    tang : ndarray angles of departure (nray x 2)
+    rang : ndarray angles of arrival (nray x 2)
+    c : ndarray
+        polynomial coefficients (order+1 x nray x 2 x 2)
+        c[n,k,i,j] with i,j in (theta,phi) : [[tt,tp],[pt,pp]]
+    err : ndarray
+        relative rms error of the model along frequency (nray)
+
+    Methods
+    -------
+
+    fit
+    eval
+    totilde
+    prop2tran
+    energy
+    rssi
+    tap
+    cut
+
+    See Also
+    --------
+
+    pylayers.antprop.channel.Ctilde.compact
+
+    """
+    def __init__(self,
+                 fGHz = np.array([]),
+                 tauk = np.array([]),
+                 tang = np.array([[],[]]).T,
+                 rang = np.array([[],[]]).T,
+                 c = np.zeros((1,0,2,2),dtype=complex)):
+        """ class constructor
+
+        Parameters
+        ----------
+
+        fGHz : np.array
+            frequency array of the band
+        tauk : np.array
+            delays (nray)
+        tang : np.array
+            angles of departure (nray x 2)
+        rang : np.array
+            angles of arrival (nray x 2)
+        c : np.array
+            polynomial coefficients (order+1 x nray x 2 x 2)
+
+        """
+        self.fGHz = fGHz
+        self.tauk = tauk
+        self.tang = tang
+        self.rang = rang
+        self.c = c
+        self.err = np.zeros(len(tauk))
+        self._C = None
+
+    def __repr__(self):
+        s = 'Schannel'+'\n---------\n'
+        s = s + 'Nray : ' + str(self.nray)+'\n'
+        if len(self.fGHz)>0:
+            s = s + 'fmin(GHz) : ' + str(self.fGHz[0])+'\n'
+            s = s + 'fmax(GHz): ' + str(self.fGHz[-1])+'\n'
+        s = s + 'Nfreq : ' + str(self.nfreq)+'\n'
+        s = s + 'order : ' + str(self.order)+'\n'
+        if self.nray>0:
+            s = s + 'max relative error : ' + str(self.err.max())+'\n'
+        return(s)
+
+    @property
+    def nray(self):
+        return(len(self.tauk))
+
+    @property
+    def nfreq(self):
+        return(len(self.fGHz))
+
+    @property
+    def order(self):
+        return(self.c.shape[0]-1)
+
+    @property
+    def fcGHz(self):
+        return((self.fGHz[0]+self.fGHz[-1])/2.)
+
+    @property
+    def BGHz(self):
+        return(self.fGHz[-1]-self.fGHz[0])
+
+    def _vander(self,fGHz):
+        """ polynomial basis evaluated on a frequency array
+
+        Parameters
+        ----------
+
+        fGHz : np.array
+
+        Returns
+        -------
+
+        V : np.array (nf x order+1)
+
+        """
+        fGHz = np.asarray(fGHz,dtype=float).ravel()
+        if self.BGHz > 0:
+            u = (fGHz-self.fcGHz)/(self.BGHz/2.)
+        else:
+            u = np.zeros(len(fGHz))
+        V = u[:,np.newaxis]**np.arange(self.order+1)[np.newaxis,:]
+        return(V)
+
+    def fit(self,C,order=1):
+        """ fit the compact model on a Ctilde
+
+        Parameters
+        ----------
+
+        C : Ctilde
+            in global basis
+        order : int
+            order of the frequency model (default 1)
+
+        Notes
+        -----
+
+        The 4 components of all rays are fitted together by a single least
+        square projection on the polynomial basis. The residual is kept in
+        err.
+
+        """
+        self.fGHz = C.fGHz
+        self.tauk = C.tauk
+        self.tang = C.tang
+        self.rang = C.rang
+        nray = C.nray
+        nfreq = C.nfreq
+        order = min(order,nfreq-1)
+        self.c = np.zeros((order+1,nray,2,2),dtype=complex)
+        # Y : f x (r x 2 x 2)
+        Y = np.empty((nfreq,nray,2,2),dtype=complex)
+        Y[:,:,0,0] = C.Ctt.y.T
+        Y[:,:,0,1] = C.Ctp.y.T
+        Y[:,:,1,0] = C.Cpt.y.T
+        Y[:,:,1,1] = C.Cpp.y.T
+        Y = Y.reshape(nfreq,-1)
+        V = self._vander(self.fGHz)
+        c = np.dot(np.linalg.pinv(V),Y)
+        R = Y - np.dot(V,c)
+        self.c = c.reshape(order+1,nray,2,2)
+        # relative rms error per ray
+        eR = np.sum(np.abs(R.reshape(nfreq,nray,4))**2,axis=(0,2))
+        eY = np.sum(np.abs(Y.reshape(nfreq,nray,4))**2,axis=(0,2))
+        self.err = np.sqrt(eR/np.where(eY>0,eY,1))
+        self._C = None
+
+    def eval(self,fGHz=[],Friis=False):
+        """ evaluate the polarimetric ray amplitudes
+
+        Parameters
+        ----------
+
+        fGHz : np.array
+            frequency array (default : band of the channel)
+        Friis : boolean
+            if True scale with :math:`-j\\frac{c}{4\pi f}`
+
+        Returns
+        -------
+
+        C : np.array (nray x 2 x 2 x nf)
+
+        Notes
+        -----
+
+        The delay term is not included, as in Ctilde.
+
+        """
+        if len(fGHz)==0:
+            fGHz = self.fGHz
+        fGHz = np.asarray(fGHz,dtype=float).ravel()
+        V = self._vander(fGHz)
+        C = np.einsum('fn,nrij->rijf',V,self.c)
+        if Friis:
+            C = C*(-1j*0.3/(4*np.pi*fGHz))
+        return(C)
+
+    def totilde(self):
+        """ materialize the Ctilde of the compact channel
+
+        Returns
+        -------
+
+        C : Ctilde (global basis)
+
+        Notes
+        -----
+
+        The Ctilde is built on the first call and kept until the channel
+        is modified (fit, cut, _loadh5).
+
+        """
+        if self._C is None:
+            Y = self.eval()
+            C = Ctilde()
+            C.fGHz = self.fGHz
+            C.nfreq = self.nfreq
+            C.nray = self.nray
+            C.tauk = self.tauk
+            C.tang = self.tang
+            C.rang = self.rang
+            C.Ctt = bs.FUsignal(self.fGHz, Y[:,0,0,:])
+            C.Ctp = bs.FUsignal(self.fGHz, Y[:,0,1,:])
+            C.Cpt = bs.FUsignal(self.fGHz, Y[:,1,0,:])
+            C.Cpp = bs.FUsignal(self.fGHz, Y[:,1,1,:])
+            self._C = C
+        return(self._C)
+
+    def prop2tran(self,a='theta',b='theta',Ta=[],Tb=[],Friis=True):
+        """ transform into transmission channel
+
+        Parameters
+        ----------
+
+        a : string or antenna array
+            polarization antenna a ( 'theta' | 'phi' | 'ant' )
+        b : string or antenna array
+            polarization antenna b ( 'theta' | 'phi' | 'ant' )
+        Ta : np.array(3x3) or np.array(No x 3 x 3)
+           rotation matrix of antenna a (default identity)
+        Tb : np.array(3x3) or np.array(No x 3 x 3)
+           rotation matrix of antenna b (default identity)
+        Friis : boolean
+
+        Returns
+        -------
+
+        H : Tchannel or list of Tchannel
+
+        See Also
+        --------
+
+        pylayers.antprop.channel.Ctilde.prop2tran
+
+        """
+        C = self.totilde()
+        if ((type(a) != str) | (type(b) != str)) & (len(Ta) == 0) & (len(Tb) == 0):
+            Ta = np.eye(3)
+        return(C.prop2tran(a=a,b=b,Ta=Ta,Tb=Tb,Friis=Friis))
+
+    def _pol(self,a):
+        """ polarization weights of a termination
+
+        Parameters
+        ----------
+
+        a : string or np.array
+            'theta' | 'phi' | array (nray x 2) of (theta,phi) components
+
+        Returns
+        -------
+
+        Fa : np.array (nray x 2)
+
+        """
+        if type(a) == str:
+            Fa = np.zeros((self.nray,2))
+            if a == 'theta':
+                Fa[:,0] = 1
+            if a == 'phi':
+                Fa[:,1] = 1
+        else:
+            Fa = np.asarray(a)*np.ones((self.nray,2))
+        return(Fa)
+
+    def _scal(self,fGHz,a='theta',b='theta',Friis=True):
+        """ ray amplitudes of the transmission channel
+
+        Parameters
+        ----------
+
+        fGHz : np.array
+        a : string or np.array
+        b : string or np.array
+        Friis : boolean
+
+        Returns
+        -------
+
+        alpha : np.array (nray x nf)
+
+        """
+        Fa = self._pol(a)
+        Fb = self._pol(b)
+        C = self.eval(fGHz,Friis=Friis)
+        alpha = np.einsum('ri,rijf,rj->rf',Fb,C,Fa)
+        return(alpha)
+
+    def energy(self,mode='mean',Friis=True,sumray=False):
+        """ calculates energy on each channel
+
+        Parameters
+        ----------
+
+        mode : string
+            mean | center | integ | first | last
+        Friis: boolean
+            True
+        sumray: boolean
+            False
+
+        Returns
+        -------
+
+        ECtt, ECpp, ECtp, ECpt
+
+        Notes
+        -----
+
+        The energy is obtained from a (order+1 x order+1) Gram matrix of the
+        polynomial basis weighted by the Friis factor, without evaluating
+        the rays along frequency.
+
+        See Also
+        --------
+
+        pylayers.antprop.channel.Ctilde.energy
+
+        """
+        f = self.fGHz
+        nf = self.nfreq
+        if mode == 'mean':
+            w = np.ones(nf)/nf
+        if mode == 'integ':
+            w = np.ones(nf)*(f[1]-f[0])
+        if mode == 'center':
+            f = f[nf/2:nf/2+1]
+            w = np.ones(1)
+        if mode == 'first':
+            f = f[0:1]
+            w = np.ones(1)
+        if mode == 'last':
+            f = f[-1:]
+            w = np.ones(1)
+        if Friis:
+            w = w*(0.3/(4*np.pi*f))**2
+        V = self._vander(f)
+        G = np.dot(V.T*w,V)
+        E = np.real(np.einsum('nrij,nm,mrij->rij',np.conj(self.c),G,self.c))
+
+        ECtt = E[:,0,0]
+        ECtp = E[:,0,1]
+        ECpt = E[:,1,0]
+        ECpp = E[:,1,1]
+
+        if sumray:
+            ECtt = np.sum(ECtt,axis=0)
+            ECtp = np.sum(ECtp,axis=0)
+            ECpt = np.sum(ECpt,axis=0)
+            ECpp = np.sum(ECpp,axis=0)
+
+        return ECtt, ECpp, ECtp, ECpt
+
+    def rssi(self,ufreq=0,a='theta',b='theta',Friis=True):
+        """ Compute RSSI value for a frequency index
+
+        Parameters
+        ----------
+
+        ufreq : int
+            index in the frequency range
+        a : string or np.array
+            polarization of termination a ('theta' | 'phi' | nray x 2)
+        b : string or np.array
+            polarization of termination b ('theta' | 'phi' | nray x 2)
+        Friis : boolean
+
+        Returns
+        -------
+
+        RSSI value in dB
+
+        See Also
+        --------
+
+        pylayers.antprop.channel.Tchannel.rssi
+
+        """
+        alpha = self._scal(self.fGHz[ufreq:ufreq+1],a=a,b=b,Friis=Friis)
+        Pr = np.sum(np.abs(alpha)**2)
+        PrdB = 10*np.log10(Pr)
+        return PrdB
+
+    def tap(self,fcGHz=[],WGHz=0.1,Ntap=10,a='theta',b='theta',Friis=True):
+        """ narrowband channel taps
+
+        Parameters
+        ----------
+
+        fcGHz : float
+            centre frequency (default : band centre)
+        WGHz : float
+            bandwidth
+        Ntap : int
+            number of taps
+        a : string or np.array
+            polarization of termination a
+        b : string or np.array
+            polarization of termination b
+        Friis : boolean
+
+        Returns
+        -------
+
+        htap : np.array (Ntap)
+
+        Notes
+        -----
+
+        Discrete time baseband model (form 2.34 [D. Tse])
+
+        .. math::
+
+            h_l = \sum_k \\alpha_k(f_c) e^{-2j\pi f_c \\tau_k} \\textrm{sinc}(l-\\tau_k W)
+
+        the ray amplitudes being taken from the compact model at fc.
+
+        """
+        if fcGHz == []:
+            fcGHz = self.fcGHz
+        alpha = self._scal(np.array([fcGHz]),a=a,b=b,Friis=Friis)[:,0]
+        l = np.arange(Ntap)
+        S = np.sinc(l[np.newaxis,:]-self.tauk[:,np.newaxis]*WGHz)
+        htap = np.dot(alpha*np.exp(-2j*np.pi*fcGHz*self.tauk),S)
+        return(htap)
+
+    def cut(self,threshold=0.99):
+        """ cut rays from a energy threshold
+
+        Parameters
+        ----------
+
+        threshold : float
+            default 0.99
+
+        Notes
+        -----
+
+        The strongest rays holding the threshold fraction of the total
+        energy are kept, in their initial order.
+
+        """
+        Ett, Epp, Etp, Ept = self.energy()
+        Etot = Ett+Epp+Etp+Ept
+        u = np.argsort(Etot)[::-1]
+        cumE = np.cumsum(Etot[u])/sum(Etot)
+        v = np.sort(u[np.where(cumE<threshold)[0]])
+
+        self.tauk = self.tauk[v]
+        self.tang = self.tang[v,:]
+        self.rang = self.rang[v,:]
+        self.c = self.c[:,v,:,:]
+        self.err = self.err[v]
+        self._C = None
+
+    def _saveh5(self,filenameh5,grpname):
+        """ save Schannel object in hdf5 format compliant with Link Class
+
+        Parameters
+        ----------
+
+        filenameh5  : str
+            file name of h5py file Link format
+        grpname  : int
+            groupname in filenameh5
+
+        Notes
+        -----
+
+        The channel is stored in the group Cs/grpname, the band is stored as
+        (fmin,fmax,nf).
+
+        """
+
+        filename=pyu.getlong(filenameh5,pstruc['DIRLNK'])
+        # try/except to avoid loosing the h5 file if
+        # read/write error
+        try:
+            fh5=h5py.File(filename,'a')
+            fCs = fh5.require_group('Cs')
+            if not grpname in fCs.keys():
+                fCs.create_group(grpname)
+            else :
+                print 'Warning : Cs/'+grpname +'already exists in '+filenameh5
+            f=fh5['Cs/'+grpname]
+
+            f.create_dataset('tang',shape=np.shape(self.tang),data=self.tang)
+            f.create_dataset('rang',shape=np.shape(self.rang),data=self.rang)
+            f.create_dataset('tauk',shape=np.shape(self.tauk),data=self.tauk)
+            f.create_dataset('band',data=np.array([self.fGHz[0],self.fGHz[-1],self.nfreq]))
+            f.create_dataset('c',shape=np.shape(self.c),data=self.c)
+            f.create_dataset('err',shape=np.shape(self.err),data=self.err)
+
+            fh5.close()
+        except:
+            fh5.close()
+            raise NameError('Channel.Schannel: issue when writting h5py file')
+
+    def _loadh5(self,filenameh5,grpname):
+        """ load Schannel object in hdf5 format compliant with Link Class
+
+        Parameters
+        ----------
+
+        filenameh5  : str
+            file name of h5py file Link format
+        grpname  : int
+            groupname in filenameh5
+
+        """
+
+        filename=pyu.getlong(filenameh5,pstruc['DIRLNK'])
+
+        try:
+            fh5=h5py.File(filename,'r')
+            f = fh5['Cs/'+grpname]
+
+            fmin,fmax,nf = f['band'][:]
+            self.fGHz = np.linspace(fmin,fmax,int(nf))
+            self.tang = f['tang'][:]
+            self.rang = f['rang'][:]
+            self.tauk = f['tauk'][:]
+            self.c = f['c'][:]
+            self.err = f['err'][:]
+            self._C = None
+
+            fh5.close()
+        except:
+            fh5.close()
+            raise NameError('Channel.Schannel: issue when reading h5py file')
+
+
 if __name__ == "__main__":
     plt.ion()
     doctest.testmod()
@@ -261,7 +261,7 @@ class Coverage(PyLayers):
             except:
                 pass
 
-    def cover(self,sinr=True,snr=True,best=True):
+    def cover(self,sinr=True,snr=True,best=True,chunk=10000,keep=True):
         """ run the coverage calculation
 
         Parameters
@@ -270,6 +270,17 @@ class Coverage(PyLayers):
         sinr : boolean
         snr  : boolean
         best : boolean
+        chunk : int
+            maximum number of grid points evaluated in a single call to
+            `loss.Losst` (default 10000). It bounds the memory used by the
+            link geometry and the intermediate loss arrays.
+        keep : boolean
+            if True (default) the intermediate arrays (Lwo,Lwp,Edo,Edp,
+            freespace,CmWo,CmWp) and the link geometry (pa,pg) are kept.
+            If False only the requested summaries (snr, sinr, best server)
+            are stored, and the methods which need the intermediate arrays
+            (evsnr, evsinr, evbestsv, show with typ 'pr' or 'loss') raise
+            an AttributeError.
 
         Examples
         --------
@@ -297,6 +308,11 @@ class Coverage(PyLayers):
         abstract the EM solver in order to make use of other calculation
         approaches as a full or partial Ray Tracing.
 
+        The links are ordered grid point first and access point second.
+        The link geometry of a chunk of grid points is obtained by
+        broadcasting the grid against the active access points and the
+        results are written in place into preallocated (nf,ng,na) arrays.
+
         The following members variables are evaluated :
 
         + freespace Loss @ fGHz   PL()  PathLoss (shoud be rename FS as free space) $
@@ -316,11 +332,9 @@ class Coverage(PyLayers):
         # select active AP
         #
         lactiveAP = []
-        try:
-            del self.aap
-            del self.ptdbm
-        except:
-            pass
+        lpap = []
+        lptdbm = []
+        lbmhz = []
 
         self.kB = 1.3806503e-23 # Boltzmann constant
         for iap in self.dap:
@@ -329,104 +343,189 @@ class Coverage(PyLayers):
                 fGHz = self.dap[iap].s.fcghz
                 self.fGHz=np.unique(np.hstack((self.fGHz,fGHz)))
                 apchan = self.dap[iap]['chan']
-                try:
-                    self.aap   = np.vstack((self.aap,self.dap[iap]['p'][0:2]))
-                    self.ptdbm = np.vstack((self.ptdbm,self.dap[iap]['PtdBm']))
-                    self.bmhz  = np.vstack((self.bmhz,
-                                 self.dap[iap].s.chan[apchan[0]]['BMHz']))
-                except:
-                    self.aap   = self.dap[iap]['p'][0:2]
-                    self.ptdbm = np.array(self.dap[iap]['PtdBm'])
-                    self.bmhz  = np.array(self.dap[iap].s.chan[apchan[0]]['BMHz'])
+                lpap.append(self.dap[iap]['p'][0:2])
+                lptdbm.append(self.dap[iap]['PtdBm'])
+                lbmhz.append(self.dap[iap].s.chan[apchan[0]]['BMHz'])
 
-        PnW = np.array((10**(self.noisefactordb/10.))*self.kB*self.temperaturek*self.bmhz*1e6)
-        # Evaluate Noise Power (in dBm)
-        self.pndbm = np.array(10*np.log10(PnW)+30)
-        #lchan = map(lambda x: self.dap[x]['chan'],lap)
-        #apchan = zip(self.dap.keys(),lchan)
-        #self.bmhz = np.array(map(lambda x: self.dap[x[0]].s.chan[x[1][0]]['BMHz']*len(x[1]),apchan))
-
-        self.ptdbm = self.ptdbm.T
-        self.pndbm = self.pndbm.T
-        # creating all links
-        p = product(range(self.ng),lactiveAP)
-        #
-        # pa : access point
-        # pg : grid point
-        #
+        # 2 x na
+        self.aap = np.array(lpap,dtype=float).T
         # 1 x na
-        for k in p:
-            pg = self.grid[k[0],:]
-            pa = self.dap[k[1]]['p'][0:2]
-            try:
-                self.pa = np.vstack((self.pa,pa))
-            except:
-                self.pa = pa
-            try:
-                self.pg = np.vstack((self.pg,pg))
-            except:
-                self.pg = pg
+        self.ptdbm = np.array(lptdbm,dtype=float)[np.newaxis,:]
+        # na x 1
+        self.bmhz = np.array(lbmhz,dtype=float)[:,np.newaxis]
 
-        self.pa = self.pa.T
-        self.pg = self.pg.T
-        self.nf = len(self.fGHz)
+        PnW = np.array((10**(self.noisefactordb/10.))*self.kB*self.temperaturek*self.bmhz*1e6)
+        # Evaluate Noise Power (in dBm)
+        self.pndbm = np.array(10*np.log10(PnW)+30).T
 
         # retrieving dimensions along the 3 axis
         na = len(lactiveAP)
         self.na = na
         ng = self.ng
+        self.nf = len(self.fGHz)
         nf = self.nf
 
-        Lwo,Lwp,Edo,Edp = loss.Losst(self.L,self.fGHz,self.pa,self.pg,dB=False)
-        self.Lwo = Lwo.reshape(nf,ng,na)
-        self.Edo = Edo.reshape(nf,ng,na)
-        self.Lwp = Lwp.reshape(nf,ng,na)
-        self.Edp = Edp.reshape(nf,ng,na)
+        #
+        # pa : access point
+        # pg : grid point
+        #
+        # 2 x (ng*na)
+        if keep:
+            self.pa = np.tile(self.aap,ng)
+            self.pg = np.repeat(self.grid[:,0:2].T,na,axis=1)
+
+        # arrays of a previous cover
+        for v in ['pa','pg','Lwo','Lwp','Edo','Edp','freespace','CmWo','CmWp',
+                  'snro','snrp','sinro','sinrp','bestsvo','bestsvp']:
+            if v in self.__dict__:
+                delattr(self,v)
+
+        # preallocation of the requested (nf,ng,na) arrays
+        lv = []
+        if keep:
+            lv = lv + ['Lwo','Lwp','Edo','Edp','freespace','CmWo','CmWp']
+        if snr:
+            lv = lv + ['snro','snrp']
+        if sinr:
+            lv = lv + ['sinro','sinrp']
+        if best:
+            lv = lv + ['bestsvo','bestsvp']
+        for v in lv:
+            setattr(self,v,np.empty((nf,ng,na)))
+
+        # transmitting power in mW
+        # 1 x 1 x na
+        PtmW = 10**(self.ptdbm[np.newaxis,...]/10.)
+
+        chunk = max(int(chunk),1)
+        for ig in range(0,ng,chunk):
+            ug = slice(ig,min(ig+chunk,ng))
+            ngc = ug.stop - ug.start
+            # 2 x (ngc*na)
+            pa = np.tile(self.aap,ngc)
+            pg = np.repeat(self.grid[ug,0:2].T,na,axis=1)
+
+            Lwo,Lwp,Edo,Edp = loss.Losst(self.L,self.fGHz,pa,pg,dB=False)
+            freespace = loss.PL(self.fGHz,pa,pg,dB=False)
+
+            Lwo = Lwo.reshape(nf,ngc,na)
+            Lwp = Lwp.reshape(nf,ngc,na)
+            freespace = freespace.reshape(nf,ngc,na)
+
+            # CmW : Received Power coverage in mW
+            # f x g x a
+            CmWo = PtmW*Lwo*freespace
+            CmWp = PtmW*Lwp*freespace
+
+            if keep:
+                self.Lwo[:,ug,:] = Lwo
+                self.Lwp[:,ug,:] = Lwp
+                self.Edo[:,ug,:] = Edo.reshape(nf,ngc,na)
+                self.Edp[:,ug,:] = Edp.reshape(nf,ngc,na)
+                self.freespace[:,ug,:] = freespace
+                self.CmWo[:,ug,:] = CmWo
+                self.CmWp[:,ug,:] = CmWp
+
+            if snr:
+                self.snro[:,ug,:] = self._snr(CmWo)
+                self.snrp[:,ug,:] = self._snr(CmWp)
+            if sinr:
+                self.sinro[:,ug,:] = self._sinr(CmWo)
+                self.sinrp[:,ug,:] = self._sinr(CmWp)
+            if best:
+                self.bestsvo[:,ug,:] = self._bestsv(CmWo)
+                self.bestsvp[:,ug,:] = self._bestsv(CmWp)
 
-        freespace = loss.PL(self.fGHz,self.pa,self.pg,dB=False)
-        self.freespace = freespace.reshape(nf,ng,na)
+    def _cover(self,name):
+        """ array evaluated by cover
 
-        # transmitting power
-        # f x g x a
+        Parameters
+        ----------
 
-        # CmW : Received Power coverage in mW
-        self.CmWo = 10**(self.ptdbm[np.newaxis,...]/10.)*self.Lwo*self.freespace
-        self.CmWp = 10**(self.ptdbm[np.newaxis,...]/10.)*self.Lwp*self.freespace
+        name : string
+            attribute name
 
+        """
+        if name not in self.__dict__:
+            raise AttributeError('Coverage.'+name+' has not been evaluated '
+                                 'by cover (see cover keep, snr, sinr and '
+                                 'best arguments)')
+        return(getattr(self,name))
 
-        if snr:
-            self.evsnr()
-        if sinr:
-            self.evsinr()
-        if best:
-            self.evbestsv()
+    def _snr(self,CmW):
+        """ snr of a (nf,ng,na) received power array
 
-    def evsnr(self):
-        """ calculates snr
-        """
+        Parameters
+        ----------
+
+        CmW : np.array (nf,ng,na)
+            received power in mW
 
+        """
         NmW = 10**(self.pndbm/10.)[np.newaxis,:]
+        return(CmW/NmW)
 
-        self.snro = self.CmWo/NmW
-        self.snrp = self.CmWp/NmW
+    def _sinr(self,CmW):
+        """ sinr of a (nf,ng,na) received power array
 
-    def evsinr(self):
-        """ calculates sinr
+        Parameters
+        ----------
 
-        """
+        CmW : np.array (nf,ng,na)
+            received power in mW
 
-        na = self.na
+        Notes
+        -----
 
-        U = (np.ones((na,na))-np.eye(na))[np.newaxis,np.newaxis,:,:]
+        The interference of an access point is the sum of the power received
+        from all the other access points.
 
-        ImWo = np.einsum('ijkl,ijl->ijk',U,self.CmWo)
-        ImWp = np.einsum('ijkl,ijl->ijk',U,self.CmWp)
+        """
+        na = CmW.shape[2]
 
+        U = (np.ones((na,na))-np.eye(na))[np.newaxis,np.newaxis,:,:]
+        ImW = np.einsum('ijkl,ijl->ijk',U,CmW)
 
         NmW = 10**(self.pndbm/10.)[np.newaxis,:]
 
-        self.sinro = self.CmWo/(ImWo+NmW)
-        self.sinrp = self.CmWp/(ImWp+NmW)
+        return(CmW/(ImW+NmW))
+
+    def _bestsv(self,CmW):
+        """ best server of a (nf,ng,na) received power array
+
+        Parameters
+        ----------
+
+        CmW : np.array (nf,ng,na)
+            received power in mW
+
+        Returns
+        -------
+
+        bestsv : np.array (nf,ng,na)
+            ka+1 where access point ka is the best server, 0 elsewhere
+
+        """
+        na = CmW.shape[2]
+        MaxV = np.max(CmW,axis=2)[:,:,np.newaxis]
+        kap = np.arange(1,na+1)[np.newaxis,np.newaxis,:]
+        bestsv = np.where(CmW==MaxV,kap,0).astype(float)
+        return(bestsv)
+
+    def evsnr(self):
+        """ calculates snr
+        """
+
+        self.snro = self._snr(self._cover('CmWo'))
+        self.snrp = self._snr(self._cover('CmWp'))
+
+    def evsinr(self):
+        """ calculates sinr
+
+        """
+
+        self.sinro = self._sinr(self._cover('CmWo'))
+        self.sinrp = self._sinr(self._cover('CmWp'))
 
     def evbestsv(self):
         """ determine best server map
@@ -437,22 +536,8 @@ class Coverage(PyLayers):
         C.bestsv
 
         """
-        na = self.na
-        ng = self.ng
-        nf = self.nf
-        # find best server regions
-        Vo = self.CmWo
-        Vp = self.CmWp
-        self.bestsvo = np.empty(nf*ng*na).reshape(nf,ng,na)
-        self.bestsvp = np.empty(nf*ng*na).reshape(nf,ng,na)
-        for kf in range(nf):
-            MaxVo = np.max(Vo[kf,:,:],axis=1)
-            MaxVp = np.max(Vp[kf,:,:],axis=1)
-            for ka in range(na):
-                uo = np.where(Vo[kf,:,ka]==MaxVo)
-                up = np.where(Vp[kf,:,ka]==MaxVp)
-                self.bestsvo[kf,uo,ka]=ka+1
-                self.bestsvp[kf,up,ka]=ka+1
+        self.bestsvo = self._bestsv(self._cover('CmWo'))
+        self.bestsvp = self._bestsv(self._cover('CmWp'))
 
 
 #    def showEd(self,polar='o',**kwargs):
@@ -757,7 +842,9 @@ class Coverage(PyLayers):
             if kwargs['db']:
                 U = 10*np.log10(U)
 
-        D = np.sqrt(np.sum((self.pa-self.pg)*(self.pa-self.pg),axis=0))
+        pa = self._cover('pa')
+        pg = self._cover('pg')
+        D = np.sqrt(np.sum((pa-pg)*(pa-pg),axis=0))
         if kwargs['a']<>-1:
             D = D.reshape(self.ng,self.na)
             ax.semilogx(D[:,kwargs['a']],U,'.',color=kwargs['col'])
@@ -858,10 +945,7 @@ class Coverage(PyLayers):
         if typ=='best':
             title = title + 'Best server'+' fc = '+str(self.fGHz[f])+' GHz'+ ' polar : '+polar
             for ka in range(self.na):
-                if polar=='p':
-                    bestsv =  self.bestsvp[f,:,ka]
-                if polar=='o':    
-                    bestsv =  self.bestsvo[f,:,ka]
+                bestsv = self._cover('bestsv'+polar)[f,:,ka]
                 m = np.ma.masked_where(bestsv == 0,bestsv)
                 if self.mode<>'file':
                     W = m.reshape(self.nx,self.ny).T
@@ -884,37 +968,25 @@ class Coverage(PyLayers):
                     legcb = 'dB'
                 else:
                     legcb = 'Linear scale'
-                if polar=='o':        
-                    V = self.sinro
-                if polar=='p':    
-                    V = self.sinrp
+                V = self._cover('sinr'+polar)
             if typ=='snr':
                 title = title + 'SNR : '+' fc = '+str(self.fGHz[f])+' GHz'+ ' polar : '+polar
                 if dB:
                     legcb = 'dB'
                 else:
                     legcb = 'Linear scale'
-                if polar=='o':
-                    V = self.snro
-                if polar=='p':
-                    V = self.snrp
+                V = self._cover('snr'+polar)
             if typ=='capacity':
                 title = title + 'Capacity : '+' fc = '+str(self.fGHz[f])+' GHz'+ ' polar : '+polar
                 legcb = 'Mbit/s'
-                if polar=='o':
-                    V = self.bmhz.T[np.newaxis,:]*np.log(1+self.sinro)/np.log(2)
-                if polar=='p':
-                    V = self.bmhz.T[np.newaxis,:]*np.log(1+self.sinrp)/np.log(2)    
+                V = self.bmhz.T[np.newaxis,:]*np.log(1+self._cover('sinr'+polar))/np.log(2)
             if typ=='pr':
                 title = title + 'Pr : '+' fc = '+str(self.fGHz[f])+' GHz'+ ' polar : '+polar
                 if dB:
                     legcb = 'dBm'
                 else:
                     lgdcb = 'mW'
-                if polar=='o':    
-                    V = self.CmWo
-                if polar=='p':
-                    V = self.CmWp
+                V = self._cover('CmW'+polar)
 
             if typ=='loss':
                 title = title + 'Loss : '+' fc = '+str(self.fGHz[f])+' GHz'+ ' polar : '+polar
@@ -922,10 +994,7 @@ class Coverage(PyLayers):
                     legcb = 'dB'
                 else:
                     legcb = 'Linear scale'
-                if polar=='o':    
-                    V = self.Lwo*self.freespace
-                if polar=='p':    
-                    V = self.Lwp*self.freespace
+                V = self._cover('Lw'+polar)*self._cover('freespace')
 
             if a == -1:
                 V = np.max(V[f,:,:],axis=1)
@@ -962,7 +1031,7 @@ class Coverage(PyLayers):
                 img=ax.scatter(self.grid[:,0],self.grid[:,1],c=U,s=20,linewidth=0)
 
             for k in range(self.na):
-                ax.annotate(str(k),xy=(self.pa[0,k],self.pa[1,k]))
+                ax.annotate(str(k),xy=(self.aap[0,k],self.aap[1,k]))
             ax.set_title(title)
 
             divider = make_axes_locatable(ax)
@@ -978,9 +1047,9 @@ class Coverage(PyLayers):
 
         # display access points
         if a==-1:
-            ax.scatter(self.pa[0,:],self.pa[1,:],s=30,c='r',linewidth=0)
+            ax.scatter(self.aap[0,:],self.aap[1,:],s=30,c='r',linewidth=0)
         else:
-            ax.scatter(self.pa[0,a],self.pa[1,a],s=30,c='r',linewidth=0)
+            ax.scatter(self.aap[0,a],self.aap[1,a],s=30,c='r',linewidth=0)
         plt.tight_layout()
         return(fig,ax)
 
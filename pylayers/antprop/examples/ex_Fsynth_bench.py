@@ -0,0 +1,53 @@
+#
+# Benchmark of the VSH pattern synthesis : Fsynth1 versus Fsynth3
+#
+# Fsynth1 : shape 1 coefficients (all (l,m) up to L), exact basis
+# Fsynth3 : shape 3 coefficients, exact basis (tol=0) or basis
+#           interpolated from a cached theta grid (tol>0)
+#
+# The shape 1 coefficients are rebuilt from the shape 3 coefficients of
+# the same antenna, so that the four syntheses evaluate the same pattern.
+#
+import time
+import numpy as np
+from pylayers.antprop.antenna import *
+
+A = Antenna('defant.vsh3')
+
+#
+# shape 3 -> shape 1
+#
+l3 = A.C.Br.ind3[:,0]
+m3 = A.C.Br.ind3[:,1]
+L = l3.max()
+for C in [A.C.Br,A.C.Bi,A.C.Cr,A.C.Ci]:
+    s1 = np.zeros((C.s3.shape[0],L+1,L+1),dtype=C.s3.dtype)
+    s1[:,C.ind3[:,0],C.ind3[:,1]] = C.s3
+    C.inits1(s1)
+
+np.random.seed(0)
+nray = 5000
+theta = np.arccos(np.random.uniform(-1,1,nray))
+phi = np.random.uniform(0,2*np.pi,nray)
+
+def timeit(f,*args,**kwargs):
+    f(*args,**kwargs)
+    tic = time.time()
+    F = f(*args,**kwargs)
+    return(F,time.time()-tic)
+
+(Fth1,Fph1),t1 = timeit(A.Fsynth1,theta,phi)
+Fmax = max(abs(Fth1).max(),abs(Fph1).max())
+print 'L = %d  K3 = %d  nray = %d  Nf = %d' % (L,len(l3),nray,Fth1.shape[0])
+print 'Fsynth1 (cached Legendre)    : %.3f s' % t1
+
+# first call : Legendre terms are computed
+A._vsh1key = None
+tic = time.time()
+A.Fsynth1(theta,phi)
+print 'Fsynth1 (new theta)          : %.3f s' % (time.time()-tic)
+
+for tol in [0,1e-3,1e-4,1e-5]:
+    (Fth3,Fph3),t3 = timeit(A.Fsynth3,theta,phi,pattern=False,tol=tol)
+    err = max(abs(Fth3-Fth1).max(),abs(Fph3-Fph1).max())/Fmax
+    print 'Fsynth3 tol = %-6g         : %.3f s  error : %.2e' % (tol,t3,err)
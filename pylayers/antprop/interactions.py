@@ -699,12 +699,12 @@ class IntR(Inter):
                 ut = self.data[self.dusl[m], 0]
                 if not ut.size == 0:
                     # find the index of angles which satisfied the data
-                    self.slab[m].ev(fGHz=fGHz, theta=ut, RT='R')
+                    Rm = self.slab.ev(m, fGHz=fGHz, theta=ut, RT='R')
                     try:
-                        R = np.concatenate((R, self.slab[m].R), axis=1)
+                        R = np.concatenate((R, Rm), axis=1)
                         mapp.extend(self.dusl[m])
                     except:
-                        R = self.slab[m].R
+                        R = Rm
                         mapp.extend(self.dusl[m])
 
             # replace in correct order the reflexion coeff
@@ -821,13 +821,13 @@ class IntT(Inter):
                         gamma = g
 
                     # find the index of angles which satisfied the data
-                    self.slab[m].ev(fGHz=fGHz, theta=ut, RT='T', compensate=True)
+                    Tm = self.slab.ev(m, fGHz=fGHz, theta=ut, RT='T', compensate=True)
 
                     try:
-                        T = np.concatenate((T, self.slab[m].T), axis=1)
+                        T = np.concatenate((T, Tm), axis=1)
                         mapp.extend(self.dusl[m])
                     except:
-                        T = self.slab[m].T
+                        T = Tm
                         mapp.extend(self.dusl[m])
             # replace in proper order the Transmission coeff
             self.A[:, np.array((mapp)), :, :] = T
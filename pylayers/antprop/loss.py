@@ -412,7 +412,7 @@ def PL(fGHz,pts,p,n=2.0,dB=True):
 
     return(PL)
 
-def Losst(L,fGHz,p1,p2,dB=True):
+def Losst(L,fGHz,p1,p2,dB=True,dtheta=np.pi/1800.):
     """  calculate Losses between links p1  p2
 
     Parameters
@@ -426,6 +426,10 @@ def Losst(L,fGHz,p1,p2,dB=True):
     p2 : observation point
         (2 x Np2) array or (2,) array
     dB : boolean
+    dtheta : float
+        width (radians) of the incidence angle bins on which the slab losses
+        and excess delays are cached (default 0.1 degree).
+        dtheta = 0 evaluates the slabs at the exact angles.
 
     Examples
     --------
@@ -481,10 +485,17 @@ def Losst(L,fGHz,p1,p2,dB=True):
 
     cslab = np.unique(slabs)
 
-    LossWallo = np.zeros((len(fGHz),Nlink))
-    LossWallp = np.zeros((len(fGHz),Nlink))
-    EdWallo = np.zeros((len(fGHz),Nlink))
-    EdWallp = np.zeros((len(fGHz),Nlink))
+    nf = len(fGHz)
+    # number of wall crossings
+    Nc = len(data)
+
+    #
+    # loss and excess delay of each wall crossing
+    #
+    lo = np.zeros((nf,Nc))
+    lp = np.zeros((nf,Nc))
+    do = np.zeros(Nc)
+    dp = np.zeros(Nc)
 
     for slname in cslab:
         # u index of slabs of name slname
@@ -494,32 +505,26 @@ def Losst(L,fGHz,p1,p2,dB=True):
         #
         # calculate Loss for slab slname
         #
-        lko,lkp  = L.sl[slname].losst(fGHz,data['a'][u])
+        lo[:,u],lp[:,u] = L.sl[slname].losst(fGHz,data['a'][u],dtheta=dtheta)
         #
         # calculate Excess delay for slab slname
         #
-        do , dp  = L.sl[slname].excess_grdelay(theta=data['a'][u])
-        # data['i'][u] links number
-        indexu = data['i'][u]
-        # reduce to involved links
-        involved_links, indices = np.unique(indexu,return_index=True)
-        indicep = np.hstack((indices[1:],np.array([len(indexu)])))
-        # range on involved links
-        irange = np.arange(len(involved_links))
-        #
-        # sum contribution of slab of a same link
-        #
-        Wallo = np.array(map(lambda x: np.sum(lko[:,indices[x]:indicep[x]],axis=1),irange)).T
-        Wallp = np.array(map(lambda x: np.sum(lkp[:,indices[x]:indicep[x]],axis=1),irange)).T
+        do[u],dp[u] = L.sl[slname].excess_grdelay(theta=data['a'][u],dtheta=dtheta)
 
-        Edo = np.array(map(lambda x: np.sum(do[indices[x]:indicep[x]]),irange)).T
-        Edp = np.array(map(lambda x: np.sum(dp[indices[x]:indicep[x]]),irange)).T
+    #
+    # sum contribution of slabs of a same link
+    #
+    # data['i'] links number
+    # The reduction is done for all frequencies at once with a single
+    # bincount on the (frequency,link) index
+    #
+    ik = (np.arange(nf)[:,np.newaxis]*Nlink + data['i'][np.newaxis,:]).ravel()
 
-        LossWallo[:,involved_links] = LossWallo[:,involved_links] + Wallo
-        LossWallp[:,involved_links] = LossWallp[:,involved_links] + Wallp
+    LossWallo = np.bincount(ik,weights=lo.ravel(),minlength=nf*Nlink).reshape(nf,Nlink)
+    LossWallp = np.bincount(ik,weights=lp.ravel(),minlength=nf*Nlink).reshape(nf,Nlink)
 
-        EdWallo[:,involved_links] = EdWallo[:,involved_links] + Edo
-        EdWallp[:,involved_links] = EdWallp[:,involved_links] + Edp
+    EdWallo = np.bincount(data['i'],weights=do,minlength=Nlink)[np.newaxis,:]*np.ones((nf,1))
+    EdWallp = np.bincount(data['i'],weights=dp,minlength=Nlink)[np.newaxis,:]*np.ones((nf,1))
 
     if not dB:
         LossWallo = 10**(-LossWallo/10)
@@ -1816,8 +1816,8 @@ class Rays(PyLayers,dict):
 
         self.filled = True
 
-    def eval(self,fGHz=np.array([2.4]),ib=[]):
-        """  docstring for eval
+    def eval(self,fGHz=np.array([2.4]),ib=[],chunk=0):
+        """  evaluation of the rays propagation matrices
 
         Parameters
         ----------
@@ -1825,17 +1825,42 @@ class Rays(PyLayers,dict):
         fGHz : array
             frequency in GHz array
         ib : list of intercation block
+        chunk : int
+            number of frequency points evaluated at once
+            (default 0 : all the frequency points)
+
+        Returns
+        -------
+
+        Cn : Ctilde
+
+        Notes
+        -----
+
+        For each interaction block l, the 2x2 matrices of all the rays
+        of the block are chained with np.matmul over the stacked
+        interactions
+
+        .. math::
+
+            Z = B_{l-1} I_{l-1} \cdots B_0 I_0 B_{00}
+
+        The frequency axis is processed by chunks of `chunk` points so that
+        only the interactions of the current chunk are held in memory.
+        When chunk is smaller than the number of frequency points,
+        self.I only keeps the interactions of the last chunk.
 
         """
 
-        #print 'Rays evaluation'
-        self.fGHz=fGHz
-        # evaluation of interaction
-        self.I.eval(fGHz)
+        self.fGHz = fGHz
+        #nf : number of frequency point
+        nf = len(fGHz)
+        if (chunk==0) or (chunk>nf):
+            chunk = nf
+
         # evaluation of base B  (2x2)
         # B and B0 do no depend on frequency
         # just an axis extension (np.newaxis)
-        #pdb.set_trace()
 
         # 1 x i x 2 x 2
         B  = self.B.data[np.newaxis,...]
@@ -1843,7 +1868,7 @@ class Rays(PyLayers,dict):
         B0 = self.B0.data[np.newaxis,...]
 
         # Ct : f x r x 2 x 2
-        Ct = np.zeros((self.I.nf, self.nray, 2, 2), dtype=complex)
+        Ct = np.zeros((nf, self.nray, 2, 2), dtype=complex)
 
         # delays : ,r
         self.delays = np.zeros((self.nray))
@@ -1851,9 +1876,6 @@ class Rays(PyLayers,dict):
         # dis : ,r
         self.dis = np.zeros((self.nray))
 
-        #nf : number of frequency point
-        nf = self.I.nf
-
         aod= np.empty((2,self.nray))
         aoa= np.empty((2,self.nray))
         # loop on interaction blocks
@@ -1866,124 +1888,57 @@ class Rays(PyLayers,dict):
             aoa[:,ir]=self[l]['aoa']
             aod[:,ir]=self[l]['aod']
             if l != 0:
+                # delay computation
+                self.delays[ir] = self[l]['dis']/0.3
+                self.dis[ir] = self[l]['dis']
+
+        # loop on frequency chunks
+        for kf in range(0,nf,chunk):
+            uf = slice(kf,min(kf+chunk,nf))
+            # evaluation of interaction
+            self.I.eval(fGHz[uf])
+            for l in ib:
+                if l == 0:
+                    continue
+                ir = self[l]['rayidx']
                 # l stands for the number of interactions
                 r = self[l]['nbrays']
                 # reshape in order to have a 1D list of index
                 # reshape ray index
                 rrl = self[l]['rays'].reshape(r*l,order='F')
                 # get the corresponding evaluated interactions
-                #
-                # reshape error can be tricky to debug.
-                #
                 # f , r , l , 2 , 2
                 A = self.I.I[:, rrl, :, :].reshape(self.I.nf, r, l, 2, 2)
                 # get the corresponding unitary matrix B
                 # 1 , r , l , 2 , 2
-                #Bl = B[:, rrl, :, :].reshape(self.I.nf, r, l, 2, 2,order='F')
                 Bl = B[:, rrl, :, :].reshape(1, r, l, 2, 2)
-                # get the first uitary matrix B0l
+                # get the first unitary matrix B0l
+                # 1 , r , 2 , 2
                 B0l = B0[:,ir,:, :]
-                # get alpha
-                # alpha = self.I.alpha[rrl].reshape(r, l,order='F')
-                # # get gamma
-                # gamma = self.I.gamma[rrl].reshape(r, l,order='F')
-                # # get si0
-                # si0 = self.I.si0[rrl].reshape(r, l,order='F')
-                # # get sout
-                # sout = self.I.sout[rrl].reshape(r, l,order='F')
-
-                try:
-                    del Z
-                except:
-                    pass
-
-
-                #print "\nrays",ir
-                #print "-----------------------"
-                ## loop on all the interactions of ray with l interactions
-                for i in range(0, l):
-
-
-    ############################################
-    ##                # Divergence factor D
-    ###                 not yet implementented
-    ############################################
-    #                if i == 0:
-    #                    D0=1./si0[:,1]
-    #                    rho1=si0[:,1]*alpha[:,i]
-    #                    rho2=si0[:,1]*alpha[:,i]*gamma[:,i]
-    #                    D=np.sqrt(
-    #                     ( (rho1 ) / (rho1 + sout[:,i]) )
-    #                     *( (rho2) / (rho2 + sout[:,i])))
-    #                    D=D*D0
-    #                    rho1=rho1+(sout[:,i]*alpha[:,i])
-    #                    rho2=rho2+(sout[:,i]*alpha[:,i]*gamma[:,i])
-
-    ##                     gerer le loss
-    #                    if np.isnan(D).any():
-    #                        p=np.nonzero(np.isnan(D))[0]
-    #                        D[p]=1./sout[p,1]
-    #                else :
-    #                    D=np.sqrt(
-    #                     ( (rho1 ) / (rho1 + sout[:,i]) )
-    #                     *( (rho2) / (rho2 + sout[:,i])))
-
-    #                    rho1=rho1+(sout[:,i]*alpha[:,i])
-    #                    rho2=rho2+(sout[:,i]*alpha[:,i]*gamma[:,i])
-    ############################################
-
-                    #  A0  (X dot Y)
-                    #  |    |     |
-                    #  v    v     v
-                    ##########################
-                    ## B  # I  # B  # I  # B #
-                    ##########################
-                    #      \_____/   \______/
-                    #         |         |
-                    #       Atmp(i)   Atmp(i+1)
-                    #
-                    # Z=Atmp(i) dot Atmp(i+1)
-
-                    #X = A [:, :, i, :, :]
-                    #Y = Bl[:, :, i, :, :]
-                    # pdb.set_trace()
-                    if i == 0:
-                    ## First Basis added
-                        Atmp = A[:, :, i, :, :]
-                        B00 = B0l[:, :,  :, :]
-                        Z = np.sum(Atmp[..., :, :, np.newaxis]
-                                  *B00[..., np.newaxis, :, :], axis=-2)
-                    else:
-                        Atmp = A[:, :, i, :, :]
-                        BB = Bl[:, :, i-1, :, :]
-                        Ztmp = np.sum(Atmp[..., :, :, np.newaxis]
-                                  *BB[..., np.newaxis, :, :], axis=-2)
-
-
-                        Z = np.sum(Ztmp[..., :, :, np.newaxis]
-                                  *Z[..., np.newaxis, :, :], axis=-2)
-
-                    if i == l-1:
-                        BB = Bl[:, :, i, :, :]
-                        Z = np.sum(BB[..., :, :, np.newaxis]
-                                  *Z[..., np.newaxis, :, :], axis=-2)
 
+                #  A0  (X dot Y)
+                #  |    |     |
+                #  v    v     v
+                ##########################
+                ## B  # I  # B  # I  # B #
+                ##########################
+                #      \_____/   \______/
+                #         |         |
+                #       Atmp(i)   Atmp(i+1)
+                #
+                # Z=Atmp(i) dot Atmp(i+1)
+                #
+                # f , r , 2 , 2
+                Z = np.matmul(A[:, :, 0, :, :], B0l)
+                for i in range(1, l):
+                    Z = np.matmul(np.matmul(A[:, :, i, :, :], Bl[:, :, i-1, :, :]), Z)
+                Z = np.matmul(Bl[:, :, l-1, :, :], Z)
 
                 # fill the C tilde MDA
-
-                Ct[:,ir, :, :] = Z[:, :, :, :]
-
-                # delay computation:
-                # sum the distance from antenna to first interaction si0
-                # and the sum of all outgoing segments
-                #self[l]['dis'] = self.I.si0[self[l]['rays'][0,:]] \
-                #        + np.sum(self.I.sout[self[l]['rays']], axis=0)
-
                 # attenuation due to distance
                 # will be removed once the divergence factor will be implemented
-                Ct[:,ir, :, :] = Ct[:, ir, :, :]*1./(self[l]['dis'][np.newaxis, :, np.newaxis, np.newaxis])
-                self.delays[ir] = self[l]['dis']/0.3
-                self.dis[ir] = self[l]['dis']
+                Ct[uf, ir, :, :] = Z/(self[l]['dis'][np.newaxis, :, np.newaxis, np.newaxis])
+
         #
         # true LOS when no interaction
         #
@@ -2010,14 +1965,14 @@ class Rays(PyLayers,dict):
         # Construction of the Ctilde channel
         #
         Cn = Ctilde()
-        Cn.Cpp = bs.FUsignal(self.I.fGHz, c11)
-        Cn.Cpt = bs.FUsignal(self.I.fGHz, c12)
-        Cn.Ctp = bs.FUsignal(self.I.fGHz, c21)
-        Cn.Ctt = bs.FUsignal(self.I.fGHz, c22)
-        Cn.nfreq = self.I.nf
+        Cn.Cpp = bs.FUsignal(fGHz, c11)
+        Cn.Cpt = bs.FUsignal(fGHz, c12)
+        Cn.Ctp = bs.FUsignal(fGHz, c21)
+        Cn.Ctt = bs.FUsignal(fGHz, c22)
+        Cn.nfreq = nf
         Cn.nray = self.nray
         Cn.tauk = self.delays
-        Cn.fGHz = self.I.fGHz
+        Cn.fGHz = fGHz
         # r x 2
         Cn.tang = aod.T
         Cn.tangl = aod.T
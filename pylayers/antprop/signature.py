@@ -50,6 +50,23 @@ Class Signatures
     Signatures.image
     Signatures.image2
 
+Class SigStore
+==============
+
+.. autosummary::
+    :toctree: generated/
+
+    SigStore.__init__
+    SigStore.reserve
+    SigStore.add
+    SigStore.append
+    SigStore.extend
+    SigStore.merge
+    SigStore.view
+    SigStore.compact
+    SigStore.stats
+    SigStore.tosig
+
 Class Signature
 ===============
 
@@ -93,6 +110,7 @@ import copy
 import time
 import pickle
 import logging
+import multiprocessing as mp
 import networkx as nx
 import shapely.geometry as shg
 import matplotlib.pyplot as plt
@@ -155,6 +173,166 @@ def gidl(g):
     return(gr)
 
 
+# shared with the run7mt worker processes (see Signatures.run7mt)
+_Gi = None
+_gic = None
+_gid = None
+_nodiff = False
+_lair = set([])
+_cutoff = 2
+_bt = False
+
+def _csrpaths(gic,s,t,cutoff,bt,nodiff,st):
+    """ depth first signature search on the compiled Gi
+
+    Parameters
+    ----------
+
+    gic : tuple
+        compiled Gi (see Layout.csrGi)
+    s : int
+        source interaction id
+    t : int
+        target interaction id
+    cutoff : int
+    bt : boolean
+        backtrace
+    nodiff : boolean
+        skip diffraction interactions
+    st : SigStore
+        signatures are appended to st
+
+    Notes
+    -----
+
+    Same exploration as run7 : the first level visits all the
+    successors of s, the next levels the outputs of the last edge.
+    The stack holds (sequence,position,end) cursors on edge ids.
+
+    """
+    adj,optr,oute,ptr,nstr,typ,air = gic
+    visited = [s]
+    # lawp = list of airwall position in visited
+    lawp = []
+    nair = 0
+    stack = [[range(ptr[s],ptr[s+1]),0,ptr[s+1]-ptr[s]]]
+    while stack:
+        top = stack[-1]
+        seq = top[0]
+        k = top[1]
+        # next child (diffraction skipped if nodiff)
+        while k < top[2]:
+            e = seq[k]
+            k = k + 1
+            if not (nodiff and typ[adj[e]]==1):
+                break
+        else:
+            e = -1
+        top[1] = k
+
+        if e < 0: # no more child
+            stack.pop()
+            visited.pop()
+            if lawp:
+                nair -= lawp.pop()
+        elif len(visited) < (cutoff + nair):
+            child = adj[e]
+            if child == t:
+                path = visited + [t]
+                st.append([nstr[i] for i in path],[typ[i] for i in path])
+            elif (child not in visited) or bt:
+                stack.append([oute,optr[e],optr[e+1]])
+                visited.append(child)
+                a = air[child]
+                lawp.append(a)
+                nair += a
+        else:
+            child = adj[e]
+            if (child == t) or (t in [ adj[x] for x in seq[k:top[2]] ]):
+                path = visited + [t]
+                st.append([nstr[i] for i in path],[typ[i] for i in path])
+            stack.pop()
+            visited.pop()
+            if lawp:
+                nair -= lawp.pop()
+
+
+def _pathfinder(lpair):
+    """ depth first signature search for a block of interaction pairs
+
+    Parameters
+    ----------
+
+    lpair : list
+        list of (source interaction, target interaction) tuples
+
+    Returns
+    -------
+
+    st : SigStore
+        signatures found for the block
+
+    Notes
+    -----
+
+    This is the run7 exploration working on the module globals
+    _Gi, _lair, _cutoff and _bt which are set by Signatures.run7mt.
+    If _gic is set the search is done on the compiled Gi (see _csrpaths).
+    Paths are accumulated in a SigStore.
+
+    """
+    Gi = _Gi
+    cutoff = _cutoff
+    st = SigStore()
+    if _gic is not None:
+        for s,t in lpair:
+            if s == t:
+                st.add([s])
+            else:
+                _csrpaths(_gic,_gid[s],_gid[t],cutoff,_bt,_nodiff,st)
+        return(st.compact())
+    for s,t in lpair:
+        if s == t:
+            st.add([s])
+            continue
+        visited = [s]
+        # stack is a list of iterators
+        stack = [iter(Gi[s])]
+        # lawp = list of airwall position in visited
+        lawp = []
+        while stack:
+            children = stack[-1]
+            child = next(children, None)
+            if child is None :
+                stack.pop()
+                visited.pop()
+                if lawp:
+                    lawp.pop()
+            elif (len(visited) < (cutoff + sum(lawp))) :
+                if child == t:
+                    st.add(visited + [t])
+                elif (child not in visited) or (_bt):
+                    try:
+                        nexti  = Gi[visited[-1]][child]['output'].keys()
+                    except:
+                        nexti = []
+                    stack.append(iter(nexti))
+                    visited.append(child)
+                    if child[0] in _lair:
+                        lawp.append(1)
+                    else:
+                        lawp.append(0)
+            else:
+                if child == t or t in children:
+                    st.add(visited + [t])
+                stack.pop()
+                visited.pop()
+                if lawp:
+                    lawp.pop()
+
+    return(st.compact())
+
+
 def frontline(L,nc,v):
     """ determine cycle frontline
 
@@ -384,6 +562,210 @@ def edgeout(L,g):
 
     return(g)
 
+class SigStore(object):
+    """ growable columnar store of signatures
+
+    Signatures of length k are kept in a buffer of shape (cap,2,k)
+    ([:,0,:] : nstr, [:,1,:] : typ 1:D 2:R 3:T) whose capacity is doubled when full,
+    so that appending a signature has an amortized O(1) cost.
+
+    Attributes
+    ----------
+
+    buf : dict
+        buf[k] : ndarray (cap,2,k)
+    n : dict
+        n[k] : number of stored signatures of length k
+
+    Examples
+    --------
+
+    >>> from pylayers.antprop.signature import *
+    >>> st = SigStore()
+    >>> st.add([(1,2),(3,2,4)])
+    >>> st.add([(-5,)])
+    >>> st.nsig(2)
+    1
+    >>> d = st.tosig()
+    >>> d[2]
+    array([[1, 3],
+           [2, 3]])
+
+    """
+    def __init__(self,cap=64):
+        self.cap = cap
+        self.buf = {}
+        self.n = {}
+
+    def __repr__(self):
+        s = self.__class__.__name__ + '\n' + '----------'+'\n'
+        for k in self.keys():
+            s = s + str(k) + ' : ' + str(self.n[k]) + '\n'
+        return(s)
+
+    def __len__(self):
+        return(sum(self.n.values()))
+
+    def keys(self):
+        """ sorted list of stored signature lengths
+        """
+        return(sorted([k for k in self.n if self.n[k]>0]))
+
+    def nsig(self,k):
+        """ number of signatures of length k
+        """
+        return(self.n.get(k,0))
+
+    def reserve(self,k,m):
+        """ make room for m more signatures of length k
+
+        Parameters
+        ----------
+
+        k : int
+            signature length
+        m : int
+            number of signatures to be added
+
+        """
+        if k not in self.buf:
+            self.buf[k] = np.empty((max(self.cap,m),2,k),dtype=int)
+            self.n[k] = 0
+        else:
+            cap = self.buf[k].shape[0]
+            need = self.n[k] + m
+            if need > cap:
+                buf = np.empty((max(2*cap,need),2,k),dtype=int)
+                buf[:self.n[k]] = self.buf[k][:self.n[k]]
+                self.buf[k] = buf
+
+    def add(self,path):
+        """ append a path of Gi interactions
+
+        Parameters
+        ----------
+
+        path : list
+            list of Gi nodes (1-tuple : D, 2-tuple : R , 3-tuple : T)
+
+        """
+        k = len(path)
+        self.reserve(k,1)
+        row = self.buf[k][self.n[k]]
+        row[0,:] = [ x[0] for x in path ]
+        row[1,:] = [ len(x) for x in path ]
+        self.n[k] += 1
+
+    def append(self,nstr,typ):
+        """ append a signature given as (nstr,typ)
+
+        Parameters
+        ----------
+
+        nstr : array_like (k,)
+        typ  : array_like (k,)
+
+        """
+        k = len(nstr)
+        self.reserve(k,1)
+        row = self.buf[k][self.n[k]]
+        row[0,:] = nstr
+        row[1,:] = typ
+        self.n[k] += 1
+
+    def extend(self,sig):
+        """ append signatures given in the Signatures layout
+
+        Parameters
+        ----------
+
+        sig : ndarray (2*nsig,k)
+            interleaved (nstr,typ) rows
+
+        """
+        m = sig.shape[0]/2
+        if m==0:
+            return
+        k = sig.shape[1]
+        self.reserve(k,m)
+        self.buf[k][self.n[k]:self.n[k]+m] = sig.reshape(m,2,k)
+        self.n[k] += m
+
+    def merge(self,other):
+        """ append all the signatures of an other SigStore
+        """
+        for k in other.keys():
+            m = other.n[k]
+            self.reserve(k,m)
+            self.buf[k][self.n[k]:self.n[k]+m] = other.buf[k][:m]
+            self.n[k] += m
+
+    def view(self,k):
+        """ view (no copy) of the signatures of length k
+
+        Returns
+        -------
+
+        ndarray (nsig,2,k)
+
+        """
+        return(self.buf[k][:self.n[k]])
+
+    def compact(self):
+        """ shrink the buffers to their used size
+        """
+        for k in self.buf.keys():
+            self.buf[k] = self.buf[k][:self.n[k]].copy()
+        return(self)
+
+    def stats(self):
+        """ per length statistics computed on the buffers
+
+        Returns
+        -------
+
+        ds : dict
+            ds[k] = {'nsig':,'nint':,'nD':,'nR':,'nT':}
+
+        """
+        ds = {}
+        for k in self.keys():
+            typ = self.view(k)[:,1,:]
+            cnt = np.bincount(typ.ravel(),minlength=4)
+            ds[k] = {'nsig':self.n[k],
+                     'nint':self.n[k]*k,
+                     'nD':cnt[1],
+                     'nR':cnt[2],
+                     'nT':cnt[3]}
+        return(ds)
+
+    def tosig(self,S=None):
+        """ convert to the Signatures dict of arrays layout
+
+        Parameters
+        ----------
+
+        S : Signatures or dict
+            if given, arrays are stored in S and appended to already
+            existing arrays of the same length
+
+        Returns
+        -------
+
+        S : dict
+            S[k] : ndarray (2*nsig,k) interleaved (nstr,typ) rows
+
+        """
+        if S is None:
+            S = {}
+        for k in self.keys():
+            sig = self.view(k).reshape(2*self.n[k],k)
+            if k in S:
+                S[k] = np.vstack((S[k],sig))
+            else:
+                S[k] = sig.copy()
+        return(S)
+
 class Signatures(PyLayers,dict):
     """ set of Signature given 2 Gt cycle (convex) indices
 
@@ -1002,8 +1384,8 @@ class Signatures(PyLayers,dict):
         ----------
 
         G : networkx Graph Gi
-        dout : dictionnary
-            ouput dictionnary
+        dout : dictionnary | SigStore
+            ouput dictionnary or signature store
         source : tuple
             interaction (node of Gi)
         target : tuple
@@ -1015,7 +1397,7 @@ class Signatures(PyLayers,dict):
         Returns
         -------
 
-        dout : dictionnary
+        dout : dictionnary | SigStore
             key : int
                number of interactions
             values : list
@@ -1027,6 +1409,9 @@ class Signatures(PyLayers,dict):
 
         1- Determine all nodes connected to Gi
 
+        If dout is a SigStore, paths are appended to it with an amortized
+        O(1) cost.
+
         """
         #print "source :",source
         #print "target :",target
@@ -1066,11 +1451,14 @@ class Signatures(PyLayers,dict):
                 if child == target:  # if child is the target point
                     #print visited + [target]
                     path = visited + [target]
-                    try:
-                        dout[len(path)].append([[p[0],len(p)] for p in path])
-                    except:
-                        dout[len(path)]=[]
-                        dout[len(path)].append([[p[0],len(p)] for p in path])
+                    if isinstance(dout,SigStore):
+                        dout.add(path)
+                    else:
+                        try:
+                            dout[len(path)].append([[p[0],len(p)] for p in path])
+                        except:
+                            dout[len(path)]=[]
+                            dout[len(path)].append([[p[0],len(p)] for p in path])
                     #yield visited + [target] # output signature
 
                 elif (child not in visited) or (bt): # else visit other node
@@ -1096,12 +1484,15 @@ class Signatures(PyLayers,dict):
             else: #len(visited) == cutoff (visited list is too long)
                 if child == target or target in children:
                     path = visited + [target]
-                    try:
-                        dout[len(path)].append([[p[0],len(p)] for p in path])
-                    except:
-                        #print "non existing : ",len(path)
-                        dout[len(path)]=[]
-                        dout[len(path)].append([[p[0],len(p)] for p in path])
+                    if isinstance(dout,SigStore):
+                        dout.add(path)
+                    else:
+                        try:
+                            dout[len(path)].append([[p[0],len(p)] for p in path])
+                        except:
+                            #print "non existing : ",len(path)
+                            dout[len(path)]=[]
+                            dout[len(path)].append([[p[0],len(p)] for p in path])
                     #print visited + [target]
                     #yield visited + [target]
 
@@ -2884,7 +3275,12 @@ class Signatures(PyLayers,dict):
             Gi = gidl(Gi)
 
         # initialize dout dictionnary
-        dout = {}
+        # (propaths2 accumulates directly in a signature store)
+        if algo=='old':
+            dout = SigStore()
+            done = set([])
+        else:
+            dout = {}
 
         # progresss stuff...
         lmax = len(lis)*len(lit)
@@ -2923,6 +3319,10 @@ class Signatures(PyLayers,dict):
                     elif algo == 'dij':
                         dout = self.short_propath(Gi,source=s,target=t,dout=dout,cutoff=cutoff)
                         # dout = self.short_propath(Gi,source=t,target=s,dout=dout,cutoff=cutoff)
+                elif algo=='old':
+                    if (s[0],len(s)) not in done:
+                        done.add((s[0],len(s)))
+                        dout.add([s])
                 else:
                     try:
                         if [s[0],len(s)] not in dout[1]:
@@ -2931,6 +3331,10 @@ class Signatures(PyLayers,dict):
                         dout[1]=[]
                         dout[1].append([s[0],len(s)])
 
+        if algo=='old':
+            self.update(dout.tosig())
+            return
+
         for k in dout.keys():
             adout = np.array((dout[k]))
             shad  = np.shape(adout)
@@ -2948,9 +3352,9 @@ class Signatures(PyLayers,dict):
 
 
 
-    def run7mt(self,cutoff=2,algo='old',bt=False,progress=False,diffraction=True,threshold=0.1):
+    def run7mt(self,cutoff=2,algo='old',bt=False,progress=False,diffraction=True,threshold=0.1,nproc=0,chunk=0,csr=True):
         """ get signatures (in one list of arrays) between tx and rx
-            multithreaded version
+            multiprocess version of run7
 
         Parameters
         ----------
@@ -2958,27 +3362,43 @@ class Signatures(PyLayers,dict):
         cutoff : int
             limit the exploration of all_simple_path
         algo: string
-            'old' : call propaths2
-            'new' : call procone2
+            unused, kept for compatibility with run7
         bt : bool
             backtrace (allow to visit already visited nodes in simple path algorithm)
         progress : bool
             display the time passed in the loop
+        diffraction : bool
+            take diffraction points into account
+        threshold : float
+            unused, kept for compatibility with run7
+        nproc : int
+            number of worker processes (default 0 : multiprocessing.cpu_count())
+            if nproc==1 the search is done in the calling process
+        chunk : int
+            number of (source,target) interaction pairs per task
+            (default 0 : about 8 tasks per process)
+        csr : bool
+            if True the search is done on the compiled Gi (Layout.csrGi)
 
+        Notes
+        -----
 
-        Returns
-        -------
-
-        sigslist :  numpy.ndarray
+        The (source interaction x target interaction) pairs obtained from
+        Layout.intercy are split in contiguous blocks which are explored
+        by a pool of processes. Gi is published as a module global before
+        the pool is forked, so that workers share it read-only without
+        pickling. Each worker accumulates the paths of a block in a SigStore
+        which is sent back to the parent. Blocks are merged in the pair order,
+        hence the result is identical to the one of run7.
 
         See Also
         --------
 
         pylayers.simul.link.Dlink.eval
-        pylayers.antprop.signature.Signatures.propath2
-        pylayers.antprop.signature.Signatures.procone2
+        pylayers.antprop.signature.Signatures.run7
 
         """
+        global _Gi,_gic,_gid,_nodiff,_lair,_cutoff,_bt
 
         self.cutoff   = cutoff
         self.filename = self.L.filename.split('.')[0] +'_' + str(self.source) +'_' + str(self.target) +'_' + str(self.cutoff) +'.sig'
@@ -2997,167 +3417,70 @@ class Signatures(PyLayers,dict):
            lit  = litT + litR + litD
         else:
            lit  = litT + litR
-        #print "source,lis :",self.source,lis
-        #print "target,lit :",self.target,lit
-
 
         Gi = self.L.Gi
         Gi.pos = self.L.Gi.pos
+        if csr:
+            _gic = self.L.csrGi()
+            _gid = self.L.gi_id
+            _nodiff = not diffraction
         #
         # remove diffractions from Gi
-        if not diffraction:
+        elif not diffraction:
             Gi = gidl(Gi)
 
-        # initialize dout dictionnary
-        dout = {}
-
-        # progresss stuff...
-        lmax = len(lis)*len(lit)
-        pe = 0
-        tic = time.time()
-        tic0 = tic
-        #for interaction source  in list of source interactions
-
-        def pathfinder(dsig,s,t,Gi):
-            visited = [s]
-            # stack is a list of iterators
-            stack = [iter(Gi[s])]
-            # lawp = list of airwall position in visited
-            lawp = []
-            # while the list of iterators is not void
-            # import ipdb
-            # ipdb.set_trace()
-            while stack: #
-                # children is the last iterator of stack
-                children = stack[-1]
-                # next child
-
-                child = next(children, None)
-
-                # update number of useful segments
-                # if there is airwall in visited
-                if child is None  : # if no more child
-                    stack.pop()   # remove last iterator
-                    visited.pop() # remove from visited list
-                    try:
-                        lawp.pop()
-                    except:
-                        pass
-
-
-
-                elif (len(visited) < (cutoff + sum(lawp))) and sum(lawp)<5  :# if visited list length is less than cutoff
-
-                    if child == t:  # if child is the target point
-                        #print visited + [target]
-                        path = visited + [t]
-                        nstr = np.array(map(lambda x: x[0],path))
-                        typ  = np.array(map(lambda x: len(x),path))
-                        try:
-                            dsig[len(typ)]=np.vstack((dsig[len(typ)],nstr,typ))
-                        except:
-                            dsig[len(typ)]=np.vstack((nstr,typ))
-                        #try:
-                        #    dout[len(path)].append([[p[0],len(p)] for p in path])
-                        #except:
-                        #    dout[len(path)]=[]
-                        #    dout[len(path)].append([[p[0],len(p)] for p in path])
-                        #yield visited + [target] # output signature
-                    elif (child not in visited) or (bt): # else visit other node
-                        # only visit output nodes except if bt
-                        #pdb.set_trace()
-                        try:
-                            nexti  = Gi[visited[-1]][child]['output'].keys()
-                            #prob  = Gi[visited[-1]][child]['output'].values()
-                            #nexti = map(lambda x:x[0]
-                            #               ,filter(lambda x
-                            #                       :x[1]>threshold,zip(out,prob)))
-                        except:
-                            nexti = []
-
-                        stack.append(iter(nexti))
-                        #stack.append(iter(G[visited[-1]][child]['output']))
-                        visited.append(child)
-                        # check if child (current segment) is an airwall
-                        # warning not efficient if many airwalls
-                        if child[0] in self.L.name['AIR']:
-                            lawp.append(1)
-                        else:
-                            lawp.append(0)
-
-
-
-                else: #len(visited) == cutoff (visited list is too long)
-                    if child == t or t in children:
-                        path = visited + [t]
-                        nstr = np.array(map(lambda x: x[0],path))
-                        typ  = np.array(map(lambda x: len(x),path))
-                        try:
-                            dsig[len(typ)]=np.vstack((dsig[len(path)],nstr,typ))
-                        except:
-                            #print "non existing : ",len(path)
-                            dsig[len(typ)]=np.vstack((nstr,typ))
-                        #print visited + [target]
-                        #yield visited + [target]
-
-                    stack.pop()
-                    visited.pop()
-                    try:
-                        lawp.pop()
-                    except:
-                        pass
-
-
-        # import multiprocessing as mpc
-        import threading as thg
-
-        # manager = mpc.Manager()
-        # dsig = manager.dict()
-        jobs = []
-        for us,s in enumerate(lis):
-            #for target interaction in list of target interactions
-            #print "---> ",s
-
-            for ut,t in enumerate(lit):
-                #print "   ---> ",t
-                # progress bar
-                if progress :
-
-                    ratio = np.round((((us)*len(lit)+ut)/(1.*lmax))*10 )
-                    if ratio > pe:
-                        pe = ratio
-                        toc = time.time()
-                        print '~%d ' % (ratio*10),
-                        print '%',
-                        print '%6.3f %6.3f' % (toc-tic, toc-tic0)
-                        tic = toc
-
-                # if source and target interaction are different
-                # and R | T
-                #if ((type(eval(s))==tuple) & (s != t)):
-                if (s != t):
-                    # p = mpc.Process(target=pathfinder, args=(dsig,s,t,Gi))
-                    p = thg.Thread(target=pathfinder, args=(self,s,t,Gi))
-                    jobs.append(p)
-                    p.start()
-                    p.join()
-                else: # s==t
-                    nstr = np.array([s[0]])
-                    typ  = np.array([len(s)])
-                    try:
-                        self[1]=np.vstack((self[1],nstr,typ))
-                    except:
-                        #print "non existing : ",len(path)
-                        self[1]=np.vstack((nstr,typ))
-
-
-
-
-
+        lpair = [ (s,t) for s in lis for t in lit ]
+        if len(lpair)==0:
+            return
 
+        if nproc==0:
+            nproc = mp.cpu_count()
+        nproc = min(nproc,len(lpair))
+        if chunk==0:
+            chunk = max(1,len(lpair)/(8*nproc))
+        ltask = [ lpair[k:k+chunk] for k in range(0,len(lpair),chunk) ]
 
+        # published before fork : shared read-only by the workers
+        _Gi     = Gi
+        _lair   = set(self.L.name['AIR'])
+        _cutoff = cutoff
+        _bt     = bt
 
-    def run7(self,cutoff=2,algo='old',bt=False,progress=False,diffraction=True,threshold=0.1):
+        tic0 = time.time()
+        try:
+            if nproc==1:
+                lres = map(_pathfinder,ltask)
+            else:
+                pool = mp.Pool(processes=nproc)
+                try:
+                    lres = []
+                    pe = 0
+                    for k,res in enumerate(pool.imap(_pathfinder,ltask)):
+                        lres.append(res)
+                        if progress:
+                            ratio = np.round(((k+1)/(1.*len(ltask)))*10)
+                            if ratio > pe:
+                                pe = ratio
+                                print '~%d ' % (ratio*10),
+                                print '%',
+                                print '%6.3f' % (time.time()-tic0)
+                    pool.close()
+                finally:
+                    pool.terminate()
+                    pool.join()
+        finally:
+            _Gi = None
+            _gic = None
+            _gid = None
+
+        # merge blocks in task order
+        st = SigStore()
+        for res in lres:
+            st.merge(res)
+        st.tosig(self)
+
+
+    def run7(self,cutoff=2,algo='old',bt=False,progress=False,diffraction=True,threshold=0.1,csr=True):
         """ get signatures (in one list of arrays) between tx and rx
 
         Parameters
@@ -3172,6 +3495,8 @@ class Signatures(PyLayers,dict):
             backtrace (allow to visit already visited nodes in simple path algorithm)
         progress : bool
             display the time passed in the loop
+        csr : bool
+            if True the search is done on the compiled Gi (Layout.csrGi)
 
 
         Returns
@@ -3211,13 +3536,16 @@ class Signatures(PyLayers,dict):
 
         Gi = self.L.Gi
         Gi.pos = self.L.Gi.pos
+        if csr:
+            gic = self.L.csrGi()
+            gid = self.L.gi_id
         #
         # remove diffractions from Gi
-        if not diffraction:
+        elif not diffraction:
             Gi = gidl(Gi)
 
-        # initialize dout dictionnary
-        dout = {}
+        # growable signature store
+        st = SigStore()
 
         # progresss stuff...
         lmax = len(lis)*len(lit)
@@ -3246,7 +3574,10 @@ class Signatures(PyLayers,dict):
                 # if source and target interaction are different
                 # and R | T
                 #if ((type(eval(s))==tuple) & (s != t)):
-                if (s != t):
+                if (s != t) and csr:
+                    _csrpaths(gic,gid[s],gid[t],cutoff,bt,not diffraction,st)
+
+                elif (s != t):
 
                     visited = [s]
                     # stack is a list of iterators
@@ -3278,13 +3609,7 @@ class Signatures(PyLayers,dict):
                         elif (len(visited) < (cutoff + sum(lawp))) :# if visited list length is less than cutoff
                             if child == t:  # if child is the target point
                                 #print visited + [target]
-                                path = visited + [t]
-                                nstr = np.array(map(lambda x: x[0],path))
-                                typ  = np.array(map(lambda x: len(x),path))
-                                try:
-                                    self[len(typ)]=np.vstack((self[len(typ)],nstr,typ))
-                                except:
-                                    self[len(typ)]=np.vstack((nstr,typ))
+                                st.add(visited + [t])
                                 #try:
                                 #    dout[len(path)].append([[p[0],len(p)] for p in path])
                                 #except:
@@ -3318,14 +3643,7 @@ class Signatures(PyLayers,dict):
 
                         else: #len(visited) == cutoff (visited list is too long)
                             if child == t or t in children:
-                                path = visited + [t]
-                                nstr = np.array(map(lambda x: x[0],path))
-                                typ  = np.array(map(lambda x: len(x),path))
-                                try:
-                                    self[len(typ)]=np.vstack((self[len(path)],nstr,typ))
-                                except:
-                                    #print "non existing : ",len(path)
-                                    self[len(typ)]=np.vstack((nstr,typ))
+                                st.add(visited + [t])
                                 #print visited + [target]
                                 #yield visited + [target]
 
@@ -3337,13 +3655,9 @@ class Signatures(PyLayers,dict):
                                 pass
 
                 else: # s==t
-                    nstr = np.array([s[0]])
-                    typ  = np.array([len(s)])
-                    try:
-                        self[1]=np.vstack((self[1],nstr,typ))
-                    except:
-                        #print "non existing : ",len(path)
-                        self[1]=np.vstack((nstr,typ))
+                    st.add([s])
+
+        st.tosig(self)
 
     def run6(self,bt=False,progress=False,diffraction=True,cutoff=8):
         """ get signatures (in one list of arrays) between tx and rx
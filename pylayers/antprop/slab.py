@@ -88,6 +88,8 @@ Slab Class
     Slab.tocolor
     Slab.loss0
     Slab.losst
+    Slab.angle2bin
+    Slab.bincache
     Slab.editgui
     Slab.show
 
@@ -98,6 +100,8 @@ SlabDB Class
     :toctree: generated/
 
     SlabDB.__init__
+    SlabDB.signature
+    SlabDB.ev
     SlabDB.showall
     SlabDB.info
     SlabDB.dass
@@ -136,6 +140,7 @@ import pylayers.util.pyutil as pyu
 import pylayers.util.plotutil as plu
 from pylayers.util.easygui import *
 from scipy.interpolate import interp1d
+from collections import OrderedDict
 import copy
 import pdb
 import copy
@@ -1360,6 +1365,8 @@ class Slab(dict,Interface):
         self['color'] = 'black'
         self['linewidth'] = 1.0
         self['evaluated'] = False
+        # cache of losst and excess_grdelay on angle bins
+        self.cache = {}
         self.conv()
 
     def __setitem__(self,key,value):
@@ -1379,12 +1386,14 @@ class Slab(dict,Interface):
             dict.__setitem__(self,"nbmat",nbmat)
             dict.__setitem__(self,"lthick",[0.05]*nbmat)
             self.conv()
+            self.cache = {}
         
         elif key == "lthick":
             if len(value)!=self['nbmat']:
                 raise ValueError("wrong number of material layers")
             else:
                 dict.__setitem__(self,"lthick",value)
+                self.cache = {}
         else:        
             dict.__setitem__(self,key, value)
 
@@ -1645,13 +1654,9 @@ class Slab(dict,Interface):
             # Using Einstein summation instead of a for loop increases speed by an order of magnitude
             #
 
-            # Co = np.einsum('ijkl,ijln->ijkn', Co, Io)
-            # Cp = np.einsum('ijkl,ijln->ijkn', Cp, Ip)
-
-
-            ### array broadcasing version , new increased speed in regard of einsum
-            Co=np.sum(Co[...,:,:,np.newaxis]*Io[...,np.newaxis,:,:], axis=3)
-            Cp=np.sum(Cp[...,:,:,np.newaxis]*Ip[...,np.newaxis,:,:], axis=3)
+            # stacked 2x2 matrix products without (nf,nt,2,2,2) temporary
+            Co = np.einsum('...kl,...ln->...kn', Co, Io)
+            Cp = np.einsum('...kl,...ln->...kn', Cp, Ip)
 
 
             if mr['name'] == 'METAL':
@@ -1719,7 +1724,7 @@ class Slab(dict,Interface):
         wout = Wafeform()
         return(wout)
 
-    def excess_grdelay(self,fGHz=np.arange(2.4,4.0,0.1),theta=np.array([0])):
+    def excess_grdelay(self,fGHz=np.arange(2.4,4.0,0.1),theta=np.array([0]),dtheta=0):
         """ calculate transmission excess delay in ns
 
         Parameters
@@ -1728,6 +1733,9 @@ class Slab(dict,Interface):
         fGHz : array
         default arange(2.4,4,0.1)
         theta : default 0
+        dtheta : float
+            angle bin width (radians). If dtheta > 0 the delay is taken from
+            the cache of the angle bins (see `Slab.bincache`). default 0
 
         Returns
         -------
@@ -1754,6 +1762,11 @@ class Slab(dict,Interface):
 
         assert len(fGHz)>2 , "fGHz too short needs more than one frequency point"
 
+        if dtheta > 0:
+            delayo, delayp = self.bincache('grdelay',fGHz,dtheta)
+            kt = self.angle2bin(theta,dtheta)
+            return (delayo[kt],delayp[kt])
+
         df = fGHz[1]-fGHz[0]
 
         self.ev(fGHz,theta=theta,compensate=True)
@@ -1830,7 +1843,7 @@ class Slab(dict,Interface):
         Lo, Lp = Interface.loss0(self, fGHz)
         return(Lo, Lp)
 
-    def losst(self, fGHz, theta):
+    def losst(self, fGHz, theta, dtheta=0):
         """ Calculate loss w.r.t angle and frequency
 
         Parameters
@@ -1842,6 +1855,10 @@ class Slab(dict,Interface):
         theta : np.array
         theta angle (radians)
 
+        dtheta : float
+        angle bin width (radians). If dtheta > 0 the loss is taken from the
+        cache of the angle bins (see `Slab.bincache`). default 0
+
         Returns
         -------
 
@@ -1856,10 +1873,89 @@ class Slab(dict,Interface):
         if type(theta)==float:
             theta = np.array([theta])
 
+        if dtheta > 0:
+            Lo, Lp = self.bincache('losst',fGHz,dtheta)
+            kt = self.angle2bin(theta,dtheta)
+            return(Lo[:,kt], Lp[:,kt])
+
         self.ev(fGHz, theta)
         Lo, Lp = Interface.losst(self, fGHz)
         return(Lo, Lp)
 
+    def angle2bin(self, theta, dtheta):
+        """ index of the angle bin of theta
+
+        Parameters
+        ----------
+
+        theta : np.array
+            angle (radians) in [0,pi/2]
+        dtheta : float
+            angle bin width (radians)
+
+        Returns
+        -------
+
+        kt : np.array (int)
+
+        """
+        nbin = int(np.ceil((np.pi/2)/dtheta))
+        kt = np.floor(np.abs(theta)/dtheta).astype(int)
+        return(np.minimum(kt,nbin-1))
+
+    def bincache(self, typ, fGHz, dtheta):
+        """ evaluate the slab on the center of angle bins and cache the result
+
+        Parameters
+        ----------
+
+        typ : string
+            'losst' | 'grdelay'
+        fGHz : np.array
+            frequency (GHz)
+        dtheta : float
+            angle bin width (radians)
+
+        Returns
+        -------
+
+        if typ == 'losst'
+            Lo,Lp : np.array (nf x nbin) loss in dB
+        if typ == 'grdelay'
+            delayo,delayp : np.array (nbin) excess delay in ns
+
+        Notes
+        -----
+
+        The cache is keyed on (typ, frequencies, dtheta) and it is cleared
+        when lmatname or lthick are modified. The centers of the bins are
+        kept below pi/2 where Fresnel coefficients are not defined.
+
+        Examples
+        --------
+
+        >>> from pylayers.antprop.slab import *
+        >>> sl = SlabDB('matDB.ini','slabDB.ini')
+        >>> s1 = sl['PARTITION']
+        >>> fGHz = np.array([2.4,5.])
+        >>> Lo,Lp = s1.bincache('losst',fGHz,np.pi/180)
+        >>> Lo.shape
+        (2, 90)
+
+        """
+        if not isinstance(fGHz, np.ndarray):
+            fGHz = np.array([fGHz])
+        key = (typ,tuple(fGHz),dtheta)
+        if key not in self.cache:
+            nbin = int(np.ceil((np.pi/2)/dtheta))
+            thb = np.minimum((np.arange(nbin)+0.5)*dtheta,np.pi/2-1e-6)
+            if typ == 'losst':
+                self.ev(fGHz, thb)
+                self.cache[key] = Interface.losst(self, fGHz)
+            if typ == 'grdelay':
+                self.cache[key] = self.excess_grdelay(fGHz, thb)
+        return(self.cache[key])
+
     def editgui(self):
         """ edit a Slab in the DB
 
@@ -1933,7 +2029,23 @@ class SlabDB(dict):
 
     DB : slab dictionnary
 
+    cache : OrderedDict
+        evaluated R and T coefficients on a theta grid (see SlabDB.ev).
+        The cache is shared by all SlabDB instances and keyed on the slab
+        constitution, so that it survives the SlabDB reloaded by each
+        Interactions object.
+    dtheta : float
+        step of the theta grid of the cache (radians)
+        dtheta = 0 disables the cache
+    cachemax : int
+        maximum size of the cache in bytes (least recently used entries are
+        evicted first)
+
     """
+    cache = OrderedDict()
+    dtheta = np.pi/1800.
+    cachemax = 256*2**20
+
     def __init__(self, filemat='matDB.ini', fileslab='slabDB.ini'):
         """ class constructor
 
@@ -1964,6 +2076,121 @@ class SlabDB(dict):
         #    S.info()
         return(st)    
 
+    def signature(self, name):
+        """ hashable description of the constitution of a slab
+
+        Parameters
+        ----------
+
+        name : string
+            slab name
+
+        Returns
+        -------
+
+        tuple of (material name, epr, sigma, mur, thickness) per layer
+
+        """
+        S = self[name]
+        sig = tuple((m['name'],complex(m['epr']),float(m['sigma']),
+                     complex(m['mur']),float(t))
+                    for m,t in zip(S['lmat'],S['lthick']))
+        return(sig)
+
+    def ev(self, name, fGHz=np.array([2.4]), theta=np.array([0.]), RT='R', compensate=False):
+        """ cached evaluation of a slab Reflection or Transmission matrix
+
+        Parameters
+        ----------
+
+        name : string
+            slab name
+        fGHz : np.array (nf)
+            frequency (GHz)
+        theta : np.array (nt)
+            incidence angle (from normal) radians
+        RT : string
+            'R' | 'T'
+        compensate : boolean
+            see Slab.ev
+
+        Returns
+        -------
+
+        R or T : np.array (nf,nt,2,2)
+
+        Notes
+        -----
+
+        The first call for a given (slab, RT, compensate, fGHz) evaluates the
+        slab on a uniform theta grid of step SlabDB.dtheta over [0,pi/2].
+        The diagonal terms of the matrix are stored in SlabDB.cache and the
+        following calls only interpolate linearly this table at theta.
+        The last grid point is kept below pi/2 where Fresnel coefficients are
+        not defined.
+
+        Examples
+        --------
+
+        >>> from pylayers.antprop.slab import *
+        >>> sl = SlabDB('matDB.ini','slabDB.ini')
+        >>> fGHz = np.array([2.4,5.])
+        >>> theta = np.array([0.1,0.4,1.2])
+        >>> R = sl.ev('WOOD',fGHz,theta,RT='R')
+        >>> R.shape
+        (2, 3, 2, 2)
+
+        """
+        if not isinstance(fGHz, np.ndarray):
+            fGHz = np.array([fGHz])
+        if not isinstance(theta, np.ndarray):
+            theta = np.array([theta])
+
+        S = self[name]
+        dtheta = self.dtheta
+
+        if dtheta == 0:
+            S.ev(fGHz, theta, compensate=compensate, RT=RT)
+            if RT=='R':
+                return(S.R)
+            else:
+                return(S.T)
+
+        key = (self.signature(name),RT,compensate,tuple(fGHz),dtheta)
+        nbin = int(np.ceil((np.pi/2)/dtheta))
+
+        if key in self.cache:
+            # move the entry at the end of the LRU order
+            tab = self.cache.pop(key)
+        else:
+            thg = np.minimum(np.arange(nbin+1)*dtheta,np.pi/2-1e-6)
+            S.ev(fGHz, thg, compensate=compensate, RT=RT)
+            if RT=='R':
+                M = S.R
+            else:
+                M = S.T
+            # nf x ngrid x 2 : diagonal of the matrix
+            tab = np.concatenate((M[:,:,0,0][...,np.newaxis],
+                                  M[:,:,1,1][...,np.newaxis]),axis=2)
+            size = sum(v.nbytes for v in self.cache.values())
+            while (len(self.cache)>0) and (size+tab.nbytes > self.cachemax):
+                k,v = self.cache.popitem(last=False)
+                size = size - v.nbytes
+        self.cache[key] = tab
+
+        #
+        # linear interpolation on the theta grid
+        #
+        x = np.abs(np.real(theta))/dtheta
+        k = np.minimum(np.floor(x).astype(int),nbin-1)
+        w = (x-k)[np.newaxis,:,np.newaxis]
+        D = (1-w)*tab[:,k,:] + w*tab[:,k+1,:]
+
+        M = np.zeros((len(fGHz),len(theta),2,2),dtype=complex)
+        M[:,:,0,0] = D[:,:,0]
+        M[:,:,1,1] = D[:,:,1]
+        return(M)
+
     def showall(self):
         """ show all slabs
 
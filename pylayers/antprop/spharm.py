@@ -95,6 +95,7 @@ Utility Functions
      AFLegendre
      VW2
      VW
+     VWtheta
      VW0
      plotVW
 
@@ -2230,6 +2231,83 @@ def VW(l, m, theta ,phi):
 
     return V, W
 
+def VWtheta(l, m, theta, Pmm1l=[], Pmp1l=[]):
+    """ theta part of the vector Spherical Harmonics basis functions
+
+    Parameters
+    ----------
+
+    l    : ndarray (1 x K)
+        level
+    m    : ndarray (1 x K)
+        mode
+    theta : np.array (1 x Nray)
+    Pmm1l : ndarray (Nray , M+1 , L+1)
+    Pmp1l : ndarray (Nray , M+1 , L+1)
+        optional precomputed Legendre terms (AFLegendre or AFLegendre3)
+        for x = -cos(theta)
+
+    Returns
+    -------
+
+    Vt  : ndarray (Nray , K)
+    Wt  : ndarray (Nray , K)
+
+    Notes
+    -----
+
+    The basis functions are separable in theta and phi
+
+        .. math::
+
+            V_l^m(\\theta,\\phi) = V_t(\\theta) e^{j m \\phi}
+
+            W_l^m(\\theta,\\phi) = W_t(\\theta) e^{j m \\phi}
+
+    Vt and Wt are real. The same fix as in VW is applied for
+    :math:`\\theta=\\pi/2` but theta is not modified.
+
+    See Also
+    --------
+
+    VW
+
+    """
+    if type(l) == float:
+        l = np.array([l])
+    if type(m) == float:
+        m = np.array([m])
+
+    L = np.max(l)
+
+    theta = np.array(theta,dtype=float)
+    index = np.where(abs(theta-np.pi/2)<1e-5)[0]
+    if len(index)>0:
+        theta[index]=np.pi/2-0.01
+    x = -np.cos(theta)
+
+    if len(Pmm1l) == 0:
+        Pmm1l, Pmp1l = AFLegendre(L, L, x)
+
+    K   = len(l)
+    Nr  = len(x)
+
+    l   = l.reshape(1,K)
+    m   = m.reshape(1,K)
+    x   = x.reshape(Nr,1)
+
+    t1 = np.sqrt((l + m) * (l - m + 1))
+    t2 = np.sqrt((l - m) * (l + m + 1))
+
+    Y1 = (t1 * Pmm1l[:,m,l] + t2 * Pmp1l[:,m,l]).reshape(Nr,K)
+    Y2 = (t1 * Pmm1l[:,m,l] - t2 * Pmp1l[:,m,l]).reshape(Nr,K)
+
+    T =  (-1.0) ** l / (2 * np.sqrt(l * (l + 1)))
+    Wt = Y1 * T / x
+    Vt = Y2 * T
+
+    return Vt, Wt
+
 def VW0(n, m, x, phi, Pmm1n, Pmp1n):
     """ evaluate vector Spherical Harmonics basis functions
 
@@ -0,0 +1,41 @@
+import time
+import numpy as np
+from pylayers.antprop.antenna import *
+from pylayers.antprop.spharm import *
+
+A = Antenna('defant.vsh3')
+
+nray = 2000
+theta = np.arccos(np.random.uniform(-1,1,nray))
+phi = np.random.uniform(0,2*np.pi,nray)
+
+#
+# reference : full V,W basis and four products
+#
+Br = A.C.Br.s3
+Bi = A.C.Bi.s3
+Cr = A.C.Cr.s3
+Ci = A.C.Ci.s3
+V, W = VW(A.C.Br.ind3[:,0], A.C.Br.ind3[:,1], theta.copy(), phi)
+Fth0 = np.dot(Br, np.real(V.T)) - np.dot(Bi, np.imag(V.T)) + \
+       np.dot(Ci, np.real(W.T)) + np.dot(Cr, np.imag(W.T))
+Fph0 = -np.dot(Cr, np.real(V.T)) + np.dot(Ci, np.imag(V.T)) + \
+        np.dot(Bi, np.real(W.T)) + np.dot(Br, np.imag(W.T))
+Fmax = max(abs(Fth0).max(),abs(Fph0).max())
+
+tic = time.time()
+Fth1, Fph1 = A.Fsynth3(theta, phi, pattern=False, tol=0)
+print "exact  : ",time.time()-tic
+np.testing.assert_allclose(Fth1, Fth0, atol=1e-10*Fmax)
+np.testing.assert_allclose(Fph1, Fph0, atol=1e-10*Fmax)
+
+#
+# cached basis on a theta grid
+#
+tol = 1e-4
+A.vsh3basis(tol)
+tic = time.time()
+Fth2, Fph2 = A.Fsynth3(theta, phi, pattern=False, tol=tol)
+print "tol %g : " % tol,time.time()-tic
+assert abs(Fth2-Fth0).max() < tol*Fmax
+assert abs(Fph2-Fph0).max() < tol*Fmax
@@ -0,0 +1,35 @@
+import numpy as np
+import pylayers.signal.bsignal as bs
+from pylayers.antprop.channel import *
+
+#
+# synthetic Ctilde with quadratic frequency dependency
+#
+nray = 50
+fGHz = np.linspace(2,6,201)
+u = (fGHz-4)/2.
+C = Ctilde()
+C.fGHz = fGHz
+C.nfreq = len(fGHz)
+C.nray = nray
+C.tauk = 100*np.random.rand(nray)
+C.tang = np.random.rand(nray,2)
+C.rang = np.random.rand(nray,2)
+for k in ['Ctt','Ctp','Cpt','Cpp']:
+    c = np.random.randn(3,nray)+1j*np.random.randn(3,nray)
+    y = c[0][:,None]+c[1][:,None]*u+c[2][:,None]*u**2
+    setattr(C,k,bs.FUsignal(fGHz,y))
+
+S = C.compact(order=2)
+assert S.err.max() < 1e-10
+
+for mode in ['mean','integ','center']:
+    E0 = C.energy(mode=mode)
+    E1 = S.energy(mode=mode)
+    for e0,e1 in zip(E0,E1):
+        np.testing.assert_allclose(e0,e1,rtol=1e-10)
+
+H0 = C.prop2tran(a='theta',b='phi',Friis=False)
+H1 = S.prop2tran(a='theta',b='phi',Friis=False)
+np.testing.assert_allclose(H0.y,H1.y,rtol=1e-10)
+np.testing.assert_allclose(H0.rssi(10),S.rssi(10,a='theta',b='phi',Friis=False))
@@ -0,0 +1,39 @@
+import numpy as np
+from pylayers.antprop.coverage import *
+
+#
+# reference : all the grid points at once, intermediate arrays kept
+#
+C1 = Coverage('coverage.ini')
+C1.cover()
+#
+# chunked evaluation keeping only the summaries
+#
+C2 = Coverage('coverage.ini')
+for chunk in [1000,50,33]:
+    C2.cover(chunk=chunk,keep=False)
+    for v in ['snro','snrp','sinro','sinrp']:
+        np.testing.assert_allclose(getattr(C2,v),getattr(C1,v),rtol=1e-12)
+    np.testing.assert_equal(C2.bestsvo,C1.bestsvo)
+    np.testing.assert_equal(C2.bestsvp,C1.bestsvp)
+#
+# the methods which need the intermediate arrays raise an AttributeError
+#
+for method in [C2.evsnr,C2.evsinr,C2.evbestsv]:
+    try:
+        method()
+        assert False
+    except AttributeError:
+        pass
+try:
+    C2.show(typ='loss')
+    assert False
+except AttributeError:
+    pass
+#
+# the summaries of ev* match the summaries of cover
+#
+C1.evsinr()
+C1.evbestsv()
+np.testing.assert_allclose(C1.sinrp,C2.sinrp,rtol=1e-12)
+np.testing.assert_equal(C1.bestsvo,C2.bestsvo)
@@ -0,0 +1,37 @@
+import numpy as np
+import pylayers.signal.bsignal as bs
+import pylayers.util.geomutil as geu
+from pylayers.antprop.channel import *
+
+#
+# one Ctilde against a sweep of receiver orientations
+#
+nray = 100
+fGHz = np.linspace(2,6,51)
+
+def ctilde():
+    C = Ctilde()
+    C.fGHz = fGHz
+    C.nfreq = len(fGHz)
+    C.nray = nray
+    C.tauk = np.arange(nray)
+    C.tang = np.c_[np.linspace(0.1,3,nray),np.linspace(-3,3,nray)]
+    C.rang = np.c_[np.linspace(3,0.1,nray),np.linspace(3,-3,nray)]
+    for k,n in enumerate(['Ctt','Ctp','Cpt','Cpp']):
+        y = np.exp(1j*(k+1)*np.outer(np.arange(nray),fGHz))
+        setattr(C,n,bs.FUsignal(fGHz,y))
+    return C
+
+Ta = geu.MEulerAngle(0.1,0.2,0.3)
+lTb = np.array([geu.MRot3(k*np.pi/18,2) for k in range(36)])
+
+C = ctilde()
+lH = C.prop2tran(a='theta',b='phi',Ta=Ta,Tb=lTb,Friis=False)
+assert len(lH) == 36
+assert not C.islocal
+
+for k,Tb in enumerate(lTb):
+    C = ctilde()
+    C.locbas(Tt=Ta,Tr=Tb)
+    H = C.prop2tran(a='theta',b='phi',Friis=False)
+    np.testing.assert_allclose(lH[k].y,H.y,atol=1e-12)
@@ -0,0 +1,40 @@
+from pylayers.gis.layout import *
+from pylayers.antprop.signature import *
+from pylayers.antprop.rays import *
+import numpy as np
+print "======================="
+print " start test_rays_chunk.py (Rays.eval by frequency chunks) "
+print "======================="
+L = Layout('defstr.ini')
+a = np.array([759,1114,1.0])
+b = np.array([767,1114,1.5])
+ca = L.pt2cy(a)
+cb = L.pt2cy(b)
+Si = Signatures(L,ca,cb,cutoff=3)
+Si.run7(cutoff=3,algo='old',diffraction=False,threshold=0.1,progress=False)
+r2d = Si.rays(a,b)
+R = r2d.to3D(L,H=L.maxheight,N=1)
+R.locbas(L)
+R.fillinter(L)
+fGHz = np.arange(2,11,0.1)
+nf = len(fGHz)
+C = R.eval(fGHz)
+print "nray : ",R.nray," nf : ",nf
+assert np.all(np.isfinite(C.Ctt.y))
+#
+# chunk sizes : 1, a divisor of nf, chunks dividing neither nf nor the
+# number of rays, nf, a chunk larger than nf and the number of rays
+#
+for k in [1,15,7,13,nf-1,nf,2*nf,R.nray]:
+    Ck = R.eval(fGHz,chunk=k)
+    for C0,C1 in [(C.Ctt,Ck.Ctt),(C.Ctp,Ck.Ctp),
+                  (C.Cpt,Ck.Cpt),(C.Cpp,Ck.Cpp)]:
+        assert C1.y.shape==C0.y.shape
+        np.testing.assert_allclose(C1.y,C0.y,rtol=1e-12,atol=1e-15)
+    np.testing.assert_equal(Ck.tauk,C.tauk)
+    np.testing.assert_equal(Ck.tang,C.tang)
+    np.testing.assert_equal(Ck.rang,C.rang)
+    print "chunk ",k," : ok"
+print "======================="
+print " stop test_rays_chunk.py (Rays.eval by frequency chunks) "
+print "======================="
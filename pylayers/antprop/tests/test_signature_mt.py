@@ -0,0 +1,29 @@
+import time
+import numpy as np
+from pylayers.gis.layout import Layout
+from pylayers.antprop.signature import *
+
+L = Layout('defstr.ini')
+L.build()
+
+tx = np.array([759,1114,1.0])
+rx = np.array([767,1114,1.5])
+ctx = L.pt2cy(tx)
+crx = L.pt2cy(rx)
+
+S1 = Signatures(L,ctx,crx)
+tic = time.time()
+S1.run7(cutoff=5,diffraction=True)
+print "run7   : ",time.time()-tic
+
+#
+# process pool version must give the same signatures in the same order
+#
+S2 = Signatures(L,ctx,crx)
+tic = time.time()
+S2.run7mt(cutoff=5,diffraction=True,nproc=4)
+print "run7mt : ",time.time()-tic
+
+assert sorted(S1.keys())==sorted(S2.keys())
+for k in S1:
+    np.testing.assert_equal(S1[k],S2[k])
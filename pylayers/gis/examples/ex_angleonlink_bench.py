@@ -0,0 +1,74 @@
+#
+# Benchmark of the segment index used by Layout.angleonlink
+#
+# A segment index with a cell larger than the layout is a single cell index,
+# which is equivalent to the former brute force scan over all segments.
+#
+import time
+import numpy as np
+import networkx as nx
+from pylayers.gis.layout import Layout
+
+def synthetic(L,nr,width=4.):
+    """ replace the structure of L by a grid of nr x nr rooms
+    """
+    L.Gs = nx.Graph()
+    L.Gs.pos = {}
+    L.name = {}
+    for k in L.sl.keys():
+        L.name[k] = []
+    x = np.arange(nr+1)*width
+    num = lambda i,j : -(i*(nr+1)+j+1)
+    for i in range(nr+1):
+        for j in range(nr+1):
+            L.Gs.add_node(num(i,j))
+            L.Gs.pos[num(i,j)] = (x[i],x[j])
+    ns = 1
+    for i in range(nr+1):
+        for j in range(nr):
+            for (n1,n2) in [(num(i,j),num(i,j+1)),(num(j,i),num(j+1,i))]:
+                L.Gs.add_node(ns,name='PARTITION',z=(0.,3.),offset=0,
+                              transition=False,connect=[n1,n2])
+                L.Gs.pos[ns] = tuple((np.array(L.Gs.pos[n1])+np.array(L.Gs.pos[n2]))/2.)
+                L.Gs.add_edge(n1,ns)
+                L.Gs.add_edge(ns,n2)
+                L.name['PARTITION'].append(ns)
+                ns = ns + 1
+    L.Np = (nr+1)**2
+    L.Ns = ns-1
+    L.Nss = 0
+    L.g2npy()
+    return(L)
+
+def bench(L,nlink=2000):
+    """ time angleonlink with and without segment index
+    """
+    xmin,ymin = np.min(L.pt,axis=1)
+    xmax,ymax = np.max(L.pt,axis=1)
+    p1 = np.vstack((xmin+(xmax-xmin)*np.random.rand(nlink),
+                    ymin+(ymax-ymin)*np.random.rand(nlink)))
+    p2 = np.vstack((xmin+(xmax-xmin)*np.random.rand(nlink),
+                    ymin+(ymax-ymin)*np.random.rand(nlink)))
+    # brute force : a single cell
+    L._buildsgi(step=1e9)
+    t0 = time.time()
+    d0 = L.angleonlink(p1,p2)
+    tb = time.time()-t0
+    # default index
+    L._buildsgi()
+    t0 = time.time()
+    d1 = L.angleonlink(p1,p2)
+    ti = time.time()-t0
+    assert (d0==d1).all()
+    return(tb,ti)
+
+np.random.seed(0)
+
+L = Layout('WHERE1.ini')
+tb,ti = bench(L)
+print 'WHERE1.ini      Ns = %5d  brute : %.3f s  index : %.3f s  speedup : %.1f' % (L.Ns,tb,ti,tb/ti)
+
+for nr in [5,10,20,40]:
+    L = synthetic(Layout('defstr.ini'),nr)
+    tb,ti = bench(L)
+    print 'grid %2dx%2d rooms Ns = %5d  brute : %.3f s  index : %.3f s  speedup : %.1f' % (nr,nr,L.Ns,tb,ti,tb/ti)
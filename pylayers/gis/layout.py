@@ -175,6 +175,7 @@ Building Graphs
     Layout.buildGv
     Layout.buildGi
     Layout.outputGi
+    Layout.csrGi
     Layout.waypointGw
     Layout.builGr2
     Layout.buildGr
@@ -235,6 +236,8 @@ import copy
 import glob
 import pickle
 import cPickle
+import hashlib
+import multiprocessing as mp
 import ConfigParser
 import numpy as np
 import numpy.random as rd
@@ -246,6 +249,7 @@ import random
 import matplotlib.pyplot as plt
 import matplotlib.colors as clr
 import networkx as nx
+import h5py
 from networkx.readwrite import write_gpickle,read_gpickle
 import shapely.geometry as sh
 from shapely.ops import cascaded_union
@@ -287,6 +291,21 @@ try:
 except:
     print 'Layout:Mayavi is not installed'
 
+# version of the build cache format (see Layout.dumpw)
+_dumpversion = 1
+# g2npy arrays stored in the build cache
+_dumparrays = ['pt','tahe','tsg','tgs','upnt','iupnt','pg','normal',
+               'sla','offset','stridess']
+
+# layout and context shared with the buildGv workers
+_gv = None
+
+def _cycleGv(icycle):
+    """ buildGv worker : visibility edges of cycle icycle
+    """
+    L,air,ldiff = _gv
+    return(L._cycleGv(icycle,air,ldiff))
+
 
 class Layout(PyLayers):
     """ Handling Layout
@@ -707,6 +726,7 @@ class Layout(PyLayers):
         self.tgs
         self.dca  : dictionnary of cycle with an airwall
         self.lsss : list of subsegments
+        self.sgi_ptr, self.sgi_seg : uniform grid index of segments
 
         assert self.pt[self.iupnt[-1]] == self.pt[:,self.iupnt[-1]]
 
@@ -907,6 +927,7 @@ class Layout(PyLayers):
         self.maxheight = np.max([v[1] for v in nx.get_node_attributes(self.Gs,'z').values()])
 
         self.extrseg()
+        self._buildsgi()
 
     def loadosm(self, _fileosm):
         """ load layout from an osm file format
@@ -3478,47 +3499,21 @@ class Layout(PyLayers):
         # 3 x N
         un = u / nu[np.newaxis,:]
 
-        seglist = self.seginframe2(p1[0:2], p2[0:2])
-
-        upos = np.nonzero(seglist>=0)[0]
-        uneg = np.nonzero(seglist<0)[0]
-
-        nNLOS = len(uneg)+1
-        # retrieve the number of segments per link
-        if nNLOS>1:
-            llink = np.hstack((uneg[0],np.hstack((uneg[1:],array([len(seglist)])))-uneg-1))
-        else:
-            llink = np.array([len(seglist)])
-        # [(link id,number of seg),...]
-        #nl = zip(np.arange(nlink),llink)
-
-        npta = self.tahe[0, seglist[upos]]
-        nphe = self.tahe[1, seglist[upos]]
-
-        Pta = self.pt[:, npta]
-        Phe = self.pt[:, nphe]
+        # candidate segments : segments of the index cells crossed by links
+        ilink,iseg = self._segonlink(p1[0:2], p2[0:2])
+        # frame condition as in seginframe2
+        bo = self._segframe(p1[0:2], p2[0:2],ilink,iseg)
+        ilink = ilink[bo]
+        iseg = iseg[bo]
 
-        #
-        # This part should possibly be improved
-        #
-
-        for i,nl in enumerate(llink):
-            try:
-                P1 = np.hstack((P1,np.outer(p1[:,i],np.ones(nl))))
-                P2 = np.hstack((P2,np.outer(p2[:,i],np.ones(nl))))
-                ilink = np.hstack((ilink,array([-1]),i*np.ones(nl,dtype='int')))
-            except:
-                P1 = np.outer(p1[:,i],np.ones(nl))
-                P2 = np.outer(p2[:,i],np.ones(nl))
-                ilink = i*np.ones(nl,dtype='int')
+        Pta = self.pt[:, self.tahe[0, iseg]]
+        Phe = self.pt[:, self.tahe[1, iseg]]
 
         # check for intersection P1P2 PtaPhe
-        bo = geu.intersect(P1, P2, Pta, Phe)
-
-        upos_intersect = upos[bo]
+        bo = geu.intersect(p1[0:2,ilink], p2[0:2,ilink], Pta, Phe)
 
-        seglist2 = seglist[upos_intersect]
-        idxlnk = ilink[upos_intersect]
+        seglist2 = iseg[bo]
+        idxlnk = ilink[bo]
 
         #
         # Calculate angle of incidence refered from segment normal
@@ -3531,7 +3526,7 @@ class Layout(PyLayers):
         angle = np.arccos(unn)
 
         # seglist = seglist+1
-        seglist = np.array(map(lambda x : self.tsg[x],seglist2))
+        seglist = self.tsg[seglist2]
         data = np.zeros(len(seglist),dtype=[('i','i8'),('s','i8'),('a',np.float32)])
 
         #
@@ -3541,7 +3536,7 @@ class Layout(PyLayers):
         # self.lsss
         # self.stridess
         #
-        sseglist = map(lambda x: self.stridess[x]+1 if x in self.lsss else x,seglist)
+        sseglist = np.where(np.in1d(seglist,self.lsss),self.stridess[seglist]+1,seglist)
 
         data['i'] = idxlnk
         data['s'] = sseglist
@@ -3603,46 +3598,21 @@ class Layout(PyLayers):
         # 2 x N
         un = u / nu[np.newaxis,:]
 
-        seglist = self.seginframe2(p1, p2)
+        # candidate segments : segments of the index cells crossed by links
+        ilink,iseg = self._segonlink(p1, p2)
+        # frame condition as in seginframe2
+        bo = self._segframe(p1, p2,ilink,iseg)
+        ilink = ilink[bo]
+        iseg = iseg[bo]
 
-        upos = np.nonzero(seglist>=0)[0]
-        uneg = np.nonzero(seglist<0)[0]
+        Pta = self.pt[:, self.tahe[0, iseg]]
+        Phe = self.pt[:, self.tahe[1, iseg]]
 
-        nNLOS = len(uneg)+1
-        # retrieve the number of segments per link
-        if nNLOS>1:
-            llink = np.hstack((uneg[0],np.hstack((uneg[1:],array([len(seglist)])))-uneg-1))
-        else:
-            llink = np.array([len(seglist)])
-        # [(link id,number of seg),...]
-        #nl = zip(np.arange(nlink),llink)
-
-        npta = self.tahe[0, seglist[upos]]
-        nphe = self.tahe[1, seglist[upos]]
-
-        Pta = self.pt[:, npta]
-        Phe = self.pt[:, nphe]
-
-        #
-        # This part should possibly be improved
-        #
-
-        for i,nl in enumerate(llink):
-            try:
-                P1 = np.hstack((P1,np.outer(p1[:,i],np.ones(nl))))
-                P2 = np.hstack((P2,np.outer(p2[:,i],np.ones(nl))))
-                ilink = np.hstack((ilink,array([-1]),i*np.ones(nl,dtype='int')))
-            except:
-                P1 = np.outer(p1[:,i],np.ones(nl))
-                P2 = np.outer(p2[:,i],np.ones(nl))
-                ilink = i*np.ones(nl,dtype='int')
-
-        bo = geu.intersect(P1, P2, Pta, Phe)
-
-        upos_intersect = upos[bo]
+        # check for intersection P1P2 PtaPhe
+        bo = geu.intersect(p1[0:2,ilink], p2[0:2,ilink], Pta, Phe)
 
-        seglist2 = seglist[upos_intersect]
-        idxlnk = ilink[upos_intersect]
+        seglist2 = iseg[bo]
+        idxlnk = ilink[bo]
 
         #
         # Calculate angle of incidence refered from segment normal
@@ -3655,7 +3625,7 @@ class Layout(PyLayers):
         angle = np.arccos(unn)
 
         # seglist = seglist+1
-        seglist = np.array(map(lambda x : self.tsg[x],seglist2))
+        seglist = self.tsg[seglist2]
         data = np.zeros(len(seglist),dtype=[('i','i8'),('s','i8'),('a',np.float32)])
 
         #
@@ -3665,7 +3635,7 @@ class Layout(PyLayers):
         # self.lsss
         # self.stridess
         #
-        sseglist = map(lambda x: self.stridess[x]+1 if x in self.lsss else x,seglist)
+        sseglist = np.where(np.in1d(seglist,self.lsss),self.stridess[seglist]+1,seglist)
 
         data['i'] = idxlnk
         data['s'] = sseglist
@@ -3958,12 +3928,268 @@ class Layout(PyLayers):
         # 2 x Np
         pt   = self.pt
         # tahe 2 x Nseg
-        th  = zip(self.tahe[0,:],self.tahe[1,:])
+        pta = pt[:,self.tahe[0,:]]
+        phe = pt[:,self.tahe[1,:]]
+
+        self.max_sx = np.maximum(pta[0,:],phe[0,:])
+        self.min_sx = np.minimum(pta[0,:],phe[0,:])
+        self.max_sy = np.maximum(pta[1,:],phe[1,:])
+        self.min_sy = np.minimum(pta[1,:],phe[1,:])
 
-        self.max_sx = np.array(map(lambda x : max(pt[0,x[0]],pt[0,x[1]]), th))
-        self.min_sx = np.array(map(lambda x : min(pt[0,x[0]],pt[0,x[1]]), th))
-        self.max_sy = np.array(map(lambda x : max(pt[1,x[0]],pt[1,x[1]]), th))
-        self.min_sy = np.array(map(lambda x : min(pt[1,x[0]],pt[1,x[1]]), th))
+    def _buildsgi(self,step=0):
+        """ build the uniform grid index of segments
+
+        Parameters
+        ----------
+
+        step : float
+            cell size (meters). Default (0) chooses a cell size such that
+            there is about one cell per segment.
+
+        Notes
+        -----
+
+        This function updates the following members
+
+            `sgi_o`   : (2,) origin of the grid
+            `sgi_h`   : cell size
+            `sgi_n`   : (2,) number of cells along x and y
+            `sgi_ptr` : (ncell+1) pointer of each cell in `sgi_seg`
+            `sgi_seg` : segment index (numpy numbering) sorted by cell
+
+        A segment is stored in every cell overlapped by its bounding box.
+        Cell (ix,iy) has index ix*ny+iy and its segments are
+        sgi_seg[sgi_ptr[k]:sgi_ptr[k+1]].
+
+        The index is rebuilt by `g2npy` and used by `seginframe2`,
+        `angleonlink` and `angleonlink3`. A step larger than the layout
+        extension gives a single cell, which is equivalent to the brute
+        force scan over all segments.
+
+        """
+        Ns = np.shape(self.tahe)[1]
+        # tolerance (meters) below the layout precision (mm)
+        self.sgi_tol = 1e-4
+        tol = self.sgi_tol
+
+        if Ns == 0:
+            self.sgi_o = np.zeros(2)
+            self.sgi_h = 1.
+            self.sgi_n = np.array([1,1])
+            self.sgi_ptr = np.zeros(2,dtype=int)
+            self.sgi_seg = np.array([],dtype=int)
+            return
+
+        pmin = np.array([np.min(self.min_sx),np.min(self.min_sy)]) - tol
+        pmax = np.array([np.max(self.max_sx),np.max(self.max_sy)]) + tol
+        ext = pmax - pmin
+
+        if step > 0:
+            h = float(step)
+        else:
+            h = np.sqrt(ext[0]*ext[1]/Ns)
+            h = max(h,np.max(ext)/Ns)
+
+        n = np.maximum(np.ceil(ext/h).astype(int),1)
+
+        self.sgi_o = pmin
+        self.sgi_h = h
+        self.sgi_n = n
+
+        # cell range of segment bounding boxes
+        ix0 = np.clip(np.floor((self.min_sx-tol-pmin[0])/h).astype(int),0,n[0]-1)
+        ix1 = np.clip(np.floor((self.max_sx+tol-pmin[0])/h).astype(int),0,n[0]-1)
+        iy0 = np.clip(np.floor((self.min_sy-tol-pmin[1])/h).astype(int),0,n[1]-1)
+        iy1 = np.clip(np.floor((self.max_sy+tol-pmin[1])/h).astype(int),0,n[1]-1)
+
+        useg,cell = self._sgiexpand(ix0,ix1,iy0,iy1)
+
+        # sort (segment,cell) pairs by cell
+        order = np.argsort(cell,kind='mergesort')
+        ncell = n[0]*n[1]
+        count = np.bincount(cell,minlength=ncell)
+        self.sgi_ptr = np.hstack((0,np.cumsum(count)))
+        self.sgi_seg = useg[order]
+
+    def _sgiexpand(self,ix0,ix1,iy0,iy1):
+        """ expand ranges of cells into (item,cell) pairs
+
+        Parameters
+        ----------
+
+        ix0,ix1 : np.array (N,)
+            first and last cell along x (included)
+        iy0,iy1 : np.array (N,)
+            first and last cell along y (included)
+
+        Returns
+        -------
+
+        item : np.array
+            index of the range in [0,N)
+        cell : np.array
+            cell index ix*ny+iy
+
+        """
+        nxc = ix1 - ix0 + 1
+        nyc = iy1 - iy0 + 1
+        cnt = nxc*nyc
+        item = np.repeat(np.arange(len(cnt)),cnt)
+        # position inside each range
+        k = np.arange(np.sum(cnt)) - np.repeat(np.cumsum(cnt)-cnt,cnt)
+        cx = ix0[item] + k % nxc[item]
+        cy = iy0[item] + k // nxc[item]
+        cell = cx*self.sgi_n[1] + cy
+        return(item,cell)
+
+    def _sgigather(self,ilink,cell):
+        """ gather segments of (link,cell) pairs
+
+        Parameters
+        ----------
+
+        ilink : np.array
+            link index
+        cell : np.array
+            cell index
+
+        Returns
+        -------
+
+        ilink : np.array
+            link index (sorted)
+        iseg : np.array
+            segment index (numpy numbering) sorted for each link
+
+        Notes
+        -----
+
+        (link,segment) duplicates are removed.
+
+        """
+        Ns = np.shape(self.tahe)[1]
+        start = self.sgi_ptr[cell]
+        cnt = self.sgi_ptr[cell+1] - start
+        ipair = np.repeat(np.arange(len(cnt)),cnt)
+        k = np.arange(np.sum(cnt)) - np.repeat(np.cumsum(cnt)-cnt,cnt)
+        iseg = self.sgi_seg[start[ipair]+k]
+        key = np.unique(ilink[ipair]*Ns + iseg)
+        return(key // Ns, key % Ns)
+
+    def _segonlink(self,p1,p2):
+        """ candidate segments of a set of links
+
+        Parameters
+        ----------
+
+        p1 : np.array (2 x N)
+        p2 : np.array (2 x N)
+
+        Returns
+        -------
+
+        ilink : np.array
+            link index (sorted)
+        iseg : np.array
+            segment index (numpy numbering) sorted for each link
+
+        Notes
+        -----
+
+        The candidates are the segments stored in the cells of the segment
+        index which are crossed by the link. The link is first clipped to the
+        grid, then the parameters of its crossings with the grid lines are
+        sorted and the middle of two consecutive crossings gives one crossed
+        cell. Any segment intersecting a link belongs to its candidates.
+
+        """
+        N = np.shape(p1)[1]
+        h = self.sgi_h
+        n = self.sgi_n
+        # grid coordinates
+        a = (p1 - self.sgi_o[:,np.newaxis])/h
+        b = (p2 - self.sgi_o[:,np.newaxis])/h
+        d = b - a
+
+        #
+        # clip links to the grid [0,nx]x[0,ny]
+        #
+        t0 = np.zeros(N)
+        t1 = np.ones(N)
+        valid = np.ones(N,dtype=bool)
+        for j in range(2):
+            null = (d[j,:] == 0)
+            valid = valid & ~(null & ((a[j,:]<0) | (a[j,:]>n[j])))
+            dj = np.where(null,1.,d[j,:])
+            ta = np.where(null,-np.inf,(0-a[j,:])/dj)
+            tb = np.where(null,np.inf,(n[j]-a[j,:])/dj)
+            t0 = np.maximum(t0,np.minimum(ta,tb))
+            t1 = np.minimum(t1,np.maximum(ta,tb))
+        valid = valid & (t0<=t1)
+
+        ul = np.nonzero(valid)[0]
+        a, d = a[:,ul], d[:,ul]
+        t0, t1 = t0[ul], t1[ul]
+        ca = a + t0*d
+        cb = a + t1*d
+
+        #
+        # parameters of the crossings with the grid lines
+        #
+        lt = [t0,t1]
+        li = [np.arange(len(ul)),np.arange(len(ul))]
+        for j in range(2):
+            lo = np.floor(np.minimum(ca[j,:],cb[j,:])).astype(int) + 1
+            hi = np.ceil(np.maximum(ca[j,:],cb[j,:])).astype(int) - 1
+            cnt = np.maximum(hi-lo+1,0)
+            il = np.repeat(np.arange(len(ul)),cnt)
+            k = lo[il] + np.arange(np.sum(cnt)) - np.repeat(np.cumsum(cnt)-cnt,cnt)
+            lt.append((k-a[j,il])/d[j,il])
+            li.append(il)
+        t = np.hstack(lt)
+        il = np.hstack(li)
+        order = np.lexsort((t,il))
+        t = t[order]
+        il = il[order]
+
+        # middle of two consecutive crossings of the same link
+        same = np.nonzero(il[1:]==il[:-1])[0]
+        il = il[same]
+        tm = 0.5*(t[same]+t[same+1])
+        pm = a[:,il] + tm*d[:,il]
+        cx = np.clip(np.floor(pm[0,:]).astype(int),0,n[0]-1)
+        cy = np.clip(np.floor(pm[1,:]).astype(int),0,n[1]-1)
+        cell = cx*n[1] + cy
+
+        return(self._sgigather(ul[il],cell))
+
+    def _segframe(self,p1,p2,ilink,iseg):
+        """ keep candidate segments inside the frame of their link
+
+        Parameters
+        ----------
+
+        p1 : np.array (2 x N)
+        p2 : np.array (2 x N)
+        ilink : np.array
+        iseg : np.array
+
+        Returns
+        -------
+
+        boolean array
+
+        """
+        min_x = np.minimum(p1[0,ilink],p2[0,ilink])
+        max_x = np.maximum(p1[0,ilink],p2[0,ilink])
+        min_y = np.minimum(p1[1,ilink],p2[1,ilink])
+        max_y = np.maximum(p1[1,ilink],p2[1,ilink])
+
+        bo = ((self.max_sx[iseg] > min_x) &
+              (self.min_sx[iseg] < max_x) &
+              (self.max_sy[iseg] > min_y) &
+              (self.min_sy[iseg] < max_y))
+        return(bo)
 
     def seginframe2(self, p1, p2):
         """ returns the seg list of a given zone defined by two points
@@ -4017,24 +4243,38 @@ class Layout(PyLayers):
         # max_sy > min_y
         # min_sy < max_y
 
+        N = np.shape(p1)[1]
+        h = self.sgi_h
+        n = self.sgi_n
+        o = self.sgi_o
 
         # N x 1
 
-        max_x = map(lambda x : max(x[1],x[0]),zip(p1[0,:], p2[0,:]))
-        min_x = map(lambda x : min(x[1],x[0]),zip(p1[0,:], p2[0,:]))
-        max_y = map(lambda x : max(x[1],x[0]),zip(p1[1,:], p2[1,:]))
-        min_y = map(lambda x : min(x[1],x[0]),zip(p1[1,:], p2[1,:]))
+        min_x = np.minimum(p1[0,:],p2[0,:])
+        max_x = np.maximum(p1[0,:],p2[0,:])
+        min_y = np.minimum(p1[1,:],p2[1,:])
+        max_y = np.maximum(p1[1,:],p2[1,:])
 
-        seglist = map(lambda x : np.nonzero( (self.max_sx > x[0]) &
-                                         (self.min_sx < x[1]) &
-                                         (self.max_sy > x[2]) &
-                                         (self.min_sy < x[3]) )[0],
-                                         zip(min_x,max_x,min_y,max_y))
+        #
+        # only the segments of the cells overlapping the frame are tested
+        #
+        ix0 = np.clip(np.floor((min_x-o[0])/h).astype(int),0,n[0]-1)
+        ix1 = np.clip(np.floor((max_x-o[0])/h).astype(int),0,n[0]-1)
+        iy0 = np.clip(np.floor((min_y-o[1])/h).astype(int),0,n[1]-1)
+        iy1 = np.clip(np.floor((max_y-o[1])/h).astype(int),0,n[1]-1)
+
+        ilink,cell = self._sgiexpand(ix0,ix1,iy0,iy1)
+        ilink,iseg = self._sgigather(ilink,cell)
+
+        bo = self._segframe(p1,p2,ilink,iseg)
+        ilink = ilink[bo]
+        iseg = iseg[bo]
 
         # np.array stacking
         # -1 acts as a deliminiter (not a segment number)
 
-        seglist = reduce(lambda x,y : np.hstack((x,array([-1]),y)),seglist)
+        seglist = -np.ones(len(iseg)+N-1,dtype=int)
+        seglist[np.arange(len(iseg))+ilink] = iseg
 
         return(seglist)
 
@@ -5023,47 +5263,242 @@ class Layout(PyLayers):
             self.saveini(f[0] +'.ini')
 
 
+    def _dumpfile(self):
+        """ name of the build cache file of the layout
+
+        The build cache is stored under the struc/gpickle directory
+        of the project as <layout file name>.h5
+
+        """
+        return(pyu.getlong(self.filename+'.h5',pstruc['DIRPICKLE']))
+
+    def _dumpkey(self):
+        """ content hash of the layout source files
+
+        Returns
+        -------
+
+        key : string
+            sha1 of the layout file, of the slab and material
+            databases and of the cache format version
+
+        """
+        root,ext = os.path.splitext(self.filename)
+        if ext == '.ini':
+            dirlay = pstruc['DIRINI']
+        elif ext == '.osm':
+            dirlay = pstruc['DIROSM']
+        else:
+            dirlay = pstruc['DIRSTRUC']
+        lfile = [pyu.getlong(self.filename,dirlay),
+                 pyu.getlong(self.fileslabini,pstruc['DIRSLAB']),
+                 pyu.getlong(self.filematini,pstruc['DIRMAT'])]
+        h = hashlib.sha1(str(_dumpversion))
+        for filename in lfile:
+            h.update(os.path.basename(filename))
+            if os.path.isfile(filename):
+                fd = open(filename,'rb')
+                h.update(fd.read())
+                fd.close()
+        return(h.hexdigest())
+
     def dumpw(self):
-        """ write a dump of given Graph
+        """ write the build cache of the layout
 
         Notes
         -----
 
-        't' : Gt
-        'c' : Gc
-        'r' : Gr
-        's' : Gs
-        'v' : Gv
-        'i' : Gi
+        All the built graphs (lbltg) are saved in a single file
+        struc/gpickle/<layout file name>.h5 together with the
+        arrays of g2npy.
 
-        """
-        # create layout directory
-        path = os.path.join(basename,'struc','gpickle',self.filename)
-        if not os.path.isdir(path):
-           os.mkdir(path)
-        for g in self.lbltg:
-            try:
-                if g in ['v','i']:
-                    gname1 ='G'+g
-                    write_gpickle(getattr(self,gname1),os.path.join(basename,'struc','gpickle','G'+g+'_'+self.filename+'.gpickle'))
-                else:
-                    gname='G'+g
-                    write_gpickle(getattr(self,gname),os.path.join(path,'G'+g+'.gpickle'))
-            except:
-                raise NameError('G'+g+' graph cannot be saved, probably because it has not been built')
-        # save dictionnary which maps string interaction to [interactionnode, interaction type]
-        if 't' in self.lbltg:
-            write_gpickle(getattr(self,'ldiffin'),os.path.join(path,'ldiffin.gpickle'))
-            write_gpickle(getattr(self,'ldiffout'),os.path.join(path,'ldiffout.gpickle'))
-        write_gpickle(getattr(self,'dca'),os.path.join(path,'dca.gpickle'))
+        'v' : Gv is stored as an (Ne x 2) array of edges
+        'i' : Gi is stored in a compressed sparse row form
+              (node table, adjacency, outputs and probabilities)
+        't','r','w','c' : Gt,Gr,Gw,Gc (which embed geometric objects) are
+              stored as pickled byte arrays as well as dca, ldiffin and
+              ldiffout
+
+        The file is tagged with a content hash of the layout file and of
+        the slab and material databases (see `_dumpkey`). `dumpr`
+        refuses a file whose hash does not match, hence the cache is
+        invalidated as soon as the source layout changes.
+
+        The file is first written under a temporary name and then renamed,
+        so that processes reading the cache never see a partial file.
+
+        See Also
+        --------
 
+        dumpr
 
+        """
+        # the key is the hash of the saved ini file
         root,ext = os.path.splitext(self.filename)
         if ext == '.ini':
             self.saveini(self.filename)
 
-    def dumpr(self):
-        """ read a dump of given Graph
+        filename = self._dumpfile()
+        path = os.path.dirname(filename)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+        lg = [ g for g in 'tcvirw' if g in self.lbltg ]
+        for g in lg:
+            if not hasattr(self,'G'+g):
+                raise NameError('G'+g+' graph cannot be saved, probably because it has not been built')
+
+        filetmp = filename + '.' + str(os.getpid())
+        f = h5py.File(filetmp,'w')
+        try:
+            f.attrs['version'] = _dumpversion
+            f.attrs['key'] = self._dumpkey()
+            f.attrs['lbltg'] = ''.join(lg)
+            #
+            # g2npy arrays
+            #
+            ga = f.create_group('g2npy')
+            for k in _dumparrays:
+                if hasattr(self,k):
+                    ga.create_dataset(k,data=np.asarray(getattr(self,k)))
+            #
+            # Gv : array of edges
+            #
+            if 'v' in lg:
+                edges = np.array(self.Gv.edges(),dtype=int).reshape(-1,2)
+                f.create_group('Gv').create_dataset('edges',data=edges)
+            #
+            # Gi : CSR form
+            #
+            if 'i' in lg:
+                self._dumpGi(f.create_group('Gi'))
+            #
+            # other graphs and dictionnaries : pickled byte arrays
+            #
+            gp = f.create_group('pickle')
+            lp = [ 'G'+g for g in lg if g not in 'vi' ]
+            lp = lp + [ k for k in ['ldiffin','ldiffout','dca'] if hasattr(self,k) ]
+            for k in lp:
+                s = cPickle.dumps(getattr(self,k),2)
+                gp.create_dataset(k,data=np.frombuffer(s,dtype=np.uint8))
+        finally:
+            f.close()
+        os.rename(filetmp,filename)
+
+    def _dumpGi(self,grp):
+        """ write Gi in CSR form in an h5 group
+
+        Parameters
+        ----------
+
+        grp : h5py group
+
+        Notes
+        -----
+
+        node  : (Ni x 3) interaction tuples padded with 0
+        nlen  : (Ni) length of the tuples (1 : D , 2 : R , 3 : T)
+        pos   : (Ni x 2) position of the interactions
+        ptr   : (Ni+1) edges of node k are adj[ptr[k]:ptr[k+1]]
+        adj   : (Ne) target node of the edges
+        iout  : (Ne) 1 if the edge has an output field
+        optr  : (Ne+1) outputs of edge e are onode[optr[e]:optr[e+1]]
+        onode : output nodes
+        oprob : output probabilities
+
+        """
+        Gi = self.Gi
+        lnode = Gi.nodes()
+        did = { n:k for k,n in enumerate(lnode) }
+        ni = len(lnode)
+
+        node = np.zeros((ni,3),dtype=int)
+        nlen = np.zeros(ni,dtype=int)
+        pos = np.zeros((ni,2))
+        ptr = np.zeros(ni+1,dtype=int)
+        adj = []
+        iout = []
+        optr = [0]
+        onode = []
+        oprob = []
+        for k,n in enumerate(lnode):
+            nlen[k] = len(n)
+            node[k,:len(n)] = n
+            if n in Gi.pos:
+                pos[k,:] = Gi.pos[n][0:2]
+            for m,d in Gi[n].iteritems():
+                adj.append(did[m])
+                if 'output' in d:
+                    iout.append(1)
+                    for o,p in d['output'].iteritems():
+                        onode.append(did[o])
+                        oprob.append(p)
+                else:
+                    iout.append(0)
+                optr.append(len(onode))
+            ptr[k+1] = len(adj)
+
+        grp.create_dataset('node',data=node)
+        grp.create_dataset('nlen',data=nlen)
+        grp.create_dataset('pos',data=pos)
+        grp.create_dataset('ptr',data=ptr)
+        grp.create_dataset('adj',data=np.array(adj,dtype=int))
+        grp.create_dataset('iout',data=np.array(iout,dtype=np.int8))
+        grp.create_dataset('optr',data=np.array(optr,dtype=int))
+        grp.create_dataset('onode',data=np.array(onode,dtype=int))
+        grp.create_dataset('oprob',data=np.array(oprob,dtype=float))
+
+    def _loadGi(self,grp):
+        """ rebuild Gi from its CSR form
+
+        Parameters
+        ----------
+
+        grp : h5py group
+
+        See Also
+        --------
+
+        _dumpGi
+
+        """
+        node = grp['node'][...].tolist()
+        nlen = grp['nlen'][...].tolist()
+        pos = grp['pos'][...].tolist()
+        ptr = grp['ptr'][...].tolist()
+        adj = grp['adj'][...].tolist()
+        iout = grp['iout'][...].tolist()
+        optr = grp['optr'][...].tolist()
+        onode = grp['onode'][...].tolist()
+        oprob = grp['oprob'][...].tolist()
+
+        lnode = [ tuple(n[:l]) for n,l in zip(node,nlen) ]
+
+        Gi = nx.DiGraph()
+        Gi.add_nodes_from(lnode)
+        Gi.pos = dict(zip(lnode,map(tuple,pos)))
+        ledges = []
+        for k,n in enumerate(lnode):
+            for e in range(ptr[k],ptr[k+1]):
+                if iout[e]:
+                    io = range(optr[e],optr[e+1])
+                    dout = { lnode[onode[i]]:oprob[i] for i in io }
+                    ledges.append((n,lnode[adj[e]],{'output':dout}))
+                else:
+                    ledges.append((n,lnode[adj[e]],{}))
+        Gi.add_edges_from(ledges)
+        self.Gi = Gi
+
+    def dumpr(self,mmap=False):
+        """ read the build cache of the layout
+
+        Parameters
+        ----------
+
+        mmap : boolean
+            if True the g2npy arrays are memory mapped (copy on write)
+            from the cache file, so that processes loading the same layout
+            share the same pages.
 
         Notes
         -----
@@ -5074,25 +5509,51 @@ class Layout(PyLayers):
             'v' : Gv
             'i' : Gi
 
+        The cache file is stored under the struc/gpickle directory of the
+        project specified by the $BASENAME environment variable.
 
-        .gpickle files are store under the struc directory of the project
-        specified by the $BASENAME environment variable
+        A NameError is raised if the cache file has been built from a
+        different version of the layout file, slab or material databases.
+        If there is no cache file, the former per graph .gpickle
+        dump is read.
+
+        See Also
+        --------
+
+        dumpw
 
         """
-        graphs=['t','c','v','i','r','w']
-        path = os.path.join(basename,'struc','gpickle',self.filename)
-        for g in graphs:
+        filename = self._dumpfile()
+        if not os.path.isfile(filename):
+            self._dumpr_gpickle()
+        else:
+            f = h5py.File(filename,'r')
             try:
-                if g in ['v','i']:
-                    gname1 ='G'+g
-                    setattr(self, gname1, read_gpickle(os.path.join(basename,'struc','gpickle','G'+g+'_'+self.filename+'.gpickle')))
-                else:
-                    gname='G'+g
-                    setattr(self, gname,read_gpickle(os.path.join(path,'G'+g+'.gpickle')))
-                self.lbltg.extend(g)
-            except:
-                pass
-                #print 'G',g,' not saved'
+                if (f.attrs['version'] != _dumpversion) or \
+                   (f.attrs['key'] != self._dumpkey()):
+                    raise NameError('build cache of '+self.filename+' is out of date')
+                lg = list(f.attrs['lbltg'])
+                for k in f['g2npy']:
+                    ds = f['g2npy'][k]
+                    offset = None
+                    if mmap and ds.size > 0:
+                        offset = ds.id.get_offset()
+                    if offset is None:
+                        setattr(self,k,ds[...])
+                    else:
+                        setattr(self,k,np.memmap(filename,dtype=ds.dtype,
+                                                 mode='c',offset=offset,
+                                                 shape=ds.shape))
+                if 'v' in lg:
+                    self.Gv = nx.Graph()
+                    self.Gv.add_edges_from(f['Gv']['edges'][...].tolist())
+                if 'i' in lg:
+                    self._loadGi(f['Gi'])
+                for k in f['pickle']:
+                    setattr(self,k,cPickle.loads(f['pickle'][k][...].tostring()))
+            finally:
+                f.close()
+            self.lbltg.extend(lg)
 
         #
         # fixing bug #136
@@ -5122,10 +5583,32 @@ class Layout(PyLayers):
             if k>0:
                 if len(self.Gs.node[k]['ncycles'])==1:
                     self.Gs.node[k]['ncycles'].append(-1)
+
+    def _dumpr_gpickle(self):
+        """ read the former dump of the graphs (one .gpickle per graph)
+
+        .gpickle files are store under the struc directory of the project
+        specified by the $BASENAME environment variable
+
+        """
+        graphs=['t','c','v','i','r','w']
+        path = os.path.join(basename,'struc','gpickle',self.filename)
+        for g in graphs:
+            try:
+                if g in ['v','i']:
+                    gname1 ='G'+g
+                    setattr(self, gname1, read_gpickle(os.path.join(basename,'struc','gpickle','G'+g+'_'+self.filename+'.gpickle')))
+                else:
+                    gname='G'+g
+                    setattr(self, gname,read_gpickle(os.path.join(path,'G'+g+'.gpickle')))
+                self.lbltg.extend(g)
+            except:
+                pass
+                #print 'G',g,' not saved'
+
         # load dictionnary which maps string interaction to [interactionnode, interaction type]
-        if 't' in graphs :
-            setattr(self,'ldiffin', read_gpickle(os.path.join(path,'ldiffin.gpickle')))
-            setattr(self,'ldiffout', read_gpickle(os.path.join(path,'ldiffout.gpickle')))
+        setattr(self,'ldiffin', read_gpickle(os.path.join(path,'ldiffin.gpickle')))
+        setattr(self,'ldiffout', read_gpickle(os.path.join(path,'ldiffout.gpickle')))
         setattr(self,'dca', read_gpickle(os.path.join(path,'dca.gpickle')))
 
 
@@ -6080,7 +6563,7 @@ class Layout(PyLayers):
     #             self.Gw.add_edges_from(combinations(d, 2))
 
 
-    def buildGv(self, show=False):
+    def buildGv(self, show=False, nproc=1):
         """ build global visibility graph
 
         Parameters
@@ -6088,6 +6571,9 @@ class Layout(PyLayers):
 
         show : boolean
             default False
+        nproc : int
+            number of processes used over cycles (default 1 : sequential,
+            0 : number of cpu)
 
         Examples
         --------
@@ -6101,84 +6587,133 @@ class Layout(PyLayers):
         Notes
         -----
 
+        The visibility edges of each cycle are evaluated independently
+        by `_cycleGv`. They are gathered in a single (Ne x 2) array,
+        duplicated edges shared by adjascent cycles are removed and
+        the global graph Gv is built once from this array.
+
+        self.dGv[icycle] is the visibility graph of cycle icycle
+
+        See Also
+        --------
+
+        _cycleGv
 
         """
+        global _gv
+
+        lcy = [ cy for cy in self.Gt.node if cy > 0 ]
+        air = set(self.name['AIR'])
+        ldiff = (set(self.ldiffout),set(self.ldiffin))
+
+        if nproc == 0:
+            nproc = mp.cpu_count()
+        nproc = min(nproc,len(lcy))
+
+        if nproc > 1:
+            # workers are forked and share the layout
+            _gv = (self,air,ldiff)
+            pool = mp.Pool(nproc)
+            try:
+                ledges = pool.map(_cycleGv,lcy,
+                                  chunksize=max(1,len(lcy)/(4*nproc)))
+            finally:
+                pool.close()
+                pool.join()
+                _gv = None
+        else:
+            ledges = [ self._cycleGv(cy,air,ldiff) for cy in lcy ]
 
-        self.Gv = nx.Graph()
         #
-        # loop over cycles
+        # dict of Gv graph
         #
-        self.dGv = {}  # dict of Gv graph
+        self.dGv = {}
+        for icycle,edges in zip(lcy,ledges):
+            Gv = nx.Graph()
+            Gv.add_edges_from(edges)
+            self.dGv[icycle] = Gv
 
-        for icycle in self.Gt.node:
-            if icycle >0:
-                #print "cycle : ",icycle
-                indoor = self.Gt.node[icycle]['indoor']
-                isopen = self.Gt.node[icycle]['isopen']
+        #
+        # Graph Gv : unique edges of all cycles
+        #
+        self.Gv = nx.Graph()
+        if len(ledges) > 0:
+            edges = np.vstack(ledges)
+            if len(edges) > 0:
+                edges = np.sort(edges,axis=1)
+                edges = np.unique(edges,axis=0)
+                self.Gv.add_edges_from(edges.tolist())
 
-                polyg = self.Gt.node[icycle]['polyg']
-                vnodes = polyg.vnodes
+    def _cycleGv(self, icycle, air, ldiff):
+        """ visibility edges of a cycle
 
-                npt  = filter(lambda x : x<0,vnodes)
-                nseg = filter(lambda x : x>0,vnodes)
+        Parameters
+        ----------
 
-                airwalls = filter(lambda x : x in self.name['AIR'],nseg)
-                if indoor:
-                    ndiff = filter(lambda x : x in self.ldiffin,npt)
-                else:
-                    ndiff = filter(lambda x : x in self.ldiffout,npt)
-                #
-                # Create a graph
-                #
-                Gv = nx.Graph()
-                #
-                # in convex case :
-                #    i)  all segments see all segments
-                #    ii) all non adjascent valid diffraction points see each other
-                #    iii) all valid diffraction points see non adjascent
-                #    segments
-                #
-                for nk in combinations(nseg, 2):
-                    Gv.add_edge(nk[0],nk[1])
+        icycle : int
+            cycle number (>0)
+        air : set
+            airwall segments
+        ldiff : tuple
+            (outdoor,indoor) sets of diffraction points
 
-                #
-                # Handle diffraction point
-                #
-                if isopen:
-                    ndiffvalid = filter(lambda x :
-                                        filter(lambda y : y in airwalls
-                                             ,nx.neighbors(self.Gs,x)),ndiff)
-                    # non adjascent segments see valid diffraction point
-                    #print "diff valid",ndiffvalid
-                    for idiff in ndiffvalid:
-                        # segvalid : not adjascent segment
-                        segvalid = filter(lambda x : x not in
-                                          nx.neighbors(self.Gs,idiff),nseg)
-                        # idiff segment neighbors
-                        nsneigh = nx.neighbors(self.Gs,idiff)
-                        # nbidiff valid
-                        nsneigh =  filter(lambda x : x not in airwalls,nsneigh)
-                        # excluded diffraction points
-                        iptexcluded = reduce(lambda u,v:u+v,map(lambda x :
-                                           nx.neighbors(self.Gs,x),nsneigh))
-                        # pntvalid : not excluded points
-                        pntvalid = filter(lambda x : x not in iptexcluded,ndiff)
-                        for ns in segvalid:
-                            Gv.add_edge(idiff,ns)
-
-                        for np in pntvalid:
-                            Gv.add_edge(idiff,np)
-                else:
-                    pass
-                    # outdoor case not implemented
+        Returns
+        -------
 
-                #
-                # Graph Gv composition
-                #
+        edges : np.array (Ne x 2)
+
+        Notes
+        -----
 
-                self.Gv  = nx.compose(self.Gv, Gv)
-                self.dGv[icycle] = Gv
+        in convex case :
+            i)  all segments see all segments
+            ii) all non adjascent valid diffraction points see each other
+            iii) all valid diffraction points see non adjascent
+            segments
+
+        """
+        indoor = self.Gt.node[icycle]['indoor']
+        isopen = self.Gt.node[icycle]['isopen']
+
+        polyg = self.Gt.node[icycle]['polyg']
+        vnodes = polyg.vnodes
+
+        npt  = [ x for x in vnodes if x < 0 ]
+        nseg = np.array([ x for x in vnodes if x > 0 ],dtype=int)
+
+        airwalls = set([ x for x in nseg if x in air ])
+        ndiff = [ x for x in npt if x in ldiff[indoor] ]
+
+        # all segments see all segments
+        u = np.triu_indices(len(nseg),1)
+        ledges = [np.vstack((nseg[u[0]],nseg[u[1]])).T]
+
+        #
+        # Handle diffraction point
+        #
+        if isopen:
+            for idiff in ndiff:
+                sneigh = self.Gs.neighbors(idiff)
+                # valid diffraction point : adjascent to an airwall
+                if not [ y for y in sneigh if y in airwalls ]:
+                    continue
+                sneigh = set(sneigh)
+                # segvalid : not adjascent segment
+                segvalid = [ x for x in nseg if x not in sneigh ]
+                # excluded diffraction points : points of the non
+                # airwall neighbor segments of idiff
+                iptexcluded = set()
+                for x in sneigh:
+                    if x not in airwalls:
+                        iptexcluded.update(self.Gs.neighbors(x))
+                # pntvalid : not excluded points
+                pntvalid = [ x for x in ndiff if x not in iptexcluded ]
+                lnodes = segvalid + pntvalid
+                ledges.append(np.vstack((idiff*np.ones(len(lnodes),dtype=int),
+                                         np.array(lnodes,dtype=int))).T)
+        # outdoor case not implemented
 
+        return(np.vstack(ledges).reshape(-1,2))
 
     def buildGi(self):
         """ build graph of interactions
@@ -6258,18 +6793,18 @@ class Layout(PyLayers):
                 nseg = filter(lambda x : x>0,vnodes)
                 vnodes = nseg+npt
                 for nstr in vnodes:
-                    if nstr in self.Gv.nodes():
+                    if nstr in self.Gv:
                         if nstr>0:
                             cyo1 = self.Gs.node[nstr]['ncycles']
                             cyo1 = filter(lambda x : x!=cy,cyo1)[0]
                             # R , Tin , Tout
                             if cyo1>0:
-                                if (nstr,cy) in self.Gi.nodes():
+                                if (nstr,cy) in self.Gi:
                                     li1 = [(nstr,cy),(nstr,cy,cyo1),(nstr,cyo1,cy)]
                                 else:# no reflection on airwall
                                     li1 = [(nstr,cyo1,cy)]
                             else:
-                                if (nstr,cy) in self.Gi.nodes():
+                                if (nstr,cy) in self.Gi:
                                     li1 = [(nstr,cy)]
                         else:
                             # D
@@ -6279,17 +6814,17 @@ class Layout(PyLayers):
                         lneighcy = filter(lambda x: x in vnodes,lneighb)
 
                         for nstrb in lneighcy:
-                            if nstrb in self.Gv.nodes():
+                            if nstrb in self.Gv:
                                 if nstrb>0:
                                     cyo2 = self.Gs.node[nstrb]['ncycles']
                                     cyo2 = filter(lambda x : x!=cy,cyo2)[0]
                                     if cyo2>0:
-                                        if (nstrb,cy) in self.Gi.nodes():
+                                        if (nstrb,cy) in self.Gi:
                                             li2 = [(nstrb,cy),(nstrb,cy,cyo2),(nstrb,cyo2,cy)]
                                         else: #no reflection on airwall
                                             li2 = [(nstrb,cy,cyo2),(nstrb,cyo2,cy)]
                                     else:
-                                        if (nstrb,cy) in self.Gi.nodes():
+                                        if (nstrb,cy) in self.Gi:
                                             li2 = [(nstrb,cy)]
                                 else:
                                     li2 = [(nstrb,)]
@@ -6347,6 +6882,9 @@ class Layout(PyLayers):
             for k in idiff:
                 self.Gt.node[c]['inter']+= [(k,)]
 
+        # invalidate the compiled Gi
+        self._gickey = None
+
 
     def outputGi(self):
         """ filter output of Gi edges
@@ -6514,6 +7052,110 @@ class Layout(PyLayers):
 
             self.Gi.add_edge(i0,i1,output=dintprob)
 
+        # invalidate the compiled Gi
+        self._gickey = None
+
+    def csrGi(self,force=False):
+        """ compiled (CSR) representation of Gi
+
+        Parameters
+        ----------
+
+        force : boolean
+            rebuild even if Gi has not changed
+
+        Returns
+        -------
+
+        gic : tuple
+            (adj,optr,oute,ptr,nstr,typ,air) python lists (see Notes)
+
+        Notes
+        -----
+
+        Interactions are numbered by integers.
+
+        self.gi_node : list
+            id -> interaction tuple
+        self.gi_id : dict
+            interaction tuple -> id
+        self.gi_ptr : np.array (Ni+1)
+            edges of node i are ptr[i]:ptr[i+1]
+        self.gi_adj : np.array (Ne)
+            target node of edge e
+        self.gi_optr : np.array (Ne+1)
+            outputs of edge e are oute[optr[e]:optr[e+1]]
+        self.gi_oute : np.array
+            output edges : for edge e=(i0,i1), the edges (i1,i2) with i2 in
+            Gi[i0][i1]['output']
+        self.gi_oprob : np.array
+            probabilities associated with gi_oute
+        self.gi_nstr : np.array (Ni)
+            segment or point number of node i
+        self.gi_typ : np.array (Ni)
+            1 : D , 2 : R , 3 : T
+        self.gi_air : np.array (Ni)
+            1 if node i is on an airwall
+
+        The order of the edges and of the outputs is the iteration
+        order of Gi, hence a search on the compiled graph visits the
+        interactions in the same order as on Gi.
+
+        The compiled graph is cached and rebuilt only when Gi changes.
+
+        """
+        key = (id(self.Gi),self.Gi.number_of_nodes(),self.Gi.number_of_edges())
+        if (not force) and (getattr(self,'_gickey',None) == key):
+            return(self._gic)
+
+        Gi = self.Gi
+        self.gi_node = Gi.nodes()
+        self.gi_id = { n:k for k,n in enumerate(self.gi_node) }
+        gid = self.gi_id
+        ni = len(self.gi_node)
+
+        ptr = np.zeros(ni+1,dtype=int)
+        adj = []
+        deid = {}
+        for k,n in enumerate(self.gi_node):
+            for m in Gi[n]:
+                deid[(n,m)] = len(adj)
+                adj.append(gid[m])
+            ptr[k+1] = len(adj)
+
+        optr = np.zeros(len(adj)+1,dtype=int)
+        oute = []
+        oprob = []
+        e = 0
+        for n in self.gi_node:
+            for m in Gi[n]:
+                try:
+                    dout = Gi[n][m]['output']
+                except:
+                    dout = {}
+                for o,p in dout.items():
+                    if (m,o) in deid:
+                        oute.append(deid[(m,o)])
+                        oprob.append(p)
+                e = e + 1
+                optr[e] = len(oute)
+
+        lair = set(self.name['AIR']) if 'AIR' in self.name else set([])
+        self.gi_ptr = ptr
+        self.gi_adj = np.array(adj,dtype=int)
+        self.gi_optr = optr
+        self.gi_oute = np.array(oute,dtype=int)
+        self.gi_oprob = np.array(oprob)
+        self.gi_nstr = np.array([ n[0] for n in self.gi_node ],dtype=int)
+        self.gi_typ = np.array([ len(n) for n in self.gi_node ],dtype=int)
+        self.gi_air = np.array([ n[0] in lair for n in self.gi_node ],dtype=int)
+
+        self._gic = (adj,optr.tolist(),oute,ptr.tolist(),
+                     self.gi_nstr.tolist(),self.gi_typ.tolist(),
+                     self.gi_air.tolist())
+        self._gickey = key
+        return(self._gic)
+
     def intercy(self,ncy,typ='source'):
         """ return the list of interactions seen from a cycle
 
@@ -28,6 +28,15 @@ Constraint Layer Array (CLA) Class
    CLA.estpos
    CLA.estpos2
 
+Batch of CLA
+============
+
+.. autosummary::
+   :toctree: generated/
+
+   refine_batch
+   compute_batch
+
 """
 #####################################################################
 #This file is part of RGPA.
@@ -273,6 +282,17 @@ class CLA(object):
         """
         self.merge2(RSS=mergeRSS)
         self.refine(l=self.Nc,NBOXMAX=NBOXMAX, VOLMIN=VOLMIN,RSS=refineRSS)
+        return self._computepe(pe=pe,HT=HT,forceamb=forceamb)
+
+    def _computepe(self,pe=True,HT=True,forceamb=False):
+        """ position estimation of compute once the CLA is refined
+
+        See Also
+        --------
+
+        compute
+
+        """
         self.update()
         if (sum(self.usable) >= 3) and (pe == True):
             self.estpos2(HT=HT)
@@ -500,7 +520,7 @@ class CLA(object):
             except:
                 pass
 
-            if len(tlb.box) == 0:             # if the list is empty (no intersection ) vcw1 is increased
+            if len(tlb.bd) == 0:             # if the list is empty (no intersection ) vcw1 is increased
                 vcw1 = vcw1 + step
                 step = step * 1.2
                 #print step, vcw1
@@ -509,7 +529,7 @@ class CLA(object):
                 step = step / 4.
                 #print step, vcw1
         try:
-            if (np.diff(tlb.box[0].bd, axis=0)[0][0] == 0) | (np.diff(tlb.box[0].bd, axis=0)[0][1] == 0):
+            if (np.diff(tlb.bd[0:2], axis=0)[0][0] == 0) | (np.diff(tlb.bd[0:2], axis=0)[0][1] == 0):
                 self.setvcw(vcw1 + 1.0)
         except:
             pass
@@ -629,25 +649,54 @@ class CLA(object):
         -------
 
         Nothing, but fills self.dlayer[l][0] and self.dlayer[l][1] respectively with enclosed boxes and ambiguous boxes
+
+        Notes
+        -----
+
+        The boxes are handled as boundary arrays (LBoxN.octant,
+        LBoxN.select), no BoxN object is created in the refine loop.
+        Several CLA are refined together with refine_batch.
         """
 
+        B = self.dlayer[l][1].octant()
+        lv = B.bd2coord()
+        l = self._refinestep(l, B, lv, NBOXMAX, VOLMIN, RSS)
+        del lv
+        if l is not None:
+            self.refine(l,NBOXMAX, VOLMIN,RSS)
+
+    def _refinestep(self, l, B, lv, NBOXMAX, VOLMIN, RSS):
+        """ one octree step of refine
+
+        Parameters
+        ----------
+
+        l : the layer number
+        B : LBoxN
+            octants of the ambiguous boxes of the layer l
+        lv : np.array
+            vertexes of B (B.bd2coord())
+        NBOXMAX : the maximum number of obtained boxes
+        VOLMIN :  the minimum volume achievable by the obtained boxes
+        RSS : boolean
+
+        Returns
+        -------
+
+        l : int or None
+            layer to refine at the next step, None if the refinement is over
+
+        """
 
         self.iter = self.iter + 1
-        Nc = self.Nc
         if self.iter == 1:
             #print NBOXMAX
             self.FINISHED = 0
 
         self.erro = np.zeros(self.Nc)
 
-        a = []
 #        print 'iter', self.iter
-        B = self.dlayer[l][1].octant()
-
-        lv = B.bd2coord()
-
         EB, AB = self.valid_v(lv, l,RSS=RSS)
-        del lv
         self.erronous.append(self.erro)
 
         nbox = len(EB)
@@ -658,7 +707,7 @@ class CLA(object):
         # if all boxes are out of the VA
 #               if  ((nboxamb==0)&(nbox==0)) and len(self.dlayer[l][0].box) == 0:
 
-        if  ((nboxamb == 0) & (nbox == 0)) and len(self.dlayer[l][0].box) == 0:
+        if  ((nboxamb == 0) & (nbox == 0)) and len(self.dlayer[l][0].bd) == 0:
             if self.iter < 25:
 
                 pb = np.nonzero(self.erro != 0)[0]
@@ -672,7 +721,7 @@ class CLA(object):
                     self.rescale(1.2)
                     self.annulus_bound()
 
-                self.refine(l,NBOXMAX, VOLMIN,RSS)
+                return l
 
             else:
 
@@ -683,7 +732,7 @@ class CLA(object):
 
                 assert l >= 0, pdb.set_trace()
 
-                self.refine(l,NBOXMAX, VOLMIN,RSS)
+                return l
 
         # if it exists at least a box ambiguous or not in the VA
         else:
@@ -693,10 +742,10 @@ class CLA(object):
 
             # Update EB
             if len(EB) != 0:
-                self.dlayer[l][0].append_l(LBoxN(B.box[EB], ndim=self.ndim))
+                self.dlayer[l][0].append_l(B.select(EB))
 
             # Update AB
-            self.dlayer[l][1] = LBoxN(B.box[AB], ndim=self.ndim)
+            self.dlayer[l][1] = B.select(AB)
 
             # check if it remains is more AB to refine
             if nboxamb != 0:
@@ -708,11 +757,12 @@ class CLA(object):
             # self.refine is executed.
             # else  self.refine is over.
 
-            if (((nboxamb + nbox) < NBOXMAX) and (self.dlayer[l][lv].box[-1].vol > VOLMIN)) and self.FINISHED == 0:
-                self.refine(l,NBOXMAX, VOLMIN,RSS)
+            if (((nboxamb + nbox) < NBOXMAX) and (self.dlayer[l][lv].vol[-1] > VOLMIN)) and self.FINISHED == 0:
+                return l
             else:
                 self.iter = 0
                 self.Nc = l
+                return None
 
     def show3(self, l=-1, amb=False, sc='all'):
         """ Display constraints and theirs boxes through geomview.
@@ -1217,13 +1267,13 @@ class CLA(object):
         PP = []
         poids = []
 
-        if len(self.dlayer[l][0].box) != 0:  # si enclosed box exists
+        if len(self.dlayer[l][0].bd) != 0:  # si enclosed box exists
             dlindx = 0
 #            print 'Enclosed pos estim'
         else:
             dlindx = 1
 #            print 'Amiguous pos estim'
-        self.saveP = np.zeros((len(self.dlayer[l][dlindx].box)))
+        self.saveP = np.zeros((len(self.dlayer[l][dlindx].bd)/2))
 
         if pyinterval_installed:
             clust, axis = self.gapdetect2(l, dlindx)
@@ -1447,3 +1497,83 @@ class CLA(object):
             self.pestd = pestdmax - pestdmin
             self.pecluster=[self.pe]
 
+
+
+def refine_batch(lC, NBOXMAX=50, VOLMIN=0.001, RSS=True):
+    """ refine several CLA together
+
+    Parameters
+    ----------
+
+    lC : list of CLA
+        merged CLA (see CLA.merge2) of the same dimension
+    NBOXMAX : the maximum number of obtained boxes
+    VOLMIN :  the minimum volume achievable by the obtained boxes
+    RSS : boolean
+        see CLA.refine
+
+    Notes
+    -----
+
+    Each CLA is refined from its layer Nc, as by CLA.refine. At each step
+    the ambiguous boxes of all the CLA still being refined are stacked
+    in a single boundary array, which is split by one LBoxN.octant and
+    converted into vertexes by one bd2coord. The vertexes of each CLA are
+    then tested against its own constraints (CLA.valid_v). The result is
+    the one of CLA.refine applied to each CLA.
+
+    """
+    # current layer of the CLA being refined
+    dl = dict([(k,C.Nc) for k,C in enumerate(lC)])
+    while len(dl) > 0:
+        # no ambiguous box left : CLA.refine handles this case
+        for k in [k for k in dl if len(lC[k].dlayer[dl[k]][1].bd) == 0]:
+            lC[k].refine(dl.pop(k),NBOXMAX,VOLMIN,RSS)
+        if len(dl) == 0:
+            break
+        lk = sorted(dl)
+        ndim = lC[lk[0]].ndim
+        pndim = pow(2,ndim)
+        lbd = [lC[k].dlayer[dl[k]][1].bd for k in lk]
+        B = LBoxN(bd=np.vstack(lbd),ndim=ndim).octant()
+        lv = B.bd2coord()
+        # index of the first octant of each CLA
+        io = np.hstack((0,np.cumsum([pndim*len(bd)/2 for bd in lbd])))
+        for i,k in enumerate(lk):
+            Bk = LBoxN(bd=B.bd[2*io[i]:2*io[i+1]],ndim=ndim)
+            lvk = lv[pndim*io[i]:pndim*io[i+1]]
+            l = lC[k]._refinestep(dl[k],Bk,lvk,NBOXMAX,VOLMIN,RSS)
+            if l is None:
+                del dl[k]
+            else:
+                dl[k] = l
+
+
+def compute_batch(lC,pe=True,mergeRSS=False,refineRSS=True, NBOXMAX=50, VOLMIN=0.001,HT=True,forceamb=False):
+    """ compute several CLA together
+
+    Parameters
+    ----------
+
+    lC : list of CLA
+        CLA of the same dimension, one per position to estimate
+    pe, mergeRSS, refineRSS, NBOXMAX, VOLMIN, HT, forceamb :
+        see CLA.compute
+
+    Returns
+    -------
+
+    lbep : list of boolean
+        CLA.compute result of each CLA
+
+    Notes
+    -----
+
+    Same as CLA.compute on each CLA, the refinement is done by
+    refine_batch.
+
+    """
+    for C in lC:
+        C.merge2(RSS=mergeRSS)
+    refine_batch(lC,NBOXMAX=NBOXMAX,VOLMIN=VOLMIN,RSS=refineRSS)
+    return [C._computepe(pe=pe,HT=HT,forceamb=forceamb) for C in lC]
@@ -125,3 +125,66 @@ c = CDF(lv, 'fig')
 c.show()
 
 
+
+#
+# array based LBoxN versus per box BoxN
+#
+for ndim in [2,3]:
+    pndim = pow(2,ndim)
+    lo = np.random.rand(6,ndim)*Lmax
+    bd = np.concatenate((lo[:,None,:],lo[:,None,:]+1+np.random.rand(6,1,ndim)*5),axis=1)
+    LB = LBoxN(bd=bd,ndim=ndim)
+    # volume
+    np.testing.assert_allclose(LB.vol,[b.vol for b in LB.box])
+    # octant : intersection of the half boxes of each BoxN
+    O = LB.octant()
+    assert len(O.bd) == 2*pndim*len(bd)
+    for i,b in enumerate(LB.box):
+        for k in range(pndim):
+            sb = BoxN(b.bd.copy(),ndim=ndim)
+            for d in range(ndim):
+                hb = BoxN(b.bd.copy(),ndim=ndim)
+                hb.bd[1-((k>>d)&1),d] = b.ctr[d]
+                hb.mesure()
+                sb = sb.intersect(hb)
+            np.testing.assert_allclose(O.box[i*pndim+k].bd,sb.bd)
+            np.testing.assert_allclose(O.vol[i*pndim+k],sb.vol)
+    # select
+    idx = np.array([3,0,3,5])
+    S = LB.select(idx)
+    for i,j in enumerate(idx):
+        np.testing.assert_array_equal(S.box[i].bd,LB.box[j].bd)
+    # intersect : non void BoxN intersections, boxes of LB in outer loop
+    I = LB.intersect(O.select(range(0,len(O.bd)/2,3)))
+    lbd = []
+    for a in LB.box:
+        for b in O.select(range(0,len(O.bd)/2,3)).box:
+            c = a.intersect(b)
+            if np.all(c.bd[1]>c.bd[0]):
+                lbd.append(c.bd)
+    assert len(I.bd) == 2*len(lbd)
+    np.testing.assert_allclose(I.bd,np.vstack(lbd))
+
+#
+# batch of CLA (compute_batch) versus CLA.compute on each CLA
+#
+for ndim in [2,3]:
+    Pb = np.random.rand(ndim,20)*Lmax
+    Ab = np.random.rand(ndim,5)*Lmax
+    Db = np.sqrt(np.sum((Ab[:,None,:]-Pb[:,:,None])**2,axis=0))
+    toab = Db/0.3 + np.random.randn(20,Ab.shape[1])
+    lC = [[],[]]
+    for k in range(Pb.shape[1]):
+        for lc in lC:
+            C = CLA()
+            for ia in range(Ab.shape[1]):
+                C.append(TOA(id=ia,value=toab[k,ia],std=1.,p=Ab[:,ia]))
+            C.update()
+            lc.append(C)
+    bep = [C.compute() for C in lC[0]]
+    assert compute_batch(lC[1]) == bep
+    for C0,C1 in zip(lC[0],lC[1]):
+        np.testing.assert_array_equal(C0.pe,C1.pe)
+        for l in C0.dlayer:
+            np.testing.assert_array_equal(C0.dlayer[l][0].bd,C1.dlayer[l][0].bd)
+            np.testing.assert_array_equal(C0.dlayer[l][1].bd,C1.dlayer[l][1].bd)
@@ -49,6 +49,7 @@ class LBoxN(PyLayers):
 
     box    : np.array
         array containing BoxN object. default void
+        (built on first access from bd for the array based LBoxN)
     vol    : list
         volume of each boxes from self.box. default void
     bd    : np.arrays    2*len(box) x ndim
@@ -61,6 +62,8 @@ class LBoxN(PyLayers):
 
     LB : LBoxN
         Create a BoxN object from another one. default : None, the LBoxN obebject created is void.
+    bd : np.array (nbox x 2 x ndim) or (2*nbox x ndim)
+        Create the LBoxN from the boundaries of the boxes, without BoxN objects.
 
     Methods
     -------
@@ -79,17 +82,26 @@ class LBoxN(PyLayers):
         quadtree on Lboxes
     volume(self):
         estimate volume of LBoxes
+    select(self,idx):
+        sub set of LBoxes
     intersect(self,lb):
-        EXPERIMENTAL find the intersection of LBoxN
+        find the intersection of LBoxN
     show3(self,col='b',Id=0):        
         required file generation for geomview display
 
     """
     #__slots__=('box','vol','bd','ndim','ctr','grav','parmsh')
 
-    def __init__(self,Lb=None,ndim=3):
+    def __init__(self,Lb=None,ndim=3,bd=None):
         self.ctr= []
-        if Lb==None:
+        if bd is not None:
+            # array based LBoxN : BoxN objects are built on demand
+            self.ndim  = np.shape(bd)[-1]
+            self.bd    = np.asarray(bd,dtype=float).reshape(-1,self.ndim)
+            self._box  = None
+            self.volume()
+
+        elif Lb is None:
             self.box   = np.array([])
             self.vol   = []
             self.bd=[]
@@ -103,6 +115,7 @@ class LBoxN(PyLayers):
             self.box   = np.array([])
             self.vol   = []
             self.bd=[]
+            self.ndim  = ndim
             for b in Lb:
                 self.append(b)
                 self.ndim=b.ndim
@@ -112,6 +125,28 @@ class LBoxN(PyLayers):
         self.parmsh['display']=True
         self.parmsh['interactive']=False
 
+    @property
+    def box(self):
+        """ array of BoxN objects
+
+        For an array based LBoxN the BoxN are built from self.bd
+        on first access. They share their boundaries with self.bd.
+
+        """
+        if self._box is None:
+            n = len(self.bd)/2
+            if n == 0:
+                self._box = np.array([])
+            else:
+                self._box = np.empty(n,dtype=object)
+                for i in xrange(n):
+                    self._box[i] = BoxN(self.bd[2*i:2*i+2],ndim=self.ndim)
+        return self._box
+
+    @box.setter
+    def box(self,b):
+        self._box = b
+
 
     def mesure(self):
         """ LMeasure BoxN
@@ -124,9 +159,7 @@ class LBoxN(PyLayers):
         """
 
         if len(self.bd ) != 0:
-            lbd=len(self.bd)/2
-            self.ctr=np.zeros((lbd,self.ndim))
-            for i in xrange(lbd):self.ctr[i,:]=(self.bd[2*i]+self.bd[(2*i)+1])/2.
+            self.ctr=(self.bd[0::2]+self.bd[1::2])/2.
 #########################FONTIONNE MAIS TROP LOURD/TENT quand bcp de box
 #            C  =np.array(([[1/2.,1/2.]]))
 #            #M  =np.array(([[-1.,1.]]))    
@@ -190,18 +223,18 @@ class LBoxN(PyLayers):
 
         """
 #        for i in xrange(len(lb.box)):self.append(lb.box[i])
-        self.box=np.append(self.box,lb.box)
-
-        try :    
-
-            self.bd=np.vstack((self.bd,lb.bd))    
-            self.ctr=np.vstack((self.ctr,lb.ctr))
-            self.vol=self.vol+lb.vol
-
-        except:
+        if len(lb.bd) == 0:
+            return
+        if len(self.bd) == 0:
             self.bd=lb.bd
             self.ctr=lb.ctr
             self.vol=lb.vol
+        else:
+            self.bd=np.vstack((self.bd,lb.bd))
+            self.ctr=np.vstack((self.ctr,lb.ctr))
+            self.vol=self.vol+lb.vol
+        # BoxN objects are rebuilt from self.bd on demand
+        self.box=None
 
 #            try:
 #                self.bd=np.vstack((self.bd,lb.bd[i][0]))
@@ -343,90 +376,90 @@ class LBoxN(PyLayers):
 
         lb    : LBoxN 2^ndim*self.box x ndim
             return theLBoxn from quadtree process
-        """
-
-        if self.ndim == 3:
-
-            tlb = []
-            lbox = LBoxN([],ndim=self.ndim) 
-            C=np.array(([[1,1/2.,0],[0,1/2.,1]])).T
-            I=np.identity(len(self.bd)/2)
-            CC=np.kron(I,C)
-            BD=np.dot(CC,self.bd)
-
-            M=np.repeat(3*np.arange(0,len(self.bd)/2),16)  # groupe de 16 boundaries equivaut a 8 sous boites
-
-            X = (range(0,2)+range(1,3))*4*(len(self.bd)/2)
-            Y =(range(0,2)*2+range(1,3)*2)*2*(len(self.bd)/2)
-            Z = (range(0,2)*4+range(1,3)*4)*(len(self.bd)/2)
-
-            Rx = BD[X+M,0]
-            Ry = BD[Y+M,1]
-            Rz = BD[Z+M,2]
-            lbd = np.array((Rx,Ry,Rz )).T
-            llbd=len(lbd)
-            xr=xrange(0,llbd,2)
-            lb=LBoxN([BoxN(lbd[i:i+2],ndim=self.ndim) for i in xr])
-            lb.mesure()
-
-
-
-        if self.ndim == 2:
 
-            tlb = []
-            lbox = LBoxN(ndim=self.ndim) 
-            C=np.array(([[1,1/2.,0],[0,1/2.,1]])).T
-            I=np.identity(len(self.bd)/2)
-            CC=np.kron(I,C)
-            BD=np.dot(CC,self.bd)
+        Notes
+        -----
 
-            M=np.repeat(3*np.arange(0,len(self.bd)/2),8)  # groupe de 16 boundaries equivaut a 8 sous boites
+        The sub boxes are obtained from the boundary array, no BoxN
+        object is created. The sub box k of a box takes the upper half
+        of the interval along the dimension d if the bit d of k is set.
 
-            X = (range(0,2)+range(1,3))*2*(len(self.bd)/2)
-            Y =(range(0,2)*2+range(1,3)*2)*(len(self.bd)/2)
+        """
+        pndim = pow(2,self.ndim)
+        bd = self.bd.reshape(-1,2,self.ndim)
+        lo = bd[:,0,:]
+        hi = bd[:,1,:]
+        mid = lo/2.+hi/2.
+        # up : 2^ndim x ndim
+        k = np.arange(pndim)
+        up = ((k[:,np.newaxis] >> np.arange(self.ndim)) & 1).astype(bool)
+        # sub boxes boundaries : nbox x 2^ndim x 2 x ndim
+        sbd = np.empty((len(bd),pndim,2,self.ndim))
+        sbd[:,:,0,:] = np.where(up,mid[:,np.newaxis,:],lo[:,np.newaxis,:])
+        sbd[:,:,1,:] = np.where(up,hi[:,np.newaxis,:],mid[:,np.newaxis,:])
+        lb = LBoxN(bd=sbd,ndim=self.ndim)
 
+        return(lb)
 
-            Rx = BD[X+M,0]
-            Ry = BD[Y+M,1]
 
-            lbd = np.array((Rx,Ry )).T
-            llbd=len(lbd)
+    def volume(self):
+        """ Evaluate Boxes volume
 
+        Compute the volume on each LBoxes
+        """
+        if len(self.bd) == 0:
+            self.vol = []
+        else:
+            vol = np.prod(self.bd[1::2]-self.bd[0::2],axis=1)
+            assert (vol>=0).all(), "Incorrect bound"
+            self.vol = list(vol)
 
-            lb=LBoxN(np.array([BoxN(lbd[i:i+2],ndim=self.ndim) for i in xrange(0,llbd,2)]))
+    def select(self,idx):
+        """ sub set of boxes
 
+        Parameters
+        ----------
 
+        idx : np.array
+            index of the boxes
 
-        return(lb)
+        Returns
+        -------
 
+        lb : LBoxN
 
-    def volume(self):
-        """ Evaluate Boxes volume
-
-        Compute the volume on each LBoxes
         """
-        self.vol=[]
-        for b in self.box:
-            vol = b.vol
-            if vol>=0:
-                self.vol.append(vol)
-            else:
-                pdb.set_trace()
+        bd = self.bd.reshape(-1,2,self.ndim)[np.asarray(idx,dtype=int)]
+        return(LBoxN(bd=bd,ndim=self.ndim))
+
+    def intersect(self,lb):
+        """ Intersection of 2 LBOXN 
 
+        Parameters
+        ----------
 
+        lb : LBoxN
 
-    def intersect(self,lb):
-        """ EXPERIMENTAL
+        Returns
+        -------
 
-        Intersection of 2 LBOXN 
+        new_lb : LBoxN
+            non void intersections of the boxes of self with the boxes
+            of lb (boxes of self in outer loop)
 
         """
-        new_lb=LBoxN(ndim=self.ndim)
-        for k in range(len(self.box)):
-            for l in range(len(lb.box)):
-                b=self.box[k].intersect(lb.box[l])
-                if b.vol>0:   # si intersection non vide
-                    new_lb.append(b)
+        if (len(self.bd) == 0) or (len(lb.bd) == 0):
+            return(LBoxN(ndim=self.ndim))
+        a = self.bd.reshape(-1,2,self.ndim)
+        b = lb.bd.reshape(-1,2,self.ndim)
+        bmin = np.maximum(a[:,np.newaxis,0,:],b[np.newaxis,:,0,:])
+        bmax = np.minimum(a[:,np.newaxis,1,:],b[np.newaxis,:,1,:])
+        # si intersection non vide
+        u = np.all(bmax>bmin,axis=2)
+        bd = np.empty((np.sum(u),2,self.ndim))
+        bd[:,0,:] = bmin[u]
+        bd[:,1,:] = bmax[u]
+        new_lb = LBoxN(bd=bd,ndim=self.ndim)
         return(new_lb)        
 
 
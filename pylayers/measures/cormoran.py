@@ -12,6 +12,21 @@ CorSer Class
     :toctree: generated/
 
     cor_log
+    cor_store
+
+Visibility Class
+================
+
+.. autosummary::
+    :toctree: generated/
+
+    Visibility.__init__
+    Visibility.fill
+    Visibility.index
+    Visibility.cut
+    Visibility.count
+    Visibility.todense
+    Visibility.tomda
 
 CorSer init and load data
 -------------------------
@@ -28,6 +43,15 @@ CorSer init and load data
     CorSer._loadcam
     CorSer._loadhkb
     CorSer._loadinfranodes
+    CorSer._loadrssi
+    CorSer._openstore
+    CorSer._fromstore
+    CorSer._loadstore
+    CorSer._offsettechno
+    CorSer._offsetshift
+    CorSer._keys
+    CorSer.savestore
+    CorSer.select
     CorSer.loadlog
 
 
@@ -164,6 +188,7 @@ import matplotlib.pyplot as plt
 from mpl_toolkits.axes_grid1 import make_axes_locatable
 import pylayers.mobility.ban.DeuxSeg as seg
 import pickle
+import logging
 
 #Those lines handle incompatibility between mayavi and VTK
 #and redirect noisy warning message into a log file
@@ -184,6 +209,38 @@ def cor_log(short=True):
         return log
 
 
+def cor_store(day=11,series=[],source='CITI',overwrite=False):
+    """ convert CORMORAN series into serie stores
+
+    Parameters
+    ----------
+
+    day : int
+        11 | 12
+    series : list
+        series to convert (default all the series of the day)
+    source : string
+        'CITI' | 'UR1' hkb source
+    overwrite : boolean
+        if True the existing stores are rewritten
+
+    See Also
+    --------
+
+    CorSer.savestore
+
+    """
+    if len(series) == 0:
+        log = cor_log()
+        series = np.unique(log[log['day']==str(day)]['serie'].values)
+    for serie in series:
+        try:
+            S = CorSer(serie=serie,day=day,source=source,usestore=not overwrite)
+            S.savestore(overwrite=overwrite)
+        except AttributeError:
+            print 'serie ',serie,' skipped'
+
+
 
 
 def time2npa(lt):
@@ -207,13 +264,199 @@ def time2npa(lt):
     return(ta)
 
 
+class Visibility(object):
+    """ bit packed link x time cut matrix
+
+    Attributes
+    ----------
+
+    links : np.array (nlink x 2)
+        name of the devices of the links
+    nframe : int
+        number of frames
+    bits : np.array (nlink x (nframe+7)/8) uint8
+        cut matrix packed along time (np.packbits)
+
+    Methods
+    -------
+
+    fill
+    index
+    cut
+    count
+    todense
+    tomda
+
+    Notes
+    -----
+
+    A frame of a link is cut (True) if the link is intersected by a body
+    segment or by a cylinder. The cut matrix of a link over a whole serie
+    is nframe/8 bytes.
+
+    """
+    def __init__(self, links, nframe):
+        self.links = np.array(links)
+        self.nframe = nframe
+        self.bits = np.zeros((len(self.links), (nframe + 7) / 8), dtype=np.uint8)
+        self._dl = {}
+        for k, l in enumerate(self.links):
+            self._dl[(l[0], l[1])] = k
+            self._dl[(l[1], l[0])] = k
+
+    def __repr__(self):
+        s = 'Visibility\n**********\n'
+        s = s + 'number of links: ' + str(len(self.links)) + '\n'
+        s = s + 'number of frames: ' + str(self.nframe) + '\n'
+        s = s + 'size (bytes): ' + str(self.bits.nbytes)
+        return s
+
+    def __getitem__(self, k):
+        return self.cut(k)
+
+    def fill(self, k0, cut):
+        """ fill a window of frames
+
+        Parameters
+        ----------
+
+        k0 : int
+            first frame of the window (multiple of 8)
+        cut : np.array (nlink x nf) bool
+            cut matrix of the frames k0 to k0+nf
+
+        """
+        assert k0 % 8 == 0, 'Visibility.fill : k0 must be a multiple of 8'
+        b = np.packbits(cut, axis=1)
+        self.bits[:, k0 / 8:k0 / 8 + b.shape[1]] = b
+
+    def index(self, a, b=None):
+        """ index of a link
+
+        Parameters
+        ----------
+
+        a : int | string | tuple
+            index of the link, name of the first device or (a,b) names
+        b : string
+            name of the second device
+
+        """
+        if b is not None:
+            return self._dl[(a, b)]
+        if isinstance(a, tuple):
+            return self._dl[a]
+        return a
+
+    def cut(self, a, b=None, frames=slice(None)):
+        """ cut state of a link over time
+
+        Parameters
+        ----------
+
+        a : int | string | tuple
+            link (see index)
+        b : string
+            name of the second device
+        frames : slice
+            frames of interest (default all)
+
+        Returns
+        -------
+
+        c : np.array (nf) bool
+            True if the link is cut
+
+        Notes
+        -----
+
+        Only the bytes of the frame window are unpacked
+
+        """
+        k = self.index(a, b)
+        start, stop, step = frames.indices(self.nframe)
+        if stop <= start:
+            return np.zeros(0, dtype=bool)
+        b0 = start / 8
+        b1 = (stop + 7) / 8
+        u = np.unpackbits(self.bits[k, b0:b1])
+        return u[start - 8 * b0:stop - 8 * b0:step].astype(bool)
+
+    def count(self):
+        """ number of cut frames of each link
+
+        Returns
+        -------
+
+        n : np.array (nlink)
+
+        """
+        n = np.zeros(len(self.links), dtype=int)
+        for k in range(len(self.links)):
+            n[k] = np.unpackbits(self.bits[k]).sum()
+        return n
+
+    def todense(self):
+        """ unpacked cut matrix
+
+        Returns
+        -------
+
+        c : np.array (nlink x nframe) bool
+
+        """
+        u = np.unpackbits(self.bits, axis=1)
+        return u[:, :self.nframe].astype(bool)
+
+    def tomda(self):
+        """ device x device x time cut matrix
+
+        Returns
+        -------
+
+        M : np.array (ndev x ndev x nframe)
+            1 if the link is cut, 0 otherwise, nan on the diagonal
+            and for the missing links
+        dev : np.array (ndev)
+            name of the devices
+
+        """
+        dev = np.unique(self.links)
+        ddev = dict(zip(dev, range(len(dev))))
+        M = np.nan * np.ones((len(dev), len(dev), self.nframe))
+        for k, l in enumerate(self.links):
+            c = self.cut(k)
+            M[ddev[l[0]], ddev[l[1]], :] = c
+            M[ddev[l[1]], ddev[l[0]], :] = c
+        return M, dev
+
+
 class CorSer(PyLayers):
     """ Hikob data handling from CORMORAN measurement campaign 11/06/2014
 
     """
 
-    def __init__(self,serie=6,day=11,source='CITI'):
+    # serie store : file attribute and time vector of the technologies
+    _storefile = {'hkb':'_filehkb','tcr':'_fileTCR','bespo':'_fileBS'}
+    _storetime = {'tcr':'ttcr','bespo':'tbs'}
 
+    def __init__(self,serie=6,day=11,source='CITI',store=False,usestore=True):
+        """
+        Parameters
+        ----------
+
+        serie : int
+        day : int
+            11 | 12
+        source : string
+            'CITI' | 'UR1' hkb source
+        store : boolean
+            if True the serie store is written when it does not exist
+            (default False, see cor_store)
+        usestore : boolean
+            if True the data are read from an existing serie store
+
+        """
 
         try:
             self.rootdir = os.environ['CORMORAN']
@@ -227,6 +470,16 @@ class CorSer(PyLayers):
         self.day = day
         self.loadlog()
 
+        # serie store (see savestore)
+        self._lazy = {}
+        self._storemeta = {}
+        self._storeindex = {}
+        self._filestore = os.path.join(self.rootdir,'POST-TREATED',
+                                       str(self.day)+'-06-2014','STORE',
+                                       'S'+str(self.serie)+'_'+source+'.h5')
+        if usestore and os.path.isfile(self._filestore):
+            self._openstore()
+
         if day == 11:
             if serie in [7,8]:
                 raise AttributeError('Serie '+str(serie) + \
@@ -305,10 +558,12 @@ class CorSer(PyLayers):
         # 1 - Resample radio time => mocap time
         # 2 - (if available) apply offset
 
-        if ('BS' in self.typ) or ('FULL' in self.typ):
+        if (('BS' in self.typ) or ('FULL' in self.typ)) and \
+           ('bespo' not in self._storemeta):
             print '\nBS data frame index: ',
             self._align_on_devdf(typ='BS')
             print 'Align on mocap OK...',
+            self._storeindex['bespo'] = self.bespo.index
             try:
                 self._apply_offset('BS')
                 print 'time-offset applied OK'
@@ -316,10 +571,12 @@ class CorSer(PyLayers):
                 print 'WARNING time-offset NOT applied'
                 print ('No BS offset not yet set => use self.offset_setter ')
 
-        if ('TCR' in self.typ) or ('FULL' in self.typ):
+        if (('TCR' in self.typ) or ('FULL' in self.typ)) and \
+           ('tcr' not in self._storemeta):
             print '\nTCR data frame index:', 
             self._align_on_devdf(typ='TCR')
             print 'Align on mocap OK...',
+            self._storeindex['tcr'] = self.tcr.index
             try:
                 self._apply_offset('TCR')
                 print 'time-offset applied OK'
@@ -328,7 +585,8 @@ class CorSer(PyLayers):
                 print ('No TCR offset not yet set => use self.offset_setter')
 
 
-        if ('HK' in self.typ) or ('FULL' in self.typ):
+        if (('HK' in self.typ) or ('FULL' in self.typ)) and \
+           ('hkb' not in self._storemeta):
             print '\nHKB data frame index:', 
             self._align_on_devdf(typ='HKB')
             print 'Align on mocap OK...',
@@ -343,6 +601,26 @@ class CorSer(PyLayers):
         self._computedistdf()
         print 'OK',
 
+        if store and len(self._storemeta)==0:
+            try:
+                self.savestore()
+            except (IOError,OSError,ImportError) as e:
+                logging.warning('serie store %s NOT saved : %s',
+                                self._filestore,e)
+
+    def __getattr__(self,name):
+        """ load a lazy attribute on first access (see _openstore)
+        """
+        lazy = self.__dict__.get('_lazy',{})
+        if name.startswith('__') or name not in lazy:
+            raise AttributeError(name)
+        lazy[name]()
+        for k in [k for k in lazy if k in self.__dict__]:
+            del lazy[k]
+        if name not in self.__dict__:
+            raise AttributeError(name)
+        return self.__dict__[name]
+
     def __repr__(self):
         st = ''
         st = st + 'Filename: ' + self._filename + '\n'
@@ -739,6 +1017,8 @@ bernard
         for k in self.dTCR:
             self.idTCR[self.dTCR[k]]=k
 
+        if self._fromstore('tcr'):
+            return
 
         dTCRni={}
         for k in self.TNET.keys():
@@ -794,6 +1074,7 @@ bernard
         t = t-t[0]
         self.tcr.index = t
         self.ttcr=self.tcr.index
+        self._storeindex['ttcr'] = self.ttcr
 
     def _loadBS(self,day=11,serie='',scenario='20',run=1):
         """ load BeSpoon data
@@ -807,6 +1088,9 @@ bernard
         for k in self.dBS:
             self.idBS[self.dBS[k]]=k
 
+        if self._fromstore('bespo'):
+            return
+
         if day==11:
             dirname = os.path.join(self.rootdir,'POST-TREATED','11-06-2014','BeSpoon')
         if day==12:
@@ -869,12 +1153,19 @@ bernard
             #if source=='UR1':
             dirname = os.path.join(self.rootdir,'POST-TREATED','12-06-2014','HIKOB')
 
-        files = os.listdir(dirname)
-
         self.idHKB={}
         for k in self.dHKB:
             self.idHKB[self.dHKB[k]]=k
 
+        self._dirhkb = dirname
+        self._sourcehkb = source
+        if self._fromstore('hkb'):
+            self._lazy['rssi'] = self._loadrssi
+            self._lazy['thkb'] = self._loadrssi
+            return
+
+        files = os.listdir(dirname)
+
         if serie != '':
             self._filehkb = filter(lambda x : 'S'+str(serie) in x ,files)[0]
             tt = self._filehkb.split('_')
@@ -900,13 +1191,7 @@ bernard
                 self._filehkb = filter(lambda x : 'r'+str(run) in x ,filsc)[0]
 
 
-        data = io.loadmat(os.path.join(dirname,self._filehkb))
-        if source=='UR1':
-            self.rssi = data['rssi']
-            self.thkb = data['t']
-        else:
-            self.rssi = data['val']
-            self.thkb = np.arange(np.shape(self.rssi)[2])*25.832e-3
+        self._loadrssi()
 
         def topandas():
             try:
@@ -925,7 +1210,264 @@ bernard
         topandas()
         self.hkb = self.hkb[self.hkb!=0]
 
-    def compute_visibility(self,techno='HKB',square_mda=True,all_links=True):
+    def _loadrssi(self):
+        """ load the hkb rssi array (self.rssi) and time (self.thkb)
+        from the .mat file of the serie
+        """
+        data = io.loadmat(os.path.join(self._dirhkb,self._filehkb))
+        if self._sourcehkb=='UR1':
+            self.rssi = data['rssi']
+            self.thkb = data['t']
+        else:
+            self.rssi = data['val']
+            self.thkb = np.arange(np.shape(self.rssi)[2])*25.832e-3
+
+    def _openstore(self):
+        """ read the content of the serie store (see savestore)
+
+        Notes
+        -----
+
+        Only the attributes and the columns of the data frames are read.
+        The loaders of the technologies in the store (_loadhkb, _loadTCR,
+        _loadBS) do not parse the raw files, the data frames are loaded
+        on first access (see __getattr__).
+
+        """
+        store = pd.HDFStore(self._filestore,'r')
+        try:
+            keys = store.keys()
+            for key in ['hkb','tcr','bespo']:
+                if '/'+key in keys:
+                    meta = dict(store.get_storer(key).attrs.meta)
+                    meta['columns'] = store.select(key,start=0,stop=0).columns
+                    self._storemeta[key] = meta
+            for key in ['ttcr','tbs']:
+                if '/'+key in keys:
+                    self._storemeta[key] = {}
+        finally:
+            store.close()
+
+    def _fromstore(self,key):
+        """ set the attributes of a technology from the serie store
+
+        Parameters
+        ----------
+
+        key : 'hkb' | 'tcr' | 'bespo'
+
+        Returns
+        -------
+
+        boolean
+            True if the technology is in the store. Its data frame
+            (and time vector) are then loaded on first access.
+
+        """
+        if key not in self._storemeta:
+            return False
+        meta = self._storemeta[key]
+        for k in ['scenario','run','typ','video']:
+            setattr(self,k,meta[k])
+        setattr(self,self._storefile[key],meta['_file'])
+        self._lazy[key] = lambda : self._loadstore(key)
+        tkey = self._storetime.get(key)
+        if tkey is not None:
+            self._lazy[tkey] = self._lazy[key]
+        return True
+
+    def _loadstore(self,key):
+        """ load a data frame of the serie store
+
+        Parameters
+        ----------
+
+        key : 'hkb' | 'tcr' | 'bespo'
+
+        Notes
+        -----
+
+        The store keeps the data frames before the time offset. The
+        current offset of the serie (self.offset) is applied here, as
+        it is in __init__ for the data parsed from the raw files.
+
+        """
+        self._lazy.pop(key,None)
+        self._lazy.pop(self._storetime.get(key),None)
+        df = pd.read_hdf(self._filestore,key)
+        self._storeindex[key] = df.index
+        setattr(self,key,df)
+        if key == 'tcr' and 'ttcr' in self._storemeta:
+            self.ttcr = pd.Index(pd.read_hdf(self._filestore,'ttcr').values)
+            self._storeindex['ttcr'] = self.ttcr
+        techno = self._offsettechno(key)
+        if techno != '':
+            try:
+                self._apply_offset(techno)
+            except:
+                print 'WARNING time-offset NOT applied'
+
+    def _offsettechno(self,key):
+        """ technology name of the time offset applied on a data frame
+
+        Returns
+        -------
+
+        techno : 'TCR' | 'BS' | ''
+            '' if no offset is applied on the data frame (see __init__)
+
+        """
+        techno = {'tcr':'TCR','bespo':'BS'}.get(key,'')
+        if (techno in self.typ) or ('FULL' in self.typ):
+            return techno
+        return ''
+
+    def _offsetshift(self,key):
+        """ time shift of a data frame index due to the time offset
+
+        Parameters
+        ----------
+
+        key : 'hkb' | 'tcr' | 'bespo'
+
+        Notes
+        -----
+
+        Only a positive offset changes the data frame index
+        (see _apply_offset).
+
+        """
+        techno = self._offsettechno(key)
+        try:
+            offset = self.offset[self._filename][techno.lower()+'_index']
+        except (AttributeError,KeyError):
+            return 0
+        if offset <= 0:
+            return 0
+        t = pd.read_hdf(self._filestore,key,start=0,stop=2).index.values
+        return t[0] + (t[1] - t[0]) * offset
+
+    def _keys(self,key):
+        """ columns of a radio data frame
+
+        The data frame is not loaded if it is still in the serie store.
+
+        Parameters
+        ----------
+
+        key : 'hkb' | 'tcr' | 'bespo'
+
+        """
+        if key in self._lazy:
+            return self._storemeta[key]['columns']
+        return getattr(self,key).keys()
+
+    def savestore(self,overwrite=False):
+        """ save the radio data of the serie in the serie store
+
+        Parameters
+        ----------
+
+        overwrite : boolean
+            if False an existing store is kept
+
+        Notes
+        -----
+
+        The store is an HDF5 file (pandas HDFStore) per serie in
+        $CORMORAN/POST-TREATED/<day>-06-2014/STORE. It contains a time
+        indexed table per technology ('hkb', 'tcr', 'bespo'), as they are
+        after the alignment on the mocap time, and the time vectors
+        of TCR ('ttcr'). The data frames are stored before the time offset,
+        which is applied when they are loaded (see _loadstore), so that a
+        change of the offset dictionary does not require to rebuild the
+        store. It is written by cor_store or by the instantiation of a
+        serie with store=True, the next instantiations read it lazily
+        (see select). There is a store per hkb source.
+
+        The bodies are still built from the c3d files, which are read
+        with the memory mapped c3d.C3dPoints.
+
+        """
+        if os.path.isfile(self._filestore) and not overwrite:
+            return
+        lkey = [k for k in ['hkb','tcr','bespo'] if hasattr(self,k)]
+        # load everything before the store is truncated
+        data = {}
+        for k in lkey:
+            data[k] = getattr(self,k)
+            if k in self._storeindex:
+                # data frame before the time offset
+                data[k] = data[k].copy(deep=False)
+                data[k].index = self._storeindex[k]
+        if 'tcr' in lkey and 'ttcr' in self._storeindex:
+            lkey.append('ttcr')
+            data['ttcr'] = self._storeindex['ttcr']
+        dirname = os.path.dirname(self._filestore)
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        meta = dict([(k,getattr(self,k)) for k in ['scenario','run','typ','video']])
+        store = pd.HDFStore(self._filestore,'w')
+        try:
+            for k in lkey:
+                if k in self._storefile:
+                    store.put(k,data[k],format='table')
+                    store.get_storer(k).attrs.meta = dict(meta,
+                        _file=getattr(self,self._storefile[k]))
+                else:
+                    store.put(k,pd.Series(np.asarray(data[k])))
+        finally:
+            store.close()
+
+    def select(self,techno,t0=0,t1=np.inf):
+        """ radio data of a technology on a time range
+
+        Parameters
+        ----------
+
+        techno : 'HKB' | 'TCR' | 'BS'
+        t0 : float
+            start time (s)
+        t1 : float
+            stop time (s)
+
+        Returns
+        -------
+
+        df : pd.DataFrame
+
+        Examples
+        --------
+
+        >>> from pylayers.measures.cormoran import *
+        >>> S = CorSer(serie=14,day=12)
+        >>> df = S.select('TCR',10,20)
+
+        Notes
+        -----
+
+        If the data frame has not been loaded from the serie store, only
+        the rows of the time range are read (where query on the index).
+
+        """
+        key = {'HKB':'hkb','TCR':'tcr','BS':'bespo'}[techno.upper()]
+        if key in self._lazy:
+            # the stored index is before the time offset, the query is
+            # widened by eps and the rows are filtered on the shifted index
+            shift = self._offsetshift(key)
+            eps = 1e-6
+            where = ['index>=%r' % float(t0-shift-eps)]
+            if t1 < np.inf:
+                where.append('index<=%r' % float(t1-shift+eps))
+            df = pd.read_hdf(self._filestore,key,where=where)
+            if shift != 0:
+                df.index = pd.Index(df.index.values + shift)
+        else:
+            df = getattr(self,key)
+        return df[(df.index>=t0) & (df.index<=t1)]
+
+    def compute_visibility(self,techno='HKB',square_mda=True,all_links=True,
+                           chunk=512,packed=False):
         """ determine visibility of links of a givcen techno
 
 
@@ -944,6 +1486,13 @@ bernard
             all_links : bool
                 compute all links or just those for which data is available
 
+            chunk : int
+                number of frames processed at once (rounded to a multiple
+                of 8)
+
+            packed : bool
+                if True the bit packed cut matrix (Visibility) is returned
+
             Return
             ------
 
@@ -962,6 +1511,13 @@ bernard
             links : (nblink x2)
                 name of the links
 
+            if packed = True
+
+            intersection : Visibility
+                bit packed (nblink x nb_timestamp) cut matrix
+            links : (nblink x2)
+                name of the links
+
             Example
             -------
 
@@ -972,7 +1528,18 @@ bernard
             >>> inter.shape
                 (15, 15, 12473)
             >>>C.imshowvisibility_i(inter,links)
+            >>> V,links=C.compute_visibility(techno='TCR',packed=True)
+            >>> c = V.cut('TCR:1','TCR:4',frames=slice(1000,2000))
 
+            Notes
+            -----
+
+            The frames are processed by windows of chunk frames. For each
+            window the distances between the links and the body segments
+            (and cylinders) are obtained from DeuxSeg.segdist and reduced
+            on the segment axis, hence the memory is bounded by the window
+            size. The cut matrix is stored bit packed (see Visibility) in
+            self._visibits.
 
         """
 
@@ -1021,101 +1588,55 @@ bernard
         mnA = [dma[n] for n in nA]
         mnB = [dma[n] for n in nB]
 
-        A=Mpdev[:,mnA]
-        B=Mpdev[:,mnB]
-
-
-        # intersect2D matrix is 
-        # d_0: nb links
-        #d_1: (cylinder number) * nb body + 1 * nb  cylinder_object
-        # d_2 : nb frame
-        intersect2D = np.zeros((len(links),
-                                11*len(self.subject) + len(self.interf),
-                                Mpdev.shape[-1]))
-        # usub : index axes subject
-        usub_start=0
-        usub_stop=0
         # C-D correspond to bodies segments
-        #C or D : 3 x 11 body segments x time
-        # radius of cylinders are (nb_cylinder x time)
+        # C or D : 3 x nb segments x time
+        # rad : radius of the segments (nb segments x time)
+        lseg = []
         for b in self.B:
-            print 'processing shadowing from ',b
             # if b is a body not a cylinder
             if not 'Cylindre' in b:
                 uta = self.B[b].sl[:,0].astype('int')
                 uhe = self.B[b].sl[:,1].astype('int')
-                rad = self.B[b].sl[:,2]
-
-                C = self.B[b].d[:,uta,:]
-                D = self.B[b].d[:,uhe,:]
-                try:
-                    radius = np.concatenate((radius,rad[:,np.newaxis]*np.ones((1,C.shape[2]))),axis=0)
-                except:
-                    radius = rad[:,np.newaxis]*np.ones((1,C.shape[2]))
-                usub_start=usub_stop
-                usub_stop=usub_stop+11
+                rad = self.B[b].sl[:,2][:,np.newaxis]
+                lseg.append((self.B[b].d,uta,uhe,None,rad))
             else:
-
                 cyl = self.B[b]
-                # top of cylinder
-                top = cyl.d[:,cyl.topnode,:]
-                # bottom of cylinder =top with z =0
-                bottom = copy.copy(cyl.d[:,cyl.topnode,:])
-                bottom[2,:]=0.02
-                #top 3 x 1 X time
-                C=top[:,np.newaxis,:]
-                D=bottom[:,np.newaxis,:]
-                radius = np.concatenate((radius,cyl.radius[np.newaxis]))
-                usub_start=usub_stop
-                usub_stop=usub_stop+1
-
-            f,g,X,Y,alpha,beta,dmin=seg.segdist(A,B,C,D,hard=True)
-
-            intersect2D[:,usub_start:usub_stop,:]=g
-            # import ipdb
-            # ipdb.set_trace()
-            #USEFUL Lines for debug
-            #########################
-
-            # def plt3d(ndev=53,ncyl=0,kl=11499):
-            #     fig=plt.figure()
-            #     ax=fig.add_subplot(111,projection='3d')
-            #     if not isinstance(kl,list):
-            #         kl=[kl]
-
-            #     for ktime in kl:
-            #         ax.plot([A[0,ndev,ktime],B[0,ndev,ktime]],[A[1,ndev,ktime],B[1,ndev,ktime]],[A[2,ndev,ktime],B[2,ndev,ktime]])
-            #         [ax.plot([C[0,k,ktime],D[0,k,ktime]],[C[1,k,ktime],D[1,k,ktime]],[C[2,k,ktime],D[2,k,ktime]],'k') for k in range(11) ]
-            #         ax.plot([X[0,ndev,ncyl,ktime],Y[0,ndev,ncyl,ktime]],[X[1,ndev,ncyl,ktime],Y[1,ndev,ncyl,ktime]],[X[2,ndev,ncyl,ktime],Y[2,ndev,ncyl,ktime]])
-            #     ax.auto_scale_xyz([-5, 5], [-5, 5], [0, 2])
-            #     plt.show()
-            # import ipdb
-            # ipdb.set_trace()
-
-
-
-
-        uinter1 = np.where((intersect2D<=(radius-0.01)))
-        uinter0 = np.where((intersect2D>(radius-0.01)))
-        # intersect2D_=copy.copy(intersect2D)
-
-        intersect2D[uinter1[0],uinter1[1],uinter1[2]]=1
-        intersect2D[uinter0[0],uinter0[1],uinter0[2]]=0
-        # #integrate the effect of all bodies by summing on axis 1
-        intersect = np.sum(intersect2D,axis=1)>0
+                lseg.append((cyl.d,cyl.topnode,None,0.02,cyl.radius))
+
+        nframe = Mpdev.shape[-1]
+        V = Visibility(links,nframe)
+        chunk = max(8,8*(chunk/8))
+        for k0 in range(0,nframe,chunk):
+            w = slice(k0,min(k0+chunk,nframe))
+            A = Mpdev[:,mnA,w]
+            B = Mpdev[:,mnB,w]
+            cut = np.zeros((len(links),A.shape[-1]),dtype=bool)
+            for d,uta,uhe,zb,rad in lseg:
+                if zb is None:
+                    C = d[:,uta,w]
+                    D = d[:,uhe,w]
+                    r = rad
+                else:
+                    # top of cylinder
+                    C = d[:,uta,w][:,np.newaxis,:]
+                    # bottom of cylinder =top with z =0
+                    D = C.copy()
+                    D[2,...] = zb
+                    r = rad[np.newaxis,w]
+                f,g,X,Y,alpha,beta,dmin=seg.segdist(A,B,C,D,hard=True)
+                # reduce on the segment axis
+                cut |= np.any(g<=(r[np.newaxis,...]-0.01),axis=1)
+            V.fill(k0,cut)
+
+        self._visibits = V
+
+        if packed:
+            return V,V.links
 
         if square_mda:
-            dev= np.unique(links)
-            ddev = dict(zip(dev,range(len(dev))))
-            lmap = np.array(map(lambda x: (ddev[x[0]],ddev[x[1]]),links))
-            M = np.nan*np.ones((len(dev),len(dev),intersect.shape[-1]))
-            for i in range(len(intersect)):
-                id1 = lmap[i][0]
-                id2 = lmap[i][1]
-                M[id1,id2,:]=intersect[i,:]
-                M[id2,id1,:]=intersect[i,:]
-            intersect=M
-            links = dev
+            intersect,links = V.tomda()
+        else:
+            intersect = V.todense()
 
         self._visilinks = links
         self._visiintersect = intersect
@@ -1530,13 +2051,13 @@ bernard
 
         if ('HK' in self.typ) or ('FULL' in self.typ):
             devmap = {self.devmapper(k,'hkb')[0]:self.devmapper(k,'hkb')[2] for k in self.dHKB}
-            udev = np.array([[self.dist_nodesmap.index(devmap[k.split('-')[0]]),self.dist_nodesmap.index(devmap[k.split('-')[1]])] for k in self.hkb.keys()])
+            udev = np.array([[self.dist_nodesmap.index(devmap[k.split('-')[0]]),self.dist_nodesmap.index(devmap[k.split('-')[1]])] for k in self._keys('hkb')])
             iudev =np.array([(self.dist_nodesmap[u[0]]+'-'+self.dist_nodesmap[u[1]]) for u in udev])
             df = pd.DataFrame(self.dist[:,udev[:,0],udev[:,1]],columns=iudev,index=self.tmocap)
 
         if ('BS' in self.typ) or ('FULL' in self.typ):
             devmap = {self.devmapper(k,'BS')[0]:self.devmapper(k,'BS')[2] for k in self.dBS}
-            udev = np.array([[self.dist_nodesmap.index(devmap[k.split('-')[0]]),self.dist_nodesmap.index(devmap[k.split('-')[1]])] for k in self.bespo.keys()])
+            udev = np.array([[self.dist_nodesmap.index(devmap[k.split('-')[0]]),self.dist_nodesmap.index(devmap[k.split('-')[1]])] for k in self._keys('bespo')])
             iudev =np.array([(self.dist_nodesmap[u[0]]+'-'+self.dist_nodesmap[u[1]]) for u in udev])
             dfb = pd.DataFrame(self.dist[:,udev[:,0],udev[:,1]],columns=iudev,index=self.tmocap)
             df = df.join(dfb)
@@ -1544,7 +2065,7 @@ bernard
 
         if ('TCR' in self.typ) or ('FULL' in self.typ):
             devmap = {self.devmapper(k,'tcr')[0]:self.devmapper(k,'tcr')[2] for k in self.dTCR}
-            udev = np.array([[self.dist_nodesmap.index(devmap[k.split('-')[0]]),self.dist_nodesmap.index(devmap[k.split('-')[1]])] for k in self.tcr.keys() if not 'COORD' in k])
+            udev = np.array([[self.dist_nodesmap.index(devmap[k.split('-')[0]]),self.dist_nodesmap.index(devmap[k.split('-')[1]])] for k in self._keys('tcr') if not 'COORD' in k])
             iudev =np.array([(self.dist_nodesmap[u[0]]+'-'+self.dist_nodesmap[u[1]]) for u in udev])
             dft = pd.DataFrame(self.dist[:,udev[:,0],udev[:,1]],columns=iudev,index=self.tmocap)
             if ('FULL' in self.typ):
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+from pylayers.measures.cormoran import *
+
+#
+# serie parsed from the raw files, then written in its store
+#
+S = CorSer(serie=14,day=12,usestore=False)
+S.savestore(overwrite=True)
+#
+# serie read from the store
+#
+R = CorSer(serie=14,day=12)
+for techno,key in [('TCR','tcr'),('BS','bespo'),('HKB','hkb')]:
+    assert key in R._lazy
+    df = getattr(S,key)
+    t0 = df.index[10]
+    t1 = df.index[100]
+    sdf = R.select(techno,t0,t1)
+    assert key in R._lazy
+    pd.util.testing.assert_frame_equal(sdf,df[(df.index>=t0) & (df.index<=t1)])
+#
+# lazy data frames
+#
+pd.util.testing.assert_frame_equal(R.tcr,S.tcr)
+pd.util.testing.assert_frame_equal(R.bespo,S.bespo)
+pd.util.testing.assert_frame_equal(R.hkb,S.hkb)
+np.testing.assert_array_equal(R.ttcr,S.ttcr)
+np.testing.assert_array_equal(R.rssi,S.rssi)
+#
+# the time offset is applied on load
+#
+R = CorSer(serie=14,day=12)
+R.offset.setdefault(R._filename,{})['tcr_index'] = 5
+sdf = R.select('TCR',5,10)
+pd.util.testing.assert_frame_equal(sdf,R.tcr[(R.tcr.index>=5) & (R.tcr.index<=10)])
@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from pylayers.measures.cormoran import *
+
+#
+# serie store round trip on a small synthetic serie (no CORMORAN data)
+#
+tmpdir = tempfile.mkdtemp()
+filestore = os.path.join(tmpdir,'STORE','S14_CITI.h5')
+
+def serie(offset):
+    """ synthetic serie aligned on the mocap time, offset applied
+    """
+    S = CorSer.__new__(CorSer)
+    S._lazy = {}
+    S._storemeta = {}
+    S._storeindex = {}
+    S._filestore = filestore
+    S.scenario = '1'
+    S.run = '1'
+    S.typ = 'FULL'
+    S.video = 'video'
+    S._filename = 'serie'
+    S.offset = {'serie':{'tcr_index':offset,'bs_index':offset}}
+    S._fileTCR = 'tcr'
+    S._fileBS = 'bs'
+    S._filehkb = 'hkb'
+    t = np.arange(50)*0.1 + 0.05
+    S.tcr = pd.DataFrame({'a':np.arange(50.),'b':np.arange(50.)**2},index=t+3)
+    S.bespo = pd.DataFrame({'c':-np.arange(50.)},index=t)
+    S.hkb = pd.DataFrame({'d':3*np.arange(50.)},index=t)
+    S.ttcr = S.tcr.index
+    S._storeindex['ttcr'] = S.ttcr
+    S._storeindex['tcr'] = S.tcr.index
+    S._storeindex['bespo'] = S.bespo.index
+    S._apply_offset('TCR')
+    S._apply_offset('BS')
+    return S
+
+def reopen(offset):
+    """ serie read from the store
+    """
+    R = CorSer.__new__(CorSer)
+    R._lazy = {}
+    R._storemeta = {}
+    R._storeindex = {}
+    R._filestore = filestore
+    R._openstore()
+    for key in ['hkb','tcr','bespo']:
+        assert R._fromstore(key)
+    R._filename = 'serie'
+    R.offset = {'serie':{'tcr_index':offset,'bs_index':offset}}
+    return R
+
+try:
+    for offset in [-3,4]:
+        S = serie(offset)
+        S.savestore(overwrite=True)
+        assert os.path.isfile(filestore)
+        R = reopen(offset)
+        assert R.typ == 'FULL'
+        assert R._fileTCR == 'tcr'
+        for techno,key in [('TCR','tcr'),('BS','bespo'),('HKB','hkb')]:
+            df = getattr(S,key)
+            for t0,t1 in [(0,np.inf),(df.index[5],df.index[20]),(1.,2.5)]:
+                sdf = R.select(techno,t0,t1)
+                # select reads the time range without loading the frame
+                assert key in R._lazy
+                pd.util.testing.assert_frame_equal(sdf,
+                    df[(df.index>=t0) & (df.index<=t1)])
+        #
+        # lazy data frames
+        #
+        pd.util.testing.assert_frame_equal(R.tcr,S.tcr)
+        pd.util.testing.assert_frame_equal(R.bespo,S.bespo)
+        pd.util.testing.assert_frame_equal(R.hkb,S.hkb)
+        np.testing.assert_array_equal(R.ttcr,S.ttcr)
+        #
+        # the time offset is applied on load : a change of offset does not
+        # require to rebuild the store
+        #
+        R = reopen(2)
+        S2 = serie(2)
+        pd.util.testing.assert_frame_equal(R.select('TCR',1,4),
+            S2.tcr[(S2.tcr.index>=1) & (S2.tcr.index<=4)])
+        pd.util.testing.assert_frame_equal(R.tcr,S2.tcr)
+        np.testing.assert_array_equal(R.ttcr,S2.ttcr)
+    #
+    # an existing store is kept unless overwrite is True
+    #
+    mtime = os.path.getmtime(filestore)
+    serie(4).savestore()
+    assert os.path.getmtime(filestore) == mtime
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+from pylayers.measures.cormoran import *
+
+#
+# Visibility : fill by windows, cut, count, todense and tomda
+#
+links = np.array([['a','b'],['a','c'],['b','c']])
+nframe = 45
+cut = np.random.rand(len(links),nframe) > 0.5
+V = Visibility(links,nframe)
+for k0 in range(0,nframe,16):
+    V.fill(k0,cut[:,k0:k0+16])
+np.testing.assert_array_equal(V.todense(),cut)
+np.testing.assert_array_equal(V.count(),np.sum(cut,axis=1))
+for frames in [slice(None),slice(3,20),slice(9,45,4),slice(30,10)]:
+    np.testing.assert_array_equal(V.cut(1,frames=frames),cut[1,frames])
+np.testing.assert_array_equal(V.cut('c','b'),cut[2])
+np.testing.assert_array_equal(V[('a','c')],cut[1])
+M,dev = V.tomda()
+assert list(dev) == ['a','b','c']
+np.testing.assert_array_equal(M[0,1],cut[0])
+np.testing.assert_array_equal(M[2,0],cut[1])
+assert np.isnan(M[1,1]).all()
+
+#
+# compute_visibility on a synthetic serie : a static body segment (pole at
+# the origin) and a cylinder (at y=10) are crossed by the links TCR:1-TCR:2
+# and TCR:3-TCR:4 when the moving device is close to y=0
+#
+class Seg(object):
+    pass
+
+nframe = 101
+r = 0.1
+y = np.linspace(-2,2,nframe)
+S = CorSer.__new__(CorSer)
+S.typ = 'TCR'
+S.tcr = pd.DataFrame()
+S.dTCR = {'COORD':31,'A':1,'B':2,'C':3,'D':4}
+S.idTCR = dict([(v,k) for k,v in S.dTCR.items()])
+pos = {'TCR:1':np.array([-1.,0,1])[:,None]*np.ones(nframe),
+       'TCR:2':np.array([np.ones(nframe),y,np.ones(nframe)]),
+       'TCR:3':np.array([-1.,10,1])[:,None]*np.ones(nframe),
+       'TCR:4':np.array([np.ones(nframe),10+y,np.ones(nframe)])}
+S.devdf = pd.concat([pd.DataFrame({'id':d,'x':p[0],'y':p[1],'z':p[2]})
+                     for d,p in sorted(pos.items())])
+pole = Seg()
+pole.d = np.array([[0.,0,0],[0,0,2]]).T[:,:,None]*np.ones(nframe)
+pole.sl = np.array([[0,1,r]])
+pole.dev = {}
+cyl = Seg()
+cyl.d = np.array([[0.,10,2]]).T[:,:,None]*np.ones(nframe)
+cyl.topnode = 0
+cyl.radius = r*np.ones(nframe)
+S.B = {'Pole':pole,'Cylindre:':cyl}
+
+# the link crosses the segment axis at distance |y|/2
+expected = np.abs(y/2.) <= r-0.01
+assert expected.any() and not expected.all()
+I,lk = S.compute_visibility(techno='TCR',square_mda=False)
+for k,l in enumerate(lk):
+    if sorted(l) in [['A','B'],['C','D']]:
+        np.testing.assert_array_equal(I[k],expected)
+    else:
+        assert not I[k].any()
+#
+# windows of frames versus a single window
+#
+for chunk in [8,13,32,nframe]:
+    V,lkc = S.compute_visibility(techno='TCR',chunk=chunk,packed=True)
+    np.testing.assert_array_equal(lkc,lk)
+    np.testing.assert_array_equal(V.todense(),I)
+    np.testing.assert_array_equal(V.count(),np.sum(I,axis=1))
+M,dev = S.compute_visibility(techno='TCR')
+np.testing.assert_array_equal(M,V.tomda()[0])
@@ -78,6 +78,9 @@ class Agent(object):
            'save': list of string
                 list of save method ( soon deprecated)
            'sim':Simpy.SimulationRT.Simulation(),
+           'crowd': transit.Crowd
+                if given, the agent is moved by the crowd process instead
+                of its own Person.move process (default None)
            'epwr': dictionnary
                 dictionnary of emmited power of transsmitter{'wstd#':epwr value}
            'sens': dictionnary
@@ -113,6 +116,7 @@ class Agent(object):
                     'world': world(),
                     'save': [],
                     'sim': Simulation(),
+                    'crowd': None,
                     'epwr': {},
                     'sens': {},
                     'dcond': {},
@@ -180,7 +184,10 @@ class Agent(object):
                              epwr=self.epwr, sens=self.sens, typ=self.typ)
             self.net.add_nodes_from(self.node.nodes(data=True))
 
-            self.sim.activate(self.meca, self.meca.move(), 0.0)
+            if args['crowd'] is None:
+                self.sim.activate(self.meca, self.meca.move(), 0.0)
+            else:
+                args['crowd'].add(self.meca)
             self.PN = self.net.node[self.ID]['PN']
 
             # Communication init
@@ -26,6 +26,7 @@ This class implements the body model
     Body.geomfile
     Body.movie
     Body.intersectBody
+    Body.shadowing
     Body.body_link
     Body.cylinder_basis_k
     Body.cyl_antenna
@@ -41,6 +42,7 @@ Miscelianous Functions
     rotation
     dist
     Global_Trajectory
+    shadowloss
 
 """
 import numpy as np
@@ -65,6 +67,7 @@ import doctest
 import itertools as itt
 from pylayers.util.project import *
 import itertools
+import multiprocessing as mp
 try:
     from mayavi import mlab 
     from tvtk.tools import visual
@@ -72,6 +75,9 @@ try:
 except:
     print 'mayavi not installed'
 
+# arrays of Body.shadowing shared with the worker processes
+_shargs = None
+
 
 class Body(PyLayers):
     """ Class  to manage a Body model
@@ -429,7 +435,7 @@ class Body(PyLayers):
         return(di)
 
 
-    def loadC3D(self, filename='07_01.c3d', nframes=-1 ,unit='cm'):
+    def loadC3D(self, filename='07_01.c3d', nframes=-1 ,unit='cm', start=0):
         """ load nframes of motion capture C3D file
 
         Parameters
@@ -438,18 +444,33 @@ class Body(PyLayers):
         filename : string
             file name
         nframes : int
-            number of frames
+            number of frames (default -1 : all the frames)
         unit : str (mm|cm|mm
             unit of c3d file
+        start : int
+            index of the first frame
         rot : list ['x','y','z']
             swap axes of the c3d file
+
+        Notes
+        -----
+
+        Only the frames start:start+nframes are read from the file, long
+        sessions can be loaded by chunks. The time base self.time starts
+        at start/VideoFrameRate, the date of the first loaded frame in
+        the file.
+
         """
 
 
         #if 'pg' in dir(self):
         # del self.pg
         # s, p, f, info = c3d.read_c3d(filename)
-        self._s, self._p, self._f, info = c3d.ReadC3d(filename)
+        if nframes<>-1:
+            frames = slice(start,start+nframes)
+        else:
+            frames = slice(start,None)
+        self._s, self._p, self._f, info = c3d.ReadC3d(filename,frames=frames)
 
         if self._multi_subject_mocap:
             us = [us for us, s in enumerate(self._s) if self.name in s ]
@@ -474,10 +495,7 @@ class Body(PyLayers):
         self.mocapinfo = info
 
         self.filename = filename
-        if nframes<>-1:
-            self.nframes = nframes
-        else:
-            self.nframes = np.shape(self._f)[0]
+        self.nframes = np.shape(self._f)[0]
         #
         # s : prefix
         # p : list of points name
@@ -502,7 +520,9 @@ class Body(PyLayers):
         self.Tmocap = self.nframes / info['VideoFrameRate']
 
         # time base of the motion capture file (sec)
-        self.time = np.linspace(0,self.Tmocap,self.nframes)
+        # offset of the first loaded frame
+        t0 = start / info['VideoFrameRate']
+        self.time = t0 + np.linspace(0,self.Tmocap,self.nframes)
 
     def ccsfromc3d(self,config):
         """ Create ccs from C3D file
@@ -2549,8 +2569,8 @@ class Body(PyLayers):
                     C = self.topos[:,kta]
                     D = self.topos[:,khe]
                 else:
-                    kta  = self.sl[k,0]
-                    khe  = self.sl[k,1]
+                    kta  = int(self.sl[k,0])
+                    khe  = int(self.sl[k,1])
                     C = self.d[:,kta,frameId]
                     D = self.d[:,khe,frameId]
 
@@ -2617,8 +2637,8 @@ class Body(PyLayers):
                 C = self.topos[:,kta]
                 D = self.topos[:,khe]
             else:
-                kta  = self.sl[k,0]
-                khe  = self.sl[k,1]
+                kta  = int(self.sl[k,0])
+                khe  = int(self.sl[k,1])
                 C = self.d[:,kta,frameId]
                 D = self.d[:,khe,frameId]
 
@@ -2672,8 +2692,8 @@ class Body(PyLayers):
                 C = self.topos[:,kta]
                 D = self.topos[:,khe]
             else:
-                kta  = self.sl[k,0]
-                khe  = self.sl[k,1]
+                kta  = int(self.sl[k,0])
+                khe  = int(self.sl[k,1])
                 C = self.d[:,kta,frameId]
                 D = self.d[:,khe,frameId]
 
@@ -2766,20 +2786,20 @@ class Body(PyLayers):
                 C = self.topos[:,kta]
                 D = self.topos[:,khe]
             else:
-                kta  = self.sl[k,0]
-                khe  = self.sl[k,1]
+                kta  = int(self.sl[k,0])
+                khe  = int(self.sl[k,1])
                 C = self.d[:,kta,frameId]
                 D = self.d[:,khe,frameId]
 
             alpha, beta,dmin = seg.dmin3d(A,B,C,D)
             if alpha < 0:
-                alpha = 0
+                alpha = np.zeros(alpha.shape)
             if alpha > 1 :
-                alpha  = 1
+                alpha  = np.ones(alpha.shape)
             if beta < 0:
-                beta = 0
+                beta = np.zeros(beta.shape)
             if beta > 1:
-                beta = 1
+                beta = np.ones(beta.shape)
             dmin = np.sqrt(seg.dist (A,B,C,D,alpha,beta)[1])
             
             diff = 0.9*self.sl[k,2] - dmin
@@ -2807,6 +2827,144 @@ class Body(PyLayers):
 
 
 
+    def shadowing(self, A, B, model='intersect', cyl=[], frameId=[],
+                  step=1, topos=False, lmd=0.06, nproc=1, chunk=0):
+        """ body shadowing of a set of links over a set of frames
+
+        Parameters
+        ----------
+
+        A : np.array (3 x nlink x nframes) or (3 x nlink)
+            first end of the links for each frame of the body
+            (3 x nlink : static links)
+        B : np.array (3 x nlink x nframes) or (3 x nlink)
+            second end of the links
+        model : string
+            'intersect' : number of cylinders intersecting the link
+            (intersectBody)
+            'knife' : knife edge loss (intersectBody3)
+            'linear' : linear loss (intersectBody4)
+        cyl : list
+            cylinders taken into account (default all the cylinders for
+            'intersect', the cylinder 0 for 'knife' and 'linear')
+        frameId : list or np.array
+            frames of the body (default all), frames of the links
+            if topos is True
+        step : int
+            frame striding
+        topos : boolean
+            if True the static body in topos is used for all the frames
+            of the links
+        lmd : float
+            wavelength (m) of the knife edge model
+        nproc : int
+            number of processes (0 : number of cpu)
+        chunk : int
+            number of frames evaluated at once
+
+        Returns
+        -------
+
+        L : np.array (nlink x nframe)
+            number of intersected cylinders ('intersect') or
+            linear attenuation factor ('knife','linear')
+
+        Examples
+        --------
+
+        >>> from pylayers.mobility.ban.body import *
+        >>> B = Body()
+        >>> A = B.d[:,[10,12],:]
+        >>> Z = B.d[:,[13,15],:]
+        >>> L = B.shadowing(A,Z,step=5)
+
+        Notes
+        -----
+
+        All the cylinders and all the links of a block of frames are
+        evaluated at once with DeuxSeg.segdist. The default cylinders
+        are the ones of intersectBody (all) for 'intersect' and of
+        intersectBody3 and intersectBody4 (cylinder 0) for 'knife' and
+        'linear'. With several cylinders the 'knife' and 'linear' losses
+        (dB) of the cylinders add up, which has no equivalent in
+        intersectBody3 and intersectBody4.
+
+        The blocks of frames are dispatched to a pool of processes
+        if nproc > 1. The arrays are published as a module global
+        before the pool is forked.
+
+        See Also
+        --------
+
+        shadowloss
+        pylayers.mobility.ban.DeuxSeg.segdist
+
+        """
+        global _shargs
+
+        if len(cyl) == 0:
+            if model == 'intersect':
+                cyl = range(self.ncyl)
+            else:
+                cyl = [0]
+        sl = self.sl[cyl, :]
+        kta = sl[:, 0].astype(int)
+        khe = sl[:, 1].astype(int)
+
+        if topos:
+            # frames of the links
+            nf = max([X.shape[2] for X in (A, B) if X.ndim == 3] + [1])
+        else:
+            nf = self.d.shape[2]
+        if len(frameId) == 0:
+            frameId = np.arange(nf)
+        fr = np.array(frameId)[::step]
+        nframe = len(fr)
+        if topos:
+            C = np.repeat(self.topos[:, kta][..., np.newaxis], nframe, axis=2)
+            D = np.repeat(self.topos[:, khe][..., np.newaxis], nframe, axis=2)
+        else:
+            C = self.d[:, kta, :][:, :, fr]
+            D = self.d[:, khe, :][:, :, fr]
+
+        if A.ndim == 2:
+            A = np.repeat(A[..., np.newaxis], nframe, axis=2)
+        else:
+            A = A[:, :, fr]
+        if B.ndim == 2:
+            B = np.repeat(B[..., np.newaxis], nframe, axis=2)
+        else:
+            B = B[:, :, fr]
+        nlink = A.shape[1]
+
+        if nproc == 0:
+            nproc = mp.cpu_count()
+        nproc = max(1, min(nproc, nframe))
+        if chunk == 0:
+            # bounds the (nlink x ncyl x chunk) segdist arrays
+            chunk = max(1, min(nframe / nproc, 100000 / (nlink * len(cyl))))
+        ltask = [(k, min(k + chunk, nframe)) for k in range(0, nframe, chunk)]
+
+        # published before fork : shared read-only by the workers
+        _shargs = (A, B, C, D, sl[:, 2], model, lmd)
+        try:
+            if nproc == 1:
+                lres = map(_shadow, ltask)
+            else:
+                pool = mp.Pool(processes=nproc)
+                try:
+                    lres = pool.map(_shadow, ltask)
+                    pool.close()
+                finally:
+                    pool.terminate()
+                    pool.join()
+        finally:
+            _shargs = None
+
+        if len(lres) == 0:
+            return np.zeros((nlink, 0))
+        return np.hstack(lres)
+
     def body_link(self, topos = True,frameId = 0):
         """ body link
 
@@ -2947,6 +3105,93 @@ class Body(PyLayers):
 
 
 
+def shadowloss(A, B, C, D, r, model='intersect', lmd=0.06):
+    """ shadowing of links by cylinders
+
+    Parameters
+    ----------
+
+    A : np.array (3 x nlink x nframe)
+        first end of the links
+    B : np.array (3 x nlink x nframe)
+        second end of the links
+    C : np.array (3 x ncyl x nframe)
+        tail of the cylinders
+    D : np.array (3 x ncyl x nframe)
+        head of the cylinders
+    r : np.array (ncyl)
+        radius of the cylinders
+    model : string
+        'intersect' | 'knife' | 'linear'
+    lmd : float
+        wavelength (m) of the knife edge model
+
+    Returns
+    -------
+
+    L : np.array (nlink x ncyl x nframe)
+        'intersect' : 1 if the link is intersected by the cylinder, 0 otherwise
+        'knife' : knife edge loss (dB) (see Body.intersectBody3)
+        'linear' : linear loss (dB) (see Body.intersectBody4)
+
+    """
+    f, g, X, Y, alpha, beta, dmin = seg.segdist(A, B, C, D, hard=True)
+    r = r[np.newaxis, :, np.newaxis]
+    if model == 'intersect':
+        u = (g < r) & (alpha > 0) & (alpha < 1) & (beta > 0) & (beta < 1)
+        return u.astype(float)
+    elif model == 'knife':
+        dAB = np.sqrt(np.sum((A - B)**2, axis=0))[:, np.newaxis, :]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            w = np.sqrt(2 / (lmd * dAB * abs(alpha) * abs(1 - alpha))) * 0.05
+            nu1 = (r - g) * w
+            nu2 = (g + r) * w
+            l1 = 6.9 + 20 * np.log10(np.sqrt((nu1 - 0.1)**2 + 1) + nu1 - 0.1)
+            l2 = 6.9 + 20 * np.log10(np.sqrt((nu2 - 0.1)**2 + 1) + nu2 - 0.1)
+            l1 = np.where(nu1 > -0.7, l1, 0.)
+            l2 = np.where(nu2 > -0.7, l2, 0.)
+            L = 10 * np.log10(10**(l1 / 10.) + 10**(l2 / 10.))
+        return np.where(g < r, L, 0.)
+    elif model == 'linear':
+        diff = 0.9 * r - g
+        return np.where((g < r) & (diff > 0), -7 * diff / r - 3, 0.)
+    else:
+        raise NameError('shadowloss : unknown model ' + model)
+
+
+def _shadow(k):
+    """ shadowing of the links for a block of frames
+
+    Parameters
+    ----------
+
+    k : tuple
+        (first frame, last frame + 1) of the block
+
+    Returns
+    -------
+
+    L : np.array (nlink x nframe)
+
+    Notes
+    -----
+
+    The arrays are read from the module global _shargs which is set
+    by Body.shadowing.
+
+    """
+    A, B, C, D, r, model, lmd = _shargs
+    sl = slice(k[0], k[1])
+    L = shadowloss(A[:, :, sl], B[:, :, sl], C[:, :, sl], D[:, :, sl],
+                   r, model=model, lmd=lmd)
+    L = np.sum(L, axis=1)
+    if model == 'knife':
+        L = 10**(-L / 10.)
+    elif model == 'linear':
+        L = 10**(L / 10.)
+    return L
+
+
 def translate(cycle, new_origin):
     """  rotate a cycle of frames by an angle alpha
 
@@ -3155,7 +3400,7 @@ class Cylinder(object):
         filename : string
             file name
         nframes : int
-            number of frames
+            number of frames (default -1 : all the frames)
         unit : str (mm|cm|mm
             unit of c3d file
         rot : list ['x','y','z']
@@ -3166,7 +3411,11 @@ class Cylinder(object):
         #if 'pg' in dir(self):
         # del self.pg
         # s, p, f, info = c3d.read_c3d(filename)
-        self._s, self._p, self._f, info = c3d.ReadC3d(filename)
+        if nframes<>-1:
+            frames = slice(0,nframes)
+        else:
+            frames = slice(None)
+        self._s, self._p, self._f, info = c3d.ReadC3d(filename,frames=frames)
         us = [us for us, s in enumerate(self._s) if self.name in s ]
         up = [up for up, p in enumerate(self._p) if self.name in p ]
 
@@ -37,6 +37,17 @@ Utility Functions
     getNumber
     getFloat
     read_c3d
+    ReadC3d
+
+C3dPoints Class
+===============
+
+.. autosummary::
+    :toctree: generated/
+
+     C3dPoints.__init__
+     C3dPoints.__getitem__
+     C3dPoints.raw
 
 """
 import string
@@ -128,6 +139,169 @@ def getFloat(Str,processor=1):
     return floatNumber,Str[4:]
 
 
+def _vax(w):
+    """ DEC-VAX floats to numbers
+
+    Parameters
+    ----------
+
+    w : np.array (...,2) uint16
+        words of the VAX F floats
+
+    """
+    u = np.asarray((w[...,0].astype(np.uint32) << 16) | w[...,1], dtype=np.uint32)
+    return u.reshape(-1).view(np.float32).reshape(u.shape)/4.
+
+
+class C3dPoints(object):
+    """ 3D points of a c3d file
+
+    The data block of the file is mapped with np.memmap as an array of
+    frame records, the frames are only read and decoded when they are
+    sliced.
+
+    Attributes
+    ----------
+
+    filename : string
+    proctype : int
+        1 : Intel
+        2 : DEC
+        3 : SGI
+    dinfo : dict
+        header information (see ReadC3d)
+    shape : tuple
+        (nframes, nmarkers, 3)
+
+    Examples
+    --------
+
+    >>> from pylayers.mobility.ban.c3d import *
+    >>> P = C3dPoints('07_01.c3d')
+    >>> f = P[100:200]
+
+    """
+    def __init__(self, _filename='07_01.c3d'):
+        # check if local or global path
+        if ('/' in _filename) or ('\\' in _filename):
+            self.filename = _filename
+        else:
+            self.filename = pyu.getlong(_filename, os.path.join('body','c3d'))
+        fid = open(self.filename,'rb')
+        header = fid.read(512)
+        NrecordFirstParameterblock = ord(header[0])
+        if ord(header[1]) != 80:
+            fid.close()
+            raise IOError(self.filename + ' does not comply to the C3D format')
+        fid.seek(512 * (NrecordFirstParameterblock - 1) + 3)
+        # proctype: 1(INTEL-PC); 2(DEC-VAX); 3(MIPS-SUN/SGI)
+        self.proctype = ord(fid.read(1)) - 83
+        fid.close()
+        if self.proctype == 3:
+            bo = '>'
+        else:
+            bo = '<'
+        word = np.frombuffer(header, dtype=bo+'u2')
+        if self.proctype == 2:
+            real = lambda k : float(_vax(word[k:k+2]))
+        else:
+            real = lambda k : float(np.frombuffer(header[2*k:2*k+4], dtype=bo+'f4')[0])
+        Nmarkers = int(word[1])
+        NanalogSamplesPerVideoFrame = int(word[2])
+        StartFrame = int(word[3])
+        EndFrame = int(word[4])
+        Scale = real(6)
+        NrecordDataBlock = int(word[8])
+        NanalogFramesPerVideoFrame = int(word[9])
+        VideoFrameRate = real(10)
+        self.dinfo = {}
+        self.dinfo['NanalogFramesPerVideoFRame'] = NanalogFramesPerVideoFrame
+        self.dinfo['AnalogFrameRate'] = VideoFrameRate * NanalogFramesPerVideoFrame
+        self.dinfo['VideoFrameRate'] = VideoFrameRate
+        self.dinfo['Scale'] = Scale
+        self.dinfo['Nmarkers'] = Nmarkers
+        self.dinfo['StartFrame'] = StartFrame
+        self.dinfo['EndFrame'] = EndFrame
+        self.offset = 512 * (NrecordDataBlock - 1)
+        #
+        # frame record : Nmarkers x (x,y,z,residual/camera)
+        #                followed by the analog samples
+        #
+        if Scale < 0:
+            if self.proctype == 2:
+                typ = ('<u2',(2,))
+            else:
+                typ = bo+'f4'
+        else:
+            typ = bo+'i2'
+        self._dtype = np.dtype([('point',typ,(Nmarkers,4)),
+                                ('analog',typ,(NanalogSamplesPerVideoFrame,))])
+        nframes = EndFrame - StartFrame + 1
+        nmax = (os.path.getsize(self.filename) - self.offset) / self._dtype.itemsize
+        nframes = max(min(nframes, nmax), 0)
+        if nframes > 0:
+            self._mm = np.memmap(self.filename, dtype=self._dtype, mode='r',
+                                 offset=self.offset, shape=(nframes,))
+        else:
+            self._mm = np.zeros(0, dtype=self._dtype)
+        self.shape = (nframes, Nmarkers, 3)
+
+    def __repr__(self):
+        s = 'C3dPoints : ' + self.filename + '\n'
+        s = s + 'nframes : ' + str(self.shape[0]) + '\n'
+        s = s + 'nmarkers : ' + str(self.shape[1]) + '\n'
+        s = s + 'Scale : ' + str(self.dinfo['Scale'])
+        return s
+
+    def __len__(self):
+        return self.shape[0]
+
+    def raw(self, k=slice(None)):
+        """ stored values of frames k
+
+        Parameters
+        ----------
+
+        k : int, slice or index array
+
+        Returns
+        -------
+
+        r : np.array (...,nmarkers,4)
+            stored x, y, z and residual/camera word
+
+        """
+        r = self._mm[k]['point']
+        if self.proctype == 2 and self.dinfo['Scale'] < 0:
+            r = _vax(r)
+        return np.array(r, dtype=float)
+
+    def __getitem__(self, k):
+        """ coordinates of frames k
+
+        Parameters
+        ----------
+
+        k : int, slice or index array
+
+        Returns
+        -------
+
+        f : np.array (...,nmarkers,3)
+
+        Notes
+        -----
+
+        integer coordinates are multiplied by Scale, float coordinates
+        are stored scaled.
+
+        """
+        f = self.raw(k)[...,0:3]
+        if self.dinfo['Scale'] > 0:
+            f = f * self.dinfo['Scale']
+        return f
+
+
 # Input:        FullFileName - file (including path) to be read
 #
 # Variable:
@@ -271,9 +445,11 @@ def read_c3d(_filename='07_01.c3d',verbose=False):
     #ind=findstr(FullFileName,'\');
     #if ind>0, FileName=FullFileName(ind(length(ind))+1:length(FullFileName)); else FileName=FullFileName; end
         print "FileName = ", FullFileName
+    P = C3dPoints(FullFileName)
     fid = open(FullFileName, 'rb')
-    # native format (PC-intel)
-    content = fid.read()
+    # header and parameter section
+    content = fid.read(P.offset)
+    fid.close()
     content_memory = content
 
     NrecordFirstParameterblock, content = getNumber(content, 1)     # Reading record number of parameter section
@@ -603,140 +779,17 @@ def read_c3d(_filename='07_01.c3d',verbose=False):
     ## ##    read data block                        ##
     ## ##                                           ##
     ## ###############################################
-    ##  Get the coordinate and analog data
-    #
-    content = content_memory
-    content = content[(NrecordDataBlock - 1) * 512:]
-
-    NvideoFrames = EndFrame - StartFrame + 1
-    if verbose:
-        print "NVideoFrames = ", NvideoFrames
-
-    for i in range(NvideoFrames):
-        Markers.append([])
-        ResidualError.append([])
-        CameraInfo.append([])
-        for j in range(Nmarkers):
-            Markers[i].append(Marker(0.0, 0.0, 0.0))
-            ResidualError[i].append(0)
-            CameraInfo[i].append(0)
-
-    #print Markers
+    ##  Get the coordinate data
     #
-    #if Scale < 0
-    #    for i=1:NvideoFrames
-    #        for j=1:Nmarkers
-    #            Markers(i,j,1:3)=fread(fid,3,'float32')';
-    #            a=fix(fread(fid,1,'float32'));
-    #            highbyte=fix(a/256);
-    #            lowbyte=a-highbyte*256;
-    #            CameraInfo(i,j)=highbyte;
-    #            ResidualError(i,j)=lowbyte*abs(Scale);
-    #        end
-    #        waitbar(i/NvideoFrames)
-    #        for j=1:NanalogFramesPerVideoFrame,
-    #            AnalogSignals(j+NanalogFramesPerVideoFrame*(i-1),1:NanalogChannels)=...
-    #                fread(fid,NanalogChannels,'int16')';
-    #        end
-    #    end
     if verbose:
+        print "NVideoFrames = ", len(P)
         print "***************************"
         print "**** Reading DataBlock ...."
         print "***************************"
-    ptr_read = 0
-    if Scale < 0.0:
-        for i in range(NvideoFrames):
-            if verbose:
-                print "*",
-            for j in range(Nmarkers):
-                #x, content = getFloat(content)
-                #y, content = getFloat(content)
-                #z, content = getFloat(content)
-                x = struct.unpack('f', content[ptr_read:ptr_read + 4])[0]
-                ptr_read += 4
-                y = struct.unpack('f', content[ptr_read:ptr_read + 4])[0]
-                ptr_read += 4
-                z = struct.unpack('f', content[ptr_read:ptr_read + 4])[0]
-                ptr_read += 4
-                Markers[i][j].x = x * Scale
-                Markers[i][j].y = y * Scale
-                Markers[i][j].z = z * Scale
-                #a, content  = getFloat(content)
-                a = struct.unpack('f', content[ptr_read:ptr_read + 4])[0]
-                ptr_read += 4
-                a = int(a)
-                highbyte = int(a / 256)
-                lowbyte = a - highbyte * 256
-                CameraInfo[i][j] = highbyte
-                ResidualError[i][j] = lowbyte * abs(Scale)
-                #if i< 2:
-                #print Markers[i][j]
-            ptr_read += NanalogFramesPerVideoFrame * NanalogChannels * 2
-            #for j in range (NanalogFramesPerVideoFrame):
-            #  for k in range(NanalogChannels):
-            #    val, content = getNumber(content, 2)
-            #    AnalogSignals[j+NanalogFramesPerVideoFrame*(i)][k]=val #??? i-1
-    #else
-    #    for i=1:NvideoFrames
-    #        for j=1:Nmarkers
-    #            Markers(i,j,1:3)=fread(fid,3,'int16')'.*Scale;
-    #            ResidualError(i,j)=fread(fid,1,'int8');
-    #            CameraInfo(i,j)=fread(fid,1,'int8');
-    #        end
-    #        waitbar(i/NvideoFrames)
-    #        for j=1:NanalogFramesPerVideoFrame,
-    #            AnalogSignals(j+NanalogFramesPerVideoFrame*(i-1),1:NanalogChannels)=...
-    #                fread(fid,NanalogChannels,'int16')';
-    #        end
-    #    end
-    #end
 
-    else:
-        for i in range(NvideoFrames):
-            #print "**** Frame ", i, " *****"
-            print "*",
-            for j in range(Nmarkers):
-                #x, content = getNumber(content,2)
-                x = ord(content[ptr_read]) + ord(content[
-                    ptr_read + 1]) * (2 ** 8)
-                ptr_read += 2
-                if x > 32768:
-                    x = -(2 ** 16) + (x)
-                #y, content = getNumber(content,2)
-                y = ord(content[ptr_read]) + ord(content[
-                    ptr_read + 1]) * (2 ** 8)
-                ptr_read += 2
-                if y > 32768:
-                    y = -(2 ** 16) + (y)
-                #z, content = getNumber(content,2)
-                z = ord(content[ptr_read]) + ord(content[
-                    ptr_read + 1]) * (2 ** 8)
-                ptr_read += 2
-                if z > 32768:
-                    z = -(2 ** 16) + (z)
-                Markers[i][j].x = x * Scale
-                Markers[i][j].y = y * Scale
-                Markers[i][j].z = z * Scale
-                #if i< 2:
-                #  print Markers[i][j]
-                ResidualError[i][j], content = getNumber(content, 1)
-                CameraInfo[i][j], content = getNumber(content, 1)
-            ptr_read += NanalogFramesPerVideoFrame * NanalogChannels * 2
-            #for j in range (NanalogFramesPerVideoFrame):
-            #  for k in range(NanalogChannels):
-            #    val, content = getNumber(content, 2)
-                #AnalogSignals(j+NanalogFramesPerVideoFrame*(i-1),1:NanalogChannels)=val
-    """
-            Added
-    """
-    Frames = np.ndarray(shape=(NvideoFrames, Nmarkers, 3), dtype = float)
-    for i in range(0, NvideoFrames):
-        for j in range(0, Nmarkers):
-            Frames[i, j, 0] = -Markers[i][j].x
-            Frames[i, j, 1] = -Markers[i][j].y
-            Frames[i, j, 2] = -Markers[i][j].z
+    Frames = -Scale * P.raw()[:, :, 0:3]
     return(Subjects, Point, Frames,dinfo)
-def ReadC3d(_filename='07_01.c3d', verbose=False):
+def ReadC3d(_filename='07_01.c3d', verbose=False, frames=slice(None), lazy=False):
     """ read c3d file
 
     Parameters
@@ -744,6 +797,20 @@ def ReadC3d(_filename='07_01.c3d', verbose=False):
 
     _filename : string
     verbose : boolean
+    frames : slice or index array
+        frames to be read (default all)
+    lazy : boolean
+        if True the frames are returned as a C3dPoints object, which
+        reads the frames when it is sliced
+
+    Returns
+    -------
+
+    Subjects : list of subject prefixes
+    Point : list of point labels
+    frames : np.array (nframes x nmarkers x 3) or C3dPoints
+    dinfo : dict
+
     """
 
     # check if local or global path
@@ -763,8 +830,11 @@ def ReadC3d(_filename='07_01.c3d', verbose=False):
     if verbose:
         print "FileName = ", FullFileName
 
+    P = C3dPoints(FullFileName)
     fid = open(FullFileName,'rb')
-    content = fid.read()
+    # header and parameter section
+    content = fid.read(P.offset)
+    fid.close()
     content_memory = content
 
     NrecordFirstParameterblock, content = getNumber(content, 1)
@@ -1026,39 +1096,10 @@ def ReadC3d(_filename='07_01.c3d', verbose=False):
         if GroupNumber >= 128:
             GroupNumber = -(2 ** 8) + (GroupNumber)
 
-    #buff = content_memory
-    #buff = content[(NrecordDataBlock - 1) * 512:]
-    fd = open(FullFileName,'rb')
-    buff = fd.read()
-    fd.close()
-
-    offset = (NrecordDataBlock -1)*512
-
-    nframe = EndFrame - StartFrame + 1
-    npoints = Nmarkers
-    nbytes = nframe*npoints*16
-    nfloat = nframe*npoints*4
-    frame1 = StringIO(buff[offset:offset+nbytes])
-    frames = np.array(frame1.read(nbytes))
-    forma = str(nbytes)+'S1'
-    y = frames.view(forma).reshape((nframe*npoints,16))
-    if proctype>1:
-        z = np.empty(shape=y.shape,dtype=y.dtype)
-        z[:,0:2]=y[:,2:4]
-        z[:,2:4]=y[:,0:2]
-        z[:,4:6]=y[:,6:8]
-        z[:,6:8]=y[:,4:6]
-        z[:,8:10]=y[:,10:12]
-        z[:,10:12]=y[:,8:10]
-        z[:,12:14]=y[:,14:16]
-        z[:,14:16]=y[:,12:14]
+    if lazy:
+        frames = P
     else:
-        z = y
-
-    sfloat = str(nfloat)+'f'
-    frames = np.array(struct.unpack(sfloat,z)).reshape(nframe,npoints,4)
-
-    frames =frames[:,:,0:3]
+        frames = P[frames]
     return(Subjects,Point,frames,dinfo)
 
 
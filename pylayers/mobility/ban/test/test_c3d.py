@@ -0,0 +1,36 @@
+import numpy as np
+from pylayers.mobility.ban.c3d import *
+
+#
+# lazy frame access versus full read
+#
+s, p, f, info = ReadC3d('07_01.c3d')
+P = C3dPoints('07_01.c3d')
+assert P.shape == f.shape
+np.testing.assert_array_equal(P[10:20], f[10:20])
+np.testing.assert_array_equal(P[5], f[5])
+
+s, p, f2, info = ReadC3d('07_01.c3d', frames=slice(100, 150))
+np.testing.assert_array_equal(f2, f[100:150])
+
+#
+# DEC file with integer coordinates
+#
+s, p, f3, info = ReadC3d('16_07.c3d')
+assert f3.shape == (info['EndFrame']-info['StartFrame']+1, info['Nmarkers'], 3)
+assert info['VideoFrameRate'] == 120
+
+#
+# time base of a chunk loaded by Body.loadC3D starts at the date of its
+# first frame
+#
+from pylayers.mobility.ban.body import *
+B = Body()
+B.loadC3D('07_01.c3d', nframes=50, start=100)
+fr = B.mocapinfo['VideoFrameRate']
+assert B.nframes == 50
+assert len(B.time) == 50
+np.testing.assert_almost_equal(B.time[0], 100/fr)
+np.testing.assert_almost_equal(B.time[-1]-B.time[0], B.Tmocap)
+B.loadC3D('07_01.c3d')
+assert B.time[0] == 0
@@ -0,0 +1,67 @@
+import numpy as np
+from pylayers.mobility.ban.body import *
+
+B = Body()
+nf = B.d.shape[2]
+nl = 6
+#
+# random links around the trunk
+#
+c = B.d.mean(axis=1)[:,np.newaxis,:]
+A = np.random.randn(3,nl,nf)*0.3 + c
+Z = np.random.randn(3,nl,nf)*0.3 + c
+
+fr = range(0,nf,10)
+I = B.shadowing(A,Z,step=10)
+K = B.shadowing(A,Z,model='knife',cyl=[0],step=10)
+N = B.shadowing(A,Z,model='linear',step=10)
+assert I.shape == (nl,len(fr))
+assert N.shape == (nl,len(fr))
+# the knife and linear models default to the cylinder 0
+np.testing.assert_array_equal(B.shadowing(A,Z,model='knife',step=10),K)
+#
+# frame by frame , link by link
+#
+for j,f in enumerate(fr):
+    for l in range(nl):
+        i = B.intersectBody(A[:,l,f],Z[:,l,f],topos=False,frameId=f)
+        k = B.intersectBody3(A[:,l,f],Z[:,l,f],topos=False,frameId=f)
+        n = B.intersectBody4(A[:,l,f],Z[:,l,f],topos=False,frameId=f)
+        assert I[l,j] == np.sum(i)
+        np.testing.assert_allclose(K[l,j],k)
+        np.testing.assert_allclose(N[l,j],n)
+#
+# multi-process chunking
+#
+I2 = B.shadowing(A,Z,step=10,nproc=2,chunk=4)
+np.testing.assert_array_equal(I,I2)
+#
+# links crossing the trunk : the linear loss is active
+#
+c0 = 0.5*(B.d[:,int(B.sl[0,0]),:]+B.d[:,int(B.sl[0,1]),:])
+A0 = c0[:,np.newaxis,:] + np.array([-1.,0,0])[:,np.newaxis,np.newaxis]
+Z0 = c0[:,np.newaxis,:] + np.array([1.,0,0])[:,np.newaxis,np.newaxis]
+N0 = B.shadowing(A0,Z0,model='linear',step=10)
+assert np.all(N0 < 1)
+for j,f in enumerate(fr):
+    n = B.intersectBody4(A0[:,0,f],Z0[:,0,f],topos=False,frameId=f)
+    np.testing.assert_allclose(N0[0,j],n)
+#
+# static body of topos, moving links (3 x nlink x nframe) and static links
+#
+B.topos = B.d[:,:,5]
+It = B.shadowing(A,Z,topos=True,step=10)
+Kt = B.shadowing(A,Z,model='knife',topos=True,step=10)
+Nt = B.shadowing(A0,Z0,model='linear',topos=True,step=10)
+assert It.shape == (nl,len(fr))
+for j,f in enumerate(fr):
+    n = B.intersectBody4(A0[:,0,f],Z0[:,0,f],topos=True)
+    np.testing.assert_allclose(Nt[0,j],n)
+    for l in range(nl):
+        i = B.intersectBody(A[:,l,f],Z[:,l,f],topos=True)
+        k = B.intersectBody3(A[:,l,f],Z[:,l,f],topos=True)
+        assert It[l,j] == np.sum(i)
+        np.testing.assert_allclose(Kt[l,j],k)
+Is = B.shadowing(A[:,:,0],Z[:,:,0],topos=True)
+assert Is.shape == (nl,1)
+np.testing.assert_array_equal(Is[:,0],It[:,0])
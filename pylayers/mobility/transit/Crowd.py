@@ -0,0 +1,453 @@
+"""
+.. currentmodule:: pylayers.mobility.transit.Crowd
+
+Utility Functions
+=================
+
+.. autosummary::
+    :toctree: generated/
+
+    truncate
+
+Crowd Class
+===========
+
+.. autosummary::
+    :toctree: generated/
+
+    Crowd.__init__
+    Crowd.__repr__
+    Crowd.add
+    Crowd.drop
+    Crowd.state
+    Crowd.tick
+    Crowd.run
+    Crowd.sync
+    Crowd.savedf
+
+"""
+from SimPy.SimulationRT import Process,hold
+import numpy as np
+import pandas as pd
+from pylayers.mobility.transit.vec3 import vec3
+from pylayers.mobility.transit.World import world
+from pylayers.mobility.transit.SteeringBehavior import Seek, Separation, \
+    Containment, InterpenetrationConstraint
+import pylayers.util.pyutil as pyu
+
+
+def truncate(v, vmax):
+    """ truncate the length of an array of 2D vectors
+
+    Parameters
+    ----------
+
+    v : np.array (N x 2)
+    vmax : np.array (N)
+        maximal length
+
+    Returns
+    -------
+
+    vt : np.array (N x 2)
+
+    Notes
+    -----
+
+    vectorized version of vec3.truncate
+
+    """
+    n = np.sqrt(np.sum(v*v, axis=1))
+    s = np.where(n > vmax, vmax / np.where(n > 0, n, 1), 1.)
+    return v * s[:, np.newaxis]
+
+
+# arrays of the kinematic state of a crowd, one row per person
+_ARRAYS = ['p', 'v', 'a', 'lx', 'ly', 'destination', 'radius', 'max_speed',
+           'desired_speed', 'max_acceleration', 'arrived', 'moving', 'wake']
+
+
+class Crowd(Process):
+    """ Crowd Process
+
+    A crowd moves a set of transit.Person in a single process. The
+    kinematic state of the persons is kept in arrays (structure of
+    arrays) and all the persons are updated at once every interval,
+    with the vectorized version (calculate_all) of the steering behaviors.
+
+    Attributes
+    ----------
+
+    persons : list of transit.Person
+        the persons must be the boids of the world, in the same order
+        (the cancelled persons are dropped, see drop)
+    interval : float
+        refresh interval of the crowd mobility
+    world : pylayers.mobility.transit.World.World
+    net : pylayers.network.Network()
+        the positions of the persons are published in bulk at each tick
+    behaviors : list
+        steering behaviors providing a calculate_all method
+    p, v, a : np.array (N x 2)
+        position, velocity and acceleration of the persons
+    lx, ly : np.array (N x 2)
+        local frame of the persons
+    destination : np.array (N x 2)
+        current waypoint of the persons
+    radius, max_speed, desired_speed, max_acceleration : np.array (N)
+    arrived : np.array (N) bool
+    moving : np.array (N) bool
+    wake : np.array (N)
+        time at which a waiting person starts moving again
+    vsync : bool
+        if True the vec3 attributes of the persons are updated at each tick
+    save : list
+        'txt' and 'mysql' records of the moves, as in Person.move
+
+    Methods
+    -------
+
+    add
+    drop
+    state
+    tick
+    run
+    sync
+    savedf
+
+    Notes
+    -----
+
+    The update of a person is the one of Person.move. The differences are :
+
+    + all the persons share the crowd interval
+    + the steering of all the persons is computed from the state at the
+      beginning of the tick, a person does not see the persons moved
+      before it in the same tick
+    + a person starting from a waiting time or heading to a new waypoint
+      moves at the next tick of the crowd
+    + the zones are called for the moving persons at the beginning of the
+      tick, the arrays of a person are then reloaded from its attributes
+
+    """
+    def __init__(self, interval=0.05, wld=world(), net=None, sim=None,
+                 behaviors=[], save=[], vsync=False):
+        """ Class Crowd
+            inherits of Simpy.SimulationRT
+        """
+        Process.__init__(self, name='Crowd', sim=sim)
+        self.interval = interval
+        self.world = wld
+        self.net = net
+        if behaviors == []:
+            behaviors = [Seek(), Containment(),
+                         Separation(), InterpenetrationConstraint()]
+        for behavior in behaviors:
+            if not hasattr(behavior, 'calculate_all'):
+                raise AttributeError(behavior.__class__.__name__ +
+                                     ' has no vectorized calculate_all')
+        self.behaviors = behaviors
+        self.save = save
+        self.vsync = vsync
+        self.persons = []
+        self._all = []
+        self._id = np.zeros(0, dtype=int)
+        self._n = 0
+        self._traj = []
+
+    def __repr__(self):
+        s = 'Crowd\n*****\n'
+        s = s + 'number of persons: ' + str(len(self.persons)) + '\n'
+        s = s + 'interval: ' + str(self.interval) + '\n'
+        s = s + 'behaviors: ' + str([b.__class__.__name__ for b in self.behaviors])
+        return s
+
+    def add(self, person):
+        """ add a person to the crowd
+
+        Parameters
+        ----------
+
+        person : transit.Person
+
+        """
+        if self.world.index(person) != len(self.persons):
+            raise AttributeError('the persons of a crowd must be the boids '
+                                 'of its world, in the same order')
+        if self._n > 0:
+            self.sync()
+        self.persons.append(person)
+        self._id = np.hstack((self._id, len(self._all)))
+        self._all.append(person)
+
+    def drop(self):
+        """ remove the cancelled persons from the crowd
+
+        Returns
+        -------
+
+        n : int
+            number of persons removed
+
+        Notes
+        -----
+
+        Person.delete cancels the person and removes it from the world.
+        The remaining persons are reordered as the boids of the world.
+        Their trajectories are kept (see savedf).
+
+        """
+        keep = [k for k, b in enumerate(self.persons)
+                if not getattr(b, 'cancelled', 0)]
+        n = len(self.persons) - len(keep)
+        if n == 0:
+            return 0
+        if self._n != len(self.persons):
+            self._build()
+        W = self.world
+        keep.sort(key=lambda k: W.index(self.persons[k]))
+        for name in _ARRAYS:
+            setattr(self, name, getattr(self, name)[keep])
+        self.persons = [self.persons[k] for k in keep]
+        self._id = self._id[keep]
+        self._n = len(keep)
+        return n
+
+    def _load(self, idx):
+        """ fill rows of the arrays from the attributes of the persons
+
+        Parameters
+        ----------
+
+        idx : list
+            index of the persons
+
+        """
+        for k in idx:
+            b = self.persons[k]
+            self.p[k] = b.position.x, b.position.y
+            self.v[k] = b.velocity.x, b.velocity.y
+            self.a[k] = b.acceleration.x, b.acceleration.y
+            self.lx[k] = b.localx.x, b.localx.y
+            self.ly[k] = b.localy.x, b.localy.y
+            self.destination[k] = b.destination.x, b.destination.y
+            self.radius[k] = b.radius
+            self.max_speed[k] = b.max_speed
+            self.desired_speed[k] = b.desired_speed
+            self.max_acceleration[k] = b.max_acceleration
+            self.arrived[k] = b.arrived
+            self.moving[k] = b.moving
+
+    def _build(self):
+        """ build the arrays from the attributes of the persons
+        """
+        n = len(self.persons)
+        for name in ['p', 'v', 'a', 'lx', 'ly', 'destination']:
+            setattr(self, name, np.zeros((n, 2)))
+        for name in ['radius', 'max_speed', 'desired_speed',
+                     'max_acceleration']:
+            setattr(self, name, np.zeros(n))
+        self.arrived = np.zeros(n, dtype=bool)
+        self.moving = np.zeros(n, dtype=bool)
+        self._load(range(n))
+        if self._n == 0:
+            self.wake = np.zeros(n)
+        else:
+            self.wake = np.hstack((self.wake, np.zeros(n - self._n)))
+        self._n = n
+
+    def state(self):
+        """ kinematic state of all the persons
+
+        Returns
+        -------
+
+        S : dict of np.array
+            state of the boids (see World.state) with the destination
+            and the desired_speed of the persons
+
+        """
+        S = {}
+        S['p'] = self.p
+        S['v'] = self.v
+        S['lx'] = self.lx
+        S['ly'] = self.ly
+        S['radius'] = self.radius
+        S['max_speed'] = self.max_speed
+        S['desired_speed'] = self.desired_speed
+        S['destination'] = self.destination
+        return S
+
+    def sync(self, idx=[]):
+        """ update the vec3 attributes of the persons from the arrays
+
+        Parameters
+        ----------
+
+        idx : list or np.array
+            index of the persons (default all)
+
+        """
+        if len(idx) == 0:
+            idx = range(self._n)
+        p = self.p.tolist()
+        v = self.v.tolist()
+        a = self.a.tolist()
+        lx = self.lx.tolist()
+        ly = self.ly.tolist()
+        for k in idx:
+            b = self.persons[k]
+            b.position = vec3(p[k][0], p[k][1])
+            b.velocity = vec3(v[k][0], v[k][1])
+            b.acceleration = vec3(a[k][0], a[k][1])
+            b.localx = vec3(lx[k][0], lx[k][1])
+            b.localy = vec3(ly[k][0], ly[k][1])
+            b.arrived = bool(self.arrived[k])
+
+    def tick(self):
+        """ update all the persons of the crowd
+
+        Returns
+        -------
+
+        u : np.array (N) bool
+            persons which have moved
+
+        """
+        self.drop()
+        if self._n != len(self.persons):
+            self._build()
+        n = self._n
+        if n == 0:
+            return np.zeros(0, dtype=bool)
+        W = self.world
+        if W.nboids() != n:
+            raise AttributeError('the persons of a crowd must be the boids '
+                                 'of its world, in the same order')
+        now = self.sim.now()
+        dt = self.interval
+        # waiting persons are not updated
+        u = self.moving & (self.wake <= now + 1e-6 * dt)
+        #
+        # zones
+        #
+        iu = np.where(u)[0]
+        iz, lz = W.inzones(self.p[iu])
+        for k, zones in zip(iu[iz], lz):
+            b = self.persons[k]
+            self.sync([k])
+            checked = []
+            for zone in zones:
+                if zone not in checked:
+                    checked.append(zone)
+                    zone(b)
+            self._load([k])
+            u[k] = self.moving[k]
+        #
+        # steering
+        #
+        S = self.state()
+        acceleration = np.zeros((n, 2))
+        offset = np.zeros((n, 2))
+        for behavior in self.behaviors:
+            if getattr(behavior, 'moves', False):
+                offset += behavior.calculate_all(W, S)
+            else:
+                acceleration += behavior.calculate_all(W, S)
+        if 'arrived' in S:
+            self.arrived[u] |= S['arrived'][u]
+        self.p[u] += offset[u]
+        acceleration = truncate(acceleration, self.max_acceleration)
+        # updating velocity
+        velocity = self.v + acceleration * dt
+        speed = np.sqrt(np.sum(velocity*velocity, axis=1))
+        # record direction only when we've really had some
+        turn = u & (speed > 0.2)
+        self.ly[turn] = velocity[turn] / speed[turn][:, np.newaxis]
+        self.lx[turn, 0] = self.ly[turn, 1]
+        self.lx[turn, 1] = -self.ly[turn, 0]
+        self.a[u] = acceleration[u]
+        self.v[u] = truncate(velocity, self.max_speed)[u]
+        # updating position
+        self.p[u] += self.v[u] * dt
+        W.update_boids(self.p)
+        #
+        # publish
+        #
+        pub = np.where(u | ~self.moving)[0]
+        P = np.zeros((len(pub), 3))
+        P[:, :2] = self.p[pub]
+        if self.net is not None:
+            self.net.update_pos([self.persons[k].ID for k in pub], P, now)
+        self._traj.append((now, self._id[iu], self.p[iu], self.v[iu],
+                           self.a[iu]))
+        if ('txt' in self.save) or ('mysql' in self.save):
+            A = np.zeros((len(iu), 3))
+            V = np.zeros((len(iu), 3))
+            A[:, :2] = self.a[iu]
+            V[:, :2] = self.v[iu]
+            for k, ik in enumerate(iu):
+                b = self.persons[ik]
+                p = P[np.searchsorted(pub, ik)]
+                if 'mysql' in self.save:
+                    b.db.writemeca(b.ID, now, p, V[k], A[k])
+                if 'txt' in self.save:
+                    pyu.writemeca(b.ID, now, p, V[k], A[k])
+        #
+        # new target when arrived in poi
+        #
+        if self.vsync:
+            self.sync()
+        for k in np.where(u & self.arrived)[0]:
+            b = self.persons[k]
+            if not self.vsync:
+                self.sync([k])
+            if b.L.pt2ro(b.position) == b.L.Gw.node[b.rooms[1]]['room']:
+                wait = b.nextwaypoint()
+                if wait is not None:
+                    self.wake[k] = now + wait
+                self.destination[k] = b.destination.x, b.destination.y
+                self.arrived[k] = b.arrived
+        return u
+
+    def run(self):
+        """ Move the crowd
+
+        """
+        while True:
+            self.tick()
+            yield hold, self, self.interval
+
+    def savedf(self):
+        """ fill the trajectory dataframe of the persons
+
+        Notes
+        -----
+
+        person.df has the layout of the dataframe filled by Person.move
+        (columns t, x, y, vx, vy, ax, ay). The persons dropped from the
+        crowd get their trajectory up to their cancellation.
+
+        """
+        if self._n > 0:
+            self.sync()
+        if len(self._traj) == 0:
+            return
+        t = np.hstack([np.repeat(tr[0], len(tr[1])) for tr in self._traj])
+        idx = np.hstack([tr[1] for tr in self._traj])
+        p = np.vstack([tr[2] for tr in self._traj])
+        v = np.vstack([tr[3] for tr in self._traj])
+        a = np.vstack([tr[4] for tr in self._traj])
+        o = np.argsort(idx, kind='mergesort')
+        bound = np.searchsorted(idx[o], np.arange(len(self._all) + 1))
+        for k, b in enumerate(self._all):
+            ok = o[bound[k]:bound[k+1]]
+            b.df = pd.DataFrame({'t': pd.to_datetime(t[ok], unit='s'),
+                                 'x': p[ok, 0],
+                                 'y': p[ok, 1],
+                                 'vx': v[ok, 0],
+                                 'vy': v[ok, 1],
+                                 'ax': a[ok, 0],
+                                 'ay': a[ok, 1]},
+                                columns=['t', 'x', 'y', 'vx', 'vy', 'ax', 'ay'])
+            b.df._metadata = b.ID
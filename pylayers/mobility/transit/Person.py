@@ -19,6 +19,7 @@ Person Class
     Person.__init__
     Person.__repr__
     Person.move
+    Person.nextwaypoint
     Person.delete
 """
 from SimPy.SimulationRT import Process,Simulation,hold
@@ -363,74 +364,9 @@ class Person(Process):
                     (self.L.pt2ro(self.position) ==\
                         self.L.Gw.node[self.rooms[1]]['room']):
 
-                    self.arrived = False
-                    if self.endpoint:
-                        self.endpoint=False
-                        self.roomId = self.nextroomId
-                        # remove the remaining waypoint which correspond 
-                        # to current room position
-                        del self.waypoints[0]
-                        del self.rooms[0]
-                        # del self.dlist[0]
-                    #
-                    # If door lets continue 
-                    #
-                    #
-                    # ig destination --> next room
-                    #
-                    #adjroom  = self.L.Gr.neighbors(self.roomId)
-                    #Nadjroom = len(adjroom)
-                        if self.cdest == 'random':
-                            # self.nextroomId   = int(np.floor(random.uniform(0,self.L.Gr.size())))
-                            self.nextroomId   = random.sample(self.L.Gr.nodes(),1)[0]
-                            # test 1 ) next != actualroom
-                            #      2 ) nextroom != fordiden room
-                            #      3 ) room not share without another agent
-                            while self.nextroomId == self.roomId or (self.nextroomId in self.forbidroomId):# or (self.nextroomId in self.sim.roomlist):
-                                # self.nextroomId   = int(np.floor(random.uniform(0,self.L.Gr.size())))
-                                self.nextroomId   = random.sample(self.L.Gr.nodes(),1)[0]
-                        elif self.cdest == 'file':
-                           self.room_counter=self.room_counter+1
-                           if self.room_counter >= self.nb_room:
-                                self.room_counter=0
-                           self.nextroomId=self.room_seq[self.room_counter]
-                           self.wait=self.room_wait[self.room_counter]
-                        #self.sim.roomlist.append(self.nextroomId) # list of all destiantion of all nodes in object sim
-                        self.rooms, wp =  self.L.waypointGw(self.roomId,self.nextroomId)
-                        # self.dlist =  [i in self.L.Gw.ldo for i in self.rooms]
-                        for tup in wp[1:]:
-                            self.waypoints.append(vec3(tup)) 
-                    #nextroom = adjroom[k]
-                    #    print "room : ",self.roomId
-                    #    print "nextroom : ",self.nextroomId
-                    #p_nextroom = self.L.Gr.pos[self.nextroomId]
-                    #setdoors1  = self.L.Gr.node[self.roomId]['doors']
-                    #setdoors2  = self.L.Gr.node[nextroom]['doors']
-                    #doorId     = np.intersect1d(setdoors1,setdoors2)[0]
-                    #
-                    # coord door
-                    #
-                    #unode = self.L.Gs.neighbors(doorId)    
-                    #p1    = self.L.Gs.pos[unode[0]]
-                    #p2    = self.L.Gs.pos[unode[1]]
-                    #print p1
-                    #print p2
-                    #pdoor = (np.array(p1)+np.array(p2))/2
-                        self.destination = self.waypoints[0]
-                    
-                        if self.sim.verbose:
-                            print 'meca: ag ' + self.ID + ' wait ' + str(self.wait)#*self.interval) 
-                        yield hold, self, self.wait
-
-                    else:
-                        del self.waypoints[0]
-                        del self.rooms[0]
-                        # del self.dlist[0]
-                    #print "wp : ", self.waypoints
-                        if len(self.waypoints)==1:
-                            self.endpoint=True
-                        self.destination = self.waypoints[0]
-                    #print "dest : ", self.destination
+                    wait = self.nextwaypoint()
+                    if wait is not None:
+                        yield hold, self, wait
                 else:
                     yield hold, self, self.interval
             else:
@@ -440,6 +376,93 @@ class Person(Process):
 
                 yield hold, self, self.interval
 
+    def nextwaypoint(self):
+        """ update the destination when the person has reached a waypoint
+
+        Returns
+        -------
+
+        wait : float
+            waiting time when the destination room is reached,
+            None when the person heads to the next waypoint
+
+        Notes
+        -----
+
+        This is called when self.arrived is True and the person is in the
+        room of the current waypoint.
+
+        """
+        self.arrived = False
+        if self.endpoint:
+            self.endpoint=False
+            self.roomId = self.nextroomId
+            # remove the remaining waypoint which correspond 
+            # to current room position
+            del self.waypoints[0]
+            del self.rooms[0]
+            # del self.dlist[0]
+        #
+        # If door lets continue 
+        #
+        #
+        # ig destination --> next room
+        #
+        #adjroom  = self.L.Gr.neighbors(self.roomId)
+        #Nadjroom = len(adjroom)
+            if self.cdest == 'random':
+                # self.nextroomId   = int(np.floor(random.uniform(0,self.L.Gr.size())))
+                self.nextroomId   = random.sample(self.L.Gr.nodes(),1)[0]
+                # test 1 ) next != actualroom
+                #      2 ) nextroom != fordiden room
+                #      3 ) room not share without another agent
+                while self.nextroomId == self.roomId or (self.nextroomId in self.forbidroomId):# or (self.nextroomId in self.sim.roomlist):
+                    # self.nextroomId   = int(np.floor(random.uniform(0,self.L.Gr.size())))
+                    self.nextroomId   = random.sample(self.L.Gr.nodes(),1)[0]
+            elif self.cdest == 'file':
+               self.room_counter=self.room_counter+1
+               if self.room_counter >= self.nb_room:
+                    self.room_counter=0
+               self.nextroomId=self.room_seq[self.room_counter]
+               self.wait=self.room_wait[self.room_counter]
+            #self.sim.roomlist.append(self.nextroomId) # list of all destiantion of all nodes in object sim
+            self.rooms, wp =  self.L.waypointGw(self.roomId,self.nextroomId)
+            # self.dlist =  [i in self.L.Gw.ldo for i in self.rooms]
+            for tup in wp[1:]:
+                self.waypoints.append(vec3(tup)) 
+        #nextroom = adjroom[k]
+        #    print "room : ",self.roomId
+        #    print "nextroom : ",self.nextroomId
+        #p_nextroom = self.L.Gr.pos[self.nextroomId]
+        #setdoors1  = self.L.Gr.node[self.roomId]['doors']
+        #setdoors2  = self.L.Gr.node[nextroom]['doors']
+        #doorId     = np.intersect1d(setdoors1,setdoors2)[0]
+        #
+        # coord door
+        #
+        #unode = self.L.Gs.neighbors(doorId)    
+        #p1    = self.L.Gs.pos[unode[0]]
+        #p2    = self.L.Gs.pos[unode[1]]
+        #print p1
+        #print p2
+        #pdoor = (np.array(p1)+np.array(p2))/2
+            self.destination = self.waypoints[0]
+
+            if self.sim.verbose:
+                print 'meca: ag ' + self.ID + ' wait ' + str(self.wait)#*self.interval) 
+            return self.wait
+
+        else:
+            del self.waypoints[0]
+            del self.rooms[0]
+            # del self.dlist[0]
+        #print "wp : ", self.waypoints
+            if len(self.waypoints)==1:
+                self.endpoint=True
+            self.destination = self.waypoints[0]
+        #print "dest : ", self.destination
+        return None
+
     def delete(self):
         """
             delete boid from world.tk
@@ -16,6 +16,7 @@ Seek Class
     :toctree: generated
 
     Seek.calculate
+    Seek.calculate_all
 
 Arrive Class
 ==============
@@ -72,9 +73,10 @@ Containment Class
 """
 
 from math import *
-from pylayers.mobility.transit.World import world
+from pylayers.mobility.transit.World import world, DIST_OBST
 from pylayers.mobility.transit.vec3 import vec3
 from random import uniform,gauss,randint
+import numpy as np
 import pdb
 
 # max front distance to consider 
@@ -82,6 +84,45 @@ FCHK = 2.0
 # max side distance to consider 
 SCHK = 2.
 
+def _normalize(v):
+    """ normalize an array of 2D vectors (null vectors are kept)
+    """
+    n = np.sqrt(np.sum(v*v,axis=1))
+    n[n==0] = 1
+    return v/n[:,np.newaxis]
+
+def _local(S, i, d):
+    """ coordinates of vectors d (M x 2) in the local frame of boids i
+
+    vectorized equivalent of World.to_local
+    """
+    lx = S['lx'][i]
+    ly = S['ly'][i]
+    x = ly[:,1]*d[:,0] - ly[:,0]*d[:,1]
+    y = -lx[:,1]*d[:,0] + lx[:,0]*d[:,1]
+    return x, y
+
+def _sum(i, v, N):
+    """ sum of the vectors v (M x 2) per boid i
+    """
+    a = np.zeros((N,2))
+    if len(i)>0:
+        a[:,0] = np.bincount(i,weights=v[:,0],minlength=N)
+        a[:,1] = np.bincount(i,weights=v[:,1],minlength=N)
+    return a
+
+def _rank(i):
+    """ rank of the pairs (i,.) among the pairs of their boid i
+
+    i is sorted, as returned by World.neighbours and World.walls
+    """
+    n = len(i)
+    if n == 0:
+        return np.zeros(0,dtype=int)
+    first = np.hstack(([True],i[1:] != i[:-1]))
+    start = np.maximum.accumulate(np.where(first,np.arange(n),0))
+    return np.arange(n) - start
+
 class Seek:
     """ class Seek
 
@@ -89,8 +130,18 @@ class Seek:
     -------
 
     calculate
+    calculate_all
+
+    Notes
+    -----
+
+    The arrival flag is a per boid information, the vectorized version is
+    only used by a crowd (see transit.Crowd) which provides the destinations
+    in the state of the boids.
 
     """
+    perboid = True
+
     def calculate(self, boid):
         """ calculate boid behavior
 
@@ -118,6 +169,35 @@ class Seek:
             boid.arrived = True
         return steering
 
+    def calculate_all(self, world, S):
+        """ calculate the behavior of all the boids of world
+
+        Parameters
+        ----------
+
+        world : World
+        S : dict
+            state of the boids, with the destination and desired_speed
+            of the boids
+
+        Returns
+        -------
+
+        steering : np.array (N x 2)
+
+        Notes
+        -----
+
+        S['arrived'] is set to True for the boids which have got their
+        target point.
+
+        """
+        displacement = S['destination'] - S['p']
+        desired_velocity = _normalize(displacement) * S['desired_speed'][:,np.newaxis]
+        distance = np.sqrt(np.sum(displacement*displacement,axis=1))
+        S['arrived'] = distance < 2*S['radius']
+        return desired_velocity - S['v']
+
 class Arrive:
     """ Class Arrive
 
@@ -278,6 +358,43 @@ class Separation:
                 acceleration += 0.5*force2 #3*force2
         return acceleration
 
+    def calculate_all(self, world, S):
+        """ calculate the behavior of all the boids of world
+
+        Parameters
+        ----------
+
+        world : World
+        S : dict
+            state of the boids (see World.state)
+
+        Returns
+        -------
+
+        acceleration : np.array (N x 2)
+
+        Notes
+        -----
+
+        (-1**randint(0,1)) is always -1, the avoidance vector is therefore
+        computed without random draw.
+
+        """
+        p = S['p']
+        N = len(p)
+        i, j = world.neighbours(6.0)
+        d = p[j] - p[i]
+        x, y = _local(S, i, d)
+        speed = np.sqrt(np.sum(S['v']*S['v'],axis=1))
+        separation_distance = 6.0 * speed / S['max_speed']
+        u = (y > -S['radius'][i]) & (np.sqrt(x*x+y*y) < separation_distance[i])
+        i = i[u]
+        d = d[u]
+        d2 = np.sum(d*d,axis=1)
+        force = -_normalize(d)/np.maximum(1e-9,d2)[:,np.newaxis]
+        force2 = np.vstack((force[:,1],-force[:,0])).T
+        return _sum(i,0.5*force2,N)
+
 class Queuing:
     """ Class Queuing
 
@@ -309,6 +426,36 @@ class Queuing:
                     return -boid.localy.scale(speed / boid.max_speed)
         return vec3()
 
+    def calculate_all(self, world, S):
+        """ calculate the behavior of all the boids of world
+
+        Parameters
+        ----------
+
+        world : World
+        S : dict
+            state of the boids (see World.state)
+
+        Returns
+        -------
+
+        acceleration : np.array (N x 2)
+
+        """
+        p = S['p']
+        N = len(p)
+        i, j = world.neighbours(4)
+        x, y = _local(S, i, p[j] - p[i])
+        r = np.sqrt(x*x+y*y)
+        angle = np.arccos(np.clip(y/np.where(r>0,r,1),-1,1))
+        speed = np.sqrt(np.sum(S['v']*S['v'],axis=1))
+        u = (y > 0) & (angle < pi / 8) & (speed[j] < speed[i])
+        queue = np.bincount(i[u],minlength=N) > 0
+        acceleration = np.zeros((N,2))
+        acceleration[queue] = -_normalize(S['ly'][queue]) * \
+                              (speed/S['max_speed'])[queue][:,np.newaxis]
+        return acceleration
+
 # class Containment:
 #     """ Class Containment 
 
@@ -514,6 +661,74 @@ class Containment:
 
         return acceleration
 
+    def calculate_all(self, world, S):
+        """ calculate the behavior of all the boids of world
+
+        Parameters
+        ----------
+
+        world : World
+        S : dict
+            state of the boids (see World.state)
+
+        Returns
+        -------
+
+        acceleration : np.array (N x 2)
+
+        Notes
+        -----
+
+        vectorized version of calculate with method 'direct' : the front
+        test vector of every boid is intersected with all the walls of its
+        tiles at once, and the closest intersection is kept.
+
+        """
+        p = S['p']
+        N = len(p)
+        acceleration = np.zeros((N,2))
+        i, k = world.walls(DIST_OBST)
+        W = world._wall[k]
+        p1 = W[:,0,:]
+        p2 = W[:,1,:]
+        position = p[i]
+        speed = np.sqrt(np.sum(S['v']*S['v'],axis=1))
+        front_check = FCHK + speed[i] * 0.5
+        VR = _normalize(S['ly'][i]) * front_check[:,np.newaxis]
+        denominator = VR[:,1] * (p2[:,0] - p1[:,0]) - VR[:,0] * (p2[:,1] - p1[:,1])
+        nz = denominator != 0
+        den = np.where(nz,denominator,1)
+        u_a = (VR[:,0] * (p1[:,1] - position[:,1])
+              - VR[:,1] * (p1[:,0] - position[:,0])) / den
+        u_b = ((p2[:,0] - p1[:,0]) * (p1[:,1] - position[:,1])
+              - (p2[:,1] - p1[:,1]) * (p1[:,0] - position[:,0])) / den
+        intersect = nz & (u_a > 0) & (u_a < 1) & (u_b > 0) & (u_b < 1)
+        if not intersect.any():
+            return acceleration
+        i = i[intersect]
+        u_a = u_a[intersect]
+        u_b = u_b[intersect]
+        p1 = p1[intersect]
+        p2 = p2[intersect]
+        # closest intersection of each boid
+        o = np.lexsort((u_b,i))
+        first = np.hstack(([True],i[o][1:] != i[o][:-1]))
+        o = o[first]
+        i = i[o]
+        front_distance = u_b[o]
+        p1 = p1[o]
+        p2 = p2[o]
+        intersection = p1 + u_a[o][:,np.newaxis] * (p2 - p1)
+        wall_VR = p1 - p2
+        wall_VR_normal = _normalize(np.vstack((-wall_VR[:,1],wall_VR[:,0])).T)
+        normal_point = intersection + wall_VR_normal
+        x, y = _local(S, i, normal_point - p[i])
+        sign = np.where(x <= 0.0, 1, -1)
+        sf = 1 / np.maximum(front_distance**2,1e-9)
+        acceleration[i] = (-_normalize(S['ly'][i])
+                           + sign[:,np.newaxis]*_normalize(S['lx'][i])) * sf[:,np.newaxis]
+        return acceleration
+
 
 
 
@@ -621,7 +836,11 @@ class Containment:
 class InterpenetrationConstraint:
     """ Class InterpenetrationConstaint
 
+    The behavior moves the boid instead of returning an acceleration.
+
     """
+    moves = True
+
     def calculate(self, boid):
         the_world = boid.world
         position = boid.position
@@ -700,6 +919,95 @@ class InterpenetrationConstraint:
             return True, distance, vector
         return False, None, None
 
+    def calculate_all(self, world, S):
+        """ calculate the behavior of all the boids of world
+
+        Parameters
+        ----------
+
+        world : World
+        S : dict
+            state of the boids (see World.state)
+
+        Returns
+        -------
+
+        offset : np.array (N x 2)
+            position correction of the boids
+
+        Notes
+        -----
+
+        As in calculate, the corrections of a boid are applied one after
+        the other : each test uses the position corrected by the previous
+        ones and the walls are tested after the other boids, around the
+        corrected position. The loops run over the rank of the neighbours
+        (walls) of a boid, all the boids being corrected at once.
+
+        """
+        p = S['p']
+        radius = S['radius']
+        N = len(p)
+        q = p.copy()
+        # other boids
+        i, j = world.neighbours()
+        r = _rank(i)
+        radius_ij = radius[i] + radius[j]
+        for n in range(r.max()+1 if len(r)>0 else 0):
+            u = r == n
+            iu = i[u]
+            offset = q[iu] - p[j[u]]
+            distance = np.sqrt(np.sum(offset*offset,axis=1))
+            c = distance < radius_ij[u]
+            q[iu[c]] += _normalize(offset[c])*(radius_ij[u]-distance)[c][:,np.newaxis]
+        # walls
+        i, k = world.walls(DIST_OBST,q)
+        W = world._wall[k]
+        p1 = W[:,0,:]
+        p2 = W[:,1,:]
+        line = p2 - p1
+        line_length = np.sqrt(np.sum(line*line,axis=1))
+        r = _rank(i)
+        nr = r.max()+1 if len(r)>0 else 0
+        wall_found = np.zeros(N,dtype=bool)
+        for n in range(nr):
+            u = r == n
+            iu = i[u]
+            t = np.sum((q[iu] - p1[u])*line[u],axis=1) / line_length[u]**2
+            vector = q[iu] - (p1[u] + t[:,np.newaxis]*line[u])
+            distance = np.sqrt(np.sum(vector*vector,axis=1))
+            c = (t > 0) & (t < 1) & (distance < radius[iu])
+            wall_found[iu[c]] = True
+            q[iu[c]] += _normalize(vector[c])*(radius[iu]-distance)[c][:,np.newaxis]
+        # wall ends, if no wall has been found
+        for n in range(nr):
+            u = (r == n) & ~wall_found[i]
+            iu = i[u]
+            for point in (p1[u], p2[u]):
+                offset = q[iu] - point
+                distance = np.sqrt(np.sum(offset*offset,axis=1))
+                c = distance < radius[iu]
+                q[iu[c]] += _normalize(offset[c])*(radius[iu]-distance)[c][:,np.newaxis]
+        return q - p
+
+def _calculate(behavior, boid):
+    """ steering vector of a behavior
+
+    The vectorized behavior of all the boids of the world is used when
+    the behavior provides it and the boid is driven by a simulation clock.
+
+    """
+    if hasattr(behavior, 'calculate_all') and \
+        not getattr(behavior, 'perboid', False):
+        a = boid.world.steering(behavior, boid)
+        if a is not None:
+            a = vec3(float(a[0]), float(a[1]))
+            if getattr(behavior, 'moves', False):
+                boid.position += a
+                return vec3()
+            return a
+    return behavior.calculate(boid)
+
 def default_steering_mind(boid):
     """ Sum all steering vectors.
 
@@ -717,7 +1025,7 @@ def default_steering_mind(boid):
 
     acceleration = vec3()
     for behavior in boid.behaviors:
-        acceleration += behavior.calculate(boid)
+        acceleration += _calculate(behavior, boid)
     return acceleration
 
 def queue_steering_mind(boid):
@@ -732,5 +1040,5 @@ def queue_steering_mind(boid):
     acceleration = vec3()
     for behavior in boid.behaviors:
 #        if not isinstance(behavior, Separation) or acceleration.length() < 0.0001:
-         acceleration += behavior.calculate(boid)
+         acceleration += _calculate(behavior, boid)
     return acceleration
@@ -41,6 +41,105 @@ def near(boid, items, distance):
     return all_items
 
 
+# tile keys of the spatial hash : (tx + _TOFF) * _TMUL + (ty + _TOFF)
+_TOFF = 2 ** 20
+_TMUL = 2 ** 21
+
+
+def tiles(p):
+    """ tiles of an array of positions
+
+    Parameters
+    ----------
+
+    p : np.array (N x 2)
+
+    Returns
+    -------
+
+    t : np.array (N x 2) of int
+
+    Notes
+    -----
+
+    same truncation as int(x / tile_size)
+
+    """
+    return np.trunc(np.asarray(p, dtype=float) / tile_size).astype(np.int64)
+
+
+def _tkey(t):
+    return (t[..., 0] + _TOFF) * _TMUL + (t[..., 1] + _TOFF)
+
+
+def _hash(t, idx):
+    """ sorted tile keys
+
+    Parameters
+    ----------
+
+    t : np.array (N x 2)
+        tiles of items
+    idx : np.array (N)
+        item index
+
+    Returns
+    -------
+
+    skey : sorted keys
+    sidx : items in key order
+
+    """
+    key = _tkey(t)
+    u = np.argsort(key, kind='mergesort')
+    return key[u], idx[u]
+
+
+def _near(tq, distance, skey, sidx):
+    """ items of the square tile window around a set of query tiles
+
+    Parameters
+    ----------
+
+    tq : np.array (Nq x 2)
+        tiles of the queries
+    distance : float
+    skey : np.array
+        sorted tile keys of the items
+    sidx : np.array
+        items in key order
+
+    Returns
+    -------
+
+    iq : np.array
+        query index
+    it : np.array
+        item index
+
+    Notes
+    -----
+
+    vectorized equivalent of near for all the queries
+
+    """
+    tile_distance = int(distance / tile_size)
+    r = np.arange(-tile_distance, tile_distance + 1)
+    dx = np.repeat(r, len(r))
+    dy = np.tile(r, len(r))
+    # Nq x Noffset
+    qk = _tkey(np.dstack((tq[:, 0][:, np.newaxis] + dx[np.newaxis, :],
+                          tq[:, 1][:, np.newaxis] + dy[np.newaxis, :])))
+    lo = np.searchsorted(skey, qk.ravel(), 'left')
+    hi = np.searchsorted(skey, qk.ravel(), 'right')
+    cnt = hi - lo
+    ntot = cnt.sum()
+    iq = np.repeat(np.arange(len(tq)).repeat(len(dx)), cnt)
+    first = np.repeat(np.cumsum(cnt) - cnt, cnt)
+    it = sidx[np.repeat(lo, cnt) + np.arange(ntot) - first]
+    return iq, it
+
+
 class World:
     """ Class World 
     
@@ -48,18 +147,78 @@ class World:
     -------
 
     boids
+    nboids
+    index
     add_boid
     remove_boid
     update_boid
+    update_boids
+    update
+    neighbours
     obstacles
+    walls
     add_wall
+    steering
+    newtick
+    zones
+    inzones
+
+    Notes
+    -----
+
+    Boid positions are kept in an array and indexed by a spatial hash
+    (sorted tile keys) which is rebuilt in bulk once per simulation tick,
+    at the first query following a position update. Within a tick the
+    queries see the tiles of the tick start.
 
     """
     def __init__(self, **args):
         # self.tk = TkWorld(**args)
-        self._boids = {}
+        self._lboid = []
+        self._p = np.zeros((0, 2))
         self._obstacles = {}
         self._zones = {}
+        self._lwall = []
+        self._wall = np.zeros((0, 2, 2))
+        self._wkey = []
+        self._widx = []
+        self._whash = None
+        self._ghash = None
+        self._t = None
+        self._dirty = True
+        self._steer = {}
+
+    def _tick(self, boid=None):
+        """ rebuild the boid hash when positions have changed in a new tick
+
+        Parameters
+        ----------
+
+        boid : querying boid
+
+        Returns
+        -------
+
+        now : simulation time (None without simulation)
+
+        """
+        try:
+            now = boid.sim.now()
+        except:
+            now = None
+        if (self._ghash is None) or (now is None) or (now != self._t):
+            if (self._ghash is None) or self._dirty:
+                self.update()
+            self._t = now
+        return now
+
+    def update(self):
+        """ bulk update of the boid spatial hash
+        """
+        n = len(self._lboid)
+        self._tiles = tiles(self._p[:n])
+        self._ghash = _hash(self._tiles, np.arange(n))
+        self._dirty = False
 
     def boids(self, boid, distance=2):
         """
@@ -76,12 +235,43 @@ class World:
         other_boids
 
         """
-
-        other_boids = near(boid, self._boids, distance)
-        other_boids.remove(boid)
+        self._tick(boid)
+        i = boid._iw
+        iq, it = _near(self._tiles[i:i+1], distance, *self._ghash)
+        other_boids = [self._lboid[j] for j in it if j != i]
 
         return other_boids
 
+    def neighbours(self, distance=2):
+        """ neighbour boids of all the boids
+
+        Parameters
+        ----------
+
+        distance : float
+            default 2
+
+        Returns
+        -------
+
+        i : np.array
+            boid index
+        j : np.array
+            neighbour index
+
+        Notes
+        -----
+
+        (i,j) are the pairs returned by boids for every boid, boids
+        are indexed as in self._lboid.
+
+        """
+        if (self._ghash is None) or self._dirty:
+            self.update()
+        i, j = _near(self._tiles, distance, *self._ghash)
+        u = i != j
+        return i[u], j[u]
+
     def add_boid(self, boid):
         """
 
@@ -91,13 +281,17 @@ class World:
         boid 
 
         """
-        tile = (int(boid.position.x / tile_size), int(
+        n = len(self._lboid)
+        if n == len(self._p):
+            self._p = np.vstack((self._p, np.zeros((max(n, 16), 2))))
+        self._lboid.append(boid)
+        boid._iw = n
+        self._p[n] = boid.position.x, boid.position.y
+        boid.tile = (int(boid.position.x / tile_size), int(
             boid.position.y / tile_size))
-        if tile not in self._boids:
-            self._boids[tile] = [boid]
-        else:
-            self._boids[tile].append(boid)
-        boid.tile = tile
+        self._dirty = True
+        self._ghash = None
+        self._steer = {}
 
     def remove_boid(self, boid):
         """
@@ -107,22 +301,144 @@ class World:
         boid
 
         """
-        self._boids[boid.tile].remove(boid)
+        i = boid._iw
+        last = self._lboid.pop()
+        if last is not boid:
+            self._lboid[i] = last
+            last._iw = i
+            self._p[i] = self._p[len(self._lboid)]
+        self._ghash = None
+        self._steer = {}
+
+    def reset_boids(self):
+        """ remove all the boids
+        """
+        self._lboid = []
+        self._p = np.zeros((0, 2))
+        self._ghash = None
+        self._steer = {}
 
     def update_boid(self, boid):
-        tile = (int(boid.position.x / tile_size), int(
+        self._p[boid._iw] = boid.position.x, boid.position.y
+        boid.tile = (int(boid.position.x / tile_size), int(
             boid.position.y / tile_size))
-        if tile is not boid.tile:
-            self._boids[boid.tile].remove(boid)
-            self.add_boid(boid)
+        self._dirty = True
+
+    def update_boids(self, p):
+        """ bulk update of the positions of all the boids
+
+        Parameters
+        ----------
+
+        p : np.array (N x 2)
+            positions of the boids, in the order of the world
+
+        Notes
+        -----
+
+        The boid attributes (position, tile) are not updated. The
+        vectorized steering restarts at the next query (see steering).
+
+        """
+        n = len(self._lboid)
+        if len(p) != n:
+            raise AttributeError('update_boids : ' + str(len(p)) +
+                                 ' positions for ' + str(n) + ' boids')
+        self._p[:n] = p
+        self._dirty = True
+        self._steer = {}
+
+    def nboids(self):
+        """ number of boids of the world
+        """
+        return len(self._lboid)
+
+    def index(self, boid):
+        """ index of a boid in the world
+
+        Parameters
+        ----------
+
+        boid
+
+        Returns
+        -------
+
+        i : int
+            row of the boid in the arrays of the world (state, neighbours)
+
+        """
+        i = boid._iw
+        if (i >= len(self._lboid)) or (self._lboid[i] is not boid):
+            raise AttributeError('boid is not in the world')
+        return i
 
     def obstacles(self, boid):
-        return near(boid, self._obstacles, DIST_OBST)
+        """ walls around a boid
+
+        Parameters
+        ----------
+
+        boid
+
+        Returns
+        -------
+
+        list of walls (line_start, line_end)
+
+        """
+        t = tiles(np.array([[boid.position.x, boid.position.y]]))
+        iq, k = _near(t, DIST_OBST, *self._wallhash())
+        return [self._lwall[kk] for kk in np.unique(k)]
+
+    def walls(self, distance=DIST_OBST, p=None):
+        """ walls around all the boids
+
+        Parameters
+        ----------
+
+        distance : float
+            default DIST_OBST
+        p : np.array (N x 2)
+            positions of the boids, if they differ from the positions
+            of the last update
+
+        Returns
+        -------
+
+        i : np.array
+            boid index
+        k : np.array
+            wall index in self._wall (Nw x 2 x 2)
+
+        """
+        if p is None:
+            if (self._ghash is None) or self._dirty:
+                self.update()
+            t = self._tiles
+        else:
+            t = tiles(p)
+        i, k = _near(t, distance, *self._wallhash())
+        nw = max(len(self._lwall), 1)
+        u = np.unique(i * nw + k)
+        return u // nw, u % nw
+
+    def _wallhash(self):
+        """ wall array and sorted tile keys of the walls
+        """
+        if self._whash is None:
+            self._wall = np.array([[w[0][:2], w[1][:2]] for w in self._lwall],
+                                  dtype=float).reshape(-1, 2, 2)
+            wkey = np.array(self._wkey, dtype=np.int64).reshape(-1, 2)
+            self._whash = _hash(wkey, np.array(self._widx, dtype=int))
+        return self._whash
 
     def add_wall(self, *wall):
         the_obstacles = self._obstacles
         for ii in range(0, len(wall) - 1):
             line_start, line_end = wall[ii], wall[ii + 1]
+            k = len(self._lwall)
+            self._lwall.append((line_start, line_end))
             start_tile_x, start_tile_y = int(line_start[0] /
                                              tile_size), int(line_start[1] / tile_size)
             end_tile_x, end_tile_y = int(line_end[0] /
@@ -134,10 +450,78 @@ class World:
             for xx in range(start_tile_x - 1, end_tile_x + 2):
                 for yy in range(start_tile_y - 1, end_tile_y + 2):
                     tile = (xx, yy)
+                    self._wkey.append(tile)
+                    self._widx.append(k)
                     if tile in the_obstacles:
                         the_obstacles[tile].append((line_start, line_end))
                     else:
                         the_obstacles[tile] = [(line_start, line_end)]
+        self._whash = None
+
+    def state(self):
+        """ kinematic state of all the boids
+
+        Returns
+        -------
+
+        S : dict of np.array
+            p, v, lx, ly : N x 2
+            radius, max_speed : N
+
+        """
+        lb = self._lboid
+        S = {}
+        S['p'] = np.array([(b.position.x, b.position.y) for b in lb]).reshape(-1, 2)
+        S['v'] = np.array([(b.velocity.x, b.velocity.y) for b in lb]).reshape(-1, 2)
+        S['lx'] = np.array([(b.localx.x, b.localx.y) for b in lb]).reshape(-1, 2)
+        S['ly'] = np.array([(b.localy.x, b.localy.y) for b in lb]).reshape(-1, 2)
+        S['radius'] = np.array([b.radius for b in lb], dtype=float)
+        S['max_speed'] = np.array([b.max_speed for b in lb], dtype=float)
+        return S
+
+    def steering(self, behavior, boid):
+        """ steering of a boid from the vectorized behavior
+
+        Parameters
+        ----------
+
+        behavior : steering behavior with a calculate_all method
+        boid
+
+        Returns
+        -------
+
+        a : np.array (2)
+            row of boid in the array computed once per tick for all boids
+            None if the boid has no simulation clock
+
+        Notes
+        -----
+
+        A world tick starts when a boid asks again for a behavior it has
+        already got in the current tick, or after a boid has been added or
+        removed. The state of the boids is taken at the beginning of the
+        tick. The tick does not depend on the clock values of the boids,
+        which may differ.
+
+        """
+        if self._tick(boid) is None:
+            return None
+        name = behavior.__class__.__name__
+        if ('state' not in self._steer) or \
+           (boid._iw in self._steer['served'].get(name, ())):
+            self.newtick()
+        if name not in self._steer:
+            self._steer[name] = behavior.calculate_all(self, self._steer['state'])
+        self._steer['served'].setdefault(name, set()).add(boid._iw)
+        return self._steer[name][boid._iw]
+
+    def newtick(self):
+        """ start a new world tick of the vectorized steering (see steering)
+        """
+        if (self._ghash is None) or self._dirty:
+            self.update()
+        self._steer = {'state': self.state(), 'served': {}}
 
     def zones(self, boid):
         """
@@ -151,6 +535,35 @@ class World:
             boid.position.y / tile_size))
         return self._zones.get(tile, [])
 
+    def inzones(self, p):
+        """ zones of an array of positions
+
+        Parameters
+        ----------
+
+        p : np.array (N x 2)
+
+        Returns
+        -------
+
+        i : np.array
+            index of the positions lying in the tile of a zone
+        lz : list
+            zones of each position of i (see zones)
+
+        """
+        if len(self._zones) == 0:
+            return np.zeros(0, dtype=int), []
+        t = tiles(p)
+        i = []
+        lz = []
+        for k, tile in enumerate(map(tuple, t.tolist())):
+            z = self._zones.get(tile, [])
+            if z != []:
+                i.append(k)
+                lz.append(z)
+        return np.array(i, dtype=int), lz
+
     def add_zone(self, zone):
         """
         Parameters 
@@ -0,0 +1,140 @@
+import numpy as np
+from pylayers.mobility.transit.vec3 import vec3
+from pylayers.mobility.transit.World import World
+from pylayers.mobility.transit.Person import Person
+from pylayers.mobility.transit.Crowd import Crowd
+from pylayers.mobility.transit.SteeringBehavior import *
+
+class Clock(object):
+    t = 0.
+    def now(self):
+        return self.t
+
+class Boid(object):
+    pass
+
+#
+# small crowd of stub persons in a 10m x 10m room with a middle wall
+#
+np.random.seed(1)
+clock = Clock()
+w = World()
+w.add_wall((0.,0.),(10.,0.),(10.,10.),(0.,10.),(0.,0.))
+w.add_wall((5.,2.),(5.,8.))
+lb = []
+for n in range(40):
+    b = Boid()
+    b.ID = str(n)
+    b.world = w
+    b.sim = clock
+    b.position = vec3(*map(float,np.random.uniform(0.5,9.5,2)))
+    b.velocity = vec3(*map(float,np.random.uniform(-0.5,0.5,2)))
+    b.acceleration = vec3()
+    a = float(np.random.uniform(0,2*np.pi))
+    b.localy = vec3(cos(a),sin(a))
+    b.localx = vec3(b.localy.y,-b.localy.x)
+    b.destination = vec3(20.,float(np.random.uniform(0,10)))
+    b.radius = 0.3
+    b.max_speed = 0.8
+    b.desired_speed = 0.8
+    b.max_acceleration = 10.
+    b.arrived = False
+    b.moving = n!=0
+    w.add_boid(b)
+    lb.append(b)
+behaviors = [Seek(),Containment(),Separation(),InterpenetrationConstraint()]
+C = Crowd(interval=0.05,wld=w,sim=clock,behaviors=behaviors)
+for b in lb:
+    C.add(b)
+#
+# one tick of Person.move, every person from the same initial state
+#
+dt = C.interval
+P0 = [vec3(b.position) for b in lb]
+lp = []
+lv = []
+la = []
+ly = []
+for k,b in enumerate(lb):
+    acceleration = vec3()
+    for behavior in behaviors:
+        acceleration += behavior.calculate(b)
+    acceleration = acceleration.truncate(b.max_acceleration)
+    velocity = b.velocity + acceleration * dt
+    v = velocity.truncate(b.max_speed)
+    lp.append([(b.position + v * dt).x,(b.position + v * dt).y])
+    lv.append([v.x,v.y])
+    la.append([acceleration.x,acceleration.y])
+    if velocity.length() > 0.2:
+        ly.append([velocity.normalize().x,velocity.normalize().y])
+    else:
+        ly.append([b.localy.x,b.localy.y])
+    b.position = vec3(P0[k])
+lp = np.array(lp)
+lv = np.array(lv)
+la = np.array(la)
+ly = np.array(ly)
+
+u = C.tick()
+assert not u[0]
+assert u[1:].all()
+np.testing.assert_allclose(C.p[u],lp[u],rtol=1e-9,atol=1e-9)
+np.testing.assert_allclose(C.v[u],lv[u],rtol=1e-9,atol=1e-9)
+np.testing.assert_allclose(C.a[u],la[u],rtol=1e-9,atol=1e-9)
+np.testing.assert_allclose(C.ly[u],ly[u],rtol=1e-9,atol=1e-9)
+np.testing.assert_array_equal(C.p[0],[P0[0].x,P0[0].y])
+#
+# trajectories
+#
+clock.t = dt
+C.tick()
+C.savedf()
+assert len(lb[0].df) == 0
+for k,b in enumerate(lb[1:]):
+    assert len(b.df) == 2
+    np.testing.assert_allclose(b.df[['x','y']].values[0],lp[k+1])
+    np.testing.assert_allclose(b.df[['x','y']].values[1],C.p[k+1])
+    np.testing.assert_allclose([b.position.x,b.position.y],C.p[k+1])
+#
+# zones : called once per tick for the moving persons in their tiles
+#
+class Slow(object):
+    lower_left = vec3(0.,0.)
+    upper_right = vec3(2.9,9.9)
+    calls = []
+    def __call__(self,b):
+        self.calls.append(b.ID)
+        b.max_speed = 0.1
+zone = Slow()
+w.add_zone(zone)
+iz = [k for k,b in enumerate(lb) if b.moving and w.zones(b) != []]
+assert len(iz) > 0
+clock.t = 2*dt
+u = C.tick()
+assert sorted(zone.calls) == sorted([lb[k].ID for k in iz])
+np.testing.assert_array_equal(C.max_speed[iz],0.1)
+speed = np.sqrt(np.sum(C.v*C.v,axis=1))
+assert np.all(speed[iz] <= 0.1 + 1e-9)
+#
+# cancellation : Person.delete removes the person from the world, the
+# crowd drops it and keeps the order of the world
+#
+cancelled = [lb[3],lb[17]]
+for b in cancelled:
+    w.remove_boid(b)
+    b.cancelled = 1
+clock.t = 3*dt
+u = C.tick()
+assert len(C.persons) == len(lb) - 2
+for k,b in enumerate(C.persons):
+    assert w.index(b) == k
+    assert b not in cancelled
+clock.t = 4*dt
+C.tick()
+C.savedf()
+for b in cancelled:
+    assert len(b.df) == 3
+for b in C.persons[1:]:
+    assert len(b.df) == 5
+    np.testing.assert_allclose(b.df[['x','y']].values[-1],
+                               [b.position.x,b.position.y])
@@ -0,0 +1,104 @@
+import numpy as np
+from pylayers.mobility.transit.vec3 import vec3
+from pylayers.mobility.transit.World import World
+from pylayers.mobility.transit.Person import Person
+from pylayers.mobility.transit.SteeringBehavior import *
+from pylayers.mobility.transit.SteeringBehavior import _calculate
+
+class Clock(object):
+    def now(self):
+        return 0.
+
+class Boid(object):
+    pass
+
+#
+# dense scene : 400 boids in a 20m x 20m grid of 5m rooms
+#
+np.random.seed(0)
+w = World()
+for x in np.arange(0,21,5.):
+    w.add_wall((float(x),0.),(float(x),20.))
+    w.add_wall((0.,float(x)),(20.,float(x)))
+lb = []
+for n in range(400):
+    b = Boid()
+    b.world = w
+    b.sim = Clock()
+    b.position = vec3(*map(float,np.random.uniform(0.1,19.9,2)))
+    b.velocity = vec3(*map(float,np.random.uniform(-0.8,0.8,2)))
+    a = float(np.random.uniform(0,2*np.pi))
+    b.localy = vec3(cos(a),sin(a))
+    b.localx = vec3(b.localy.y,-b.localy.x)
+    b.radius = 0.3 + 0.05*float(np.random.rand())
+    b.max_speed = 0.8
+    w.add_boid(b)
+    lb.append(b)
+P = np.array([(b.position.x,b.position.y) for b in lb])
+S = w.state()
+#
+# accelerations
+#
+for behavior in [Separation(),Queuing(),Containment()]:
+    A = behavior.calculate_all(w,S)
+    for k,b in enumerate(lb):
+        a = behavior.calculate(b)
+        np.testing.assert_allclose(A[k],[a.x,a.y],rtol=1e-9,atol=1e-9)
+#
+# position corrections, each boid from the same initial positions
+#
+behavior = InterpenetrationConstraint()
+D = behavior.calculate_all(w,S)
+assert (np.abs(D).max(axis=1)>0).sum() > 100
+for k,b in enumerate(lb):
+    b.position = vec3(*map(float,P[k]))
+    behavior.calculate(b)
+    np.testing.assert_allclose(D[k],[b.position.x-P[k,0],b.position.y-P[k,1]],
+                               rtol=1e-9,atol=1e-9)
+    b.position = vec3(*map(float,P[k]))
+#
+# World.steering : boids with unsynchronized clocks, boid added in the
+# middle of a tick
+#
+class Tick(Clock):
+    def __init__(self, t):
+        self.t = t
+    def now(self):
+        return self.t
+
+class CountSeparation(Separation):
+    ncall = 0
+    def calculate_all(self, world, S):
+        CountSeparation.ncall += 1
+        return Separation.calculate_all(self, world, S)
+
+w = World()
+lb = []
+def addboid(x, y, t):
+    b = Boid()
+    b.world = w
+    b.sim = Tick(t)
+    b.position = vec3(x, y)
+    b.velocity = vec3(0.5, 0.)
+    b.localy = vec3(1., 0.)
+    b.localx = vec3(0., -1.)
+    b.radius = 0.3
+    b.max_speed = 0.8
+    w.add_boid(b)
+    lb.append(b)
+    return b
+
+behavior = CountSeparation()
+addboid(1., 1., 0.)
+addboid(2., 1., 0.01)
+for b in lb:
+    a = _calculate(behavior, b)
+    e = Separation.calculate(behavior, b)
+    np.testing.assert_allclose([a.x, a.y], [e.x, e.y], atol=1e-12)
+assert CountSeparation.ncall == 1
+addboid(2.5, 1.5, 0.02)
+for b in [lb[2], lb[0], lb[1]]:
+    a = _calculate(behavior, b)
+    e = Separation.calculate(behavior, b)
+    np.testing.assert_allclose([a.x, a.y], [e.x, e.y], atol=1e-12)
+assert CountSeparation.ncall == 2
@@ -1118,6 +1118,8 @@ class Network(PyLayers,nx.MultiDiGraph):
             node ID
         p    : np.array  ( or a list of )
             node position 
+            a list of N node IDs can be updated in bulk with a np.array
+            (N x 3) of positions (see transit.Crowd)
 
         Todo
         ----
@@ -234,6 +234,7 @@ FUDsignal Class
     FUDsignal.totime
     FUDsignal.iftd
     FUDsignal.ft1
+    FUDsignal.ftstream
     FUDsignal.ftau
     FUDsignal.cir
     FUDsignal.plot3d
@@ -1234,7 +1235,7 @@ class Usignal(Bsignal):
             #pdb.set_trace()
         return(U)
 
-    def align(self, u2):
+    def align(self, u2, nearest=False):
         """ align two Usignal on a same base
 
         returns a list which contains the two aligned signals
@@ -1246,6 +1247,10 @@ class Usignal(Bsignal):
         ----------
 
         u2 : TUsignal
+        nearest : boolean
+            if True and the supports differ, the signals are placed at
+            their nearest sample on the base of u1 extended to both
+            supports, which has round(T/dx)+1 samples (default False)
 
         Returns
         -------
@@ -1299,6 +1304,29 @@ class Usignal(Bsignal):
         if (bool):
         # same x support
             L = Usignal(u1.x, np.vstack((u1.y,u2.y)))
+        elif nearest:
+        # different x support
+        # each signal is placed at its nearest sample on the common base
+            xstart = min(u1_start, u2_start)
+            xstop = max(u1_stop, u2_stop)
+            dx = u1.dx()
+            N = int(np.round((xstop - xstart) / dx)) + 1
+            x = xstart + dx * np.arange(N)
+            n1 = int(np.round((u1_start - xstart) / dx))
+            n2 = int(np.round((u2_start - xstart) / dx))
+            M1 = min(M1, N - n1)
+            M2 = min(M2, N - n2)
+            Y1 = np.zeros((N1,N), dtype=u1.y.dtype)
+            Y2 = np.zeros((N2,N), dtype=u2.y.dtype)
+            Y1[:,n1:n1+M1] = u1.y[:,0:M1]
+            Y2[:,n2:n2+M2] = u2.y[:,0:M2]
+            U1 = Usignal(x, Y1)
+            U2 = Usignal(x, Y2)
+
+            #L = [U1, U2]
+            L   = Usignal()
+            L.x = U1.x
+            L.y = np.vstack((U1.y,U2.y))
         else:
         # different x support
             xstart = min(u1_start, u2_start)
@@ -4475,7 +4503,7 @@ class FUDsignal(FUsignal):
             rf.y[i, :] = r.y
         return rf
 
-    def ft1(self, Nz, ffts=0):
+    def ft1(self, Nz, ffts=0, nearest=False):
         """  construct CIR from ifft(RTF)
 
         Parameters
@@ -4485,6 +4513,10 @@ class FUDsignal(FUsignal):
         ffts : fftshift indicator
             0  no fftshift
             1  apply fftshift
+        nearest : boolean
+            if True the pulses are added at their nearest time sample
+            (see Usignal.align), the result is then the one of
+            ftstream(frac=False)
 
         Returns
         -------
@@ -4510,9 +4542,166 @@ class FUDsignal(FUsignal):
             for i in range(len(tau)):
                 si = TUsignal(self.s.x, self.s.y[i, :])
                 si.translate(tau[i])
-                r = r + si
+                if nearest:
+                    L = r.align(si, nearest=True)
+                    r = TUsignal(L.x, L.y[0,:] + L.y[1,:])
+                else:
+                    r = r + si
             return r
 
+    def ftstream(self, Nz, ffts=0, nb=100, method='fft', frac=True,
+                 fast=False, tstart=[], tstop=[], nf=256, verbose=False):
+        """ construct the CIR ray batch by ray batch
+
+        Parameters
+        ----------
+
+        Nz   : int
+            number of zeros for zero padding (as in ft1)
+        ffts : int
+            fftshift indicator
+            0  no fftshift
+            1  apply fftshift
+        nb   : int
+            number of rays per batch
+        method : string
+            'fft' : inverse real FFT of each ray and pasting
+            'direct' : direct synthesis of the shifted pulses on the
+            time base (delay domain)
+        frac : boolean
+            if True the fractional part of the delay is applied
+            as a phase ramp, if False the delays are rounded to the
+            time step ('fft' only)
+        fast : boolean
+            if True the FFT size is increased to scipy next_fast_len
+            (the time step is slightly reduced)
+        tstart : float
+            start of the time window (default start of the CIR)
+        tstop : float
+            stop of the time window (default end of the CIR)
+        nf : int
+            number of frequency points per batch ('direct' only)
+        verbose : boolean
+
+        Returns
+        -------
+
+        r : TUsignal
+
+        Notes
+        -----
+
+        The result is the CIR of ft1 : the sum of the pulses of the rays
+        translated by tau = taud + taue. With frac=False the pulses are
+        placed at the nearest time sample of their delay, as in
+        ft1(nearest=True). With frac=True the fractional part of the delays is
+        kept and the result differs from ft1. The zero padded hermitian spectrum
+        of ift is never built for all the rays at once : only nb rays are
+        transformed at a time and added to the CIR. The working memory is
+        proportional to nb instead of the number of rays.
+
+        The pulse of a ray covers one period 1/df of the inverse
+        transform. With method 'direct' the pulses are evaluated at the
+        time samples of the window directly from the spectrum, which is
+        interesting for short windows. The time x frequency kernel is
+        built nf frequency points at a time.
+
+        The time base is x0 + k dx with dx = 1/(Nfft df), where Nfft is the
+        size of the hermitian spectrum of symHz.
+
+        The peak working memory (in bytes) is stored in self.mem together
+        with the size of the dense zero padded spectrum of all rays.
+
+        See Also
+        --------
+
+        ft1
+        FUsignal.symHz
+        FHsignal.ifft
+
+        """
+        tau = self.taud + self.taue
+        if np.ndim(self.y) == 1:
+            Y = self.y.reshape(1,-1)
+        else:
+            Y = self.y
+        Nray, N = np.shape(Y)
+        f = self.x
+        df = self.dx()
+        Nl = np.int(np.ceil(f[0] / df))
+        # size of the hermitian spectrum (see symHz)
+        Nfft = 2*(Nl + N + Nz) - 1
+        if fast:
+            from scipy.fftpack import next_fast_len
+            Nfft = next_fast_len(Nfft)
+        dx = 1./(Nfft*df)
+        # same scaling as symHz(scale='extract') and FHsignal.ifft
+        scale = np.sqrt(Nfft/(2.*N))*Nfft*df
+        # frequency of the spectrum bins
+        fk = (Nl + np.arange(N))*df
+        # time of the first sample of a pulse
+        x0 = -(Nfft/2)*dx
+        if ffts:
+            c = 0
+        else:
+            c = x0
+
+        #
+        # time window
+        #
+        kmin = min(int(np.round(np.min(tau)/dx)),0)
+        kmax = Nfft + int(np.round(max(np.max(tau),0)/dx))
+        if tstart != []:
+            kmin = int(np.ceil((tstart-x0)/dx))
+        if tstop != []:
+            kmax = int(np.ceil((tstop-x0)/dx))
+        Nw = max(kmax - kmin,0)
+        x = x0 + dx*np.arange(kmin,kmax)
+        r = np.zeros(Nw)
+
+        n0 = np.round(tau/dx).astype(int)
+        dtau = tau - n0*dx
+        if not frac:
+            dtau = 0*dtau
+
+        mem = r.nbytes
+        if method == 'fft':
+            for ib in range(0,Nray,nb):
+                u = np.arange(ib,min(ib+nb,Nray))
+                # half hermitian spectrum with fractional delay
+                H = np.zeros((len(u),Nfft/2+1),dtype=complex)
+                H[:,Nl:Nl+N] = Y[u,:]*np.exp(-2j*np.pi*np.outer(dtau[u],fk))
+                p = fft.irfft(H,Nfft,axis=1)*scale
+                if ffts:
+                    p = fft.fftshift(p,axes=1)
+                # pasting
+                k = n0[u][:,None] + np.arange(Nfft)[None,:] - kmin
+                v = (k >= 0) & (k < Nw)
+                r = r + np.bincount(k[v],weights=p[v],minlength=Nw)
+                mem = max(mem,r.nbytes+H.nbytes+p.nbytes+k.nbytes+v.nbytes)
+
+        if method == 'direct':
+            for kf in range(0,N,nf):
+                uf = slice(kf,min(kf+nf,N))
+                # common time part of the pulses (Nw x nf)
+                E = np.exp(2j*np.pi*np.outer(x-c,fk[uf]))
+                for ib in range(0,Nray,nb):
+                    u = np.arange(ib,min(ib+nb,Nray))
+                    Yt = Y[u,uf]*np.exp(-2j*np.pi*np.outer(tau[u],fk[uf]))
+                    # index of the samples in the pulse
+                    m = np.arange(kmin,kmax)[None,:] - n0[u][:,None]
+                    v = (m >= 0) & (m < Nfft)
+                    p = 2*scale/Nfft*np.real(np.dot(Yt,E.T))
+                    r = r + np.sum(p*v,axis=0)
+                    mem = max(mem,r.nbytes+E.nbytes+Yt.nbytes+p.nbytes+m.nbytes+v.nbytes)
+
+        self.mem = {'stream':mem,'dense':Nray*Nfft*16}
+        if verbose:
+            print 'ftstream : peak memory %.1f MB (dense spectrum %.1f MB)' % \
+                   (mem/1e6,Nray*Nfft*16/1e6)
+
+        return(TUsignal(x,r))
+
     def ftau(self, Nz=0, k=0, ffts=0):
         """ time superposition
 
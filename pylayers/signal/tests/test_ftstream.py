@@ -0,0 +1,68 @@
+import numpy as np
+from pylayers.signal.bsignal import *
+
+fGHz = np.arange(2,11,0.01)
+N = len(fGHz)
+Nz = 500
+nray = 2000
+
+tau = np.sort(np.random.uniform(5,80,nray))
+a = np.random.randn(nray)*np.exp(-tau/30.)
+W = np.exp(-((fGHz-6.5)/2.)**2)
+y = a[:,None]*W[None,:]*np.exp(2j*np.pi*np.random.rand(nray))[:,None]
+H = FUDsignal(fGHz,y,tau)
+
+#
+# reference : ift of all the rays at once, pulses pasted at the
+# nearest time sample
+#
+s = H.ift(Nz,1)
+dx = s.dx()
+n0 = np.round(tau/dx).astype(int)
+ref = np.zeros(len(s.x)+n0.max())
+for k in range(nray):
+    ref[n0[k]:n0[k]+len(s.x)] += s.y[k,:]
+
+r = H.ftstream(Nz,ffts=1,nb=100,frac=False,verbose=True)
+np.testing.assert_allclose(r.x[0],s.x[0])
+np.testing.assert_allclose(r.y,ref[0:len(r.y)],atol=1e-10*abs(ref).max())
+assert H.mem['stream'] < H.mem['dense']
+
+#
+# fractional delays : fft and direct synthesis on a time window
+#
+r1 = H.ftstream(Nz,ffts=1,nb=100,tstart=10,tstop=30)
+r2 = H.ftstream(Nz,ffts=1,nb=100,tstart=10,tstop=30,method='direct')
+np.testing.assert_allclose(r1.x,r2.x)
+np.testing.assert_allclose(r1.y,r2.y,atol=1e-10*abs(r1.y).max())
+# direct synthesis by frequency batches
+for nf in [1,37,N]:
+    r3 = H.ftstream(Nz,ffts=1,nb=100,tstart=10,tstop=30,method='direct',nf=nf)
+    np.testing.assert_allclose(r3.y,r2.y,atol=1e-10*abs(r2.y).max())
+
+#
+# applywavB : ray batches (nb > 0) and all the rays at once
+# (ft1 with nearest sample placement)
+#
+from pylayers.antprop.channel import Tchannel
+nr = 300
+C = Tchannel(fGHz,y[0:nr],tau[0:nr],np.zeros((nr,2)),np.zeros((nr,2)))
+Wgam = FUsignal(fGHz,W)
+r0 = C.apply(Wgam).ft1(Nz=500,ffts=1,nearest=True)
+for nb in [1,50,1000]:
+    r = C.applywavB(Wgam,nb=nb)
+    assert len(r.y) == len(r0.y)
+    np.testing.assert_allclose(r.x,r0.x,atol=1e-10)
+    np.testing.assert_allclose(r.y,r0.y,atol=1e-10*abs(r0.y).max())
+#
+# align : default base of floor(T/dx) samples, nearest sample placement
+# on round(T/dx)+1 samples
+#
+u1 = TUsignal(np.arange(10.),np.ones(10))
+u2 = TUsignal(np.arange(10.)+5.2,2*np.ones(10))
+L = u1.align(u2)
+assert L.y.shape == (2,14)
+L = u1.align(u2,nearest=True)
+assert L.y.shape == (2,15)
+np.testing.assert_array_equal(L.y[0],np.hstack((np.ones(10),np.zeros(5))))
+np.testing.assert_array_equal(L.y[1],np.hstack((np.zeros(5),2*np.ones(10))))
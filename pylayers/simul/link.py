@@ -28,6 +28,18 @@ SLink Class
 
     SLink.onbody
 
+LinkCache Class
+===============
+
+.. autosummary::
+    :toctree: generated/
+
+    LinkCache.lock
+    LinkCache.find
+    LinkCache.index
+    LinkCache.exist
+    LinkCache.stack
+
 DLink Class
 ===========
 
@@ -114,7 +126,14 @@ from pylayers.antprop.channel import Ctilde, Tchannel
 from pylayers.antprop.statModel import getchannel
 
 import h5py
+import time
 import pdb
+from contextlib import contextmanager
+from scipy.spatial import cKDTree
+try:
+    import fcntl
+except:
+    fcntl = None
 
 
 
@@ -199,6 +218,292 @@ class SLink(Link):
 
 
 
+class LinkCache(object):
+    """ in memory index of a Links h5 file
+
+    The mapping datasets (c_map,p_map,f_map,A_map,T_map) and the group
+    names of the sig, ray, Ct and H groups are held in memory, so that
+    looking up a configuration does not touch the file.
+    The file is only opened when something is missing from memory
+    and all the additions required by a configuration are written
+    in a single transaction.
+
+    Transactions are protected by an advisory lock on the file
+    <filename>.lock so that several processes can share the same
+    Links file.
+
+    Attributes
+    ----------
+
+    filename : string
+        long filename of the h5 file
+    map : dict
+        in memory copy of the mapping datasets
+    grp : dict
+        set of group names of 'sig','ray','Ct','H'
+    nopen : int
+        number of file opening (for monitoring)
+
+    """
+    lmap = ['c_map','p_map','f_map','A_map','T_map']
+    lgrp = ['sig','ray','Ct','H']
+
+    def __init__(self,filename):
+        self.filename = filename
+        self.lockname = filename + '.lock'
+        self.map = {}
+        self.grp = {}
+        self.nopen = 0
+        self._depth = 0
+        self._lockfd = None
+        self._tree = None
+        self._ntree = 0
+        with self.lock(shared=True):
+            f = self._open('r')
+            try:
+                for k in self.lmap:
+                    self.map[k] = f[k][...]
+                for k in self.lgrp:
+                    self.grp[k] = set(f[k].keys())
+            finally:
+                f.close()
+
+    def __repr__(self):
+        s = 'LinkCache : ' + self.filename + '\n'
+        for k in self.lmap:
+            s = s + k + ' : ' + str(len(self.map[k])) + '\n'
+        for k in self.lgrp:
+            s = s + k + ' : ' + str(len(self.grp[k])) + ' groups\n'
+        s = s + 'file openings : ' + str(self.nopen)
+        return(s)
+
+    @contextmanager
+    def lock(self,shared=False):
+        """ advisory lock of the h5 file (reentrant)
+
+        Parameters
+        ----------
+
+        shared : boolean
+            shared (read) lock if True, exclusive lock otherwise
+
+        """
+        if self._depth==0:
+            self._lockfd = open(self.lockname,'a')
+            if fcntl is not None:
+                if shared:
+                    fcntl.flock(self._lockfd,fcntl.LOCK_SH)
+                else:
+                    fcntl.flock(self._lockfd,fcntl.LOCK_EX)
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth==0:
+                if fcntl is not None:
+                    fcntl.flock(self._lockfd,fcntl.LOCK_UN)
+                self._lockfd.close()
+                self._lockfd = None
+
+    def _open(self,mode):
+        self.nopen += 1
+        return(h5py.File(self.filename,mode))
+
+    def _tail(self,f):
+        """ read the rows added to the mapping datasets by other processes
+        """
+        for k in self.lmap:
+            n = len(self.map[k])
+            if f[k].shape[0] > n:
+                self.map[k] = np.concatenate((self.map[k],f[k][n:]),axis=0)
+
+    def find(self,key,array,tol=1e-3):
+        """ indices of array in the in memory mapping dataset key
+
+        Parameters
+        ----------
+
+        key : string
+            'c_map' | 'p_map' | 'f_map' | 'A_map' | 'T_map'
+        array : np.ndarray
+        tol : float
+            tolerance in meter for p_map
+
+        Returns
+        -------
+
+        ua : np.ndarray
+            increasing indices (empty if array does not exist)
+
+        Notes
+        -----
+
+        p_map is searched with a KD-tree built on the first rows of the map,
+        the rows added since the last build are scanned linearly.
+
+        """
+        fa = self.map[key]
+
+        if key == 'c_map':
+            eq = array == fa
+            # sum eq = 3 means cy0,cy1 and cutoff are the same in fa and array
+            ua = np.where(np.sum(eq,axis=1)==3)[0]
+
+        elif key == 'p_map':
+            n = len(fa)
+            if (n-self._ntree) > max(64,self._ntree/10):
+                self._tree = cKDTree(fa)
+                self._ntree = n
+            if self._ntree > 0:
+                ua = np.array(self._tree.query_ball_point(array,tol),dtype=int)
+            else:
+                ua = np.array([],dtype=int)
+            if n > self._ntree:
+                da = np.sqrt(np.sum((array-fa[self._ntree:])**2,axis=1))
+                ua = np.hstack((ua,self._ntree+np.where(da<tol)[0]))
+            ua = np.sort(ua)
+
+        elif key == 'f_map':
+            if len(fa)==0:
+                return(np.array([],dtype=int))
+            # fmin_h5 < fmin_rqst
+            ufmi = np.where(fa[:,0]<=array[0])[0]
+            lufmi = len(ufmi)
+            # fmax_h5 > fmax_rqst
+            ufma = np.where(fa[:,1]>=array[1])[0]
+            lufma = len(ufma)
+            # fstep_h5 < fstep_rqst
+            ufst = np.where(fa[:,2]<=array[2])[0]
+            lufst = len(ufst)
+            # if fmin, fmax or fstep
+            if (lufmi==0) and (lufma==0) and (lufst==0):
+                ua = np.array([])
+            else :
+                # find comon lines of fmin and fmax
+                ufmima = np.where(np.in1d(ufmi,ufma))[0]
+                # find comon lines of fmin, fmax and fstep
+                ua = np.where(np.in1d(ufmima,ufst))[0]
+
+        elif key == 'A_map':
+            ua = np.where(fa==array)[0]
+
+        elif key == 'T_map':
+            eq = array == fa
+            seq = np.sum(np.sum(eq,axis=1),axis=1)
+            ua = np.where(seq==9)[0]
+
+        else :
+            raise NameError('LinkCache.find : invalid key')
+
+        return ua
+
+    def index(self,lreq,tol=1e-3):
+        """ get (or create) the indices of a list of arrays
+
+        Parameters
+        ----------
+
+        lreq : list
+            list of (key,array)
+        tol : float
+            tolerance in meter for p_map
+
+        Returns
+        -------
+
+        lu : list
+            list of (u_opt,u) with u_opt 'r' if read and 's' if stacked
+
+        Notes
+        -----
+
+        Missing arrays are appended to the file in a single transaction,
+        after reading the rows added by other processes.
+
+        """
+        lu = []
+        for key,array in lreq:
+            ua = self.find(key,array,tol=tol)
+            if len(ua)>0:
+                lu.append(('r',ua[0]))
+            else:
+                lu.append(None)
+
+        if None in lu:
+            with self.lock():
+                f = self._open('a')
+                try:
+                    self._tail(f)
+                    for k,(key,array) in enumerate(lreq):
+                        if lu[k] is not None:
+                            continue
+                        ua = self.find(key,array,tol=tol)
+                        if len(ua)>0:
+                            lu[k] = ('r',ua[0])
+                        else:
+                            lu[k] = ('s',self._append(f,key,array))
+                finally:
+                    f.close()
+        return(lu)
+
+    def _append(self,f,key,array):
+        """ append array to the mapping dataset key of the open file f
+        """
+        sc = f[key].shape
+        f[key].resize((sc[0]+1,)+sc[1:])
+        f[key][-1,...] = array
+        self.map[key] = np.concatenate((self.map[key],f[key][-1:]),axis=0)
+        return(sc[0])
+
+    def stack(self,key,array):
+        """ append array to the mapping dataset key
+
+        Returns
+        -------
+
+        idx : int
+            index of the appended array
+
+        """
+        with self.lock():
+            f = self._open('a')
+            try:
+                self._tail(f)
+                idx = self._append(f,key,array)
+            finally:
+                f.close()
+        return(idx)
+
+    def exist(self,lkg):
+        """ check existence of a list of groups
+
+        Parameters
+        ----------
+
+        lkg : list
+            list of (key,grpname) with key in 'sig','ray','Ct','H'
+
+        Returns
+        -------
+
+        lb : list of boolean
+
+        """
+        lb = [ g in self.grp[k] for k,g in lkg ]
+        if False in lb:
+            # groups may have been created by other processes
+            with self.lock(shared=True):
+                f = self._open('r')
+                try:
+                    for k in set([ k for k,g in lkg ]):
+                        self.grp[k] = set(f[k].keys())
+                finally:
+                    f.close()
+            lb = [ g in self.grp[k] for k,g in lkg ]
+        return(lb)
+
+
 class DLink(Link):
 
     def __init__(self, **kwargs):
@@ -397,6 +702,8 @@ class DLink(Link):
             print 'Links save file for ' + self.L.filename + ' does not exist.'
             print 'It is beeing created. You\'ll see that message only once per Layout'
             self.save_init(filenameh5)
+        # in memory index of the h5 file
+        self.cache = LinkCache(filenameh5)
 
         # dictionnary data exists
         self.dexist={'sig':{'exist':False,'grpname':''},
@@ -458,6 +765,8 @@ class DLink(Link):
         self.R = Rays(self.a,self.b)
         self.C = Ctilde()
         self.H = Tchannel()
+        # in memory signatures of the incremental mode
+        self.dsig = {}
 
 
 
@@ -697,8 +1006,10 @@ class DLink(Link):
             print 'Links save file for ' + self.L.filename + ' does not exist.'
             print 'It is beeing created. You\'ll see that message only once per Layout'
             self.save_init(filenameh5)
+        self.cache = LinkCache(filenameh5)
 
 
+        self.dsig = {}
         try:
             delattr(self,'Si')
         except:
@@ -730,7 +1041,9 @@ class DLink(Link):
         # get identifier groupname in h5py file
         self.get_grpname()
         # check if grpnamee exist in the h5py file
-        [self.fill_dexist(k,self.dexist[k]['grpname'])   for k in self.save_opt]
+        lb = self.cache.exist([(k,self.dexist[k]['grpname']) for k in self.save_opt])
+        for k,b in zip(self.save_opt,lb):
+            self.dexist[k]['exist'] = b
 
 
 
@@ -789,22 +1102,7 @@ class DLink(Link):
             indice of last element of the array of key
 
         """
-        try :
-            lfilename=pyu.getlong(self.filename,pstruc['DIRLNK'])
-            f=h5py.File(lfilename,'a')
-            if key != 'T_map':
-                sc = f[key].shape
-                f[key].resize((sc[0]+1,sc[1]))
-                f[key][-1,:]=array
-            else:
-                sc = f[key].shape
-                f[key].resize((sc[0]+1,sc[1],sc[2]))
-                f[key][-1,:,:]=array
-            f.close()
-            return np.array([sc[0]])
-        except:
-            f.close()
-            raise NameError('Link stack: issue during stacking')
+        return np.array([self.cache.stack(key,array)])
 
     def _delete(self,key,grpname):
         """ Delete a key and associated data into h5py file
@@ -819,17 +1117,19 @@ class DLink(Link):
 
         """
         lfilename=pyu.getlong(self.filename,pstruc['DIRLNK'])
-        f=h5py.File(lfilename,'a')
-        # try/except to avoid loosing the h5 file if
-        # read/write error
+        with self.cache.lock():
+            f=h5py.File(lfilename,'a')
+            # try/except to avoid loosing the h5 file if
+            # read/write error
 
-        try:
-            del f[key][grpname]
-            # print 'delete ',key , ' in ', grpname
-            f.close()
-        except:
-            f.close()
-            raise NameError('Link._delete: issue when deleting in h5py file')
+            try:
+                del f[key][grpname]
+                # print 'delete ',key , ' in ', grpname
+                f.close()
+            except:
+                f.close()
+                raise NameError('Link._delete: issue when deleting in h5py file')
+        self.cache.grp[key].discard(grpname)
 
 
 
@@ -848,15 +1148,19 @@ class DLink(Link):
         """
 
 
-        if not force :
-            obj._saveh5(self.filename,grpname)
-        # if save is forced, previous existing data are removed and
-        # replaced by new ones.
-        else :
-            if self.dexist[key]['exist']:
-                self._delete(key,grpname)
+        with self.cache.lock():
+            if not force :
+                # the group may have been saved by an other process
+                if not self.cache.exist([(key,grpname)])[0]:
+                    obj._saveh5(self.filename,grpname)
+            # if save is forced, previous existing data are removed and
+            # replaced by new ones.
+            else :
+                if self.cache.exist([(key,grpname)])[0]:
+                    self._delete(key,grpname)
 
-            obj._saveh5(self.filename,grpname)
+                obj._saveh5(self.filename,grpname)
+            self.cache.grp[key].add(grpname)
 
         if self.verbose :
             print str(obj.__class__).split('.')[-1] + ' from '+ grpname + ' saved'
@@ -876,7 +1180,8 @@ class DLink(Link):
 
         """
 
-        obj._loadh5(self.filename,grpname)
+        with self.cache.lock(shared=True):
+            obj._loadh5(self.filename,grpname)
         if self.verbose :
             print str(obj.__class__).split('.')[-1] + ' from '+ grpname + ' loaded'
 
@@ -890,42 +1195,43 @@ class DLink(Link):
         Update the key grpname of self.dexist[key] dictionnary,
         where key  = 'sig'|'ray'|'Ct'|'H'
 
+        All the indices are obtained with a single LinkCache.index call,
+        i.e. at most one file transaction.
+
         """
-        
+
+        # signature cycles, positions of a and b, frequency range
+        # rotation matrices and antenna names
+        farray = np.array(([self.fmin,self.fmax,self.fstep]))
+        lreq = [('c_map',np.array(([self.ca,self.cb,self.cutoff]))),
+                ('p_map',self.a),
+                ('p_map',self.b),
+                ('f_map',farray),
+                ('T_map',self.Ta),
+                ('T_map',self.Tb),
+                ('A_map',self.Aa._filename),
+                ('A_map',self.Ab._filename)]
+        lu = self.cache.index(lreq)
+        uc,ua,ub,uf,uTa,uTb,uAa,uAb = [ u for (u_opt,u) in lu ]
+
         ############
         # Signatures
         ############
 
-        array = np.array(([self.ca,self.cb,self.cutoff]))
-        ua_opt, ua = self.get_idx('c_map',array)
         grpname = str(self.ca) + '_' +str(self.cb) + '_' + str(self.cutoff)
         self.dexist['sig']['grpname']=grpname
 
-
-
         ############
         # Rays
         #############
 
-        # check existence of self.a in h5py file
-
-        ua_opt, ua = self.get_idx('p_map',self.a)
-        # check existence of self.b in h5py file
-        ub_opt, ub = self.get_idx('p_map',self.b)
-        # Write in h5py if no prior a-b link
         grpname = str(self.cutoff) + '_' + str(ua) + '_' +str(ub)
         self.dexist['ray']['grpname']=grpname
 
-
-
         ############
         # Ctilde
         #############
 
-        # check existence of frequency in h5py file
-        farray = np.array(([self.fmin,self.fmax,self.fstep]))
-        uf_opt, uf = self.get_idx('f_map',farray)
-
         grpname = str(ua) + '_' + str(ub) + '_' + str(uf)
         self.dexist['Ct']['grpname'] = grpname
 
@@ -933,17 +1239,6 @@ class DLink(Link):
         # H
         #############
 
-
-        # check existence of Rot a (Ta) in h5py file
-        uTa_opt, uTa = self.get_idx('T_map',self.Ta)
-        # check existence of Rot b (Tb) in h5py file
-        uTb_opt, uTb = self.get_idx('T_map',self.Tb)
-        # check existence of Antenna a (Aa) in h5py file
-        uAa_opt, uAa = self.get_idx('A_map',self.Aa._filename)
-        # check existence of Antenna b (Ab) in h5py file
-        uAb_opt, uAb = self.get_idx('A_map',self.Ab._filename)
-
-
         grpname = str(ua) + '_' + str(ub) + '_' + str(uf) + \
                   '_'  + str(uTa) + '_' + str(uTb) + \
                   '_'  + str(uAa) + '_' + str(uAb)
@@ -969,17 +1264,7 @@ class DLink(Link):
         update the key grpname of self.dexist[key] dictionnary
 
         """
-        try :
-            lfilename=pyu.getlong(self.filename,pstruc['DIRLNK'])
-            f=h5py.File(lfilename,'r')
-            if grpname.decode('utf8') in f[key].keys():
-                self.dexist[key]['exist']=True
-            else :
-                self.dexist[key]['exist']=False
-            f.close()
-        except:
-            f.close()
-            raise NameError('Link exist: issue during stacking')
+        self.dexist[key]['exist'] = self.cache.exist([(key,grpname)])[0]
 
 
     def get_idx(self,key,array,tol=1e-3):
@@ -1015,20 +1300,11 @@ class DLink(Link):
         --------
 
         Links.array_exist
+        LinkCache.index
 
         """
 
-        umap = self.array_exist(key,array,tol=tol)
-        lu = len(umap)
-        # if exists take the existing one
-        # otherwise value is created
-        if lu != 0:
-            u = umap
-            u_opt='r'
-        else :
-            u = self.stack(key,array)
-            u_opt='s'
-        return u_opt,u[0]
+        return self.cache.index([(key,array)],tol=tol)[0]
 
 
     def array_exist(self,key,array,tol=1e-3) :
@@ -1061,58 +1337,7 @@ class DLink(Link):
       
         """
 
-        lfilename=pyu.getlong(self.filename,pstruc['DIRLNK'])
-        try :
-            f=h5py.File(lfilename,'a')
-            fa = f[key][...]
-            f.close()
-        except:
-            f.close()
-            raise NameError('Link check_exist: issue during reading')
-
-        if key == 'c_map':
-            eq = array == fa
-            # sum eq = 3 means cy0,cy1 and cutoff are the same in fa and array
-            ua = np.where(np.sum(eq,axis=1)==3)[0]
-
-        elif key == 'p_map':
-
-            da = np.sqrt(np.sum((array-fa)**2,axis=1))
-            # indice points candidate in db for a
-
-            ua = np.where(da<tol)[0]
-
-        elif key == 'f_map':
-            # fmin_h5 < fmin_rqst
-            ufmi = np.where(fa[:,0]<=array[0])[0]
-            lufmi = len(ufmi)
-            # fmax_h5 > fmax_rqst
-            ufma = np.where(fa[:,1]>=array[1])[0]
-            lufma = len(ufma)
-            # fstep_h5 < fstep_rqst
-            ufst = np.where(fa[:,2]<=array[2])[0]
-            lufst = len(ufst)
-            # if fmin, fmax or fstep
-            if (lufmi==0) and (lufma==0) and (lufst==0):
-                ua = np.array([])
-            else :
-                # find comon lines of fmin and fmax
-                ufmima = np.where(np.in1d(ufmi,ufma))[0]
-                # find comon lines of fmin, fmax and fstep
-                ua = np.where(np.in1d(ufmima,ufst))[0]
-
-        elif key == 'A_map':
-            ua = np.where(fa==array)[0]
-
-        elif key == 'T_map':
-            eq = array == fa
-            seq = np.sum(np.sum(eq,axis=1),axis=1)
-            ua = np.where(seq==9)[0]
-
-        else :
-            raise NameError('Link.array_exist : invalid key')
-
-        return ua
+        return self.cache.find(key,array,tol=tol)
 
 
     def eval(self,**kwargs):
@@ -1132,7 +1357,9 @@ class DLink(Link):
 #        alg : 5 | 7
 #            version of run for signature
 #        si_mt: boolean
-#            Multuithreat version of algo version 7
+#            multiprocess version of algo version 7 (Signatures.run7mt)
+#        si_nproc: int (0)
+#            number of processes used if si_mt (0 : all the cpus)
 #        si_progress: bollean ( False)
 #            display progression bar for signatures
 #        diffraction : boolean (False)
@@ -1143,6 +1370,14 @@ class DLink(Link):
 #            ceil height
 #        ra_vectorized: boolean (True)
 #            if True used the (2015 new) vectorized approach to determine 2drays
+#        ct_chunk : int (0)
+#            number of frequency points evaluated at once in Rays.eval
+#            (0 : all the frequency points)
+#        incremental : boolean (False)
+#            keep the signatures of the (ca,cb,cutoff) cycles in memory and
+#            only recompute rays, Ct and H (not saved in the h5 file)
+#            when an end point moves inside its cycle.
+#            Per stage timing is stored in self.tstage
 #
 #        """
 
@@ -1194,15 +1429,18 @@ class DLink(Link):
         defaults={ 'applywav':True,
                    'si_algo':'old',
                    'si_mt':False,
+                   'si_nproc':0,
                    'si_progress':False,
                    'diffraction':False,
                    'ra_vectorized':False,
                    'ra_ceil_height_meter':3,
                    'ra_number_mirror_cf':1,
+                   'ct_chunk':0,
                    'force':[],
                    'alg':7,
                    'si_reverb':4,
                    'threshold':0.1,
+                   'incremental':False,
                    }
         for key, value in defaults.items():
             if key not in kwargs:
@@ -1222,20 +1460,32 @@ class DLink(Link):
                     kwargs['force'] = []
 
         # must be placed after all the init !!!!
-        self.checkh5()
+        #
+        # incremental mode : signatures of the current pair of cycles
+        # are kept in memory, only the rays are recomputed
+        #
+        sigkey = (self.ca,self.cb,kwargs['cutoff'],kwargs['diffraction'])
+        incr = kwargs['incremental'] and ('sig' not in kwargs['force'])
+        reuse = incr and (sigkey in self.dsig)
+
+        if not reuse:
+            self.checkh5()
 
+        self.tstage = {}
 
         ############
         # Signatures
         ############
-        Si = Signatures(self.L,self.ca,self.cb,cutoff=kwargs['cutoff'])
-
-
-        if (self.dexist['sig']['exist'] and not ('sig' in kwargs['force'])):
+        tic = time.time()
+        if reuse:
+            Si = self.dsig[sigkey]
 
+        elif (self.dexist['sig']['exist'] and not ('sig' in kwargs['force'])):
+            Si = Signatures(self.L,self.ca,self.cb,cutoff=kwargs['cutoff'])
             self.load(Si,self.dexist['sig']['grpname'])
 
         else :
+            Si = Signatures(self.L,self.ca,self.cb,cutoff=kwargs['cutoff'])
             if kwargs['alg']==2015:
                 TMP=Si.run2015(cutoff=kwargs['cutoff'],
                         cutoffbound=kwargs['si_reverb'])
@@ -1249,12 +1499,13 @@ class DLink(Link):
                         diffraction=kwargs['diffraction'],
                         progress=kwargs['si_progress'])
             if kwargs['alg']==7:
-                if kwargs['si_mt']==7:
+                if kwargs['si_mt']:
                     Si.run7mt(cutoff=kwargs['cutoff'],
                         algo=kwargs['si_algo'],
                         diffraction=kwargs['diffraction'],
                         threshold=kwargs['threshold'],
-                        progress=kwargs['si_progress'])
+                        progress=kwargs['si_progress'],
+                        nproc=kwargs['si_nproc'])
                 else :
                     Si.run7(cutoff=kwargs['cutoff'],
                         algo=kwargs['si_algo'],
@@ -1266,16 +1517,20 @@ class DLink(Link):
             # save sig
             self.save(Si,'sig',self.dexist['sig']['grpname'],force = kwargs['force'])
 
+        if kwargs['incremental']:
+            self.dsig[sigkey] = Si
         self.Si = Si
+        self.tstage['sig'] = time.time()-tic
 
 
 
         ############
         # Rays
         ############
+        tic = time.time()
         R = Rays(self.a,self.b)
 
-        if self.dexist['ray']['exist'] and not ('ray' in kwargs['force']):
+        if (not incr) and self.dexist['ray']['exist'] and not ('ray' in kwargs['force']):
             self.load(R,self.dexist['ray']['grpname'])
 
         else :
@@ -1290,9 +1545,11 @@ class DLink(Link):
             R = r2d.to3D(self.L,H=self.L.maxheight, N=kwargs['ra_number_mirror_cf'])
             R.locbas(self.L)
             # ...and save
-            self.save(R,'ray',self.dexist['ray']['grpname'],force = kwargs['force'])
+            if not incr:
+                self.save(R,'ray',self.dexist['ray']['grpname'],force = kwargs['force'])
 
         self.R = R
+        self.tstage['ray'] = time.time()-tic
         
 
         if self.R.nray == 0:
@@ -1303,26 +1560,30 @@ class DLink(Link):
         ############
         # Ctilde
         ############
+        tic = time.time()
         C=Ctilde()
 
-        if self.dexist['Ct']['exist'] and not ('Ct' in kwargs['force']):
+        if (not incr) and self.dexist['Ct']['exist'] and not ('Ct' in kwargs['force']):
             self.load(C,self.dexist['Ct']['grpname'])
 
         else :
             R.fillinter(self.L)
             # Ctilde...
-            C = R.eval(self.fGHz)
+            C = R.eval(self.fGHz,chunk=kwargs['ct_chunk'])
             # ...save Ct
-            self.save(C,'Ct',self.dexist['Ct']['grpname'],force = kwargs['force'])
+            if not incr:
+                self.save(C,'Ct',self.dexist['Ct']['grpname'],force = kwargs['force'])
 
         self.C = C
+        self.tstage['Ct'] = time.time()-tic
 
         ############
         # H
         ############
+        tic = time.time()
         H = Tchannel()
 
-        if self.dexist['H']['exist'] and not ('H' in kwargs['force']):
+        if (not incr) and self.dexist['H']['exist'] and not ('H' in kwargs['force']):
             self.load(H,self.dexist['H']['grpname'])
 
 
@@ -1331,9 +1592,21 @@ class DLink(Link):
             Cl=C.locbas(Tt=self.Ta, Tr=self.Tb)
             #T channel
             H = C.prop2tran(a=self.Aa,b=self.Ab,Friis=True)
-            self.save(H,'H',self.dexist['H']['grpname'],force = kwargs['force'])
+            if not incr:
+                self.save(H,'H',self.dexist['H']['grpname'],force = kwargs['force'])
 
         self.H = H
+        self.tstage['H'] = time.time()-tic
+
+        # rays, Ct and H of the incremental mode are not stored in the h5 file
+        if incr:
+            for k in ['ray','Ct','H']:
+                self.dexist[k]['exist'] = False
+                self.dexist[k]['grpname'] = ''
+
+        if self.verbose:
+            print 'timing (s) : ' + ' '.join([ k + ' %.3f' % self.tstage[k] for k in ['sig','ray','Ct','H']])
+
         if kwargs['applywav']:
             if self.H.isFriis:
                 self.ir = self.H.applywavB(self.wav.sf)
@@ -71,6 +71,7 @@ from pylayers.gis.layout import Layout
 from pylayers.antprop.slab import Slab
 from pylayers.util.utilnet import str2bool
 from pylayers.mobility.transit.World import world
+from pylayers.mobility.transit.Crowd import Crowd
 #from pylayers.util.pymysqldb import Database as DB
 from pylayers.util.project import *
 from pylayers.util.save import *
@@ -212,6 +213,16 @@ class Simul(SimulationRT): # Sympy 2
 
         self.lAg = []
         agents=[]
+        # all the agents are moved by a single crowd process
+        if str2bool(self.meca_opt.get('crowd','False')):
+            self.crowd = Crowd(interval=float(self.meca_opt['mecanic_update_time']),
+                               wld=self.the_world,
+                               net=self.net,
+                               sim=self,
+                               save=eval(self.save_opt['save']),
+                               vsync=str2bool(self.net_opt['show_table']))
+        else:
+            self.crowd = None
         Cf = ConfigParser.ConfigParser()
         Cf.read(pyu.getlong('agent.ini','ini'))
         agents=eval(dict(Cf.items('used_agent'))['list'])
@@ -243,7 +254,10 @@ class Simul(SimulationRT): # Sympy 2
                             gcom=self.gcom,
                             comm_mode=eval(self.net_opt['communication_mode']),
                             sim=self,
+                            crowd=self.crowd,
                             seed=self.seed))
+        if self.crowd is not None:
+            self.activate(self.crowd, self.crowd.run(), 0.0)
 
 
     def create_EMS(self):
@@ -385,8 +399,10 @@ class Simul(SimulationRT): # Sympy 2
             self.simulate(until=float(self.sim_opt['duration']),
                           real_time=True,
                           rel_speed=float(self.sim_opt['speedratio']))
+            if self.crowd is not None:
+                self.crowd.savedf()
 
-            self.the_world._boids={}
+            self.the_world.reset_boids()
 
 
             #if str2bool(self.save_opt['savep']):
@@ -20,6 +20,7 @@ Run simulation and data exploitation
 
     Simul.__init__
     Simul.run
+    Simul.prun
     Simul._gen_net
     Simul.evaldeter
     Simul.evalstat
@@ -34,6 +35,18 @@ Internal configuration
     Simul._saveh5
     Simul._loadh5
 
+TrajStore class
+===============
+
+.. autosummary::
+    :toctree: generated/
+
+    TrajStore.__init__
+    TrajStore.done
+    TrajStore.append
+    TrajStore.todf
+    TrajStore.aktk
+
 
 """
 import doctest
@@ -60,6 +73,240 @@ from pylayers.mobility.ban.body import *
 from pylayers.antprop.statModel import *
 import pandas as pd
 import csv
+import os
+import time
+import itertools
+import multiprocessing as mp
+
+# shared with the prun worker processes (see Simul.prun)
+_S = None
+
+def _prun_init():
+    """ prun worker initialization
+
+    Each worker process evaluates its links with its own Layout and DLink.
+    The DLink of the worker has the configuration of the DLink of the
+    calling Simul.
+
+    """
+    DL = _S.DL
+    _S.L = Layout(_S.L.filename)
+    _S.DL = DLink(L=_S.L,
+                  a=DL.a,b=DL.b,
+                  Aa=DL.Aa,Ab=DL.Ab,
+                  Ta=DL.Ta,Tb=DL.Tb,
+                  fGHz=DL.fGHz,
+                  wav=DL.wav,
+                  cutoff=DL.cutoff,
+                  save_opt=DL.save_opt,
+                  save_idx=DL.save_idx,
+                  verbose=False)
+
+def _prun_unit(lut):
+    """ evaluate all the links of _S._lk for a block of time indices
+
+    Parameters
+    ----------
+
+    lut : list
+        time indices in _S._lt
+
+    Returns
+    -------
+
+    lut : list
+    rows : np.array (len(lut)*nlink,ncol)
+        see TrajStore.columns
+    ak : np.array
+    tk : np.array
+
+    """
+    S = _S
+    rows = []
+    lak = []
+    ltk = []
+    for ut in lut:
+        t = S._lt[ut]
+        S.ctime = t
+        S.update_pos(t)
+        for il,(na,nb,typ,w) in enumerate(S._lk):
+            ak, tk = S.evaldeter(na, nb, w, applywav=False, incremental=True)
+            ak = np.ravel(ak)
+            tk = np.ravel(tk)
+            # body engagement of the on body links (see evalstat)
+            if typ == 'OB':
+                eng = float(S.evalstat(na, nb)[2])
+            else:
+                eng = 0
+            pa = S.N.node[na]['p']
+            pb = S.N.node[nb]['p']
+            rows.append([ut, t, il,
+                         pa[0], pa[1], pa[2],
+                         pb[0], pb[1], pb[2],
+                         S.N.edge[na][nb]['d'], eng,
+                         S.DL.fmin, S.DL.fmax, S.DL.fstep,
+                         len(ak)])
+            lak.append(ak)
+            ltk.append(tk)
+    return lut, np.array(rows), np.hstack(lak), np.hstack(ltk)
+
+
+class TrajStore(object):
+    """ columnar h5 store of the results of Simul.prun
+
+    Dataset organisation:
+
+    simultraj_<trajectory_filename>_run.h5
+        |
+        |time  : requested time values
+        |links : (nlink,4) id_a, id_b, typ, wstd
+        |rows  : (nrow,ncol) one row per (time,link), see columns
+        |ak    : alpha_k of all the rows (concatenated)
+        |tk    : tau_k of all the rows (concatenated)
+        |done  : time indices already evaluated
+
+    The number of paths of a row is in column nk, hence the paths of row i
+    are ak[ptr[i]:ptr[i+1]] with ptr = np.r_[0,np.cumsum(nk)].
+    Results are appended as they are produced and a time index is marked
+    done once all its links are written. This allows to resume an
+    interrupted run.
+
+    The committed lengths of rows, ak, tk and done are stored in the
+    attributes of the file. They are updated after the data of an append
+    have been flushed, and the datasets are truncated to these lengths
+    when the file is opened, so that an append interrupted in the middle
+    is discarded.
+
+    """
+    columns = ['ut','t','il',
+               'x_a','y_a','z_a',
+               'x_b','y_b','z_b',
+               'd','eng',
+               'fbminghz','fbmaxghz','fstep',
+               'nk']
+    # appended datasets
+    keys = ['rows','ak','tk','done']
+
+    def __init__(self,filename,lt,lk,resume=True):
+        """
+        Parameters
+        ----------
+
+        filename : string
+            long filename
+        lt : np.array
+            requested time values
+        lk : list
+            list of links (id_a,id_b,typ,wstd)
+        resume : boolean
+            if False an existing file is replaced
+
+        """
+        self.filename = filename
+        alk = np.array([ [str(x) for x in l] for l in lk ])
+        if resume and os.path.exists(filename):
+            f = h5py.File(filename,'a')
+            try:
+                same = ((len(f['time'])==len(lt)) and
+                        np.allclose(f['time'][...],lt) and
+                        (f['links'].shape == alk.shape) and
+                        (f['links'][...]==alk).all())
+                if same:
+                    # discard an interrupted append
+                    for key in self.keys:
+                        n = f.attrs['n'+key]
+                        if f[key].shape[0] != n:
+                            f[key].resize((n,)+f[key].shape[1:])
+            finally:
+                f.close()
+            if not same:
+                raise NameError('TrajStore: ' + filename +
+                                ' has been created for other times or links,'
+                                ' use resume=False')
+        else:
+            f = h5py.File(filename,'w')
+            try:
+                f.create_dataset('time',data=lt)
+                f.create_dataset('links',data=alk)
+                f.create_dataset('rows',shape=(0,len(self.columns)),
+                                 maxshape=(None,len(self.columns)),dtype='float64')
+                f.attrs['columns'] = self.columns
+                f.create_dataset('ak',shape=(0,),maxshape=(None,),dtype='float64')
+                f.create_dataset('tk',shape=(0,),maxshape=(None,),dtype='float64')
+                f.create_dataset('done',shape=(0,),maxshape=(None,),dtype='int')
+                for key in self.keys:
+                    f.attrs['n'+key] = 0
+            finally:
+                f.close()
+
+    def done(self):
+        """ time indices already evaluated
+        """
+        f = h5py.File(self.filename,'r')
+        try:
+            done = f['done'][0:f.attrs['ndone']]
+        finally:
+            f.close()
+        return(done)
+
+    def append(self,lut,rows,ak,tk):
+        """ append the results of a block of time indices
+
+        Parameters
+        ----------
+
+        lut : list
+            time indices
+        rows : np.array (nrow,ncol)
+        ak : np.array
+        tk : np.array
+
+        """
+        f = h5py.File(self.filename,'a')
+        try:
+            ldata = [rows,ak,tk,np.array(lut)]
+            for key,data in zip(self.keys,ldata):
+                n = f.attrs['n'+key]
+                f[key].resize((n+len(data),)+f[key].shape[1:])
+                f[key][n:,...] = data
+            f.flush()
+            # commit
+            for key,data in zip(self.keys,ldata):
+                f.attrs['n'+key] = f.attrs['n'+key] + len(data)
+            f.flush()
+        finally:
+            f.close()
+
+    def todf(self):
+        """ results as a pandas DataFrame indexed by time
+        """
+        f = h5py.File(self.filename,'r')
+        try:
+            rows = f['rows'][0:f.attrs['nrows']]
+            alk = f['links'][...]
+        finally:
+            f.close()
+        df = pd.DataFrame(rows,columns=self.columns)
+        il = df['il'].values.astype(int)
+        for k,c in enumerate(['id_a','id_b','typ','wstd']):
+            df[c] = alk[il,k]
+        df.index = df['t'].values
+        df.index.name = 't'
+        return(df)
+
+    def aktk(self,i):
+        """ alpha_k and tau_k of row i
+        """
+        f = h5py.File(self.filename,'r')
+        try:
+            nk = f['rows'][0:f.attrs['nrows'],self.columns.index('nk')].astype(int)
+            ptr = np.r_[0,np.cumsum(nk)]
+            ak = f['ak'][ptr[i]:ptr[i+1]]
+            tk = f['tk'][ptr[i]:ptr[i+1]]
+        finally:
+            f.close()
+        return(ak,tk)
+
 
 class Simul(PyLayers):
     """
@@ -398,44 +645,24 @@ class Simul(PyLayers):
         self.update_pos(t)
 
 
-    def run(self, **kwargs):
-        """ run the link evaluation along a trajectory
-
+    def _runconf(self, kwargs):
+        """ check and complete the arguments of run and prun
 
         Parameters
         ----------
 
-        OB: boolean
-            perform on body statistical link evaluation
-        B2B:  boolean
-            perform body to body deterministic link evaluation
-        B2I: boolean
-            perform body to infrastructure deterministic link evaluation
-        I2I:  boolean
-            perform infrastructure to infrastructure deterministic link eval.
-        links: dict
-            dictionnary of link to be evaluated (key is wtsd and value is a list of links)
-            (if [], all link are considered)
-        wstd: list
-            list of wstd to be evaluated
-            (if [], all wstd are considered)
-        t: np.array
-            list of timestamp to be evaluated
-            (if [], all timestamps are considered)
-
+        kwargs : dict
+            OB, B2B, B2I, I2I, links, wstd, t (see run)
 
-        Example
+        Returns
         -------
 
-            >>> from pylayers.simul.simultraj import *
-            >>> from pylayers.measures.cormoran import *
-            >>> C=CorSer()
-            >>> S=Simul(C,verbose=True)
-            >>> link={'ieee802154':[]}
-            >>> link['ieee802154'].append(S.N.links['ieee802154'][0])
-            >>> lt = [0,0.2,0.3,0.4,0.5]
-            >>> S.run(links=link,t=lt)
-
+        links : dict
+            dictionnary of links to be evaluated
+        wstd : list
+            list of wireless standards
+        lt : np.array
+            requested time values
 
         """
         defaults = {'OB': True,
@@ -505,6 +732,54 @@ class Simul(PyLayers):
                lt[-1] <= self._tmax:
                raise AttributeError('Requested time range not available')
 
+        return links, wstd, lt
+
+    def run(self, **kwargs):
+        """ run the link evaluation along a trajectory
+
+
+        Parameters
+        ----------
+
+        OB: boolean
+            perform on body statistical link evaluation
+        B2B:  boolean
+            perform body to body deterministic link evaluation
+        B2I: boolean
+            perform body to infrastructure deterministic link evaluation
+        I2I:  boolean
+            perform infrastructure to infrastructure deterministic link eval.
+        links: dict
+            dictionnary of link to be evaluated (key is wtsd and value is a list of links)
+            (if [], all link are considered)
+        wstd: list
+            list of wstd to be evaluated
+            (if [], all wstd are considered)
+        t: np.array
+            list of timestamp to be evaluated
+            (if [], all timestamps are considered)
+        incremental : boolean (True)
+            reuse the in memory signatures of a link as long as its
+            end points stay in the same cycles (see DLink.eval)
+
+
+        Example
+        -------
+
+            >>> from pylayers.simul.simultraj import *
+            >>> from pylayers.measures.cormoran import *
+            >>> C=CorSer()
+            >>> S=Simul(C,verbose=True)
+            >>> link={'ieee802154':[]}
+            >>> link['ieee802154'].append(S.N.links['ieee802154'][0])
+            >>> lt = [0,0.2,0.3,0.4,0.5]
+            >>> S.run(links=link,t=lt)
+
+
+        """
+        incremental = kwargs.pop('incremental',True)
+        links, wstd, lt = self._runconf(kwargs)
+
         # self._traj is a copy of self.traj, which is affected by resampling.
         # it is only a temporary attribute for a given run
         # if len(lt) > 1:
@@ -542,7 +817,10 @@ class Simul(PyLayers):
                             print '-'*30
                         eng = 0
                         #self.evaldeter(na, nb, w,applywav=False)
-                        self.evaldeter(na, nb, w,applywav=False, force =['Ct','H'])
+                        if incremental:
+                            self.evaldeter(na, nb, w,applywav=False, incremental=True)
+                        else:
+                            self.evaldeter(na, nb, w,applywav=False, force =['Ct','H'])
                         # if typ == 'OB':
                         #     self.evalstat(na, nb)
                         #     eng = self.SL.eng
@@ -596,6 +874,104 @@ class Simul(PyLayers):
                             self._saveh5(ut, na, nb, w)
 
 
+    def prun(self, **kwargs):
+        """ parallel link evaluation along a trajectory
+
+        Parameters
+        ----------
+
+        OB, B2B, B2I, I2I, links, wstd, t :
+            see run
+        nproc : int
+            number of worker processes (default 0 : multiprocessing.cpu_count())
+            if nproc==1 evaluation is done in the calling process
+        tchunk : int
+            number of consecutive time steps of a work unit (default 10)
+        resume : boolean
+            if True (default) the time steps already stored
+            in the result file are skipped
+
+        Returns
+        -------
+
+        st : TrajStore
+            columnar store of the results
+
+        Notes
+        -----
+
+        The (time,link) grid is split along time in blocks of tchunk
+        consecutive steps which are evaluated by a process pool.
+        Each worker holds its own Layout and DLink, positions the bodies
+        once per time step and evaluates all the links in the incremental
+        mode of DLink.eval, so that signatures are reused along the block.
+        Results are streamed to simultraj_<trajectory>_run.h5
+        (see TrajStore) instead of self.data.
+
+        Examples
+        --------
+
+            >>> from pylayers.simul.simultraj import *
+            >>> from pylayers.measures.cormoran import *
+            >>> C=CorSer()
+            >>> S=Simul(C,verbose=False)
+            >>> st = S.prun(t=np.arange(0,1,0.1),nproc=4)
+            >>> df = st.todf()
+
+        """
+        global _S
+
+        nproc = kwargs.pop('nproc',0)
+        tchunk = kwargs.pop('tchunk',10)
+        resume = kwargs.pop('resume',True)
+        links, wstd, lt = self._runconf(kwargs)
+        lt = self.get_sim_time(lt)
+
+        lk = [ (na,nb,typ,w) for w in wstd
+                             for na,nb,typ in links[w]
+                             if self.todo[typ] ]
+        if len(lk)==0:
+            raise AttributeError('no link to be evaluated')
+
+        filename = pyu.getlong(self.filename.split('.')[0] + '_run.h5',
+                               pstruc['DIRLNK'])
+        st = TrajStore(filename,lt,lk,resume=resume)
+
+        done = set(st.done())
+        lut = [ ut for ut in range(len(lt)) if ut not in done ]
+        lunit = [ lut[k:k+tchunk] for k in range(0,len(lut),tchunk) ]
+        if len(lunit)==0:
+            return(st)
+
+        self._lt = lt
+        self._lk = lk
+        _S = self
+        if nproc==0:
+            nproc = mp.cpu_count()
+        nproc = min(nproc,len(lunit))
+        tic = time.time()
+        try:
+            if nproc==1:
+                for k,res in enumerate(itertools.imap(_prun_unit,lunit)):
+                    st.append(*res)
+                    if self.verbose:
+                        print '%d/%d %6.3f' % (k+1,len(lunit),time.time()-tic)
+            else:
+                pool = mp.Pool(processes=nproc,initializer=_prun_init)
+                try:
+                    for k,res in enumerate(pool.imap_unordered(_prun_unit,lunit)):
+                        st.append(*res)
+                        if self.verbose:
+                            print '%d/%d %6.3f' % (k+1,len(lunit),time.time()-tic)
+                    pool.close()
+                finally:
+                    pool.terminate()
+                    pool.join()
+        finally:
+            _S = None
+
+        return(st)
+
     def check_exist(self, df):
         """check if a dataframe df already exists in self.data
 
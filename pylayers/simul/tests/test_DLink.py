@@ -14,4 +14,16 @@ if DL.R.los:
     assert tk0*0.3 == dist_a_b, 'invalid distance'
     lak0 = 20* np.log10(ak0)
     Friss= 20*np.log10(2.4)+20*np.log10(dist_a_b) + 32.4
-    assert np.allclose(-lak0,Friss,0.1), 'issue in Friss'
\ No newline at end of file
+    assert np.allclose(-lak0,Friss,0.1), 'issue in Friss'
+#
+# incremental evaluation : small move of b inside its cycle
+#
+DL.eval(incremental=True,force=['sig'])
+cb = DL.cb
+DL.b = DL.b+np.array([0.05,0.05,0])
+assert DL.cb == cb
+DL.eval(incremental=True)
+ak1,tk1 = DL.H.ak,DL.H.tk
+DL.eval(force=['ray','Ct','H'])
+np.testing.assert_almost_equal(ak1,DL.H.ak)
+np.testing.assert_almost_equal(tk1,DL.H.tk)
@@ -0,0 +1,49 @@
+import os
+import shutil
+import tempfile
+import ConfigParser
+import numpy as np
+from pylayers.util.project import *
+from pylayers.simul.simulnet import Simul
+
+#
+# simulnet with the agents moved by a single crowd process
+# simulation configuration in a copy of the project ini directory
+#
+tmpdir = tempfile.mkdtemp()
+dirsimul = pstruc['DIRSIMUL']
+dirini = os.path.join(tmpdir,'ini')
+shutil.copytree(os.path.join(basename,dirsimul),dirini)
+config = ConfigParser.ConfigParser()
+config.read(os.path.join(dirini,'simulnet.ini'))
+config.set('Mechanics','crowd','True')
+config.set('Simulation','duration','10.0')
+config.set('Save','savepd','False')
+fd = open(os.path.join(dirini,'simulnet.ini'),'w')
+config.write(fd)
+fd.close()
+try:
+    pstruc['DIRSIMUL'] = dirini
+    S = Simul()
+finally:
+    pstruc['DIRSIMUL'] = dirsimul
+    shutil.rmtree(tmpdir)
+
+C = S.crowd
+assert C is not None
+persons = [a.meca for a in S.lAg if a.typ == 'ag']
+assert len(persons) > 0
+assert C.persons == persons
+p0 = np.array([[b.position.x,b.position.y] for b in persons])
+S.runsimul()
+assert len(C._traj) > 0
+for k,b in enumerate(persons):
+    # trajectory recorded at the crowd interval from the initial position
+    assert len(b.df) > 0
+    dt = np.diff(b.df['t'].values).astype(float)/1e9
+    assert np.all(dt >= C.interval - 1e-6)
+    np.testing.assert_allclose([b.position.x,b.position.y],C.p[k])
+    # positions published to the network
+    pos = S.net.node[b.ID]['p']
+    np.testing.assert_allclose(pos[:2],C.p[k])
+assert np.any(np.abs(C.p - p0) > 0.1)
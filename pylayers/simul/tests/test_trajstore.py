@@ -0,0 +1,46 @@
+import os
+import tempfile
+import numpy as np
+import h5py
+from pylayers.simul.simultraj import TrajStore
+
+filename = os.path.join(tempfile.mkdtemp(),'simultraj_test_run.h5')
+lt = np.arange(0,1,0.1)
+lk = [('1_Alex','2_Alex','OB','ieee802154'),('1_Alex','AP1','B2I','ieee802154')]
+ncol = len(TrajStore.columns)
+
+def block(lut):
+    """ rows, ak and tk of a block of time indices, 3 paths per row
+    """
+    rows = np.zeros((len(lut)*len(lk),ncol))
+    rows[:,0] = np.repeat(lut,len(lk))
+    rows[:,-1] = 3
+    ak = np.repeat(rows[:,0],3) + np.tile(np.arange(3),len(rows))/10.
+    return rows, ak, ak+100
+
+st = TrajStore(filename,lt,lk,resume=False)
+st.append([0,1],*block([0,1]))
+#
+# append interrupted before its commit : rows and ak written, tk and done not
+#
+rows, ak, tk = block([2,3])
+f = h5py.File(filename,'a')
+for key,data in [('rows',rows),('ak',ak)]:
+    n = f[key].shape[0]
+    f[key].resize((n+len(data),)+f[key].shape[1:])
+    f[key][n:,...] = data
+f.close()
+#
+# resume
+#
+st = TrajStore(filename,lt,lk,resume=True)
+assert list(st.done()) == [0,1]
+st.append([2,3],*block([2,3]))
+assert list(st.done()) == [0,1,2,3]
+df = st.todf()
+assert len(df) == 4*len(lk)
+for i in range(len(df)):
+    ak, tk = st.aktk(i)
+    ut = df['ut'].values[i]
+    np.testing.assert_allclose(ak,ut+np.arange(3)/10.)
+    np.testing.assert_allclose(tk,ak+100)
@@ -3363,6 +3363,44 @@ def angledir(s):
     return(a_new)
 
 
+def _BTB(a_g, T):
+    """ local angles and local spherical bases for stacked rotation matrices
+
+    Parameters
+    ----------
+
+    a_g  : angle in global reference frame  N x 2 :  N x (theta,phi)
+    T    : rotation matrices  No x 3 x 3
+
+    Returns
+    -------
+
+    B_g : ndarray (3 x 2 x N)
+        (theta,phi) global basis vectors
+    B_l : ndarray (No x 3 x 2 x N)
+        (theta,phi) local basis vectors expressed in the global frame
+    al : ndarray (No x N x 2)
+        angles expressed in local basis
+
+    Notes
+    -----
+
+    The global spherical basis is evaluated once for all the
+    orientations.
+
+    """
+    No = T.shape[0]
+    N = np.shape(a_g)[0]
+    G = SphericalBasis(a_g)
+    B_g = G[0:2, :, :].transpose((1, 0, 2))
+    # s_l = T^T s_g  : No x N x 3
+    s_l = np.einsum('oji,jn->oni', T, G[2, :, :])
+    al = angledir(s_l.reshape(No*N, 3))
+    L = SphericalBasis(al)
+    B_l = L[0:2, :, :].reshape(2, 3, No, N).transpose((2, 1, 0, 3))
+    return B_g, B_l, al.reshape(No, N, 2)
+
+
 def BTB_rx(a_g, T):
     """ Produce a set of rotation matrices for passage between global and
     local frames
@@ -3371,15 +3409,15 @@ def BTB_rx(a_g, T):
     ----------
 
     a_g  :
-        angle in global reference frame   2 x N  :  (theta,phi) x N
+        angle in global reference frame   N x 2  :  N x (theta,phi)
     T    :
-        Rx rotation matrix     3 x 3
+        Rx rotation matrix     3 x 3  or  No x 3 x 3
 
     Returns
     -------
 
-    R  :  ndarray (3x3)
-    al :  ndarray (r x 2)
+    R  :  ndarray (2 x 2 x N)  or  (No x 2 x 2 x N)
+    al :  ndarray (N x 2)  or  (No x N x 2)
         angle expressed in local basis
 
     See Also
@@ -3392,21 +3430,22 @@ def BTB_rx(a_g, T):
     Notes
     -----
 
-    N is the number or rays
+    N is the number or rays, No the number of orientations
 
-    """
-    G = SphericalBasis(a_g)
-    th_g = G[0, :, :]
-    ph_g = G[1, :, :]
-    B_g = np.dstack((th_g, ph_g)).transpose((0, 2, 1))
-    s_l = np.dot(T.T, G[2, :, :]).T
-    al = angledir(s_l)
-    L = SphericalBasis(al)
-    th_l = L[0, :, :]
-    ph_l = L[1, :, :]
-    B_lT = np.dstack((th_l, ph_l)).transpose((2, 0, 1))
-    R = mul3(B_lT, mul3(T.T, B_g))
+    .. math::
+
+        R = B_l^T T^T B_g
 
+    """
+    T = np.asarray(T)
+    stacked = T.ndim == 3
+    if not stacked:
+        T = T[np.newaxis, :, :]
+    B_g, B_l, al = _BTB(a_g, T)
+    TB_g = np.einsum('oji,jbn->oibn', T, B_g)
+    R = np.einsum('oian,oibn->oabn', B_l, TB_g)
+    if not stacked:
+        return R[0], al[0]
     return R, al
 
 
@@ -3416,27 +3455,33 @@ def BTB_tx(a_g, T):
     Parameters
     ----------
 
-    a_g  : angle in global reference frame      2 x N  :  (theta,phi) x N
-    T    : Tx rotation matrix     3 x 3
-
-    """
-    G = SphericalBasis(a_g)
+    a_g  : angle in global reference frame      N x 2  :  N x (theta,phi)
+    T    : Tx rotation matrix     3 x 3  or  No x 3 x 3
 
-    th_g = G[0, :, :]
-    ph_g = G[1, :, :]
+    Returns
+    -------
 
-    B_gT = np.dstack((th_g, ph_g)).transpose((2, 0, 1))
+    R  :  ndarray (2 x 2 x N)  or  (No x 2 x 2 x N)
+    al :  ndarray (N x 2)  or  (No x N x 2)
+        angle expressed in local basis
 
-    s_l = np.dot(T.T, G[2, :, :]).T
+    Notes
+    -----
 
-    al = angledir(s_l)
+    .. math::
 
-    L = SphericalBasis(al)
-    th_l = L[0, :, :]
-    ph_l = L[1, :, :]
-    B_l = np.dstack((th_l, ph_l)).transpose((0, 2, 1))
-    R = mul3(B_gT, mul3(T, B_l))
+        R = B_g^T T B_l
 
+    """
+    T = np.asarray(T)
+    stacked = T.ndim == 3
+    if not stacked:
+        T = T[np.newaxis, :, :]
+    B_g, B_l, al = _BTB(a_g, T)
+    TB_l = np.einsum('oij,ojbn->oibn', T, B_l)
+    R = np.einsum('ian,oibn->oabn', B_g, TB_l)
+    if not stacked:
+        return R[0], al[0]
     return R, al
 
 def plot_coords(ax, ob, color='#999999'):